@@ -0,0 +1,305 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from langchain_core.runnables import ensure_config
+
+# Caches criados pelo processo, para exportação conjunta das estatísticas
+_caches = []
+
+# Hits/misses por conversa (thread_id), só das CACHE_CONVERSAS_MAX conversas mais recentes
+_conversas = OrderedDict()
+_conversas_lock = threading.Lock()
+
+_PODAR_EXPIRADAS = """
+DELETE FROM cache_entradas
+WHERE (namespace, chave) IN (
+    SELECT namespace, chave FROM cache_entradas WHERE expira_em < CURRENT_TIMESTAMP LIMIT %s
+)
+"""
+
+
+def _conversa_atual() -> str | None:
+    """thread_id da conversa cuja tool está executando (None fora de uma conversa).
+
+    Vem do RunnableConfig que o LangChain propaga para dentro das tools, inclusive
+    em asyncio.to_thread, sem precisar passá-lo a cada get.
+    """
+    return (ensure_config().get("configurable") or {}).get("thread_id")
+
+
+class SQLiteCacheStore:
+    """Armazenamento em disco (SQLite) compartilhado entre processos do mesmo host."""
+
+    def __init__(self, path: str, tabela: str):
+        self.path = path
+        self.tabela = tabela
+        self._local = threading.local()
+        with self._db() as db:
+            db.execute(
+                f"CREATE TABLE IF NOT EXISTS {tabela} "
+                "(chave TEXT PRIMARY KEY, valor TEXT NOT NULL, expira_em REAL NOT NULL)"
+            )
+
+    def _db(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            self._local.db = db
+        return db
+
+    def get(self, chave):
+        row = self._db().execute(
+            f"SELECT valor, expira_em FROM {self.tabela} WHERE chave = ?", (chave,)
+        ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def set(self, chave, valor, expira_em):
+        self._db().execute(
+            f"INSERT OR REPLACE INTO {self.tabela} (chave, valor, expira_em) VALUES (?, ?, ?)",
+            (chave, json.dumps(valor), expira_em),
+        )
+
+    def delete(self, chave):
+        self._db().execute(f"DELETE FROM {self.tabela} WHERE chave = ?", (chave,))
+
+
+class PostgresCacheStore:
+    """Armazenamento no Postgres do agente (tabela cache_entradas, ver sql/03_create_cache_table.sql)."""
+
+    def __init__(self, namespace: str):
+        self.namespace = namespace
+
+    def get(self, chave):
+        from agent.utils import _conn
+
+        with _conn() as conn:
+            row = conn.execute(
+                "SELECT valor, EXTRACT(EPOCH FROM expira_em) FROM cache_entradas "
+                "WHERE namespace = %s AND chave = %s",
+                (self.namespace, chave),
+            ).fetchone()
+        if row is None:
+            return None
+        return row[0], float(row[1])
+
+    def set(self, chave, valor, expira_em):
+        from psycopg.types.json import Jsonb
+        from agent.utils import _conn
+
+        with _conn() as conn:
+            conn.execute(
+                "INSERT INTO cache_entradas (namespace, chave, valor, expira_em) "
+                "VALUES (%s, %s, %s, to_timestamp(%s)) "
+                "ON CONFLICT (namespace, chave) DO UPDATE "
+                "SET valor = EXCLUDED.valor, expira_em = EXCLUDED.expira_em",
+                (self.namespace, chave, Jsonb(valor), expira_em),
+            )
+
+    def delete(self, chave):
+        from agent.utils import _conn
+
+        with _conn() as conn:
+            conn.execute(
+                "DELETE FROM cache_entradas WHERE namespace = %s AND chave = %s",
+                (self.namespace, chave),
+            )
+
+
+class TTLCache:
+    """Cache com expiração (TTL) e limite de tamanho com evicção LRU.
+
+    Opcionalmente usa um `store` compartilhado (SQLite ou Postgres) como segundo
+    nível: faltas na memória são buscadas no store e escritas vão para ambos.
+    Os valores precisam ser serializáveis em JSON quando há store. Um erro no
+    store (banco fora do ar, SQLite travado) conta em store_errors e o cache
+    segue só com a memória, como numa falta.
+    """
+
+    def __init__(self, nome: str, ttl: float, maxsize: int, store=None):
+        self.nome = nome
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.store = store
+        self._dados = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.store_errors = 0
+        _caches.append(self)
+
+    def _contar_na_conversa(self, evento: str):
+        """Soma um hit/miss à conversa atual; cada hit é uma chamada ao Asaas evitada nela."""
+        thread_id = _conversa_atual()
+        if thread_id is None:
+            return
+        with _conversas_lock:
+            contagem = _conversas.get(thread_id)
+            if contagem is None:
+                contagem = _conversas[thread_id] = Counter()
+            _conversas.move_to_end(thread_id)
+            contagem[f"cache_{self.nome}_{evento}"] += 1
+            while len(_conversas) > int(os.getenv("CACHE_CONVERSAS_MAX", "10000")):
+                _conversas.popitem(last=False)
+
+    def _get_memoria(self, chave):
+        agora = time.time()
+        with self._lock:
+            entrada = self._dados.get(chave)
+            if entrada is not None and entrada[1] <= agora:
+                del self._dados[chave]
+                entrada = None
+            if entrada is not None:
+                self._dados.move_to_end(chave)
+                self.hits += 1
+        if entrada is None:
+            return False, None
+        self._contar_na_conversa("hits")
+        return True, entrada[0]
+
+    def _set_memoria(self, chave, valor, expira_em):
+        with self._lock:
+            self._dados[chave] = (valor, expira_em)
+            self._dados.move_to_end(chave)
+            while len(self._dados) > self.maxsize:
+                self._dados.popitem(last=False)
+                self.evictions += 1
+
+    def _acessar_store(self, operacao, *args):
+        """Chama store.<operacao>(*args); em caso de erro conta store_errors e retorna None."""
+        try:
+            return getattr(self.store, operacao)(*args)
+        except Exception:
+            with self._lock:
+                self.store_errors += 1
+            return None
+
+    def _get_store(self, chave):
+        entrada = self._acessar_store("get", chave) if self.store is not None else None
+        if entrada is not None and entrada[1] > time.time():
+            self._set_memoria(chave, entrada[0], entrada[1])
+            with self._lock:
+                self.hits += 1
+            self._contar_na_conversa("hits")
+            return entrada[0]
+        with self._lock:
+            self.misses += 1
+        self._contar_na_conversa("misses")
+        return None
+
+    def get(self, chave):
+        """Retorna o valor em cache ou None se ausente/expirado."""
+        encontrado, valor = self._get_memoria(chave)
+        if encontrado:
+            return valor
+        return self._get_store(chave)
+
+    def set(self, chave, valor):
+        expira_em = time.time() + self.ttl
+        self._set_memoria(chave, valor, expira_em)
+        if self.store is not None:
+            self._acessar_store("set", chave, valor, expira_em)
+
+    def invalidate(self, chave):
+        """Remove explicitamente uma entrada (ex.: após erro usando o valor em cache)."""
+        with self._lock:
+            self._dados.pop(chave, None)
+            self.invalidations += 1
+        if self.store is not None:
+            self._acessar_store("delete", chave)
+
+    def clear(self):
+        with self._lock:
+            self._dados.clear()
+
+    # Versões assíncronas: a memória é consultada direto; o store, que faz I/O
+    # bloqueante, roda em uma thread para não travar o event loop.
+
+    async def aget(self, chave):
+        encontrado, valor = self._get_memoria(chave)
+        if encontrado:
+            return valor
+        if self.store is None:
+            return self._get_store(chave)
+        return await asyncio.to_thread(self._get_store, chave)
+
+    async def aset(self, chave, valor):
+        if self.store is None:
+            return self.set(chave, valor)
+        await asyncio.to_thread(self.set, chave, valor)
+
+    async def ainvalidate(self, chave):
+        if self.store is None:
+            return self.invalidate(chave)
+        await asyncio.to_thread(self.invalidate, chave)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                f"cache_{self.nome}_hits": self.hits,
+                f"cache_{self.nome}_misses": self.misses,
+                f"cache_{self.nome}_evictions": self.evictions,
+                f"cache_{self.nome}_invalidations": self.invalidations,
+                f"cache_{self.nome}_store_errors": self.store_errors,
+                f"cache_{self.nome}_size": len(self._dados),
+                f"cache_{self.nome}_hit_ratio": self.hits / total if total else 0.0,
+            }
+
+
+def criar_cache(nome: str, ttl: float, maxsize: int) -> TTLCache:
+    """Cria um TTLCache com o store compartilhado configurado por CACHE_STORE.
+
+    CACHE_STORE: "memoria" (padrão), "disco" (SQLite em CACHE_PATH) ou "postgres".
+    """
+    tipo = os.getenv("CACHE_STORE", "memoria").lower()
+    store = None
+    if tipo == "disco":
+        store = SQLiteCacheStore(os.getenv("CACHE_PATH", ".cache_agente.sqlite3"), f"cache_{nome}")
+    elif tipo == "postgres":
+        store = PostgresCacheStore(nome)
+    return TTLCache(nome, ttl=ttl, maxsize=maxsize, store=store)
+
+
+def podar_cache(lote: int = 1000) -> int:
+    """Remove as entradas expiradas de cache_entradas (CACHE_STORE=postgres) em lotes de `lote`.
+
+    Returns:
+        quantidade de entradas removidas
+    """
+    from agent.utils import _conn
+
+    removidas = 0
+    while True:
+        with _conn() as conn:
+            apagadas = conn.execute(_PODAR_EXPIRADAS, (lote,)).rowcount
+        removidas += apagadas
+        if apagadas < lote:
+            return removidas
+
+
+def cache_stats() -> dict:
+    """Estatísticas de todos os caches do processo, no formato {métrica: valor}."""
+    stats = {}
+    for cache in _caches:
+        stats.update(cache.stats())
+    return stats
+
+
+def cache_stats_conversa(thread_id: str) -> dict:
+    """Hits e misses dos caches em uma conversa, no formato {métrica: valor}.
+
+    Cada hit é uma chamada ao Asaas que a conversa deixou de fazer. Conversas
+    fora das CACHE_CONVERSAS_MAX mais recentes voltam vazias.
+    """
+    with _conversas_lock:
+        return dict(_conversas.get(thread_id, {}))
@@ -0,0 +1,287 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from typing import Any
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import httpx
+import requests
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage, message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, ChatResult
+from pydantic import PrivateAttr
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+# Cassetes: trocas com o Asaas (HTTP) e com o modelo de chat gravadas em JSON
+# e reproduzidas sem rede, com a latência gravada ou uma latência fixa. Servem
+# para perfilar as tools e o grafo inteiro (benchmarks/bench_agente_replay.py)
+# sem depender do Asaas nem da OpenAI.
+
+# Só o que as tools leem da resposta; o resto (cookies, datas, ids de requisição) não é gravado
+_HEADERS_GRAVADOS = ("Content-Type", "Retry-After")
+
+_cassete = None
+_cassete_lock = threading.Lock()
+
+
+class CasseteIncompleto(LookupError):
+    """A reprodução pediu uma troca que não está gravada no cassete."""
+
+
+class Cassete:
+    """Trocas gravadas em um arquivo JSON, agrupadas por chave.
+
+    No modo "gravar" o arquivo começa vazio e é reescrito a cada troca. No modo
+    "reproduzir" as trocas de uma chave voltam na ordem em que foram gravadas;
+    depois da última, a última se repete. latencia_ms fixa a espera de cada
+    troca reproduzida (None: a duração gravada).
+    """
+
+    def __init__(self, caminho: str, modo: str = "reproduzir", latencia_ms: float | None = None):
+        if modo not in ("gravar", "reproduzir"):
+            raise ValueError(f"Modo de cassete inválido: {modo} (use gravar ou reproduzir)")
+        self.caminho = str(caminho)
+        self.modo = modo
+        self.latencia_ms = latencia_ms
+        self._lock = threading.Lock()
+        self._trocas = defaultdict(list)
+        self._posicoes = Counter()
+        if modo == "reproduzir":
+            with open(self.caminho, encoding="utf-8") as f:
+                self._trocas.update(json.load(f)["trocas"])
+
+    @property
+    def gravando(self) -> bool:
+        return self.modo == "gravar"
+
+    def gravar(self, chave: str, troca: dict):
+        with self._lock:
+            self._trocas[chave].append(troca)
+            temporario = f"{self.caminho}.tmp"
+            with open(temporario, "w", encoding="utf-8") as f:
+                json.dump({"versao": 1, "trocas": self._trocas}, f, ensure_ascii=False, indent=1, sort_keys=True)
+            os.replace(temporario, self.caminho)
+
+    def reproduzir(self, chave: str) -> dict:
+        """Próxima troca gravada da chave.
+
+        Raises:
+            CasseteIncompleto: se a chave não foi gravada
+        """
+        with self._lock:
+            trocas = self._trocas.get(chave)
+            if not trocas:
+                raise CasseteIncompleto(f"Troca não gravada no cassete {self.caminho}: {chave}")
+            posicao = self._posicoes[chave]
+            self._posicoes[chave] += 1
+        return trocas[min(posicao, len(trocas) - 1)]
+
+    def espera(self, troca: dict) -> float:
+        """Segundos de latência injetada na reprodução da troca."""
+        ms = troca.get("duracao_ms", 0) if self.latencia_ms is None else self.latencia_ms
+        return ms / 1000
+
+
+def _get_cassete_config():
+    """Retorna (arquivo do cassete do Asaas ou None, modo, latência em ms ou None).
+
+    ASAAS_CASSETE: arquivo JSON do cassete; sem ele as chamadas vão para a rede
+    ASAAS_CASSETE_MODO: gravar ou reproduzir (padrão: reproduzir)
+    ASAAS_CASSETE_LATENCIA: "gravada" (padrão) ou milissegundos fixos por troca
+    """
+    latencia = os.getenv("ASAAS_CASSETE_LATENCIA", "gravada")
+    return (
+        os.getenv("ASAAS_CASSETE") or None,
+        os.getenv("ASAAS_CASSETE_MODO", "reproduzir").lower(),
+        None if latencia == "gravada" else float(latencia),
+    )
+
+
+def obter_cassete() -> Cassete | None:
+    """Cassete do Asaas configurado no ambiente (um por processo), ou None."""
+    global _cassete
+    caminho, modo, latencia = _get_cassete_config()
+    if caminho is None:
+        return None
+    with _cassete_lock:
+        if _cassete is None or (_cassete.caminho, _cassete.modo, _cassete.latencia_ms) != (caminho, modo, latencia):
+            _cassete = Cassete(caminho, modo, latencia)
+        return _cassete
+
+
+def _reset_cassete():
+    """Descarta o cassete do processo (útil em testes)."""
+    global _cassete
+    with _cassete_lock:
+        _cassete = None
+
+
+def chave_http(method: str, url) -> str:
+    """Chave da troca: método, caminho relativo a ASAAS_BASE_URL e query ordenada.
+
+    O corpo não entra na chave: o PUT de atualizar_boleto leva a data de hoje e
+    deixaria o cassete velho no dia seguinte.
+    """
+    partes = urlsplit(str(url))
+    base = urlsplit(os.getenv("ASAAS_BASE_URL", "")).path.rstrip("/")
+    caminho = partes.path[len(base):] if base and partes.path.startswith(base) else partes.path
+    query = urlencode(sorted(parse_qsl(partes.query, keep_blank_values=True)))
+    return f"{method.upper()} {caminho}" + (f"?{query}" if query else "")
+
+
+def _troca_http(status: int, headers, corpo: str, inicio: float) -> dict:
+    return {
+        "status": status,
+        "headers": {nome: headers[nome] for nome in _HEADERS_GRAVADOS if nome in headers},
+        "corpo": corpo,
+        "duracao_ms": round((time.perf_counter() - inicio) * 1000, 3),
+    }
+
+
+class CasseteAdapter(HTTPAdapter):
+    """Adapter do requests.Session do Asaas que grava ou reproduz as trocas do cassete.
+
+    Na reprodução, uma troca ausente vira ConnectionError, tratada pelas tools
+    como qualquer falha de conexão.
+    """
+
+    def __init__(self, cassete: Cassete, **kwargs):
+        self.cassete = cassete
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        chave = chave_http(request.method, request.url)
+        if self.cassete.gravando:
+            inicio = time.perf_counter()
+            response = super().send(request, **kwargs)
+            self.cassete.gravar(chave, _troca_http(response.status_code, response.headers, response.text, inicio))
+            return response
+
+        try:
+            troca = self.cassete.reproduzir(chave)
+        except CasseteIncompleto as e:
+            raise requests.exceptions.ConnectionError(str(e), request=request)
+        time.sleep(self.cassete.espera(troca))
+
+        response = requests.Response()
+        response.status_code = troca["status"]
+        response.headers = CaseInsensitiveDict(troca["headers"])
+        response._content = troca["corpo"].encode("utf-8")
+        response.encoding = "utf-8"
+        response.url = request.url
+        response.request = request
+        return response
+
+
+class CasseteTransport(httpx.AsyncBaseTransport):
+    """Transport do httpx.AsyncClient do Asaas, equivalente ao CasseteAdapter."""
+
+    def __init__(self, cassete: Cassete, transporte: httpx.AsyncBaseTransport | None = None):
+        self.cassete = cassete
+        self._transporte = transporte or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request):
+        chave = chave_http(request.method, request.url)
+        if self.cassete.gravando:
+            inicio = time.perf_counter()
+            response = await self._transporte.handle_async_request(request)
+            corpo = (await response.aread()).decode("utf-8", "replace")
+            await response.aclose()
+            troca = _troca_http(response.status_code, response.headers, corpo, inicio)
+            self.cassete.gravar(chave, troca)
+        else:
+            try:
+                troca = self.cassete.reproduzir(chave)
+            except CasseteIncompleto as e:
+                raise httpx.ConnectError(str(e), request=request)
+            await asyncio.sleep(self.cassete.espera(troca))
+
+        # Resposta montada só com os headers gravados: o corpo já está decodificado
+        return httpx.Response(troca["status"], headers=troca["headers"], content=troca["corpo"].encode("utf-8"), request=request)
+
+    async def aclose(self):
+        await self._transporte.aclose()
+
+
+def _texto(mensagem) -> str:
+    conteudo = mensagem.content
+    if isinstance(conteudo, list):
+        conteudo = " ".join(bloco.get("text", "") for bloco in conteudo if isinstance(bloco, dict))
+    return conteudo.strip()
+
+
+def chave_conversa(messages) -> str:
+    """Chave de uma chamada ao modelo: textos do cliente e sequência de tools da conversa.
+
+    Prompt de sistema, notas de histórico, saídas das tools e ids ficam de fora:
+    a mesma conversa tem a mesma chave entre execuções e entre threads.
+    """
+    partes = []
+    for m in messages:
+        if isinstance(m, HumanMessage):
+            partes.append(["cliente", _texto(m)])
+        elif isinstance(m, AIMessage):
+            partes.append(["modelo", [c["name"] for c in m.tool_calls]])
+        elif isinstance(m, ToolMessage):
+            partes.append(["tool", m.name])
+    return hashlib.sha256(json.dumps(partes, ensure_ascii=False).encode("utf-8")).hexdigest()[:32]
+
+
+def _mensagem_reproduzida(troca: dict) -> AIMessage:
+    """AIMessage gravada com ids novos (o add_messages substituiria uma mensagem de mesmo id)."""
+    mensagem = messages_from_dict([troca["mensagem"]])[0]
+    mensagem.id = None
+    mensagem.tool_calls = [{**c, "id": f"call_{uuid.uuid4().hex[:12]}"} for c in mensagem.tool_calls]
+    return mensagem
+
+
+class CasseteChatModel(BaseChatModel):
+    """Modelo de chat que grava as respostas de `modelo` ou as reproduz do cassete.
+
+    A reprodução não precisa de `modelo` e tem _agenerate próprio (asyncio.sleep),
+    então centenas de conversas simultâneas não disputam o executor de threads.
+    """
+
+    cassete: Any
+    modelo: Any = None
+    _ligado: Any = PrivateAttr(default=None)
+
+    @property
+    def _llm_type(self) -> str:
+        return "cassete"
+
+    def bind_tools(self, tools, **kwargs):
+        if self.modelo is not None:
+            self._ligado = self.modelo.bind_tools(tools, **kwargs)
+        return self
+
+    def _gravar(self, chave, mensagem, inicio):
+        self.cassete.gravar(chave, {
+            "mensagem": message_to_dict(mensagem),
+            "duracao_ms": round((time.perf_counter() - inicio) * 1000, 3),
+        })
+        return ChatResult(generations=[ChatGeneration(message=mensagem)])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        chave = chave_conversa(messages)
+        if self.cassete.gravando:
+            inicio = time.perf_counter()
+            return self._gravar(chave, (self._ligado or self.modelo).invoke(messages, stop=stop, **kwargs), inicio)
+        troca = self.cassete.reproduzir(chave)
+        time.sleep(self.cassete.espera(troca))
+        return ChatResult(generations=[ChatGeneration(message=_mensagem_reproduzida(troca))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        chave = chave_conversa(messages)
+        if self.cassete.gravando:
+            inicio = time.perf_counter()
+            return self._gravar(chave, await (self._ligado or self.modelo).ainvoke(messages, stop=stop, **kwargs), inicio)
+        troca = self.cassete.reproduzir(chave)
+        await asyncio.sleep(self.cassete.espera(troca))
+        return ChatResult(generations=[ChatGeneration(message=_mensagem_reproduzida(troca))])
@@ -0,0 +1,156 @@
+import asyncio
+import os
+import weakref
+from datetime import datetime, timedelta, timezone
+
+from langgraph.checkpoint.postgres import PostgresSaver
+from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+
+from agent.utils import _get_async_checkpoint_pool, _get_checkpoint_pool
+
+# Tabelas do PostgresSaver com dados por thread, na ordem em que são apagadas
+_TABELAS_THREAD = ("checkpoint_writes", "checkpoint_blobs", "checkpoints")
+
+# Threads cujo checkpoint mais recente é anterior ao corte. O campo ts do
+# checkpoint é gravado pelo LangGraph em ISO 8601 UTC, então a comparação de
+# texto equivale à comparação de datas.
+_SELECT_THREADS_ANTIGAS = """
+    SELECT thread_id FROM checkpoints
+    GROUP BY thread_id
+    HAVING max(checkpoint->>'ts') < %s
+    LIMIT %s
+"""
+
+
+class PostgresSaverSyncAsync(PostgresSaver):
+    """PostgresSaver que também atende ainvoke/astream.
+
+    O PostgresSaver só implementa os métodos síncronos (aget_tuple, aput etc.
+    levantam NotImplementedError). Aqui as chamadas assíncronas vão para um
+    AsyncPostgresSaver do event loop atual, sobre o pool de checkpoints do
+    mesmo loop; as síncronas continuam no pool de _get_checkpoint_pool().
+    """
+
+    def __init__(self, conn, pipe=None, serde=None):
+        super().__init__(conn, pipe, serde)
+        # Assim como os pools assíncronos, o AsyncPostgresSaver fica preso ao loop que o criou
+        self._savers_async = weakref.WeakKeyDictionary()
+
+    async def _saver_async(self) -> AsyncPostgresSaver:
+        loop = asyncio.get_running_loop()
+        saver = self._savers_async.get(loop)
+        if saver is None:
+            saver = AsyncPostgresSaver(await _get_async_checkpoint_pool(), serde=self.serde)
+            self._savers_async[loop] = saver
+        return saver
+
+    async def aget_tuple(self, config):
+        return await (await self._saver_async()).aget_tuple(config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        saver = await self._saver_async()
+        async for checkpoint in saver.alist(config, filter=filter, before=before, limit=limit):
+            yield checkpoint
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return await (await self._saver_async()).aput(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        await (await self._saver_async()).aput_writes(config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id):
+        await (await self._saver_async()).adelete_thread(thread_id)
+
+
+def _get_checkpointer_config():
+    """Retorna (tipo do checkpointer, TTL das threads em segundos).
+
+    AGENT_CHECKPOINTER: "postgres" (tabelas de sql/05_create_checkpoints.sql),
+        "memoria" (InMemorySaver, útil em testes e evals) ou "nenhum" (padrão;
+        o LangGraph Server já persiste as threads por conta própria)
+    CHECKPOINT_THREAD_TTL: threads sem atividade há mais que isso são removidas por podar_threads
+    """
+    return (
+        os.getenv("AGENT_CHECKPOINTER", "nenhum").lower(),
+        float(os.getenv("CHECKPOINT_THREAD_TTL", "2592000")),
+    )
+
+
+def criar_checkpointer():
+    """Cria o checkpointer do grafo conforme AGENT_CHECKPOINTER (None se desabilitado).
+
+    Com checkpointer, quem chama o agente envia só a nova mensagem do usuário e
+    o thread_id em config["configurable"]; o histórico vem do checkpoint.
+    Em turnos de conversa, invoke(..., durability="exit") grava um checkpoint só
+    ao fim do turno, em vez de um por passo do grafo (ver benchmarks/bench_checkpointer.py).
+    O checkpointer Postgres usa os pools de checkpoints de agent.utils, com o
+    mesmo banco e limites DB_POOL_* do restante do agente, e atende tanto
+    invoke quanto ainvoke/astream (ver PostgresSaverSyncAsync).
+    """
+    tipo, _ = _get_checkpointer_config()
+    if tipo == "postgres":
+        return PostgresSaverSyncAsync(_get_checkpoint_pool())
+    if tipo == "memoria":
+        from langgraph.checkpoint.memory import InMemorySaver
+
+        return InMemorySaver()
+    return None
+
+
+async def acriar_checkpointer():
+    """Versão assíncrona de criar_checkpointer, para grafos usados com ainvoke/astream.
+
+    O AsyncPostgresSaver fica preso ao event loop em que foi criado, assim como o pool.
+    """
+    tipo, _ = _get_checkpointer_config()
+    if tipo == "postgres":
+        return AsyncPostgresSaver(await _get_async_checkpoint_pool())
+    return criar_checkpointer()
+
+
+def _corte(ttl: float | None) -> str:
+    if ttl is None:
+        _, ttl = _get_checkpointer_config()
+    return (datetime.now(timezone.utc) - timedelta(seconds=ttl)).isoformat()
+
+
+def podar_threads(ttl: float | None = None, lote: int = 500) -> int:
+    """Remove os checkpoints das threads sem atividade há mais de `ttl` segundos.
+
+    Apaga em lotes de `lote` threads, cada lote na sua transação, para não
+    segurar locks das tabelas de checkpoint por muito tempo.
+
+    Returns:
+        quantidade de threads removidas
+    """
+    corte = _corte(ttl)
+    removidas = 0
+    pool = _get_checkpoint_pool()
+    while True:
+        with pool.connection() as conn:
+            with conn.transaction():
+                threads = [
+                    row["thread_id"] for row in conn.execute(_SELECT_THREADS_ANTIGAS, (corte, lote)).fetchall()
+                ]
+                for tabela in _TABELAS_THREAD:
+                    conn.execute(f"DELETE FROM {tabela} WHERE thread_id = ANY(%s)", (threads,))
+        removidas += len(threads)
+        if len(threads) < lote:
+            return removidas
+
+
+async def apodar_threads(ttl: float | None = None, lote: int = 500) -> int:
+    """Versão assíncrona de podar_threads."""
+    corte = _corte(ttl)
+    removidas = 0
+    pool = await _get_async_checkpoint_pool()
+    while True:
+        async with pool.connection() as conn:
+            async with conn.transaction():
+                cur = await conn.execute(_SELECT_THREADS_ANTIGAS, (corte, lote))
+                threads = [row["thread_id"] for row in await cur.fetchall()]
+                for tabela in _TABELAS_THREAD:
+                    await conn.execute(f"DELETE FROM {tabela} WHERE thread_id = ANY(%s)", (threads,))
+        removidas += len(threads)
+        if len(threads) < lote:
+            return removidas
@@ -0,0 +1,153 @@
+import json
+import os
+
+from agent.cache import criar_cache
+
+# Registros completos (cliente, pendências com links) referenciados por id no formato compacto
+_registros = criar_cache(
+    "registros",
+    ttl=float(os.getenv("TOOL_REGISTROS_TTL", "86400")),
+    maxsize=int(os.getenv("TOOL_REGISTROS_MAXSIZE", "20000")),
+)
+
+# Campos do cliente mantidos na saída compacta; o restante fica em _registros
+CAMPOS_CLIENTE = ("id", "nome", "cpfCnpj", "email")
+
+# Colunas da tabela de pendências na saída compacta: (cabeçalho, campo da pendência)
+COLUNAS_PENDENCIA = (
+    ("id", "id"),
+    ("status", "status"),
+    ("venc", "data_vencimento"),
+    ("valor", "valor"),
+    ("total", "valor_total"),
+    ("fatura", "numero_fatura"),
+    ("desc", "descricao"),
+)
+
+REFERENCIA = "links e dados completos: detalhar_registro(id)"
+
+
+def formato_compacto() -> bool:
+    """Indica se as saídas das tools voltam ao modelo no formato compacto (TOOL_OUTPUT_FORMAT=compacto)."""
+    return os.getenv("TOOL_OUTPUT_FORMAT", "padrao").lower() == "compacto"
+
+
+def _valor(valor) -> str:
+    if isinstance(valor, bool):
+        return "sim" if valor else "nao"
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    if isinstance(valor, dict):
+        valor = {chave: v for chave, v in valor.items() if not _vazio(v)}
+    if isinstance(valor, (dict, list)):
+        return json.dumps(valor, ensure_ascii=False, separators=(",", ":"))
+    # "|" e quebras de linha separam colunas e linhas das tabelas
+    return str(valor).replace("|", "/").replace("\n", " ")
+
+
+def _vazio(valor) -> bool:
+    return valor is None or valor == "" or valor == [] or valor == {}
+
+
+def tabela(itens: list[dict], colunas=None) -> str:
+    """Renderiza dicionários como tabela "a|b|c", com cabeçalho e sem colunas sempre vazias.
+
+    colunas: pares (cabeçalho, campo); por padrão, todos os campos na ordem em que aparecem
+    """
+    if colunas is None:
+        campos = list(dict.fromkeys(campo for item in itens for campo in item))
+        colunas = [(campo, campo) for campo in campos]
+    colunas = [(cabecalho, campo) for cabecalho, campo in colunas if any(not _vazio(i.get(campo)) for i in itens)]
+    linhas = ["|".join(cabecalho for cabecalho, _ in colunas)]
+    for item in itens:
+        linhas.append("|".join("" if _vazio(item.get(campo)) else _valor(item.get(campo)) for _, campo in colunas))
+    return "\n".join(linhas)
+
+
+def pares(dados: dict) -> str:
+    """Renderiza um dicionário como "chave=valor; ..." sem os campos vazios."""
+    return "; ".join(f"{chave}={_valor(valor)}" for chave, valor in dados.items() if not _vazio(valor))
+
+
+def _renderizar_generico(dados: dict) -> str:
+    linhas = []
+    escalares = {}
+    for chave, valor in dados.items():
+        if isinstance(valor, list) and valor and all(isinstance(item, dict) for item in valor):
+            linhas.append(f"{chave}:\n{tabela(valor)}")
+        else:
+            escalares[chave] = valor
+    return "\n".join([pares(escalares), *linhas])
+
+
+def _renderizar_consulta(dados: dict) -> str:
+    if dados.get("status") != "sucesso":
+        return _renderizar_generico(dados)
+
+    cliente = dados.get("cliente") or {}
+    pendencias = dados.get("pendencias") or []
+    total = dados.get("total_pendencias") or 0
+    linhas = [
+        "status=sucesso",
+        "cliente: " + pares({campo: cliente.get(campo) for campo in CAMPOS_CLIENTE}),
+        f"pendencias ({total}{', há mais' if dados.get('truncado') else ''}):",
+    ]
+    if pendencias:
+        linhas.append(tabela(pendencias, COLUNAS_PENDENCIA))
+    linhas.append(REFERENCIA)
+    return "\n".join(linhas)
+
+
+_RENDERIZADORES = {
+    "ConsultaFinanceiraOutput": _renderizar_consulta,
+}
+
+
+def renderizar(saida) -> str:
+    """Texto de uma saída de tool no formato compacto (o que vai na ToolMessage).
+
+    Remove campos nulos, usa tabelas para listas de registros e, na consulta
+    financeira, troca links e dados cadastrais pela referência a detalhar_registro.
+    """
+    dados = saida.model_dump()
+    renderizador = _RENDERIZADORES.get(type(saida).__name__, _renderizar_generico)
+    return renderizador(dados)
+
+
+def _chave(thread_id: str | None, registro_id: str) -> str:
+    # Cada conversa só enxerga os registros das próprias consultas
+    return f"{thread_id or ''}:{registro_id}"
+
+
+def guardar_registros(saida, thread_id: str | None = None):
+    """Guarda cliente e pendências completos de uma consulta para detalhar_registro.
+
+    Os registros ficam restritos à conversa (thread_id) que fez a consulta.
+    Só tem efeito no formato compacto; retorna a própria saída.
+    """
+    if formato_compacto() and saida.status == "sucesso":
+        cliente = saida.cliente or {}
+        if cliente.get("id"):
+            _registros.set(_chave(thread_id, cliente["id"]), cliente)
+        for pendencia in saida.pendencias or []:
+            _registros.set(_chave(thread_id, pendencia["id"]), pendencia)
+    return saida
+
+
+async def guardar_registros_async(saida, thread_id: str | None = None):
+    """Versão assíncrona de guardar_registros."""
+    if formato_compacto() and saida.status == "sucesso":
+        cliente = saida.cliente or {}
+        if cliente.get("id"):
+            await _registros.aset(_chave(thread_id, cliente["id"]), cliente)
+        for pendencia in saida.pendencias or []:
+            await _registros.aset(_chave(thread_id, pendencia["id"]), pendencia)
+    return saida
+
+
+def ler_registro(registro_id: str, thread_id: str | None = None) -> dict | None:
+    return _registros.get(_chave(thread_id, registro_id))
+
+
+async def aler_registro(registro_id: str, thread_id: str | None = None) -> dict | None:
+    return await _registros.aget(_chave(thread_id, registro_id))
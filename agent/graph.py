@@ -6,9 +6,14 @@ from agent.tools import (
     validar_comprovante,
     transferir_humano,
     registrar_negociacao,
-    verificar_negociacao
+    verificar_negociacao,
+    detalhar_registro,
 )
+from agent.checkpoint import criar_checkpointer
+from agent.compact import formato_compacto
+from agent.history import criar_pre_model_hook
 from agent.prompt import system_message, basic_prompt
+from agent.router import com_roteador
 
 model = ChatOpenAI(
     model="gpt-5-nano",
@@ -17,15 +22,26 @@ model = ChatOpenAI(
     verbosity="low",
 )
 
-agent = create_react_agent(
-    model,
-    prompt=basic_prompt,
-    tools=[
-        consulta_financeira,
-        atualizar_boleto,
-        validar_comprovante,
-        transferir_humano,
-        registrar_negociacao,
-        verificar_negociacao
-    ],
+tools = [
+    consulta_financeira,
+    atualizar_boleto,
+    validar_comprovante,
+    transferir_humano,
+    registrar_negociacao,
+    verificar_negociacao,
+    # Só existe o que detalhar quando as saídas são compactas
+    *([detalhar_registro] if formato_compacto() else []),
+]
+
+agent = com_roteador(
+    create_react_agent(
+        model,
+        prompt=basic_prompt,
+        tools=tools,
+        # Mantém os últimos turnos na íntegra e o prompt dentro de HISTORY_MAX_TOKENS
+        pre_model_hook=criar_pre_model_hook(basic_prompt),
+    ),
+    tools,
+    # Com AGENT_CHECKPOINTER=postgres o histórico fica no banco: basta enviar a nova mensagem e o thread_id
+    checkpointer=criar_checkpointer(),
 )
@@ -0,0 +1,120 @@
+import os
+import re
+
+from langchain_core.messages import HumanMessage, SystemMessage, ToolMessage
+from langchain_core.messages.utils import count_tokens_approximately
+
+# Identificadores que precisam sobreviver ao corte do histórico (CNPJ/CPF e ids do Asaas)
+_RE_IDENTIFICADORES = re.compile(
+    r"\b\d{2}\.?\d{3}\.?\d{3}/?\d{4}-?\d{2}\b|\b\d{3}\.?\d{3}\.?\d{3}-?\d{2}\b|\b(?:cus|pay)_\w+"
+)
+
+
+def _get_history_config():
+    """Retorna (turnos mantidos na íntegra, orçamento de tokens por chamada, caracteres por resumo).
+
+    HISTORY_MAX_TURNS: últimos turnos (mensagem do usuário em diante) enviados sem alteração
+    HISTORY_MAX_TOKENS: teto de tokens de cada chamada ao modelo (prompt de sistema incluído)
+    HISTORY_TOOL_SUMMARY_CHARS: tamanho máximo das saídas de tools nos turnos antigos
+    """
+    return (
+        int(os.getenv("HISTORY_MAX_TURNS", "4")),
+        int(os.getenv("HISTORY_MAX_TOKENS", "8000")),
+        int(os.getenv("HISTORY_TOOL_SUMMARY_CHARS", "240")),
+    )
+
+
+def _texto(mensagem) -> str:
+    conteudo = mensagem.content
+    if isinstance(conteudo, list):
+        return " ".join(bloco.get("text", "") for bloco in conteudo if isinstance(bloco, dict))
+    return conteudo
+
+
+def _turnos(messages) -> list[list]:
+    """Agrupa as mensagens em turnos: cada turno começa numa mensagem do usuário."""
+    turnos = []
+    for mensagem in messages:
+        if isinstance(mensagem, HumanMessage) or not turnos:
+            turnos.append([])
+        turnos[-1].append(mensagem)
+    return turnos
+
+
+def _resumir_tool_message(mensagem: ToolMessage, limite: int) -> ToolMessage:
+    """Encurta a saída de uma tool de um turno antigo, mantendo o par com a chamada."""
+    texto = _texto(mensagem)
+    if len(texto) <= limite:
+        return mensagem
+    resumo = f"{texto[:limite].rstrip()}… [saída de {mensagem.name} resumida; {len(texto)} caracteres]"
+    return mensagem.model_copy(update={"content": resumo})
+
+
+def _nota_de_corte(turnos_omitidos: list[list]) -> SystemMessage:
+    """Resumo dos turnos descartados: quantos eram e os identificadores citados neles."""
+    identificadores = []
+    for turno in turnos_omitidos:
+        for mensagem in turno:
+            for encontrado in _RE_IDENTIFICADORES.findall(_texto(mensagem)):
+                if encontrado not in identificadores:
+                    identificadores.append(encontrado)
+    nota = f"[{len(turnos_omitidos)} turnos anteriores omitidos por tamanho."
+    if identificadores:
+        nota += f" Identificadores citados: {', '.join(identificadores[-10:])}."
+    return SystemMessage(content=nota + "]")
+
+
+def reduzir_historico(messages, prompt=None, max_turnos=None, max_tokens=None, limite_resumo=None) -> list:
+    """Reduz o histórico enviado ao modelo, sem alterar o estado salvo da conversa.
+
+    - os últimos `max_turnos` turnos vão na íntegra
+    - nos turnos anteriores, as saídas de tools viram resumos curtos
+    - se ainda passar de `max_tokens` (contando o prompt de sistema), os turnos
+      mais antigos saem inteiros (o último turno é sempre mantido) e uma nota
+      com os identificadores citados neles entra no lugar
+    """
+    padrao_turnos, padrao_tokens, padrao_resumo = _get_history_config()
+    max_turnos = padrao_turnos if max_turnos is None else max_turnos
+    max_tokens = padrao_tokens if max_tokens is None else max_tokens
+    limite_resumo = padrao_resumo if limite_resumo is None else limite_resumo
+
+    turnos = _turnos(messages)
+    corte = max(0, len(turnos) - max_turnos)
+    antigos, recentes = turnos[:corte], turnos[corte:]
+    antigos = [
+        [_resumir_tool_message(m, limite_resumo) if isinstance(m, ToolMessage) else m for m in turno]
+        for turno in antigos
+    ]
+    turnos = antigos + recentes
+
+    tokens_prompt = count_tokens_approximately([prompt]) if prompt is not None else 0
+    tokens_turnos = [count_tokens_approximately(turno) for turno in turnos]
+
+    omitidos = []
+    while len(turnos) > 1 and tokens_prompt + sum(tokens_turnos) > max_tokens:
+        omitidos.append(turnos.pop(0))
+        tokens_turnos.pop(0)
+
+    reduzido = [mensagem for turno in turnos for mensagem in turno]
+    if omitidos:
+        reduzido.insert(0, _nota_de_corte(omitidos))
+    return reduzido
+
+
+def criar_pre_model_hook(prompt=None, max_turnos=None, max_tokens=None, limite_resumo=None):
+    """Cria o pre_model_hook do create_react_agent que aplica reduzir_historico.
+
+    O resultado vai em llm_input_messages: o estado (e o checkpoint) continua com
+    todas as mensagens; só a entrada de cada chamada ao modelo é reduzida.
+    Parâmetros não informados vêm das variáveis HISTORY_* a cada chamada.
+    """
+
+    def pre_model_hook(state):
+        messages = state["messages"] if isinstance(state, dict) else state.messages
+        return {
+            "llm_input_messages": reduzir_historico(
+                messages, prompt, max_turnos=max_turnos, max_tokens=max_tokens, limite_resumo=limite_resumo,
+            )
+        }
+
+    return pre_model_hook
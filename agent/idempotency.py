@@ -0,0 +1,211 @@
+import hashlib
+import json
+import os
+import threading
+from collections import Counter
+
+from psycopg.types.json import Jsonb
+
+from agent.utils import _aconn, _conn
+
+# Reserva a chave para esta execução. Uma chave existente só é retomada se já
+# expirou ou se ficou "em andamento" (resultado NULL) por mais que o prazo de
+# execução, caso de um processo que caiu no meio da tool.
+_RESERVAR_CHAVE = """
+INSERT INTO idempotencia (chave, ferramenta, expira_em)
+VALUES (%s, %s, CURRENT_TIMESTAMP + make_interval(secs => %s))
+ON CONFLICT (chave) DO UPDATE
+SET resultado = NULL, criado_em = CURRENT_TIMESTAMP, expira_em = EXCLUDED.expira_em
+WHERE idempotencia.expira_em < CURRENT_TIMESTAMP
+   OR (idempotencia.resultado IS NULL
+       AND idempotencia.criado_em < CURRENT_TIMESTAMP - make_interval(secs => %s))
+RETURNING chave
+"""
+
+_SELECT_RESULTADO = "SELECT resultado FROM idempotencia WHERE chave = %s"
+
+_GRAVAR_RESULTADO = "UPDATE idempotencia SET resultado = %s WHERE chave = %s"
+
+_LIBERAR_CHAVE = "DELETE FROM idempotencia WHERE chave = %s AND resultado IS NULL"
+
+_PODAR_EXPIRADAS = """
+DELETE FROM idempotencia
+WHERE chave IN (SELECT chave FROM idempotencia WHERE expira_em < CURRENT_TIMESTAMP LIMIT %s)
+"""
+
+EM_ANDAMENTO = "Esta operação já está sendo executada; aguarde alguns segundos antes de tentar de novo."
+
+_metricas = Counter()
+_metricas_lock = threading.Lock()
+
+
+def _get_idempotencia_config():
+    """Retorna (idempotência ligada, TTL das chaves em segundos, prazo de uma execução em segundos).
+
+    IDEMPOTENCY_ENABLED: repetições de atualizar_boleto/registrar_negociacao na
+        mesma thread devolvem o resultado gravado (padrão: true)
+    IDEMPOTENCY_TTL: por quanto tempo o resultado de uma chamada é reaproveitado
+    IDEMPOTENCY_LEASE: após esse prazo, uma execução sem resultado é tida como
+        perdida e a chave pode ser retomada
+    """
+    return (
+        os.getenv("IDEMPOTENCY_ENABLED", "true").lower() == "true",
+        float(os.getenv("IDEMPOTENCY_TTL", "86400")),
+        float(os.getenv("IDEMPOTENCY_LEASE", "60")),
+    )
+
+
+def chave_idempotencia(thread_id: str, ferramenta: str, argumentos: dict) -> str:
+    """SHA-256 de (thread, tool, argumentos), com os argumentos em JSON canônico."""
+    texto = json.dumps([thread_id, ferramenta, argumentos], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+
+def _thread_id(config) -> str | None:
+    return ((config or {}).get("configurable") or {}).get("thread_id")
+
+
+def _registrar(evento: str):
+    with _metricas_lock:
+        _metricas[evento] += 1
+
+
+def _preparar(config, ferramenta: str, input) -> str | None:
+    """Chave da chamada, ou None quando ela roda sem idempotência (desligada ou fora de uma thread)."""
+    ligado, _, _ = _get_idempotencia_config()
+    thread_id = _thread_id(config)
+    if not ligado or thread_id is None:
+        return None
+    # model_dump dos modelos de entrada já normalizados (ex.: CNPJ só com dígitos)
+    return chave_idempotencia(str(thread_id), ferramenta, input.model_dump(mode="json"))
+
+
+def _resultado_gravado(linha, modelo_saida):
+    """Saída de uma chamada repetida: o resultado gravado ou o aviso de execução em andamento."""
+    if linha is None or linha[0] is None:
+        _registrar("em_andamento")
+        return modelo_saida(status="em_andamento", mensagem=EM_ANDAMENTO)
+    _registrar("repeticoes")
+    return modelo_saida.model_validate(linha[0])
+
+
+def executar_idempotente(config, ferramenta: str, input, modelo_saida, executar):
+    """Executa `executar()` uma única vez por (thread, tool, argumentos) dentro do TTL.
+
+    Só saídas com status "sucesso" são gravadas; erros liberam a chave para que
+    uma nova tentativa refaça a operação. Se a tabela idempotencia estiver
+    indisponível, a tool roda normalmente (sem idempotência) e o erro é contado
+    em idempotencia_erros.
+
+    Args:
+        config: RunnableConfig da chamada da tool (thread_id em configurable)
+        ferramenta: nome da tool, parte da chave
+        input: modelo de entrada da tool
+        modelo_saida: classe da saída, para reconstruir o resultado gravado
+        executar: função sem argumentos que executa a tool de fato
+    """
+    chave = _preparar(config, ferramenta, input)
+    if chave is None:
+        return executar()
+
+    _, ttl, prazo = _get_idempotencia_config()
+    try:
+        with _conn() as conn:
+            reservada = conn.execute(_RESERVAR_CHAVE, (chave, ferramenta, ttl, prazo)).fetchone()
+            gravado = None if reservada else conn.execute(_SELECT_RESULTADO, (chave,)).fetchone()
+    except Exception:
+        _registrar("erros")
+        return executar()
+    if not reservada:
+        return _resultado_gravado(gravado, modelo_saida)
+
+    _registrar("execucoes")
+    try:
+        saida = executar()
+    except BaseException:
+        _concluir(chave, None)
+        raise
+    _concluir(chave, saida)
+    return saida
+
+
+def _concluir(chave: str, saida):
+    try:
+        with _conn() as conn:
+            if saida is not None and saida.status == "sucesso":
+                conn.execute(_GRAVAR_RESULTADO, (Jsonb(saida.model_dump(mode="json")), chave))
+            else:
+                conn.execute(_LIBERAR_CHAVE, (chave,))
+    except Exception:
+        # A chave expira sozinha após IDEMPOTENCY_LEASE
+        _registrar("erros")
+
+
+async def aexecutar_idempotente(config, ferramenta: str, input, modelo_saida, executar):
+    """Versão assíncrona de executar_idempotente; `executar` retorna um awaitable."""
+    chave = _preparar(config, ferramenta, input)
+    if chave is None:
+        return await executar()
+
+    _, ttl, prazo = _get_idempotencia_config()
+    try:
+        async with _aconn() as conn:
+            cur = await conn.execute(_RESERVAR_CHAVE, (chave, ferramenta, ttl, prazo))
+            reservada = await cur.fetchone()
+            gravado = None
+            if not reservada:
+                cur = await conn.execute(_SELECT_RESULTADO, (chave,))
+                gravado = await cur.fetchone()
+    except Exception:
+        _registrar("erros")
+        return await executar()
+    if not reservada:
+        return _resultado_gravado(gravado, modelo_saida)
+
+    _registrar("execucoes")
+    try:
+        saida = await executar()
+    except BaseException:
+        await _aconcluir(chave, None)
+        raise
+    await _aconcluir(chave, saida)
+    return saida
+
+
+async def _aconcluir(chave: str, saida):
+    try:
+        async with _aconn() as conn:
+            if saida is not None and saida.status == "sucesso":
+                await conn.execute(_GRAVAR_RESULTADO, (Jsonb(saida.model_dump(mode="json")), chave))
+            else:
+                await conn.execute(_LIBERAR_CHAVE, (chave,))
+    except Exception:
+        _registrar("erros")
+
+
+def podar_idempotencia(lote: int = 1000) -> int:
+    """Remove as chaves expiradas em lotes de `lote`; retorna quantas foram removidas."""
+    removidas = 0
+    while True:
+        with _conn() as conn:
+            apagadas = conn.execute(_PODAR_EXPIRADAS, (lote,)).rowcount
+        removidas += apagadas
+        if apagadas < lote:
+            return removidas
+
+
+def idempotencia_stats() -> dict:
+    """Execuções com chave reservada, repetições respondidas com o resultado gravado
+    (cada uma é um PUT no Asaas ou um INSERT evitado), chamadas que encontraram a
+    mesma operação em andamento e falhas de acesso à tabela."""
+    with _metricas_lock:
+        metricas = dict(_metricas)
+    return {
+        f"idempotencia_{evento}": metricas.get(evento, 0)
+        for evento in ("execucoes", "repeticoes", "em_andamento", "erros")
+    }
+
+
+def _reset_idempotencia_stats():
+    with _metricas_lock:
+        _metricas.clear()
@@ -0,0 +1,185 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import sys
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+
+# Eventos das tools em JSON, um por linha. Quem registra só enfileira o record
+# (sem formatar nem escrever); uma thread do QueueListener redige os dados
+# pessoais, formata e escreve. Com a fila cheia o record é descartado e contado:
+# uma saída lenta nunca segura a tool.
+
+_LOGGER = "nxz_fin_agent.eventos"
+
+# Ordem importa: e-mail antes dos números; CNPJ (14 dígitos) antes de CPF (11) e telefone
+_REDACOES = (
+    (re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+"), "[EMAIL]"),
+    (re.compile(r"(?<!\d)\d{2}\.?\d{3}\.?\d{3}/?\d{4}-?\d{2}(?!\d)"), "[CNPJ]"),
+    (re.compile(r"(?<!\d)\d{3}\.\d{3}\.\d{3}-\d{2}(?!\d)"), "[CPF]"),
+    # 11 dígitos sem máscara: CPF ou celular, ambos redigidos; antes do telefone, que também os casaria
+    (re.compile(r"(?<!\d)\d{11}(?!\d)"), "[CPF]"),
+    (re.compile(r"(?<![\w+])(?:\+?55[\s-]?)?\(?\d{2}\)?[\s-]?9?\d{4}[\s-]?\d{4}(?!\d)"), "[TELEFONE]"),
+)
+
+_metricas = Counter()
+_metricas_lock = threading.Lock()
+
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+
+def _get_log_config():
+    """Retorna (nível, arquivo ou None, tamanho do buffer, amostragem por evento).
+
+    LOG_NIVEL: nível mínimo dos eventos (padrão: INFO)
+    LOG_ARQUIVO: arquivo JSONL dos eventos (padrão: stderr)
+    LOG_BUFFER: eventos aguardando escrita; com a fila cheia, novos eventos são
+        descartados (padrão: 10000)
+    LOG_AMOSTRAGEM: fração registrada de eventos de alto volume, no formato
+        "evento=fração,..." (padrão: comprovante_validado=0.1)
+    """
+    amostragem = {}
+    for item in os.getenv("LOG_AMOSTRAGEM", "comprovante_validado=0.1").split(","):
+        if "=" in item:
+            evento, fracao = item.split("=", 1)
+            amostragem[evento.strip()] = float(fracao)
+    return (
+        logging.getLevelName(os.getenv("LOG_NIVEL", "INFO").upper()),
+        os.getenv("LOG_ARQUIVO") or None,
+        int(os.getenv("LOG_BUFFER", "10000")),
+        amostragem,
+    )
+
+
+def redigir(valor):
+    """Troca CNPJ, CPF, e-mail e telefone por marcadores em textos, dicts e listas."""
+    if isinstance(valor, str):
+        for padrao, marcador in _REDACOES:
+            valor = padrao.sub(marcador, valor)
+        return valor
+    if isinstance(valor, dict):
+        return {chave: redigir(v) for chave, v in valor.items()}
+    if isinstance(valor, (list, tuple)):
+        return [redigir(v) for v in valor]
+    return valor
+
+
+def _contar(evento: str):
+    with _metricas_lock:
+        _metricas[evento] += 1
+
+
+class FormatoJSON(logging.Formatter):
+    """Um objeto JSON por evento: ts, nivel, evento e os campos, já redigidos."""
+
+    def format(self, record):
+        registro = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "nivel": record.levelname.lower(),
+            "evento": record.getMessage(),
+            **redigir(getattr(record, "campos", {})),
+        }
+        if record.exc_info:
+            registro["erro"] = redigir(self.formatException(record.exc_info))
+        return json.dumps(registro, ensure_ascii=False, default=str)
+
+
+class _FilaSemBloqueio(logging.handlers.QueueHandler):
+    """Enfileira o record como veio; com o buffer cheio, descarta em vez de esperar."""
+
+    def prepare(self, record):
+        # Formatação e redação ficam na thread do listener, fora da tool
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+            _contar("enfileirados")
+        except queue.Full:
+            _contar("descartados")
+
+
+class _Escritor(logging.handlers.QueueListener):
+    def enqueue_sentinel(self):
+        # Com o buffer cheio, put_nowait do sentinela falharia: espera a thread abrir espaço
+        self.queue.put(self._sentinel)
+
+
+class _Pipeline:
+    def __init__(self, nivel, arquivo, buffer, amostragem):
+        self.amostragem = amostragem
+        self.fila = queue.Queue(maxsize=buffer)
+        saida = logging.FileHandler(arquivo, encoding="utf-8") if arquivo else logging.StreamHandler(sys.stderr)
+        saida.setFormatter(FormatoJSON())
+        self.saida = saida
+        self.listener = _Escritor(self.fila, saida)
+        self.logger = logging.getLogger(_LOGGER)
+        self.logger.setLevel(nivel)
+        self.logger.propagate = False
+        self.handler = _FilaSemBloqueio(self.fila)
+        self.logger.addHandler(self.handler)
+        self.listener.start()
+
+    def parar(self):
+        """Escreve o que restou na fila e solta o logger."""
+        self.logger.removeHandler(self.handler)
+        self.listener.stop()
+        self.saida.close()
+
+
+def _obter_pipeline() -> _Pipeline:
+    global _pipeline
+    if _pipeline is None:
+        with _pipeline_lock:
+            if _pipeline is None:
+                _pipeline = _Pipeline(*_get_log_config())
+    return _pipeline
+
+
+def registrar(evento: str, nivel: int = logging.INFO, **campos):
+    """Registra um evento estruturado sem bloquear: só enfileira.
+
+    Os campos podem ter dados do cliente (contexto, OCR): são redigidos antes
+    da escrita. Eventos em LOG_AMOSTRAGEM passam só na fração configurada.
+    """
+    pipeline = _pipeline or _obter_pipeline()
+    if not pipeline.logger.isEnabledFor(nivel):
+        return
+    fracao = pipeline.amostragem.get(evento)
+    if fracao is not None and random.random() >= fracao:
+        _contar("fora_da_amostra")
+        return
+    pipeline.logger.log(nivel, evento, extra={"campos": campos})
+
+
+def logs_stats() -> dict:
+    """Eventos enfileirados, descartados com o buffer cheio, fora da amostra e pendentes."""
+    with _metricas_lock:
+        metricas = dict(_metricas)
+    return {
+        "logs_enfileirados": metricas.get("enfileirados", 0),
+        "logs_descartados": metricas.get("descartados", 0),
+        "logs_fora_da_amostra": metricas.get("fora_da_amostra", 0),
+        "logs_pendentes": _pipeline.fila.qsize() if _pipeline else 0,
+    }
+
+
+def _reset_logs():
+    """Esvazia a fila, fecha a saída e relê a configuração no próximo evento (útil em testes)."""
+    global _pipeline
+    with _pipeline_lock:
+        if _pipeline is not None:
+            _pipeline.parar()
+            _pipeline = None
+    with _metricas_lock:
+        _metricas.clear()
+
+
+atexit.register(_reset_logs)
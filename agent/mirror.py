@@ -0,0 +1,257 @@
+import os
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+
+from psycopg.types.json import Jsonb
+
+from agent.utils import _aconn, _conn, _iter_asaas_list
+
+# O Asaas envia as datas dos eventos no horário de Brasília, sem fuso
+ASAAS_TZ = ZoneInfo("America/Sao_Paulo")
+
+_INSERT_EVENTO = (
+    "INSERT INTO asaas_eventos (id, evento) VALUES (%s, %s) ON CONFLICT (id) DO NOTHING"
+)
+
+_GARANTIR_CLIENTE = "INSERT INTO clientes (id) VALUES (%s) ON CONFLICT (id) DO NOTHING"
+
+_UPSERT_CLIENTE = """
+INSERT INTO clientes (id, cpf_cnpj, dados) VALUES (%s, %s, %s)
+ON CONFLICT (id) DO UPDATE
+SET cpf_cnpj = EXCLUDED.cpf_cnpj, dados = EXCLUDED.dados, data_atualizacao = CURRENT_TIMESTAMP
+"""
+
+_UPSERT_PAGAMENTO = """
+INSERT INTO pagamentos (id, cliente_id, status, valor, data_vencimento, deletado, dados, evento_em)
+VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+ON CONFLICT (id) DO UPDATE
+SET cliente_id = EXCLUDED.cliente_id, status = EXCLUDED.status, valor = EXCLUDED.valor,
+    data_vencimento = EXCLUDED.data_vencimento, deletado = EXCLUDED.deletado,
+    dados = EXCLUDED.dados, evento_em = EXCLUDED.evento_em, data_atualizacao = CURRENT_TIMESTAMP
+WHERE pagamentos.evento_em <= EXCLUDED.evento_em
+"""
+
+_MARCAR_SINCRONIZADOS = "UPDATE clientes SET sincronizado_em = %s WHERE id = ANY(%s)"
+
+# O espelho só responde por clientes que passaram pelo backfill e enquanto o
+# fluxo de eventos (ou o próprio backfill) for mais recente que o limite.
+_SELECT_CLIENTE = """
+SELECT c.dados
+FROM clientes c
+WHERE c.cpf_cnpj = %s
+  AND c.sincronizado_em IS NOT NULL
+  AND GREATEST(c.sincronizado_em, (SELECT max(recebido_em) FROM asaas_eventos))
+      >= CURRENT_TIMESTAMP - make_interval(secs => %s)
+LIMIT 1
+"""
+
+# Eventos que marcam o pagamento como removido/restaurado no Asaas
+_EVENTOS_REMOCAO = {"PAYMENT_DELETED": True, "PAYMENT_RESTORED": False}
+
+
+def _espelho_habilitado() -> bool:
+    return os.getenv("ASAAS_MIRROR_ENABLED", "false").lower() == "true"
+
+
+def _espelho_max_age() -> float:
+    """Idade máxima (segundos) do espelho para que a consulta confie nele."""
+    return float(os.getenv("ASAAS_MIRROR_MAX_AGE", "1800"))
+
+
+def _data_evento(evento: dict) -> datetime:
+    """Data do evento do webhook (dateCreated, horário de Brasília) como datetime com fuso."""
+    data = evento.get("dateCreated")
+    if not data:
+        return datetime.now(timezone.utc)
+    return datetime.fromisoformat(data).replace(tzinfo=ASAAS_TZ)
+
+
+def _digitos(valor: str | None) -> str | None:
+    return "".join(c for c in valor if c.isdigit()) if valor else None
+
+
+def _parametros_cliente(cliente: dict) -> tuple:
+    return (cliente["id"], _digitos(cliente.get("cpfCnpj")), Jsonb(cliente))
+
+
+def _parametros_pagamento(pagamento: dict, evento_em: datetime, deletado: bool | None = None) -> tuple:
+    if deletado is None:
+        deletado = bool(pagamento.get("deleted"))
+    return (
+        pagamento["id"],
+        pagamento["customer"],
+        pagamento.get("status"),
+        pagamento.get("value"),
+        pagamento.get("dueDate"),
+        deletado,
+        Jsonb(pagamento),
+        evento_em,
+    )
+
+
+def _consulta_pagamentos(cliente_id: str, filtros: list[dict], limite: int) -> tuple[str, list]:
+    """Monta o SELECT de pagamentos do espelho equivalente aos filtros de GET /payments."""
+    sql = "SELECT dados FROM pagamentos WHERE cliente_id = %s AND NOT deletado"
+    params = [cliente_id]
+
+    status = [f["status"] for f in filtros if "status" in f]
+    if status:
+        sql += " AND status = ANY(%s)"
+        params.append(status)
+    if filtros and "dueDate[ge]" in filtros[0]:
+        sql += " AND data_vencimento >= %s"
+        params.append(filtros[0]["dueDate[ge]"])
+    if filtros and "dueDate[le]" in filtros[0]:
+        sql += " AND data_vencimento <= %s"
+        params.append(filtros[0]["dueDate[le]"])
+
+    # Mesma ordem da consulta ao vivo: um bloco por status, na ordem pedida
+    if status:
+        sql += " ORDER BY array_position(%s::text[], status::text), data_vencimento, id"
+        params.append(status)
+    else:
+        sql += " ORDER BY data_vencimento, id"
+
+    sql += " LIMIT %s"
+    params.append(limite)
+    return sql, params
+
+
+# ===== INGESTÃO =====
+
+def processar_evento(conn, evento: dict) -> bool:
+    """Aplica um evento de webhook do Asaas ao espelho, de forma idempotente.
+
+    O id do evento é registrado na mesma transação do upsert: se o evento já
+    foi processado nada é alterado, e se o upsert falhar o Asaas pode reenviar.
+
+    Returns:
+        bool: False se o evento já havia sido processado
+    """
+    cur = conn.execute(_INSERT_EVENTO, (evento["id"], evento["event"]))
+    if cur.rowcount == 0:
+        return False
+
+    pagamento = evento.get("payment")
+    if pagamento:
+        conn.execute(_GARANTIR_CLIENTE, (pagamento["customer"],))
+        conn.execute(
+            _UPSERT_PAGAMENTO,
+            _parametros_pagamento(pagamento, _data_evento(evento), _EVENTOS_REMOCAO.get(evento["event"])),
+        )
+    return True
+
+
+async def aprocessar_evento(conn, evento: dict) -> bool:
+    """Versão assíncrona de processar_evento."""
+    cur = await conn.execute(_INSERT_EVENTO, (evento["id"], evento["event"]))
+    if cur.rowcount == 0:
+        return False
+
+    pagamento = evento.get("payment")
+    if pagamento:
+        await conn.execute(_GARANTIR_CLIENTE, (pagamento["customer"],))
+        await conn.execute(
+            _UPSERT_PAGAMENTO,
+            _parametros_pagamento(pagamento, _data_evento(evento), _EVENTOS_REMOCAO.get(evento["event"])),
+        )
+    return True
+
+
+def registrar_pagamento(pagamento: dict):
+    """Grava no espelho um pagamento obtido da API (ex.: resposta de atualizar_boleto)."""
+    with _conn() as conn:
+        conn.execute(_GARANTIR_CLIENTE, (pagamento["customer"],))
+        conn.execute(_UPSERT_PAGAMENTO, _parametros_pagamento(pagamento, datetime.now(timezone.utc)))
+
+
+async def aregistrar_pagamento(pagamento: dict):
+    """Versão assíncrona de registrar_pagamento."""
+    async with _aconn() as conn:
+        await conn.execute(_GARANTIR_CLIENTE, (pagamento["customer"],))
+        await conn.execute(_UPSERT_PAGAMENTO, _parametros_pagamento(pagamento, datetime.now(timezone.utc)))
+
+
+def _em_lotes(itens, tamanho: int):
+    lote = []
+    for item in itens:
+        lote.append(item)
+        if len(lote) >= tamanho:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+def backfill(base_url: str, headers: dict, cpf_cnpj: str | None = None, tamanho_lote: int = 500) -> dict:
+    """Carrega clientes e pagamentos do Asaas no espelho, em lotes.
+
+    Sem cpf_cnpj, percorre todos os clientes e todos os pagamentos da conta.
+    Ao final marca os clientes carregados como sincronizados, liberando o
+    espelho para responder por eles.
+
+    Raises:
+        AsaasError: se alguma página da API falhar
+    """
+    inicio = datetime.now(timezone.utc)
+    params_clientes = {"cpfCnpj": _digitos(cpf_cnpj)} if cpf_cnpj else None
+    clientes_ids = []
+    total_pagamentos = 0
+
+    with _conn() as conn:
+        with conn.cursor() as cur:
+            for lote in _em_lotes(_iter_asaas_list(f"{base_url}/customers", headers, params=params_clientes), tamanho_lote):
+                cur.executemany(_UPSERT_CLIENTE, [_parametros_cliente(c) for c in lote])
+                clientes_ids.extend(c["id"] for c in lote)
+                conn.commit()
+
+            filtros_pagamentos = [{"customer": cid} for cid in clientes_ids] if cpf_cnpj else [None]
+            for params in filtros_pagamentos:
+                pagamentos = _iter_asaas_list(f"{base_url}/payments", headers, params=params)
+                for lote in _em_lotes(pagamentos, tamanho_lote):
+                    cur.executemany(_GARANTIR_CLIENTE, [(cid,) for cid in {p["customer"] for p in lote}])
+                    cur.executemany(_UPSERT_PAGAMENTO, [_parametros_pagamento(p, inicio) for p in lote])
+                    total_pagamentos += len(lote)
+                    conn.commit()
+
+            cur.execute(_MARCAR_SINCRONIZADOS, (inicio, clientes_ids))
+
+    return {"clientes": len(clientes_ids), "pagamentos": total_pagamentos}
+
+
+# ===== LEITURA =====
+
+def ler_espelho(cpf_cnpj: str, filtros: list[dict], limite: int):
+    """Lê cliente e pagamentos do espelho, se ele estiver atualizado para o CNPJ.
+
+    Args:
+        cpf_cnpj: CNPJ/CPF (apenas dígitos)
+        filtros: parâmetros de GET /payments gerados pela consulta (status, dueDate[...])
+        limite: máximo de pagamentos
+
+    Returns:
+        (cliente, pagamentos) no formato da API do Asaas, ou None se o espelho
+        não puder responder (cliente sem backfill ou espelho desatualizado)
+    """
+    with _conn() as conn:
+        row = conn.execute(_SELECT_CLIENTE, (cpf_cnpj, _espelho_max_age())).fetchone()
+        if row is None:
+            return None
+        cliente = row[0]
+        sql, params = _consulta_pagamentos(cliente["id"], filtros, limite)
+        pagamentos = [r[0] for r in conn.execute(sql, params).fetchall()]
+    return cliente, pagamentos
+
+
+async def aler_espelho(cpf_cnpj: str, filtros: list[dict], limite: int):
+    """Versão assíncrona de ler_espelho."""
+    async with _aconn() as conn:
+        cur = await conn.execute(_SELECT_CLIENTE, (cpf_cnpj, _espelho_max_age()))
+        row = await cur.fetchone()
+        if row is None:
+            return None
+        cliente = row[0]
+        sql, params = _consulta_pagamentos(cliente["id"], filtros, limite)
+        cur = await conn.execute(sql, params)
+        pagamentos = [r[0] for r in await cur.fetchall()]
+    return cliente, pagamentos
@@ -1,18 +1,74 @@
+from datetime import date
+from typing import Literal
+
 from pydantic import BaseModel, Field
 
+from agent.compact import formato_compacto, renderizar
+from agent.validators import Documento, DocumentoOpcional
+
+
+class SaidaFerramenta(BaseModel):
+    """Base das saídas das tools.
+
+    str() é o conteúdo da ToolMessage devolvida ao modelo: a representação
+    padrão do pydantic ou, com TOOL_OUTPUT_FORMAT=compacto, a forma compacta.
+    """
+
+    def __str__(self):
+        if formato_compacto():
+            return renderizar(self)
+        return super().__str__()
+
 
 # ===== CONSULTA FINANCEIRA =====
 
-class ConsultaFinanceiraInput(BaseModel):
-    cnpj: str = Field(..., description="CNPJ do cliente a ser buscado")
+StatusPagamento = Literal[
+    "PENDING",
+    "OVERDUE",
+    "RECEIVED",
+    "CONFIRMED",
+    "RECEIVED_IN_CASH",
+    "REFUNDED",
+    "REFUND_REQUESTED",
+    "REFUND_IN_PROGRESS",
+    "CHARGEBACK_REQUESTED",
+    "CHARGEBACK_DISPUTE",
+    "AWAITING_CHARGEBACK_REVERSAL",
+    "DUNNING_REQUESTED",
+    "DUNNING_RECEIVED",
+    "AWAITING_RISK_ANALYSIS",
+]
+
+# Visão padrão da consulta: apenas itens em aberto
+STATUS_EM_ABERTO: list[StatusPagamento] = ["OVERDUE", "PENDING"]
 
 
-class ConsultaFinanceiraOutput(BaseModel):
+class ConsultaFinanceiraInput(BaseModel):
+    cnpj: Documento = Field(..., description="CNPJ (ou CPF) do cliente a ser buscado, com ou sem formatação")
+    customer_id: str | None = Field(
+        default=None,
+        description="ID do cliente no Asaas (cus_...), se já retornado por uma consulta anterior",
+    )
+    status: list[StatusPagamento] | None = Field(
+        default=None,
+        description="Status das cobranças a buscar. Padrão: apenas em aberto (OVERDUE, PENDING)",
+    )
+    vencimento_de: date | None = Field(default=None, description="Vencimento a partir de (AAAA-MM-DD)")
+    vencimento_ate: date | None = Field(default=None, description="Vencimento até (AAAA-MM-DD)")
+    max_itens: int = Field(default=50, ge=1, le=1000, description="Quantidade máxima de pendências retornadas")
+    historico_completo: bool = Field(
+        default=False,
+        description="Se verdadeiro, ignora o filtro de status e traz todo o histórico (inclusive pagas)",
+    )
+
+
+class ConsultaFinanceiraOutput(SaidaFerramenta):
     status: str = Field(..., description="Status da operação")
     mensagem: str | None = Field(default=None, description="Mensagem de erro se houver")
     cliente: dict | None = Field(default=None, description="Informações do cliente")
     pendencias: list[dict] | None = Field(default=None, description="Lista de pendências")
     total_pendencias: int | None = Field(default=None, description="Total de pendências")
+    truncado: bool | None = Field(default=None, description="Se há mais pendências além de max_itens")
 
 
 # ===== ATUALIZAR BOLETO =====
@@ -22,7 +78,7 @@ class AtualizarBoletoInput(BaseModel):
     valor: float = Field(..., description="Valor do boleto")
 
 
-class AtualizarBoletoOutput(BaseModel):
+class AtualizarBoletoOutput(SaidaFerramenta):
     status: str = Field(..., description="Status da operação")
     mensagem: str | None = Field(default=None, description="Mensagem de erro se houver")
     boleto_id: str | None = Field(default=None, description="ID do boleto")
@@ -38,48 +94,89 @@ class AtualizarBoletoOutput(BaseModel):
 # ===== REGISTRAR NEGOCIAÇÃO =====
 
 class RegistrarNegociacaoInput(BaseModel):
-    cnpj: str = Field(..., description="CNPJ do cliente (obrigatório)")
+    cnpj: Documento = Field(..., description="CNPJ (ou CPF) do cliente (obrigatório)")
     detalhes: str = Field(..., description="Detalhes da negociação")
 
 
-class RegistrarNegociacaoOutput(BaseModel):
+class RegistrarNegociacaoOutput(SaidaFerramenta):
     status: str = Field(..., description="Status da operação")
     mensagem: str | None = Field(default=None, description="Mensagem de retorno")
+    negociacao_id: str | None = Field(default=None, description="Identificador da negociação registrada")
 
 
 # ===== VERIFICAR NEGOCIAÇÃO =====
 
 class VerificarNegociacaoInput(BaseModel):
-    cnpj: str = Field(..., description="CNPJ do cliente para buscar negociações")
-
-
-class VerificarNegociacaoOutput(BaseModel):
+    cnpj: Documento = Field(..., description="CNPJ (ou CPF) do cliente para buscar negociações")
+    apenas_primeira: bool = Field(
+        default=False,
+        description="Se verdadeiro, só informa se seria a primeira negociação do cliente, sem listar as anteriores",
+    )
+    max_itens: int = Field(default=5, ge=1, le=100, description="Quantidade máxima de negociações retornadas (mais recentes primeiro)")
+    cursor: str | None = Field(
+        default=None,
+        description="proximo_cursor de uma chamada anterior, para buscar as negociações mais antigas seguintes",
+    )
+
+
+class VerificarNegociacaoOutput(SaidaFerramenta):
     status: str = Field(..., description="Status da operação")
     mensagem: str | None = Field(default=None, description="Mensagem de erro se houver")
+    primeira_negociacao: bool | None = Field(default=None, description="Se o cliente ainda não tem negociações registradas")
     negociacoes: list[dict] | None = Field(default=None, description="Lista de negociações")
-    total: int | None = Field(default=None, description="Total de negociações")
+    total: int | None = Field(default=None, description="Negociações retornadas nesta página")
+    truncado: bool | None = Field(default=None, description="Se há negociações mais antigas além desta página")
+    proximo_cursor: str | None = Field(default=None, description="Cursor para buscar a próxima página, se truncado")
 
 
 # ===== VALIDAR COMPROVANTE =====
 
 class ValidarComprovanteInput(BaseModel):
     ocr_text: str = Field(..., description="Texto extraído do comprovante via OCR")
+    cnpj: Documento | None = Field(
+        default=None,
+        description="CNPJ (ou CPF) do cliente identificado na conversa (obrigatório para validar)",
+    )
+    customer_id: str | None = Field(
+        default=None,
+        description="ID do cliente no Asaas (cus_...), se já retornado por uma consulta anterior",
+    )
 
 
-class ValidarComprovanteOutput(BaseModel):
+class ValidarComprovanteOutput(SaidaFerramenta):
     status: str = Field(..., description="Status da validação")
     mensagem: str = Field(..., description="Mensagem de retorno")
     valido: bool | None = Field(default=None, description="Se o comprovante é válido")
     confiabilidade: float | None = Field(default=None, description="Taxa de confiabilidade (0-1)")
+    pendencia_id: str | None = Field(default=None, description="ID da pendência que o comprovante quita")
+    motivos: list[str] | None = Field(default=None, description="Sinais considerados na validação")
+    campos: dict | None = Field(default=None, description="Campos extraídos do comprovante")
+    duplicado: bool | None = Field(default=None, description="Se o comprovante já tinha sido enviado antes")
 
 
 # ===== TRANSFERIR HUMANO =====
 
 class TransferirHumanoInput(BaseModel):
     contexto: str = Field(..., description="Contexto completo da conversa e motivo da transferência")
+    cnpj: DocumentoOpcional = Field(
+        default=None,
+        description="CNPJ (ou CPF) do cliente, se já identificado; prioriza o ticket pelo valor em atraso",
+    )
 
 
-class TransferirHumanoOutput(BaseModel):
+class TransferirHumanoOutput(SaidaFerramenta):
     status: str = Field(..., description="Status da operação")
     mensagem: str = Field(..., description="Mensagem de confirmação")
     ticket_id: str | None = Field(default=None, description="ID do ticket gerado")
+
+
+# ===== DETALHAR REGISTRO =====
+
+class DetalharRegistroInput(BaseModel):
+    registro_id: str = Field(..., description="ID do cliente (cus_...) ou da cobrança (pay_...) citado numa consulta")
+
+
+class DetalharRegistroOutput(SaidaFerramenta):
+    status: str = Field(..., description="Status da operação")
+    mensagem: str | None = Field(default=None, description="Mensagem de erro se houver")
+    registro: dict | None = Field(default=None, description="Registro completo, incluindo links")
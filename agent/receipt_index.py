@@ -0,0 +1,256 @@
+import hashlib
+import os
+import re
+import threading
+import unicodedata
+from collections import Counter
+
+from psycopg.types.json import Jsonb
+
+from agent.utils import _aconn, _conn
+
+# Um reenvio idêntico é respondido por uma única consulta pela chave primária,
+# antes de qualquer extração; cada envio conta em envios/visto_em
+_MARCAR_ENVIO = """
+UPDATE comprovantes SET envios = envios + 1, visto_em = CURRENT_TIMESTAMP
+WHERE impressao = %s AND expira_em > CURRENT_TIMESTAMP
+RETURNING cnpj, resultado
+"""
+
+# O primeiro envio da transação define o CNPJ dono do comprovante
+_SELECT_TRANSACAO = """
+SELECT cnpj, resultado FROM comprovantes
+WHERE id_transacao = %s AND expira_em > CURRENT_TIMESTAMP
+ORDER BY criado_em LIMIT 1
+"""
+
+_INSERT_COMPROVANTE = """
+INSERT INTO comprovantes (impressao, id_transacao, cnpj, pendencia_id, resultado, expira_em)
+VALUES (%s, %s, %s, %s, %s, CURRENT_TIMESTAMP + make_interval(secs => %s))
+ON CONFLICT (impressao) DO UPDATE
+SET id_transacao = EXCLUDED.id_transacao, cnpj = EXCLUDED.cnpj, pendencia_id = EXCLUDED.pendencia_id,
+    resultado = EXCLUDED.resultado, envios = 1, criado_em = CURRENT_TIMESTAMP,
+    visto_em = CURRENT_TIMESTAMP, expira_em = EXCLUDED.expira_em
+WHERE comprovantes.expira_em <= CURRENT_TIMESTAMP
+"""
+
+_PODAR_EXPIRADOS = """
+DELETE FROM comprovantes
+WHERE impressao IN (SELECT impressao FROM comprovantes WHERE expira_em < CURRENT_TIMESTAMP LIMIT %s)
+"""
+
+OUTRO_CNPJ = "comprovante já enviado por outro cliente"
+
+# Trocas típicas de OCR (O/0, a/o, l/I/1, S/5, e/c) levadas ao mesmo caractere
+# na impressão, junto com caixa, acentos, espaços e pontuação
+_DOBRAS_OCR = str.maketrans({"o": "0", "a": "0", "l": "1", "i": "1", "s": "5", "e": "c"})
+_RE_NAO_ALFANUMERICO = re.compile(r"[^0-9a-z]+")
+
+_metricas = Counter()
+_metricas_lock = threading.Lock()
+
+
+def _get_comprovantes_config():
+    """Retorna (índice de comprovantes ligado, retenção em segundos, retenção dos negativos em segundos).
+
+    COMPROVANTES_DEDUP: reenvios do mesmo comprovante são respondidos pelo
+        índice, sem nova validação (padrão: true)
+    COMPROVANTES_RETENCAO_DIAS: por quantos dias um comprovante que conferiu
+        fica no índice (padrão: 180); depois disso é removido por scripts/podar_retencao.py
+    COMPROVANTES_RETENCAO_NEGATIVOS_MINUTOS: idem para os que não conferiram
+        (padrão: 15). Só segura reenvios em sequência: uma cobrança criada ou
+        alterada depois pode fazer o mesmo comprovante conferir
+    """
+    return (
+        os.getenv("COMPROVANTES_DEDUP", "true").lower() == "true",
+        float(os.getenv("COMPROVANTES_RETENCAO_DIAS", "180")) * 86400,
+        float(os.getenv("COMPROVANTES_RETENCAO_NEGATIVOS_MINUTOS", "15")) * 60,
+    )
+
+
+def impressao_comprovante(texto: str) -> str:
+    """SHA-256 do texto do OCR normalizado (sem caixa, acentos, espaços, pontuação e trocas de OCR)."""
+    texto = unicodedata.normalize("NFKD", texto.lower()).encode("ascii", "ignore").decode("ascii")
+    texto = _RE_NAO_ALFANUMERICO.sub("", texto.translate(_DOBRAS_OCR))
+    return hashlib.sha256(texto.encode("ascii")).hexdigest()
+
+
+def id_transacao(campos: dict) -> str | None:
+    """Identificador da transação extraído do comprovante: ID do PIX, autenticação ou linha digitável."""
+    if campos.get("pix_id"):
+        return f"pix:{campos['pix_id']}"
+    if campos.get("autenticacao"):
+        return "autenticacao:" + _RE_NAO_ALFANUMERICO.sub("", campos["autenticacao"].lower()).upper()
+    if campos.get("linha_digitavel"):
+        return f"linha:{campos['linha_digitavel']}"
+    return None
+
+
+def _registrar(evento: str):
+    with _metricas_lock:
+        _metricas[evento] += 1
+
+
+def _resultado_repetido(linha, cnpj: str | None, evento: str) -> dict:
+    """Resultado de um comprovante já visto; reuso por outro CNPJ nunca é válido."""
+    cnpj_original, resultado = linha
+    if cnpj and cnpj != cnpj_original:
+        _registrar("outro_cnpj")
+        return {
+            **resultado,
+            "valido": False,
+            "confiabilidade": 0.0,
+            "pendencia_id": None,
+            "motivos": (resultado.get("motivos") or []) + [OUTRO_CNPJ],
+            "mensagem": "Este comprovante já foi enviado por outro cliente; encaminhe para conferência manual",
+            "duplicado": True,
+        }
+
+    _registrar(evento)
+    if OUTRO_CNPJ in (resultado.get("motivos") or []):
+        mensagem = resultado["mensagem"]
+    elif resultado.get("valido"):
+        mensagem = f"Comprovante já recebido e conferido com a pendência {resultado.get('pendencia_id')}"
+    else:
+        mensagem = "Comprovante já recebido e não confere com as pendências em aberto; encaminhe para conferência manual"
+    return {**resultado, "mensagem": mensagem, "duplicado": True}
+
+
+def buscar_comprovante(texto: str, cnpj: str | None = None) -> tuple[str, dict | None]:
+    """Consulta o índice pela impressão do texto, antes de qualquer extração.
+
+    Args:
+        texto: texto do OCR
+        cnpj: CNPJ do cliente, se informado; sem ele, é o mesmo pagador do primeiro envio
+
+    Returns:
+        (impressao, resultado do envio anterior ou None)
+    """
+    impressao = impressao_comprovante(texto)
+    ligado, _, _ = _get_comprovantes_config()
+    if not ligado:
+        return impressao, None
+    try:
+        with _conn() as conn:
+            linha = conn.execute(_MARCAR_ENVIO, (impressao,)).fetchone()
+    except Exception:
+        _registrar("erros")
+        return impressao, None
+    return impressao, _resultado_repetido(linha, cnpj, "repetidos") if linha else None
+
+
+async def abuscar_comprovante(texto: str, cnpj: str | None = None) -> tuple[str, dict | None]:
+    """Versão assíncrona de buscar_comprovante."""
+    impressao = impressao_comprovante(texto)
+    ligado, _, _ = _get_comprovantes_config()
+    if not ligado:
+        return impressao, None
+    try:
+        async with _aconn() as conn:
+            cur = await conn.execute(_MARCAR_ENVIO, (impressao,))
+            linha = await cur.fetchone()
+    except Exception:
+        _registrar("erros")
+        return impressao, None
+    return impressao, _resultado_repetido(linha, cnpj, "repetidos") if linha else None
+
+
+def buscar_transacao(campos: dict, cnpj: str) -> tuple[str | None, dict | None]:
+    """Consulta o índice pelo ID da transação extraído (mesmo comprovante com outro texto).
+
+    Returns:
+        (id_transacao ou None, resultado do primeiro envio da transação ou None)
+    """
+    transacao = id_transacao(campos)
+    ligado, _, _ = _get_comprovantes_config()
+    if not ligado or transacao is None:
+        return transacao, None
+    try:
+        with _conn() as conn:
+            linha = conn.execute(_SELECT_TRANSACAO, (transacao,)).fetchone()
+    except Exception:
+        _registrar("erros")
+        return transacao, None
+    return transacao, _resultado_repetido(linha, cnpj, "mesma_transacao") if linha else None
+
+
+async def abuscar_transacao(campos: dict, cnpj: str) -> tuple[str | None, dict | None]:
+    """Versão assíncrona de buscar_transacao."""
+    transacao = id_transacao(campos)
+    ligado, _, _ = _get_comprovantes_config()
+    if not ligado or transacao is None:
+        return transacao, None
+    try:
+        async with _aconn() as conn:
+            cur = await conn.execute(_SELECT_TRANSACAO, (transacao,))
+            linha = await cur.fetchone()
+    except Exception:
+        _registrar("erros")
+        return transacao, None
+    return transacao, _resultado_repetido(linha, cnpj, "mesma_transacao") if linha else None
+
+
+def _parametros(impressao: str, transacao: str | None, cnpj: str, resultado: dict) -> tuple | None:
+    ligado, retencao, retencao_negativos = _get_comprovantes_config()
+    if not ligado or resultado.get("status") != "sucesso":
+        return None
+    if not resultado.get("valido"):
+        retencao = retencao_negativos
+    return (impressao, transacao, cnpj, resultado.get("pendencia_id"), Jsonb(resultado), retencao)
+
+
+def registrar_comprovante(impressao: str, transacao: str | None, cnpj: str, resultado: dict):
+    """Grava o resultado de uma validação concluída (status "sucesso") no índice.
+
+    Comprovantes que não conferiram ficam só pela retenção curta dos negativos.
+    """
+    parametros = _parametros(impressao, transacao, cnpj, resultado)
+    if parametros is None:
+        return
+    try:
+        with _conn() as conn:
+            conn.execute(_INSERT_COMPROVANTE, parametros)
+        _registrar("novos")
+    except Exception:
+        _registrar("erros")
+
+
+async def aregistrar_comprovante(impressao: str, transacao: str | None, cnpj: str, resultado: dict):
+    """Versão assíncrona de registrar_comprovante."""
+    parametros = _parametros(impressao, transacao, cnpj, resultado)
+    if parametros is None:
+        return
+    try:
+        async with _aconn() as conn:
+            await conn.execute(_INSERT_COMPROVANTE, parametros)
+        _registrar("novos")
+    except Exception:
+        _registrar("erros")
+
+
+def podar_comprovantes(lote: int = 1000) -> int:
+    """Remove os comprovantes fora da retenção em lotes de `lote`; retorna quantos foram removidos."""
+    removidos = 0
+    while True:
+        with _conn() as conn:
+            apagados = conn.execute(_PODAR_EXPIRADOS, (lote,)).rowcount
+        removidos += apagados
+        if apagados < lote:
+            return removidos
+
+
+def comprovantes_stats() -> dict:
+    """Comprovantes novos gravados no índice, reenvios respondidos pela impressão do
+    texto ou pelo ID da transação (cada um é uma validação evitada), reusos por
+    outro CNPJ e falhas de acesso à tabela."""
+    with _metricas_lock:
+        metricas = dict(_metricas)
+    return {
+        f"comprovantes_{evento}": metricas.get(evento, 0)
+        for evento in ("novos", "repetidos", "mesma_transacao", "outro_cnpj", "erros")
+    }
+
+
+def _reset_comprovantes_stats():
+    with _metricas_lock:
+        _metricas.clear()
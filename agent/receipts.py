@@ -0,0 +1,442 @@
+import math
+import os
+import re
+from bisect import bisect_left, bisect_right
+from datetime import date, timedelta
+
+from agent.validators import cnpj_valido, cpf_valido, somente_digitos
+
+# ===== EXTRAÇÃO =====
+# Regexes compiladas uma vez no import: a validação roda sem LLM e é barata o
+# bastante para reprocessar lotes grandes de comprovantes.
+
+_NUMERO = r"(\d{1,3}(?:\.\d{3})+,\d{2}|\d+,\d{2}|\d+\.\d{2}(?!\d))"
+
+# "Valor pago: R$ 1.234,56". O grupo do rótulo define a prioridade em _PRIORIDADE_VALOR.
+_RE_VALOR_ROTULADO = re.compile(
+    r"(?i)\bvalor(?:\s+(?P<rotulo>pago|total|transferido|do\s+pagamento|da\s+transfer[eê]ncia|"
+    r"do\s+pix|cobrado|do\s+documento|original|nominal))?\s*(?:\(R\$\))?\s*[:\-]?\s*(?:R[$S]\s*)?" + _NUMERO
+)
+_RE_VALOR_MOEDA = re.compile(r"R[$S]\s*" + _NUMERO)
+_PRIORIDADE_VALOR = {
+    "pago": 0, "total": 0, "transferido": 0, "do pagamento": 0, "da transferência": 0,
+    "da transferencia": 0, "do pix": 0, "cobrado": 0, None: 1, "do documento": 2, "original": 2, "nominal": 2,
+}
+
+_MESES = {"jan": 1, "fev": 2, "mar": 3, "abr": 4, "mai": 5, "jun": 6, "jul": 7, "ago": 8, "set": 9, "out": 10, "nov": 11, "dez": 12}
+_RE_DATA = re.compile(
+    r"(?i)\b(?:(?P<d>\d{2})/(?P<m>\d{2})/(?P<a>\d{4}|\d{2})"
+    r"|(?P<ai>\d{4})-(?P<mi>\d{2})-(?P<di>\d{2})"
+    r"|(?P<dx>\d{1,2})\s+(?:de\s+)?(?P<mx>jan|fev|mar|abr|mai|jun|jul|ago|set|out|nov|dez)[a-zç]*\.?\s+(?:de\s+)?(?P<ax>\d{4}))\b"
+)
+# Rótulo na mesma linha, antes da data
+_RE_ROTULO_VENCIMENTO = re.compile(r"(?i)vencimento|vence\s+em")
+_RE_ROTULO_PAGAMENTO = re.compile(
+    r"(?i)data\s+d[oa]\s+(?:pagamento|transa[cç][aã]o|transfer[eê]ncia|opera[cç][aã]o|d[eé]bito)"
+    r"|pago\s+em|realizad[oa]\s+em|efetuad[oa]\s+em|debitad[oa]\s+em"
+)
+_RE_AGENDAMENTO = re.compile(r"(?i)\bagendamento\b|\bagendad[oa]\s+para\b|\bpagamento\s+agendado\b")
+
+_RE_CNPJ = re.compile(r"(?<![\d.])\d{2}\.?\d{3}\.?\d{3}/?\d{4}-?\d{2}(?![\d-])")
+_RE_CPF = re.compile(r"(?<![\d.*])\d{3}\.?\d{3}\.?\d{3}-?\d{2}(?![\d-])")
+
+# Cabeçalhos das seções do comprovante: um documento pertence à última seção aberta antes dele
+_RE_SECAO = re.compile(
+    r"(?im)^[ \t]*(?:(?P<pagador>dados\s+do\s+pagador|pagador|origem|quem\s+pagou|remetente|de|"
+    r"conta\s+de\s+origem|debitado\s+de)"
+    r"|(?P<beneficiario>dados\s+do\s+(?:benefici[aá]rio|recebedor|favorecido)|benefici[aá]rio(?:\s+final)?|"
+    r"favorecido|recebedor|destino|para|quem\s+recebeu|destinat[aá]rio|cedente|conta\s+de\s+destino))\b"
+)
+
+# Nome como aparece no texto (minúsculo, espaços simples) -> nome do banco
+_BANCOS = {
+    "itau": "Itaú", "itaú": "Itaú", "bradesco": "Bradesco", "banco do brasil": "Banco do Brasil",
+    "caixa": "Caixa", "santander": "Santander", "nubank": "Nubank", "nu pagamentos": "Nubank",
+    "banco inter": "Inter", "sicoob": "Sicoob", "sicredi": "Sicredi", "c6 bank": "C6 Bank",
+    "btg": "BTG Pactual", "mercado pago": "Mercado Pago", "pagbank": "PagBank", "pagseguro": "PagBank",
+    "picpay": "PicPay", "banco safra": "Safra", "banrisul": "Banrisul", "banco original": "Original",
+}
+_RE_BANCO = re.compile(
+    r"(?i)\b(" + "|".join(re.escape(nome).replace(r"\ ", r"\s+") for nome in _BANCOS) + r")\b"
+)
+
+_RE_AUTENTICACAO = re.compile(
+    r"(?i)(?:autentica[cç][aã]o(?:\s+(?:mec[aâ]nica|banc[aá]ria|eletr[oô]nica|digital))?|c[oó]digo\s+de\s+autentica[cç][aã]o"
+    r"|protocolo|n[uú]mero\s+de\s+controle|controle|id\s+da\s+transa[cç][aã]o|c[oó]digo\s+da\s+transa[cç][aã]o)"
+    r"\s*[:\-]?\s*(?=[^\n]*\d)([A-Z0-9](?:[A-Z0-9.\-]| (?=[A-Z0-9])){9,}[A-Z0-9])"
+)
+# End-to-end id do PIX: E + ISPB (8) + AAAAMMDDHHMM (12) + 11 alfanuméricos
+_RE_PIX_ID = re.compile(r"\b(E\d{20}[A-Za-z0-9]{11})\b")
+
+_RE_LINHA_DIGITAVEL = re.compile(
+    r"(?<!\d)(\d{5})[.\s]?(\d{5})\s+(\d{5})[.\s]?(\d{6})\s+(\d{5})[.\s]?(\d{6})\s+(\d)\s+(\d{14})(?!\d)"
+    r"|(?<!\d)(\d{47})(?!\d)"
+)
+
+# Fator de vencimento do boleto: dias desde 07/10/1997; a partir de 22/02/2025
+# o fator recomeça em 1000
+_BASE_FATOR = date(1997, 10, 7)
+_BASE_FATOR_2025 = date(2025, 2, 22)
+
+
+def _valor_decimal(texto: str) -> float:
+    if "," in texto:
+        texto = texto.replace(".", "").replace(",", ".")
+    return float(texto)
+
+
+def _extrair_valor(texto: str) -> float | None:
+    """Valor pago: o rotulado de maior prioridade ou, sem rótulo, o maior valor em R$."""
+    melhor = None
+    for m in _RE_VALOR_ROTULADO.finditer(texto):
+        rotulo = re.sub(r"\s+", " ", m.group("rotulo").lower()) if m.group("rotulo") else None
+        prioridade = _PRIORIDADE_VALOR.get(rotulo, 1)
+        if melhor is None or prioridade < melhor[0]:
+            melhor = (prioridade, m.group(2))
+    if melhor is not None:
+        return _valor_decimal(melhor[1])
+    valores = [_valor_decimal(m.group(1)) for m in _RE_VALOR_MOEDA.finditer(texto)]
+    return max(valores) if valores else None
+
+
+def _data_do_match(m) -> date | None:
+    try:
+        if m.group("d"):
+            ano = int(m.group("a"))
+            return date(ano + 2000 if ano < 100 else ano, int(m.group("m")), int(m.group("d")))
+        if m.group("ai"):
+            return date(int(m.group("ai")), int(m.group("mi")), int(m.group("di")))
+        return date(int(m.group("ax")), _MESES[m.group("mx").lower()[:3]], int(m.group("dx")))
+    except ValueError:
+        return None
+
+
+def _extrair_datas(texto: str) -> tuple[date | None, date | None]:
+    """Retorna (data do pagamento, vencimento impresso) conforme o rótulo da linha."""
+    pagamento = rotulada = vencimento = None
+    for m in _RE_DATA.finditer(texto):
+        data = _data_do_match(m)
+        if data is None:
+            continue
+        inicio_linha = texto.rfind("\n", 0, m.start()) + 1
+        prefixo = texto[inicio_linha:m.start()]
+        if _RE_ROTULO_VENCIMENTO.search(prefixo):
+            vencimento = vencimento or data
+        elif _RE_ROTULO_PAGAMENTO.search(prefixo):
+            rotulada = rotulada or data
+        else:
+            pagamento = pagamento or data
+    return rotulada or pagamento, vencimento
+
+
+def _documentos_por_papel(texto: str) -> dict:
+    """CNPJs/CPFs válidos do texto, atribuídos a pagador ou beneficiário pela seção em que aparecem."""
+    secoes = [(m.start(), "pagador" if m.group("pagador") else "beneficiario") for m in _RE_SECAO.finditer(texto)]
+    documentos = {"pagador": None, "beneficiario": None, "outros": []}
+    encontrados = [(m.start(), somente_digitos(m.group())) for m in _RE_CNPJ.finditer(texto)]
+    encontrados += [(m.start(), somente_digitos(m.group())) for m in _RE_CPF.finditer(texto)]
+    for posicao, digitos in sorted(encontrados):
+        if not (cnpj_valido(digitos) if len(digitos) == 14 else cpf_valido(digitos)):
+            continue
+        papel = None
+        for inicio, nome in secoes:
+            if inicio > posicao:
+                break
+            papel = nome
+        if papel and documentos[papel] is None:
+            documentos[papel] = digitos
+        elif digitos not in documentos["outros"]:
+            documentos["outros"].append(digitos)
+    return documentos
+
+
+def _modulo_10(numero: str) -> int:
+    soma = 0
+    for i, digito in enumerate(reversed(numero)):
+        produto = int(digito) * (2 if i % 2 == 0 else 1)
+        soma += produto // 10 + produto % 10
+    return (10 - soma % 10) % 10
+
+
+def _modulo_11_boleto(numero: str) -> int:
+    soma = sum(int(d) * (2 + i % 8) for i, d in enumerate(reversed(numero)))
+    resto = 11 - soma % 11
+    return 1 if resto in (0, 10, 11) else resto
+
+
+def linha_digitavel_valida(linha: str) -> bool:
+    """Confere os dígitos dos três campos (módulo 10) e o dígito geral (módulo 11) de uma linha de 47 dígitos."""
+    linha = somente_digitos(linha)
+    if len(linha) != 47:
+        return False
+    campos = ((linha[0:9], linha[9]), (linha[10:20], linha[20]), (linha[21:31], linha[31]))
+    if any(_modulo_10(campo) != int(dv) for campo, dv in campos):
+        return False
+    codigo_sem_dv = linha[0:4] + linha[33:47] + linha[4:9] + linha[10:20] + linha[21:31]
+    return _modulo_11_boleto(codigo_sem_dv) == int(linha[32])
+
+
+def vencimento_do_fator(fator: int, referencia: date) -> date | None:
+    """Data do fator de vencimento, escolhendo entre o ciclo antigo e o de 2025 o mais próximo da referência."""
+    if fator == 0:
+        return None
+    candidatas = [_BASE_FATOR + timedelta(days=fator)]
+    if fator >= 1000:
+        candidatas.append(_BASE_FATOR_2025 + timedelta(days=fator - 1000))
+    return min(candidatas, key=lambda d: abs((d - referencia).days))
+
+
+def _extrair_linha_digitavel(texto: str) -> str | None:
+    m = _RE_LINHA_DIGITAVEL.search(texto)
+    if m is None:
+        return None
+    return m.group(9) or "".join(m.groups()[:8])
+
+
+def _extrair_banco(texto: str) -> str | None:
+    m = _RE_BANCO.search(texto)
+    return _BANCOS[re.sub(r"\s+", " ", m.group(1).lower())] if m else None
+
+
+def extrair_campos(texto: str, hoje: date | None = None) -> dict:
+    """Extrai do texto do OCR os campos usados na validação do comprovante.
+
+    Returns:
+        dict com valor, data_pagamento, data_vencimento (impressa ou do fator da
+        linha digitável), cnpj_pagador, cnpj_beneficiario, banco, autenticacao,
+        pix_id, linha_digitavel, linha_valida, valor_boleto e agendamento.
+        Campos não encontrados ficam None.
+    """
+    hoje = hoje or date.today()
+    data_pagamento, vencimento = _extrair_datas(texto)
+    documentos = _documentos_por_papel(texto)
+    pix = _RE_PIX_ID.search(texto)
+    autenticacao = _RE_AUTENTICACAO.search(texto)
+    linha = _extrair_linha_digitavel(texto)
+
+    valor_boleto = linha_valida = None
+    if linha:
+        linha_valida = linha_digitavel_valida(linha)
+        valor_boleto = int(linha[37:47]) / 100 or None
+        vencimento = vencimento or vencimento_do_fator(int(linha[33:37]), data_pagamento or hoje)
+
+    return {
+        "valor": _extrair_valor(texto) or valor_boleto,
+        "data_pagamento": data_pagamento.isoformat() if data_pagamento else None,
+        "data_vencimento": vencimento.isoformat() if vencimento else None,
+        "cnpj_pagador": documentos["pagador"],
+        "cnpj_beneficiario": documentos["beneficiario"],
+        "documentos": documentos["outros"],
+        "banco": _extrair_banco(texto),
+        "autenticacao": autenticacao.group(1).strip() if autenticacao else None,
+        "pix_id": pix.group(1) if pix else None,
+        "linha_digitavel": linha,
+        "linha_valida": linha_valida,
+        "valor_boleto": valor_boleto,
+        "agendamento": bool(_RE_AGENDAMENTO.search(texto)),
+    }
+
+
+# ===== CONFERÊNCIA COM AS PENDÊNCIAS =====
+
+# Faixa de valores aceitos em relação à pendência: acréscimo de multa/juros
+# por atraso ou desconto por antecipação
+ACRESCIMO_MAXIMO = 0.15
+DESCONTO_MAXIMO = 0.10
+
+
+def _centavos(valor) -> int:
+    return int(round(float(valor) * 100))
+
+
+class IndicePendencias:
+    """Índice das pendências em aberto de um cliente por valor (centavos) e vencimento.
+
+    O valor é indexado em uma lista ordenada, para buscar por faixa com bisect
+    (pagamentos com juros ou desconto), e em um dict, para o valor exato; o
+    vencimento, em um dict por data. Montado uma vez por cliente, serve todos os
+    comprovantes dele.
+    """
+
+    def __init__(self, pendencias: list[dict]):
+        self.pendencias = pendencias
+        self._por_centavos = {}
+        self._por_vencimento = {}
+        for indice, pendencia in enumerate(pendencias):
+            for campo in ("valor", "valor_total"):
+                if pendencia.get(campo):
+                    self._por_centavos.setdefault(_centavos(pendencia[campo]), set()).add(indice)
+            if pendencia.get("data_vencimento"):
+                self._por_vencimento.setdefault(pendencia["data_vencimento"], set()).add(indice)
+        self._centavos = sorted(self._por_centavos)
+
+    def exatas(self, valor: float) -> set[int]:
+        return self._por_centavos.get(_centavos(valor), set())
+
+    def candidatas(self, valor: float | None, vencimento: str | None) -> list[int]:
+        """Índices das pendências com valor na faixa aceita ou com o mesmo vencimento."""
+        encontradas = set(self._por_vencimento.get(vencimento, ())) if vencimento else set()
+        if valor:
+            centavos = _centavos(valor)
+            inicio = bisect_left(self._centavos, math.floor(centavos / (1 + ACRESCIMO_MAXIMO)))
+            fim = bisect_right(self._centavos, math.ceil(centavos / (1 - DESCONTO_MAXIMO)))
+            for chave in self._centavos[inicio:fim]:
+                encontradas |= self._por_centavos[chave]
+        return sorted(encontradas)
+
+
+# Sinais usados na confiabilidade, na ordem dos pesos
+SINAIS = (
+    "valor_exato",
+    "valor_proximo",
+    "vencimento_confere",
+    "linha_valida",
+    "data_coerente",
+    "data_futura",
+    "agendamento",
+    "beneficiario_confere",
+    "beneficiario_diverge",
+    "pagador_confere",
+    "pagador_diverge",
+    "comprovacao",
+    "sem_valor",
+)
+# Sinais contra a validade do comprovante (peso <= 0 no ajuste)
+SINAIS_NEGATIVOS = {"data_futura", "agendamento", "beneficiario_diverge", "pagador_diverge", "sem_valor"}
+
+# Regressão logística ajustada no corpus sintético de tests/fake_comprovantes.py
+# (python benchmarks/bench_comprovantes.py --ajustar), para que a confiabilidade
+# seja uma probabilidade calibrada de o comprovante quitar a pendência
+_INTERCEPTO = -9.3
+_PESOS = {
+    "valor_exato": 7.2,
+    "valor_proximo": 4.5,
+    "vencimento_confere": 0.8,
+    "linha_valida": 0.0,
+    "data_coerente": 6.0,
+    "data_futura": -1.9,
+    "agendamento": -1.9,
+    "beneficiario_confere": 0.0,
+    "beneficiario_diverge": -7.9,
+    "pagador_confere": 0.0,
+    "pagador_diverge": -3.5,
+    "comprovacao": 0.0,
+    "sem_valor": 0.0,
+}
+
+
+def _get_comprovante_config():
+    """Retorna (CNPJs aceitos como beneficiário, confiabilidade mínima para considerar válido).
+
+    COMPROVANTE_CNPJS_BENEFICIARIO: CNPJs (separados por vírgula) que podem
+        receber os pagamentos, ex.: o da NEXUZ e o da conta no Asaas; vazio
+        desliga a conferência do beneficiário
+    COMPROVANTE_LIMIAR: confiabilidade mínima de um comprovante válido
+    """
+    cnpjs = os.getenv("COMPROVANTE_CNPJS_BENEFICIARIO", "")
+    return (
+        {somente_digitos(c) for c in cnpjs.split(",") if somente_digitos(c)},
+        float(os.getenv("COMPROVANTE_LIMIAR", "0.8")),
+    )
+
+
+def _data(valor: str | None) -> date | None:
+    return date.fromisoformat(valor) if valor else None
+
+
+def sinais(campos: dict, pendencia: dict | None, cnpj_cliente: str | None, beneficiarios: set, hoje: date) -> dict:
+    """Sinais (0/1) do comprovante contra uma pendência candidata (ou nenhuma)."""
+    valor = campos["valor"]
+    pago_em = _data(campos["data_pagamento"])
+    vencimento = _data(pendencia.get("data_vencimento")) if pendencia else None
+
+    exato = proximo = False
+    if pendencia and valor:
+        valores = [pendencia.get(c) for c in ("valor", "valor_total") if pendencia.get(c)]
+        exato = any(_centavos(v) == _centavos(valor) for v in valores)
+        proximo = not exato and any(v * (1 - DESCONTO_MAXIMO) <= valor <= v * (1 + ACRESCIMO_MAXIMO) for v in valores)
+
+    beneficiario = campos["cnpj_beneficiario"]
+    pagador = campos["cnpj_pagador"]
+    return {
+        "valor_exato": exato,
+        "valor_proximo": proximo,
+        "vencimento_confere": bool(vencimento and campos["data_vencimento"] == vencimento.isoformat()),
+        "linha_valida": bool(campos["linha_valida"]),
+        "data_coerente": bool(
+            pago_em and pago_em <= hoje and (hoje - pago_em).days <= 180
+            and (vencimento is None or pago_em >= vencimento - timedelta(days=90))
+        ),
+        "data_futura": bool(pago_em and pago_em > hoje),
+        "agendamento": campos["agendamento"],
+        "beneficiario_confere": bool(beneficiarios and beneficiario in beneficiarios),
+        "beneficiario_diverge": bool(beneficiarios and beneficiario and beneficiario not in beneficiarios),
+        "pagador_confere": bool(cnpj_cliente and pagador == cnpj_cliente),
+        "pagador_diverge": bool(cnpj_cliente and pagador and pagador != cnpj_cliente),
+        "comprovacao": bool(campos["autenticacao"] or campos["pix_id"]),
+        "sem_valor": valor is None,
+    }
+
+
+def confiabilidade(sinais_comprovante: dict) -> float:
+    """Probabilidade (0-1) de o comprovante quitar a pendência, pela regressão logística."""
+    z = _INTERCEPTO + sum(_PESOS[nome] for nome in SINAIS if sinais_comprovante[nome])
+    return 1 / (1 + math.exp(-z))
+
+
+_MOTIVOS = {
+    "valor_exato": "valor confere com a pendência",
+    "valor_proximo": "valor próximo ao da pendência (juros ou desconto)",
+    "vencimento_confere": "vencimento confere com a pendência",
+    "data_futura": "data do pagamento no futuro",
+    "agendamento": "comprovante de agendamento, não de pagamento",
+    "beneficiario_diverge": "beneficiário diferente da NEXUZ",
+    "pagador_diverge": "pagador diferente do cliente",
+    "sem_valor": "valor não encontrado no comprovante",
+}
+
+
+def conferir(campos: dict, indice: IndicePendencias, cnpj_cliente: str | None = None, hoje: date | None = None) -> dict:
+    """Confere os campos extraídos com as pendências do índice e escolhe a mais provável.
+
+    Returns:
+        dict com valido, confiabilidade, pendencia_id (None sem candidata) e motivos
+    """
+    hoje = hoje or date.today()
+    beneficiarios, limiar = _get_comprovante_config()
+
+    # Empate entre pendências de mesmo valor (mensalidades iguais): fica a de
+    # vencimento mais próximo da data do pagamento
+    referencia = _data(campos["data_pagamento"]) or hoje
+    melhor = None
+    for indice_pendencia in indice.candidatas(campos["valor"], campos["data_vencimento"]):
+        pendencia = indice.pendencias[indice_pendencia]
+        sinais_pendencia = sinais(campos, pendencia, cnpj_cliente, beneficiarios, hoje)
+        vencimento = _data(pendencia.get("data_vencimento"))
+        distancia = abs((referencia - vencimento).days) if vencimento else 10**6
+        ordem = (confiabilidade(sinais_pendencia), -distancia)
+        if melhor is None or ordem > melhor[0]:
+            melhor = (ordem, pendencia, sinais_pendencia)
+
+    if melhor is None:
+        sinais_pendencia = sinais(campos, None, cnpj_cliente, beneficiarios, hoje)
+        probabilidade, pendencia = confiabilidade(sinais_pendencia), None
+    else:
+        (probabilidade, _), pendencia, sinais_pendencia = melhor
+    motivos = [texto for nome, texto in _MOTIVOS.items() if sinais_pendencia[nome]]
+    if pendencia is None:
+        motivos.append("nenhuma pendência em aberto com esse valor ou vencimento")
+    # Pago por outro CNPJ/CPF: nunca quita a pendência do cliente sem conferência manual
+    return {
+        "valido": pendencia is not None and probabilidade >= limiar and not sinais_pendencia["pagador_diverge"],
+        "confiabilidade": round(probabilidade, 3),
+        "pendencia_id": pendencia.get("id") if pendencia else None,
+        "motivos": motivos,
+    }
+
+
+def validar_texto(texto: str, pendencias: list[dict], cnpj_cliente: str | None = None, hoje: date | None = None) -> dict:
+    """Extrai os campos do texto do OCR e os confere com as pendências; atalho para uso unitário."""
+    campos = extrair_campos(texto, hoje)
+    return {**conferir(campos, IndicePendencias(pendencias), cnpj_cliente, hoje), "campos": campos}
+
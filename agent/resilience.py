@@ -0,0 +1,181 @@
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+
+class TokenBucket:
+    """Limitador de taxa (token bucket) compartilhado entre threads e tasks assíncronas.
+
+    `taxa` tokens são repostos por segundo, até `capacidade` (rajada máxima).
+    Cada chamada reserva um token sob um lock curto e devolve quanto tempo o
+    chamador deve esperar; a espera acontece fora do lock, com time.sleep ou
+    asyncio.sleep. O limite vale por processo: com vários workers, divida a
+    cota do Asaas entre eles.
+    """
+
+    def __init__(self, taxa: float, capacidade: float):
+        self.taxa = taxa
+        self.capacidade = capacidade
+        self._tokens = capacidade
+        self._atualizado = time.monotonic()
+        self._lock = threading.Lock()
+        self.esperas = 0
+        self.espera_total = 0.0
+        self.penalizacoes = 0
+
+    def _repor(self, agora):
+        self._tokens = min(self.capacidade, self._tokens + (agora - self._atualizado) * self.taxa)
+        self._atualizado = agora
+
+    def reservar(self) -> float:
+        """Reserva um token e retorna a espera necessária, em segundos."""
+        with self._lock:
+            self._repor(time.monotonic())
+            self._tokens -= 1
+            espera = -self._tokens / self.taxa if self._tokens < 0 else 0.0
+            if espera:
+                self.esperas += 1
+                self.espera_total += espera
+            return espera
+
+    def devolver(self):
+        """Devolve um token reservado que não chegou a ser usado."""
+        with self._lock:
+            self._tokens = min(self.capacidade, self._tokens + 1)
+
+    def penalizar(self, segundos: float):
+        """Esvazia o balde por `segundos` (ex.: Retry-After de um 429), para todos os chamadores."""
+        with self._lock:
+            self._repor(time.monotonic())
+            self._tokens = min(self._tokens, -segundos * self.taxa)
+            self.penalizacoes += 1
+
+    def tokens(self) -> float:
+        with self._lock:
+            self._repor(time.monotonic())
+            return self._tokens
+
+    def stats(self, prefixo: str) -> dict:
+        return {
+            f"{prefixo}_tokens": round(self.tokens(), 3),
+            f"{prefixo}_taxa": self.taxa,
+            f"{prefixo}_capacidade": self.capacidade,
+            f"{prefixo}_esperas": self.esperas,
+            f"{prefixo}_espera_total_s": round(self.espera_total, 3),
+            f"{prefixo}_penalizacoes": self.penalizacoes,
+        }
+
+
+class CircuitBreaker:
+    """Circuit breaker de três estados para uma dependência externa.
+
+    - fechado: chamadas passam; `limite_falhas` falhas consecutivas abrem o circuito
+    - aberto: chamadas falham imediatamente por `tempo_recuperacao` segundos
+    - meio_aberto: uma única chamada de teste passa; sucesso fecha, falha reabre
+    """
+
+    FECHADO = "fechado"
+    ABERTO = "aberto"
+    MEIO_ABERTO = "meio_aberto"
+
+    _CODIGOS = {FECHADO: 0, MEIO_ABERTO: 1, ABERTO: 2}
+
+    def __init__(self, limite_falhas: int, tempo_recuperacao: float):
+        self.limite_falhas = limite_falhas
+        self.tempo_recuperacao = tempo_recuperacao
+        self._estado = self.FECHADO
+        self._falhas = 0
+        self._aberto_em = 0.0
+        self._teste_em_andamento = False
+        self._lock = threading.Lock()
+        self.aberturas = 0
+        self.rejeicoes = 0
+
+    @property
+    def estado(self) -> str:
+        with self._lock:
+            self._atualizar_estado()
+            return self._estado
+
+    def _atualizar_estado(self):
+        if self._estado == self.ABERTO and time.monotonic() - self._aberto_em >= self.tempo_recuperacao:
+            self._estado = self.MEIO_ABERTO
+            self._teste_em_andamento = False
+
+    def permitir(self) -> bool:
+        """Indica se uma chamada pode ser feita agora (contabiliza as rejeições)."""
+        with self._lock:
+            self._atualizar_estado()
+            if self._estado == self.FECHADO:
+                return True
+            if self._estado == self.MEIO_ABERTO and not self._teste_em_andamento:
+                self._teste_em_andamento = True
+                return True
+            self.rejeicoes += 1
+            return False
+
+    def segundos_para_tentar(self) -> float:
+        """Tempo restante até o circuito aceitar uma chamada de teste."""
+        with self._lock:
+            if self._estado != self.ABERTO:
+                return 0.0
+            return max(0.0, self.tempo_recuperacao - (time.monotonic() - self._aberto_em))
+
+    def registrar_sucesso(self):
+        with self._lock:
+            self._estado = self.FECHADO
+            self._falhas = 0
+            self._teste_em_andamento = False
+
+    def registrar_falha(self):
+        with self._lock:
+            self._falhas += 1
+            if self._estado == self.MEIO_ABERTO or self._falhas >= self.limite_falhas:
+                if self._estado != self.ABERTO:
+                    self.aberturas += 1
+                self._estado = self.ABERTO
+                self._aberto_em = time.monotonic()
+                self._teste_em_andamento = False
+
+    def stats(self, prefixo: str) -> dict:
+        estado = self.estado
+        return {
+            f"{prefixo}_estado": self._CODIGOS[estado],
+            f"{prefixo}_falhas_consecutivas": self._falhas,
+            f"{prefixo}_aberturas": self.aberturas,
+            f"{prefixo}_rejeicoes": self.rejeicoes,
+        }
+
+
+def atraso_retry(tentativa: int, base: float, maximo: float, retry_after: float | None = None) -> float | None:
+    """Backoff exponencial com jitter completo; nunca menor que o Retry-After recebido.
+
+    A espera nunca passa de `maximo`: se o Retry-After pedir mais que isso,
+    retorna None e o chamador deve desistir com o erro transitório.
+    """
+    if retry_after is not None and retry_after > maximo:
+        return None
+    atraso = random.uniform(0, min(maximo, base * (2 ** tentativa)))
+    if retry_after is not None:
+        atraso = max(atraso, retry_after)
+    return atraso
+
+
+def parse_retry_after(valor: str | None) -> float | None:
+    """Converte o header Retry-After (segundos ou data HTTP) em segundos."""
+    if not valor:
+        return None
+    try:
+        return max(0.0, float(valor))
+    except ValueError:
+        pass
+    try:
+        data = parsedate_to_datetime(valor)
+    except (TypeError, ValueError):
+        return None
+    if data.tzinfo is None:
+        data = data.replace(tzinfo=timezone.utc)
+    return max(0.0, (data - datetime.now(timezone.utc)).total_seconds())
+
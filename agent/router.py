@@ -0,0 +1,266 @@
+import os
+import re
+import threading
+import unicodedata
+import uuid
+from collections import Counter
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langgraph.graph import END, START, StateGraph
+from langgraph.prebuilt import ToolNode
+from langgraph.prebuilt.chat_agent_executor import AgentState
+
+from agent.validators import cnpj_valido, normalizar_documento, somente_digitos
+
+RE_CNPJ = re.compile(r"(?<!\d)\d{2}\.?\d{3}\.?\d{3}/?\d{4}-?\d{2}(?!\d)")
+RE_CUSTOMER_ID = re.compile(r"\bcus_\w+")
+RE_NEGACAO = re.compile(r"\b(?:nao|nunca|nem)\b")
+
+# Pontuação das intents (de basic_prompt) por palavras-chave, sobre o texto
+# sem acentos e em minúsculas. A CNPJ (cliente_validar) é tratada à parte.
+PALAVRAS_CHAVE = {
+    "boleto_gerar_segunda_via": (
+        (r"\bsegunda via\b", 3),
+        (r"\b2a? via\b", 3),
+        (r"\bnovo boleto\b", 2),
+        (r"\bboleto\b", 1),
+        (r"\bfatura\b", 1),
+        (r"\batualizad[oa]\b", 1),
+    ),
+    "transferir_atendimento": (
+        (r"\batendente\b", 3),
+        (r"\bhumano\b", 3),
+        (r"\bfalar com\b", 2),
+        (r"\bpessoa\b", 2),
+        (r"\bespecialista\b", 2),
+        (r"\balguem\b", 1),
+    ),
+    "status_cliente_consultar": (
+        (r"\bquanto devo\b", 3),
+        (r"\bdebitos?\b", 2),
+        (r"\bpendencias?\b", 2),
+        (r"\bem aberto\b", 2),
+        (r"\bsituacao\b", 3),
+        (r"\bdevendo\b", 2),
+    ),
+    "comprovante_validar": (
+        (r"\bcomprovante\b", 3),
+        (r"\bpaguei\b", 2),
+        (r"\bpix\b", 1),
+    ),
+}
+_PADROES = {
+    intent: [(re.compile(padrao), peso) for padrao, peso in palavras]
+    for intent, palavras in PALAVRAS_CHAVE.items()
+}
+
+# Intents que o roteador resolve sem o modelo; as demais sempre vão ao LLM
+INTENTS_ROTEADAS = ("cliente_validar", "boleto_gerar_segunda_via", "transferir_atendimento", "status_cliente_consultar")
+
+CNPJ_INVALIDO = "{erro}. Pode conferir e me enviar o CNPJ novamente, por favor? Intent: cliente_validar"
+
+PEDIR_CNPJ = (
+    "Olá! Sou a Fernanda, da NEXUZ. Para continuar, preciso que me informe o CNPJ da empresa, por favor. "
+    "Intent: cliente_validar"
+)
+
+_metricas = Counter()
+_metricas_lock = threading.Lock()
+
+
+def _get_router_config():
+    """Retorna (roteador ligado, pontuação mínima, palavras máximas da mensagem).
+
+    ROUTER_ENABLED: liga o roteador determinístico na frente do agente (padrão: true)
+    ROUTER_MIN_SCORE: pontuação mínima da intent vencedora para dispensar o modelo
+    ROUTER_MAX_WORDS: mensagens mais longas que isso (sem CNPJ) sempre vão ao modelo
+    """
+    return (
+        os.getenv("ROUTER_ENABLED", "true").lower() == "true",
+        int(os.getenv("ROUTER_MIN_SCORE", "3")),
+        int(os.getenv("ROUTER_MAX_WORDS", "12")),
+    )
+
+
+def _normalizar(texto: str) -> str:
+    sem_acentos = unicodedata.normalize("NFKD", texto).encode("ascii", "ignore").decode("ascii")
+    return " ".join(sem_acentos.lower().split())
+
+
+def _texto(mensagem) -> str:
+    conteudo = mensagem.content
+    if isinstance(conteudo, list):
+        return " ".join(bloco.get("text", "") for bloco in conteudo if isinstance(bloco, dict))
+    return conteudo
+
+
+def pontuar(texto: str) -> dict[str, int]:
+    """Pontuação de cada intent para o texto (soma dos pesos das palavras-chave encontradas)."""
+    normalizado = _normalizar(texto)
+    return {
+        intent: sum(peso for padrao, peso in padroes if padrao.search(normalizado))
+        for intent, padroes in _PADROES.items()
+    }
+
+
+def classificar(texto: str, min_pontuacao=None, max_palavras=None) -> tuple[str | None, str | None]:
+    """Classifica uma mensagem do usuário.
+
+    Returns:
+        (intent, cnpj): intent é None quando não há confiança suficiente. Uma
+        única CNPJ na mensagem vale cliente_validar, seja qual for o resto do
+        texto (a consulta é sempre o primeiro passo). Sem CNPJ, a intent com
+        maior pontuação vence se passar de `min_pontuacao`, for a única com essa
+        pontuação e a mensagem for curta e sem negação.
+    """
+    _, padrao_pontuacao, padrao_palavras = _get_router_config()
+    min_pontuacao = padrao_pontuacao if min_pontuacao is None else min_pontuacao
+    max_palavras = padrao_palavras if max_palavras is None else max_palavras
+
+    cnpjs = {somente_digitos(cnpj) for cnpj in RE_CNPJ.findall(texto)}
+    if len(cnpjs) == 1:
+        return "cliente_validar", cnpjs.pop()
+    if cnpjs:
+        return None, None
+
+    normalizado = _normalizar(texto)
+    if len(normalizado.split()) > max_palavras or RE_NEGACAO.search(normalizado):
+        return None, None
+
+    pontuacoes = sorted(pontuar(texto).items(), key=lambda item: item[1], reverse=True)
+    (intent, melhor), (_, segunda) = pontuacoes[0], pontuacoes[1]
+    if melhor < min_pontuacao or melhor == segunda:
+        return None, None
+    return intent, None
+
+
+def _cnpj_da_conversa(messages) -> str | None:
+    """Última CNPJ válida informada pelo usuário na conversa."""
+    for mensagem in reversed(messages):
+        if isinstance(mensagem, HumanMessage):
+            for encontrado in reversed(RE_CNPJ.findall(_texto(mensagem))):
+                if cnpj_valido(encontrado):
+                    return somente_digitos(encontrado)
+    return None
+
+
+def _customer_id_da_conversa(messages) -> str | None:
+    """customer_id retornado pela última consulta_financeira da conversa."""
+    for mensagem in reversed(messages):
+        if isinstance(mensagem, ToolMessage) and mensagem.name == "consulta_financeira":
+            encontrado = RE_CUSTOMER_ID.search(_texto(mensagem))
+            return encontrado.group(0) if encontrado else None
+    return None
+
+
+def _chamada(nome: str, args: dict) -> AIMessage:
+    return AIMessage(
+        content="",
+        name="roteador",
+        tool_calls=[{"name": nome, "args": {"input": args}, "id": f"rota_{uuid.uuid4().hex[:12]}"}],
+    )
+
+
+def decidir(messages, ferramentas=None) -> tuple[str | None, AIMessage | None]:
+    """Decide a primeira ação do turno sem o modelo, se a última mensagem for trivial.
+
+    Returns:
+        (intent, mensagem): a mensagem é uma chamada de tool pronta para o
+        ToolNode ou uma resposta direta (pedido de CNPJ ou CNPJ inválida);
+        (None, None) quando o turno deve ir ao modelo
+    """
+    if not messages or not isinstance(messages[-1], HumanMessage):
+        return None, None
+    texto = _texto(messages[-1])
+    intent, cnpj = classificar(texto)
+    if intent not in INTENTS_ROTEADAS:
+        return None, None
+
+    if cnpj is not None:
+        # CNPJ com dígitos verificadores errados é recusada sem ir ao Asaas
+        try:
+            normalizar_documento(cnpj)
+        except ValueError as e:
+            return intent, AIMessage(content=CNPJ_INVALIDO.format(erro=e), name="roteador")
+
+    cnpj = cnpj or _cnpj_da_conversa(messages[:-1])
+    if cnpj is None:
+        # Nenhuma ação sem validar o cliente pela CNPJ
+        return intent, AIMessage(content=PEDIR_CNPJ, name="roteador")
+
+    if intent == "transferir_atendimento":
+        nome, args = "transferir_humano", {
+            "contexto": f"Cliente CNPJ {cnpj} pediu atendimento humano: {texto}",
+            "cnpj": cnpj,
+        }
+    else:
+        nome, args = "consulta_financeira", {"cnpj": cnpj}
+        customer_id = _customer_id_da_conversa(messages)
+        if intent != "cliente_validar" and customer_id:
+            args["customer_id"] = customer_id
+
+    if ferramentas is not None and nome not in ferramentas:
+        return None, None
+    return intent, _chamada(nome, args)
+
+
+def _registrar(intent: str | None):
+    with _metricas_lock:
+        _metricas["turnos"] += 1
+        if intent is not None:
+            _metricas["desviados"] += 1
+            _metricas[f"intent_{intent}"] += 1
+
+
+def roteador_stats() -> dict:
+    """Turnos vistos pelo roteador, quantos dispensaram o modelo na primeira
+    ação (cada um economiza uma chamada ao LLM) e a contagem por intent."""
+    with _metricas_lock:
+        metricas = dict(_metricas)
+    turnos = metricas.get("turnos", 0)
+    desviados = metricas.get("desviados", 0)
+    stats = {f"roteador_{chave}": valor for chave, valor in metricas.items()}
+    stats["roteador_turnos"] = turnos
+    stats["roteador_desviados"] = desviados
+    stats["roteador_taxa_desvio"] = desviados / turnos if turnos else 0.0
+    return stats
+
+
+def _reset_roteador_stats():
+    with _metricas_lock:
+        _metricas.clear()
+
+
+def com_roteador(agente, tools, checkpointer=None):
+    """Coloca o roteador determinístico na frente de um agente do create_react_agent.
+
+    Turnos triviais têm a primeira chamada de tool feita pelo roteador (o modelo
+    só entra para redigir a resposta) ou, sem CNPJ, a resposta direta pedindo a
+    CNPJ. Os demais seguem direto para o agente. O checkpointer fica no grafo
+    externo e vale também para o agente.
+    """
+    nomes = {t.name for t in tools}
+
+    def roteador(state):
+        ligado, _, _ = _get_router_config()
+        if not ligado:
+            return {"messages": []}
+        intent, mensagem = decidir(state["messages"], nomes)
+        _registrar(intent)
+        return {"messages": [mensagem] if mensagem is not None else []}
+
+    def proximo(state):
+        ultima = state["messages"][-1]
+        if isinstance(ultima, AIMessage) and ultima.name == "roteador":
+            return "ferramentas" if ultima.tool_calls else END
+        return "agente"
+
+    builder = StateGraph(AgentState)
+    builder.add_node("roteador", roteador)
+    builder.add_node("ferramentas", ToolNode(tools))
+    builder.add_node("agente", agente)
+    builder.add_edge(START, "roteador")
+    builder.add_conditional_edges("roteador", proximo, ["ferramentas", "agente", END])
+    builder.add_edge("ferramentas", "agente")
+    builder.add_edge("agente", END)
+    return builder.compile(checkpointer=checkpointer)
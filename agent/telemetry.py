@@ -0,0 +1,419 @@
+import atexit
+import bisect
+import contextvars
+import json
+import os
+import queue
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from functools import lru_cache, wraps
+from urllib.parse import urlsplit
+
+# Spans ao redor de cada tool, requisição ao Asaas e query do Postgres. Cada
+# span termina em um histograma de duração rotulado (sempre que a telemetria
+# está ligada) e, com o tracing ligado, também vira um registro com trace_id e
+# pai (arquivo JSONL e OpenTelemetry, se instalado). O registro só é enfileirado:
+# uma thread serializa e escreve o arquivo, fora do lock das métricas. Com a
+# fila cheia o registro é descartado e contado. Com o tracing desligado o
+# custo é o de um perf_counter e uma atualização de histograma sob lock:
+# orçamento de 5 µs por span (medido em benchmarks/bench_telemetria.py).
+
+# Limites dos buckets de duração, em segundos (os padrões do Prometheus, mais 1 ms)
+_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_histogramas = {}
+_contadores = Counter()
+_lock = threading.Lock()
+
+_config = None
+_config_lock = threading.Lock()
+_escritor_spans = None
+_escritor_lock = threading.Lock()
+_falhas = Counter()
+_falhas_lock = threading.Lock()
+_exportadores = {}
+_span_atual = contextvars.ContextVar("span_atual", default=None)
+
+_RE_TABELA_SQL = re.compile(r"\b(?:FROM|INTO|UPDATE|TABLE)\s+(?:IF\s+(?:NOT\s+)?EXISTS\s+)?([A-Za-z_][\w.]*)", re.I)
+# Segmentos de caminho com dígitos são ids (cus_..., pay_..., 123): viram {id} no rótulo
+_RE_SEGMENTO_ID = re.compile(r"\d")
+
+
+def _get_telemetria_config():
+    """Retorna (métricas ligadas, tracing ligado, arquivo de spans, arquivo Prometheus, intervalo, buffer).
+
+    TELEMETRIA_ENABLED: histogramas e contadores de tools, Asaas e Postgres (padrão: true)
+    TELEMETRIA_TRACING: registra cada span, com trace_id e pai, no arquivo de
+        spans e no OpenTelemetry, se instalado (padrão: false)
+    TELEMETRIA_SPANS_ARQUIVO: arquivo JSONL dos spans, com o tracing ligado
+    TELEMETRIA_PROMETHEUS_ARQUIVO: arquivo no formato texto do Prometheus (ex.:
+        para o textfile collector do node_exporter), reescrito a cada
+        TELEMETRIA_INTERVALO segundos (padrão: 15) e na saída do processo
+    TELEMETRIA_SPANS_BUFFER: spans aguardando escrita no arquivo; com a fila
+        cheia, novos spans são descartados (padrão: 10000)
+    """
+    return (
+        os.getenv("TELEMETRIA_ENABLED", "true").lower() == "true",
+        os.getenv("TELEMETRIA_TRACING", "false").lower() == "true",
+        os.getenv("TELEMETRIA_SPANS_ARQUIVO") or None,
+        os.getenv("TELEMETRIA_PROMETHEUS_ARQUIVO") or None,
+        float(os.getenv("TELEMETRIA_INTERVALO", "15")),
+        int(os.getenv("TELEMETRIA_SPANS_BUFFER", "10000")),
+    )
+
+
+def _configuracao():
+    """Configuração lida uma vez por processo: o caminho quente não consulta o ambiente."""
+    global _config
+    if _config is None:
+        with _config_lock:
+            if _config is None:
+                config = _get_telemetria_config()
+                if config[0] and config[3]:
+                    _iniciar_exportador(config[3], config[4])
+                _config = config
+    return _config
+
+
+@lru_cache(maxsize=1)
+def _tracer_otel():
+    try:
+        from opentelemetry import trace
+
+        return trace.get_tracer("nxz-fin-agent")
+    except ImportError:
+        return None
+
+
+class _SpanNulo:
+    """Span da telemetria desligada: não mede nada."""
+
+    resultado = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, erro, tb):
+        return False
+
+
+_SPAN_NULO = _SpanNulo()
+
+
+class Span:
+    """Mede um trecho e registra a duração no histograma `nome` com os rótulos dados.
+
+    `resultado` entra como rótulo (padrão "ok", ou o nome da exceção que saiu do
+    bloco). `atributos` só vão para o registro do tracing, sem virar rótulo.
+    """
+
+    __slots__ = ("nome", "rotulos", "resultado", "atributos", "_inicio", "_tracing", "_registro", "_token", "_otel")
+
+    def __init__(self, nome: str, rotulos: tuple, tracing: bool):
+        self.nome = nome
+        self.rotulos = rotulos
+        self.resultado = None
+        self.atributos = None
+        self._tracing = tracing
+
+    def __enter__(self):
+        if self._tracing:
+            self._iniciar_registro()
+        self._inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo, erro, tb):
+        duracao = time.perf_counter() - self._inicio
+        if self.resultado is None:
+            self.resultado = tipo.__name__ if tipo is not None else "ok"
+        _observar(self.nome, self.rotulos, str(self.resultado), duracao)
+        if self._tracing:
+            self._encerrar_registro(duracao, tipo, erro, tb)
+        return False
+
+    def _iniciar_registro(self):
+        pai = _span_atual.get()
+        self._registro = {
+            "nome": self.nome,
+            "trace_id": pai["trace_id"] if pai else uuid.uuid4().hex,
+            "span_id": uuid.uuid4().hex[:16],
+            "pai": pai["span_id"] if pai else None,
+            "inicio": time.time(),
+        }
+        self._token = _span_atual.set(self._registro)
+        tracer = _tracer_otel()
+        self._otel = None
+        if tracer is not None:
+            self._otel = tracer.start_as_current_span(self.nome, attributes=dict(self.rotulos))
+            self._otel.__enter__()
+
+    def _encerrar_registro(self, duracao, tipo, erro, tb):
+        _span_atual.reset(self._token)
+        atributos = {**dict(self.rotulos), **(self.atributos or {}), "resultado": str(self.resultado)}
+        if self._otel is not None:
+            from opentelemetry import trace
+
+            trace.get_current_span().set_attributes(atributos)
+            self._otel.__exit__(tipo, erro, tb)
+        _escrever_span({**self._registro, "duracao_ms": round(duracao * 1000, 3), "atributos": atributos})
+
+
+def span(nome: str, **rotulos):
+    """Span de `nome` ("tool", "asaas", "db"...), para uso com `with span(...) as s`.
+
+    Os rótulos devem ter poucos valores possíveis (tool, método, endpoint sem ids).
+    """
+    config = _config or _configuracao()
+    if not config[0]:
+        return _SPAN_NULO
+    return Span(nome, tuple(rotulos.items()), config[1])
+
+
+def _observar(nome: str, rotulos: tuple, resultado: str, duracao: float):
+    chave = (nome, rotulos, resultado)
+    indice = bisect.bisect_left(_BUCKETS, duracao)
+    with _lock:
+        serie = _histogramas.get(chave)
+        if serie is None:
+            serie = _histogramas[chave] = [[0] * (len(_BUCKETS) + 1), 0.0]
+        serie[0][indice] += 1
+        serie[1] += duracao
+
+
+def contar(nome: str, valor: float = 1, **rotulos):
+    """Soma `valor` ao contador `nome` (exportado como nxz_<nome>_total)."""
+    if not _configuracao()[0]:
+        return
+    chave = (nome, tuple(rotulos.items()))
+    with _lock:
+        _contadores[chave] += valor
+
+
+def _contar_falha(evento: str):
+    with _falhas_lock:
+        _falhas[evento] += 1
+
+
+class _EscritorSpans:
+    """Thread que serializa os spans da fila e os escreve no arquivo JSONL."""
+
+    _FIM = object()
+
+    def __init__(self, caminho: str, buffer: int):
+        self.caminho = caminho
+        self.fila = queue.Queue(maxsize=buffer)
+        self.thread = threading.Thread(target=self._escrever, name="telemetria-spans", daemon=True)
+        self.thread.start()
+
+    def enfileirar(self, registro: dict):
+        try:
+            self.fila.put_nowait(registro)
+        except queue.Full:
+            _contar_falha("spans_descartados")
+
+    def _escrever(self):
+        arquivo = None
+        try:
+            while True:
+                registros = [self.fila.get()]
+                # Escreve de uma vez o que acumulou enquanto a última escrita corria
+                while len(registros) < 1000:
+                    try:
+                        registros.append(self.fila.get_nowait())
+                    except queue.Empty:
+                        break
+                fim = registros[-1] is self._FIM
+                try:
+                    if arquivo is None:
+                        arquivo = open(self.caminho, "a", encoding="utf-8")
+                    arquivo.writelines(
+                        json.dumps(r, ensure_ascii=False, default=str) + "\n" for r in registros if r is not self._FIM
+                    )
+                    arquivo.flush()
+                except Exception:
+                    # Sem o arquivo a thread segue consumindo a fila: quem registra nunca espera
+                    _contar_falha("spans_erros")
+                if fim:
+                    return
+        finally:
+            if arquivo is not None:
+                arquivo.close()
+
+    def parar(self):
+        """Escreve o que restou na fila e fecha o arquivo."""
+        # Com o buffer cheio, espera a thread abrir espaço para o sinal de fim
+        self.fila.put(self._FIM)
+        self.thread.join()
+
+
+def _escrever_span(registro: dict):
+    global _escritor_spans
+    if _escritor_spans is None:
+        caminho = _configuracao()[2]
+        if caminho is None:
+            return
+        with _escritor_lock:
+            if _escritor_spans is None:
+                _escritor_spans = _EscritorSpans(caminho, _configuracao()[5])
+    _escritor_spans.enfileirar(registro)
+
+
+def _parar_escritor_spans():
+    global _escritor_spans
+    with _escritor_lock:
+        if _escritor_spans is not None:
+            _escritor_spans.parar()
+            _escritor_spans = None
+
+
+def instrumentar_tool(ferramenta):
+    """Envolve func e coroutine da tool em spans "tool"; o status da saída é o resultado."""
+    func, coroutine = ferramenta.func, ferramenta.coroutine
+
+    @wraps(func)
+    def executar(*args, **kwargs):
+        with span("tool", tool=ferramenta.name) as s:
+            saida = func(*args, **kwargs)
+            s.resultado = getattr(saida, "status", None) or "ok"
+            return saida
+
+    ferramenta.func = executar
+    if coroutine is not None:
+        @wraps(coroutine)
+        async def aexecutar(*args, **kwargs):
+            with span("tool", tool=ferramenta.name) as s:
+                saida = await coroutine(*args, **kwargs)
+                s.resultado = getattr(saida, "status", None) or "ok"
+                return saida
+
+        ferramenta.coroutine = aexecutar
+    return ferramenta
+
+
+def rotulo_endpoint(url: str) -> str:
+    """Endpoint do Asaas sem host, prefixo e ids: "/payments/{id}"."""
+    caminho = urlsplit(url).path
+    if "/v3" in caminho:
+        caminho = caminho.split("/v3", 1)[1]
+    return "/".join("{id}" if _RE_SEGMENTO_ID.search(segmento) else segmento for segmento in caminho.split("/"))
+
+
+@lru_cache(maxsize=512)
+def rotulo_sql(query: str) -> str:
+    """Comando e primeira tabela da query: "SELECT negociacoes", "INSERT comprovantes"."""
+    palavras = query.split(None, 1)
+    if not palavras:
+        return "?"
+    tabela = _RE_TABELA_SQL.search(query)
+    return f"{palavras[0].upper()} {tabela.group(1).lower()}" if tabela else palavras[0].upper()
+
+
+def _rotulos_prometheus(rotulos) -> str:
+    if not rotulos:
+        return ""
+    escapar = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{chave}="{escapar(valor)}"' for chave, valor in rotulos) + "}"
+
+
+def exportar_prometheus(extras: dict | None = None) -> str:
+    """Histogramas e contadores no formato texto do Prometheus (0.0.4).
+
+    `extras` ({métrica: valor}, como o de /metricas) entra como gauges nxz_<métrica>.
+    """
+    with _lock:
+        histogramas = {chave: ([*serie[0]], serie[1]) for chave, serie in _histogramas.items()}
+        contadores = dict(_contadores)
+
+    linhas = []
+    for nome in sorted({nome for nome, *_ in histogramas}):
+        metrica = f"nxz_{nome}_duracao_segundos"
+        linhas += [f"# HELP {metrica} Duração dos spans {nome}, em segundos", f"# TYPE {metrica} histogram"]
+        for (_, rotulos, resultado), (contagens, soma) in sorted(
+            (i for i in histogramas.items() if i[0][0] == nome), key=lambda i: str(i[0][1:])
+        ):
+            rotulos = rotulos + (("resultado", resultado),)
+            acumulado = 0
+            for limite, contagem in zip((*_BUCKETS, "+Inf"), contagens):
+                acumulado += contagem
+                linhas.append(f"{metrica}_bucket{_rotulos_prometheus(rotulos + (('le', limite),))} {acumulado}")
+            linhas.append(f"{metrica}_sum{_rotulos_prometheus(rotulos)} {soma}")
+            linhas.append(f"{metrica}_count{_rotulos_prometheus(rotulos)} {acumulado}")
+
+    for nome in sorted({nome for nome, _ in contadores}):
+        metrica = f"nxz_{nome}_total"
+        linhas.append(f"# TYPE {metrica} counter")
+        for (_, rotulos), valor in sorted((i for i in contadores.items() if i[0][0] == nome), key=lambda i: str(i[0][1])):
+            linhas.append(f"{metrica}{_rotulos_prometheus(rotulos)} {valor}")
+
+    for nome, valor in (extras or {}).items():
+        if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+            linhas += [f"# TYPE nxz_{nome} gauge", f"nxz_{nome} {valor}"]
+    return "\n".join(linhas) + "\n"
+
+
+def escrever_prometheus(caminho: str, extras: dict | None = None):
+    """Grava exportar_prometheus() em `caminho` (troca atômica do arquivo)."""
+    temporario = f"{caminho}.tmp"
+    with open(temporario, "w", encoding="utf-8") as f:
+        f.write(exportar_prometheus(extras))
+    os.replace(temporario, caminho)
+
+
+def _exportar_arquivo(caminho: str):
+    """escrever_prometheus(caminho) sem propagar erros: cada falha é contada e a exportação segue."""
+    try:
+        escrever_prometheus(caminho)
+    except Exception:
+        _contar_falha("exportacao_erros")
+
+
+def _iniciar_exportador(caminho: str, intervalo: float):
+    if caminho in _exportadores:
+        return
+    parar = _exportadores[caminho] = threading.Event()
+
+    def exportar():
+        while not parar.wait(intervalo):
+            _exportar_arquivo(caminho)
+
+    threading.Thread(target=exportar, name="telemetria-prometheus", daemon=True).start()
+    atexit.register(_exportar_arquivo, caminho)
+
+
+def telemetria_stats() -> dict:
+    """Spans medidos por nome, spans descartados e falhas de escrita, no formato {métrica: valor} de /metricas."""
+    with _lock:
+        contagens = Counter()
+        for (nome, *_), serie in _histogramas.items():
+            contagens[nome] += sum(serie[0])
+    with _falhas_lock:
+        falhas = dict(_falhas)
+    return {
+        **{f"telemetria_spans_{nome}": total for nome, total in sorted(contagens.items())},
+        "telemetria_spans_descartados": falhas.get("spans_descartados", 0),
+        "telemetria_spans_erros": falhas.get("spans_erros", 0),
+        "telemetria_exportacao_erros": falhas.get("exportacao_erros", 0),
+    }
+
+
+def _reset_telemetria():
+    """Escreve os spans pendentes, para os exportadores, zera as métricas e relê a configuração (útil em testes)."""
+    global _config
+    _parar_escritor_spans()
+    with _config_lock:
+        for parar in _exportadores.values():
+            parar.set()
+        _exportadores.clear()
+    with _lock:
+        _histogramas.clear()
+        _contadores.clear()
+    with _falhas_lock:
+        _falhas.clear()
+    with _config_lock:
+        _config = None
+
+
+atexit.register(_parar_escritor_spans)
@@ -0,0 +1,307 @@
+import json
+import os
+import threading
+import uuid
+from collections import Counter
+from decimal import Decimal
+
+from agent.utils import _aconn, _conn
+
+# Tickets de atendimento humano (sql/11_create_tickets.sql). transferir_humano
+# grava o ticket com o valor em atraso do cliente; os atendentes assumem o de
+# prazo mais próximo com FOR UPDATE SKIP LOCKED, sem disputar a mesma linha; e
+# um envio à parte (scripts/enviar_tickets.py) abre cada ticket no help desk.
+
+# Uma segunda transferência na mesma thread cai no ticket ainda não resolvido:
+# o contexto é acrescentado, o prazo fica o menor dos dois e o ticket volta a
+# ser enviado ao help desk
+_INSERT_TICKET = """
+INSERT INTO tickets (id, thread_id, cnpj, contexto, valor_em_atraso, prioridade, prazo_atendimento)
+VALUES (%s, %s, %s, %s, %s, %s, CURRENT_TIMESTAMP + make_interval(secs => %s))
+ON CONFLICT (thread_id) WHERE estado <> 'resolvido' DO UPDATE
+SET contexto = tickets.contexto || E'\\n\\n' || EXCLUDED.contexto,
+    cnpj = COALESCE(EXCLUDED.cnpj, tickets.cnpj),
+    valor_em_atraso = GREATEST(tickets.valor_em_atraso, EXCLUDED.valor_em_atraso),
+    prioridade = GREATEST(tickets.prioridade, EXCLUDED.prioridade),
+    prazo_atendimento = LEAST(tickets.prazo_atendimento, EXCLUDED.prazo_atendimento),
+    enviado_em = NULL
+RETURNING id, (xmax = 0) AS novo
+"""
+
+_CAMPOS = [
+    "id", "thread_id", "cnpj", "contexto", "valor_em_atraso", "prioridade", "estado", "atendente",
+    "criado_em", "prazo_atendimento", "assumido_em", "resolvido_em", "id_helpdesk",
+]
+_COLUNAS = ", ".join(_CAMPOS)
+
+# A subconsulta percorre idx_tickets_fila do prazo mais próximo em diante e
+# pula as linhas já travadas por outro atendente: o custo não depende de
+# quantos tickets estão abertos nem de quantos atendentes assumem ao mesmo tempo
+_ASSUMIR_TICKET = f"""
+UPDATE tickets SET estado = 'em_atendimento', atendente = %s, assumido_em = CURRENT_TIMESTAMP
+WHERE id = (
+    SELECT id FROM tickets WHERE estado = 'aberto'
+    ORDER BY prazo_atendimento LIMIT 1
+    FOR UPDATE SKIP LOCKED
+)
+RETURNING {_COLUNAS}, assumido_em <= prazo_atendimento AS dentro_do_sla
+"""
+
+_RESOLVER_TICKET = f"""
+UPDATE tickets SET estado = 'resolvido', resolvido_em = CURRENT_TIMESTAMP
+WHERE id = %s AND atendente = %s AND estado = 'em_atendimento'
+RETURNING {_COLUNAS}
+"""
+
+_SELECT_A_ENVIAR = f"""
+SELECT {_COLUNAS} FROM tickets WHERE enviado_em IS NULL
+ORDER BY criado_em LIMIT %s
+FOR UPDATE SKIP LOCKED
+"""
+
+_MARCAR_ENVIADO = "UPDATE tickets SET enviado_em = CURRENT_TIMESTAMP, id_helpdesk = %s WHERE id = %s"
+
+_MARCAR_FALHA_ENVIO = "UPDATE tickets SET tentativas_envio = tentativas_envio + 1 WHERE id = %s"
+
+_metricas = Counter()
+_metricas_lock = threading.Lock()
+
+
+def _get_tickets_config():
+    """Retorna (fila de tickets ligada, faixas de SLA [(valor em atraso mínimo, prazo em segundos)]).
+
+    TICKETS_FILA: transferir_humano grava o ticket no Postgres (padrão: true);
+        false só gera o id do ticket, sem fila
+    TICKETS_SLA: prazo do primeiro atendimento por faixa de valor em atraso, no
+        formato "valor:minutos,..." (padrão: 0:240,500:60,5000:15); a prioridade
+        do ticket é a posição da faixa
+    """
+    faixas = []
+    for item in os.getenv("TICKETS_SLA", "0:240,500:60,5000:15").split(","):
+        if ":" in item:
+            valor, minutos = item.split(":", 1)
+            faixas.append((float(valor), float(minutos) * 60))
+    return (
+        os.getenv("TICKETS_FILA", "true").lower() == "true",
+        sorted(faixas) or [(0.0, 240 * 60)],
+    )
+
+
+def prioridade_e_prazo(valor_em_atraso: float) -> tuple[int, float]:
+    """Prioridade (posição da faixa de TICKETS_SLA) e prazo de atendimento em segundos."""
+    _, faixas = _get_tickets_config()
+    prioridade = 0
+    for indice, (minimo, _) in enumerate(faixas):
+        if valor_em_atraso >= minimo:
+            prioridade = indice
+    return prioridade, faixas[prioridade][1]
+
+
+def fila_habilitada() -> bool:
+    ligado, _ = _get_tickets_config()
+    return ligado
+
+
+def _registrar(evento: str, quantidade: int = 1):
+    with _metricas_lock:
+        _metricas[evento] += quantidade
+
+
+def _ticket(linha, campos=_CAMPOS) -> dict:
+    """Linha de tickets (_COLUNAS) como dict serializável em JSON."""
+    ticket = dict(zip(campos, linha))
+    for chave, valor in ticket.items():
+        if isinstance(valor, uuid.UUID):
+            ticket[chave] = str(valor)
+        elif isinstance(valor, Decimal):
+            ticket[chave] = float(valor)
+        elif hasattr(valor, "isoformat"):
+            ticket[chave] = valor.isoformat()
+    return ticket
+
+
+def _parametros(contexto: str, cnpj: str | None, thread_id: str | None, valor_em_atraso: float) -> tuple:
+    prioridade, prazo = prioridade_e_prazo(valor_em_atraso)
+    thread_id = str(thread_id) if thread_id is not None else None
+    return (uuid.uuid4(), thread_id, cnpj, contexto, round(valor_em_atraso, 2), prioridade, prazo)
+
+
+def _aberto(linha) -> str:
+    ticket_id, novo = linha
+    _registrar("abertos" if novo else "complementados")
+    return str(ticket_id)
+
+
+def abrir_ticket(contexto: str, cnpj: str | None = None, thread_id: str | None = None,
+                 valor_em_atraso: float = 0.0) -> str:
+    """Enfileira um ticket para atendimento humano e retorna o id.
+
+    Na mesma thread, enquanto o ticket anterior não for resolvido, retorna o
+    id dele com o novo contexto acrescentado.
+
+    Raises:
+        psycopg.Error: se o ticket não puder ser gravado (contado em tickets_erros)
+    """
+    try:
+        with _conn() as conn:
+            linha = conn.execute(_INSERT_TICKET, _parametros(contexto, cnpj, thread_id, valor_em_atraso)).fetchone()
+    except Exception:
+        _registrar("erros")
+        raise
+    return _aberto(linha)
+
+
+async def aabrir_ticket(contexto: str, cnpj: str | None = None, thread_id: str | None = None,
+                        valor_em_atraso: float = 0.0) -> str:
+    """Versão assíncrona de abrir_ticket."""
+    try:
+        async with _aconn() as conn:
+            cur = await conn.execute(_INSERT_TICKET, _parametros(contexto, cnpj, thread_id, valor_em_atraso))
+            linha = await cur.fetchone()
+    except Exception:
+        _registrar("erros")
+        raise
+    return _aberto(linha)
+
+
+def _assumido(linha) -> dict | None:
+    if linha is None:
+        return None
+    ticket = _ticket(linha, _CAMPOS + ["dentro_do_sla"])
+    _registrar("assumidos")
+    if not ticket["dentro_do_sla"]:
+        _registrar("assumidos_fora_do_sla")
+    return ticket
+
+
+def assumir_ticket(atendente: str) -> dict | None:
+    """Atribui a `atendente` o ticket aberto de prazo mais próximo; None com a fila vazia."""
+    with _conn() as conn:
+        return _assumido(conn.execute(_ASSUMIR_TICKET, (atendente,)).fetchone())
+
+
+async def aassumir_ticket(atendente: str) -> dict | None:
+    """Versão assíncrona de assumir_ticket."""
+    async with _aconn() as conn:
+        cur = await conn.execute(_ASSUMIR_TICKET, (atendente,))
+        return _assumido(await cur.fetchone())
+
+
+def _resolvido(linha) -> dict | None:
+    if linha is None:
+        return None
+    _registrar("resolvidos")
+    return _ticket(linha)
+
+
+def resolver_ticket(ticket_id: str, atendente: str) -> dict | None:
+    """Encerra um ticket em atendimento por `atendente`; None se não houver um assim."""
+    with _conn() as conn:
+        return _resolvido(conn.execute(_RESOLVER_TICKET, (ticket_id, atendente)).fetchone())
+
+
+async def aresolver_ticket(ticket_id: str, atendente: str) -> dict | None:
+    """Versão assíncrona de resolver_ticket."""
+    async with _aconn() as conn:
+        cur = await conn.execute(_RESOLVER_TICKET, (ticket_id, atendente))
+        return _resolvido(await cur.fetchone())
+
+
+# ===== HELP DESK =====
+
+class HelpDeskLocal:
+    """Help desk de desenvolvimento: guarda os tickets em memória e, com `arquivo`, em JSONL."""
+
+    def __init__(self, arquivo: str | None = None):
+        self.arquivo = arquivo
+        self.enviados: list[dict] = []
+
+    def enviar(self, ticket: dict) -> str:
+        self.enviados.append(ticket)
+        if self.arquivo:
+            with open(self.arquivo, "a", encoding="utf-8") as f:
+                f.write(json.dumps(ticket, ensure_ascii=False) + "\n")
+        return ticket["id_helpdesk"] or f"local-{ticket['id'][:8]}"
+
+
+class HelpDeskWebhook:
+    """Help desk externo: POST do ticket em JSON para `url`; o id vem do campo "id" da resposta.
+
+    Um ticket já enviado (complementado depois) vai com o id_helpdesk anterior,
+    para o help desk atualizar em vez de abrir outro.
+    """
+
+    def __init__(self, url: str, token: str | None = None, timeout: float = 10.0):
+        import requests
+
+        self.url = url
+        self.timeout = timeout
+        self.session = requests.Session()
+        if token:
+            self.session.headers["Authorization"] = f"Bearer {token}"
+
+    def enviar(self, ticket: dict) -> str:
+        resposta = self.session.post(self.url, json=ticket, timeout=self.timeout)
+        resposta.raise_for_status()
+        corpo = resposta.json() if resposta.content else {}
+        return str(corpo.get("id") or ticket["id_helpdesk"] or ticket["id"])
+
+
+def criar_helpdesk():
+    """Cria o adaptador do help desk configurado por HELPDESK.
+
+    HELPDESK: "local" (padrão; HELPDESK_ARQUIVO opcional) ou "webhook"
+        (HELPDESK_URL, HELPDESK_TOKEN e HELPDESK_TIMEOUT)
+    """
+    tipo = os.getenv("HELPDESK", "local").lower()
+    if tipo == "webhook":
+        return HelpDeskWebhook(
+            os.environ["HELPDESK_URL"],
+            os.getenv("HELPDESK_TOKEN"),
+            float(os.getenv("HELPDESK_TIMEOUT", "10")),
+        )
+    return HelpDeskLocal(os.getenv("HELPDESK_ARQUIVO") or None)
+
+
+def enviar_tickets(helpdesk=None, lote: int = 100) -> int:
+    """Abre no help desk os tickets ainda não enviados, até `lote` por vez; retorna quantos foram enviados.
+
+    Os tickets do lote ficam travados (SKIP LOCKED) até o fim do envio, então
+    vários processos de envio não mandam o mesmo ticket. Uma falha no help desk
+    conta em tentativas_envio e o ticket fica para a próxima rodada.
+    """
+    helpdesk = helpdesk or criar_helpdesk()
+    enviados = 0
+    with _conn() as conn:
+        for linha in conn.execute(_SELECT_A_ENVIAR, (lote,)).fetchall():
+            ticket = _ticket(linha)
+            try:
+                id_helpdesk = helpdesk.enviar(ticket)
+            except Exception:
+                _registrar("erros_envio")
+                conn.execute(_MARCAR_FALHA_ENVIO, (ticket["id"],))
+                continue
+            conn.execute(_MARCAR_ENVIADO, (id_helpdesk, ticket["id"]))
+            enviados += 1
+    _registrar("enviados", enviados)
+    return enviados
+
+
+def tickets_stats() -> dict:
+    """Tickets abertos, complementados por uma nova transferência na mesma thread,
+    assumidos (e quantos depois do prazo), resolvidos, enviados ao help desk,
+    falhas de envio e falhas de gravação."""
+    with _metricas_lock:
+        metricas = dict(_metricas)
+    return {
+        f"tickets_{evento}": metricas.get(evento, 0)
+        for evento in (
+            "abertos", "complementados", "assumidos", "assumidos_fora_do_sla",
+            "resolvidos", "enviados", "erros_envio", "erros",
+        )
+    }
+
+
+def _reset_tickets_stats():
+    with _metricas_lock:
+        _metricas.clear()
@@ -1,9 +1,29 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import aclosing
 from datetime import datetime, timedelta
+from itertools import islice
+import json
+import logging
+import os
 import uuid
 
+from langchain_core.runnables import RunnableConfig
 from langchain_core.tools import tool
 
+from agent.cache import criar_cache
+from agent.compact import aler_registro, guardar_registros, guardar_registros_async, ler_registro
+from agent.idempotency import _thread_id, aexecutar_idempotente, executar_idempotente
+from agent.logs import registrar
+from agent.mirror import (
+    _espelho_habilitado,
+    aler_espelho,
+    aregistrar_pagamento,
+    ler_espelho,
+    registrar_pagamento,
+)
 from agent.models import (
+    STATUS_EM_ABERTO,
     ConsultaFinanceiraInput,
     ConsultaFinanceiraOutput,
     AtualizarBoletoInput,
@@ -16,11 +36,372 @@ from agent.models import (
     ValidarComprovanteOutput,
     TransferirHumanoInput,
     TransferirHumanoOutput,
+    DetalharRegistroInput,
+    DetalharRegistroOutput,
+)
+from agent.receipt_index import (
+    abuscar_comprovante,
+    abuscar_transacao,
+    aregistrar_comprovante,
+    buscar_comprovante,
+    buscar_transacao,
+    registrar_comprovante,
+)
+from agent.receipts import IndicePendencias, conferir, extrair_campos
+from agent.telemetry import instrumentar_tool
+from agent.tickets import aabrir_ticket, abrir_ticket, fila_habilitada
+from agent.utils import (
+    AsaasError,
+    _aconn,
+    _ahandle_asaas_request,
+    _aiter_asaas_list,
+    _conn,
+    _get_asaas_config,
+    _handle_asaas_request,
+    _iter_asaas_list,
+)
+from agent.validators import somente_digitos
+from agent.write_behind import (
+    enfileirar_negociacao,
+    flush_negociacoes,
+    negociacao_pendente,
+    write_behind_habilitado,
+)
+
+# Cache CNPJ -> cliente do Asaas; o mapeamento praticamente nunca muda
+_clientes_cache = criar_cache(
+    "clientes_asaas",
+    ttl=float(os.getenv("ASAAS_CUSTOMER_CACHE_TTL", "3600")),
+    maxsize=int(os.getenv("ASAAS_CUSTOMER_CACHE_MAXSIZE", "10000")),
+)
+
+# CNPJ -> id do cliente no Asaas; o id não muda, então vive mais que os dados do cliente
+_ids_clientes_cache = criar_cache(
+    "ids_clientes_asaas",
+    ttl=float(os.getenv("ASAAS_CUSTOMER_ID_CACHE_TTL", "86400")),
+    maxsize=int(os.getenv("ASAAS_CUSTOMER_ID_CACHE_MAXSIZE", "50000")),
+)
+
+# Snapshot curto das pendências por cliente: customer_id -> {filtros: pendências}
+_pendencias_cache = criar_cache(
+    "pendencias",
+    ttl=float(os.getenv("ASAAS_PENDENCIAS_CACHE_TTL", "60")),
+    maxsize=int(os.getenv("ASAAS_PENDENCIAS_CACHE_MAXSIZE", "2000")),
 )
-from agent.utils import _conn, _get_asaas_config, _handle_asaas_request
+
+
+def _chave_cnpj(cnpj: str) -> str:
+    """Chave de cache de um CNPJ/CPF: apenas os dígitos."""
+    return somente_digitos(cnpj)
+
+
+def _normalizar_pendencia(pagamento: dict) -> dict:
+    """Converte um pagamento do Asaas para o formato de pendência usado pelo agente."""
+    # Processar multas e juros
+    fine_value = 0
+    interest_value = 0
+
+    if pagamento.get("fine") and isinstance(pagamento.get("fine"), dict):
+        fine_value = pagamento["fine"].get("value", 0)
+
+    if pagamento.get("interest") and isinstance(
+        pagamento.get("interest"), dict
+    ):
+        interest_value = pagamento["interest"].get("value", 0)
+
+    # Calcular valor total com multas e juros
+    total_value = pagamento.get("value", 0) + fine_value + interest_value
+
+    return {
+        "id": pagamento.get("id"),
+        "data_criacao": pagamento.get("dateCreated"),
+        "status": pagamento.get("status"),
+        "valor": pagamento.get("value"),
+        "multa": fine_value,
+        "juros": interest_value,
+        "valor_total": total_value,
+        "data_vencimento": pagamento.get("dueDate"),
+        "data_vencimento_original": pagamento.get("originalDueDate"),
+        "tipo_cobranca": pagamento.get("billingType"),
+        "numero_fatura": pagamento.get("invoiceNumber"),
+        "link_fatura": pagamento.get("invoiceUrl"),
+        "link_boleto": pagamento.get("bankSlipUrl"),
+        "descricao": pagamento.get("description"),
+        "pago": pagamento.get("status") == "RECEIVED",
+    }
+
+
+def _normalizar_cliente(cliente: dict) -> dict:
+    """Converte um cliente do Asaas para o formato usado pelo agente."""
+    return {
+        "id": cliente.get("id"),
+        "nome": cliente.get("name"),
+        "email": cliente.get("email"),
+        "empresa": cliente.get("company"),
+        "cpfCnpj": cliente.get("cpfCnpj"),
+        "telefone": cliente.get("phone"),
+        "celular": cliente.get("mobilePhone"),
+        "endereco": cliente.get("address"),
+        "numero": cliente.get("addressNumber"),
+        "complemento": cliente.get("complement"),
+        "bairro": cliente.get("province"),
+        "cep": cliente.get("postalCode"),
+        "cidade": cliente.get("cityName"),
+        "estado": cliente.get("state"),
+        "pais": cliente.get("country"),
+        "tipo_pessoa": cliente.get("personType"),
+        "deletado": cliente.get("deleted"),
+        "grupos": (
+            [grupo.get("name") for grupo in cliente.get("groups", [])]
+            if cliente.get("groups")
+            else []
+        ),
+    }
+
+
+def _primeiro_cliente(customer_data: dict) -> dict | None:
+    """Retorna o primeiro cliente de uma listagem de /customers, se houver."""
+    total_count = customer_data.get("totalCount", 0)
+    data = customer_data.get("data")
+
+    if total_count <= 0 or not data:
+        return None
+
+    return data[0]
+
+
+def _filtros_pagamentos(input: ConsultaFinanceiraInput) -> list[dict]:
+    """Traduz os filtros da consulta em parâmetros de GET /payments.
+
+    O Asaas filtra um único status por requisição, então é gerado um conjunto
+    de parâmetros por status pedido (padrão: apenas itens em aberto).
+    """
+    base = {}
+    if input.vencimento_de:
+        base["dueDate[ge]"] = input.vencimento_de.isoformat()
+    if input.vencimento_ate:
+        base["dueDate[le]"] = input.vencimento_ate.isoformat()
+
+    if input.historico_completo:
+        return [base]
+
+    return [
+        {**base, "status": status}
+        for status in dict.fromkeys(input.status or STATUS_EM_ABERTO)
+    ]
+
+
+def _iter_pendencias(base_url: str, headers: dict, customer_id: str, filtros: list[dict], page_size=None):
+    """Gera as pendências normalizadas do cliente, página a página e filtro a filtro.
+
+    Raises:
+        AsaasError: se alguma página de /payments falhar
+    """
+    for filtro in filtros:
+        for pagamento in _iter_asaas_list(
+            f"{base_url}/payments", headers,
+            params={"customer": customer_id, **filtro}, page_size=page_size,
+        ):
+            yield _normalizar_pendencia(pagamento)
+
+
+async def _aiter_pendencias(base_url: str, headers: dict, customer_id: str, filtros: list[dict], page_size=None):
+    """Versão assíncrona de _iter_pendencias."""
+    for filtro in filtros:
+        async for pagamento in _aiter_asaas_list(
+            f"{base_url}/payments", headers,
+            params={"customer": customer_id, **filtro}, page_size=page_size,
+        ):
+            yield _normalizar_pendencia(pagamento)
+
+
+def _chave_snapshot(input: ConsultaFinanceiraInput) -> str:
+    """Identifica, dentro do snapshot de um cliente, a lista de uma combinação de filtros."""
+    return json.dumps([_filtros_pagamentos(input), input.max_itens], sort_keys=True)
+
+
+def _buscar_pendencias(base_url: str, headers: dict, customer_id: str, input: ConsultaFinanceiraInput) -> list[dict]:
+    """Retorna as pendências do cliente para os filtros pedidos, usando o snapshot se houver.
+
+    Busca no máximo max_itens + 1 itens (o excedente só indica truncamento).
+
+    Raises:
+        AsaasError: se alguma página de /payments falhar
+    """
+    chave = _chave_snapshot(input)
+    snapshot = _pendencias_cache.get(customer_id) or {}
+    if chave in snapshot:
+        return snapshot[chave]
+
+    pendencias = list(islice(
+        _iter_pendencias(
+            base_url, headers, customer_id,
+            _filtros_pagamentos(input), page_size=input.max_itens + 1,
+        ),
+        input.max_itens + 1,
+    ))
+    _pendencias_cache.set(customer_id, {**snapshot, chave: pendencias})
+    return pendencias
+
+
+async def _abuscar_pendencias(base_url: str, headers: dict, customer_id: str, input: ConsultaFinanceiraInput) -> list[dict]:
+    """Versão assíncrona de _buscar_pendencias."""
+    chave = _chave_snapshot(input)
+    snapshot = await _pendencias_cache.aget(customer_id) or {}
+    if chave in snapshot:
+        return snapshot[chave]
+
+    pendencias = []
+    async with aclosing(_aiter_pendencias(
+        base_url, headers, customer_id,
+        _filtros_pagamentos(input), page_size=input.max_itens + 1,
+    )) as iterador:
+        async for pendencia in iterador:
+            pendencias.append(pendencia)
+            if len(pendencias) > input.max_itens:
+                break
+    await _pendencias_cache.aset(customer_id, {**snapshot, chave: pendencias})
+    return pendencias
+
+
+def _cliente_confere(cliente: dict | None, chave_cliente: str) -> bool:
+    """Confere se o cliente obtido pelo id é o do CNPJ consultado e não foi removido."""
+    return (
+        bool(cliente)
+        and not cliente.get("deleted")
+        and _chave_cnpj(cliente.get("cpfCnpj") or "") == chave_cliente
+    )
+
+
+def _resultado_cliente_e_pendencias(cliente, error, pendencias, error_pendencias, chave_cliente):
+    """Combina as respostas paralelas de cliente e pendências em (cliente, pendencias, error).
+
+    Se o id não levar ao cliente do CNPJ consultado (id errado, cliente removido
+    ou falha na busca), retorna (None, None, None) e a consulta segue pelo CNPJ.
+    """
+    if error or not _cliente_confere(cliente, chave_cliente):
+        return None, None, None
+    if error_pendencias:
+        return cliente, None, error_pendencias
+    return cliente, pendencias, None
+
+
+def _buscar_cliente_e_pendencias(base_url: str, headers: dict, customer_id: str, chave_cliente: str, input: ConsultaFinanceiraInput):
+    """Busca o cliente pelo id e as pendências ao mesmo tempo, quando o id já é conhecido.
+
+    As pendências rodam em uma thread auxiliar enquanto GET /customers/{id}
+    roda na thread atual.
+    """
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        futuro_pendencias = executor.submit(_buscar_pendencias, base_url, headers, customer_id, input)
+        cliente, error = _handle_asaas_request("GET", f"{base_url}/customers/{customer_id}", headers)
+        try:
+            pendencias, error_pendencias = futuro_pendencias.result(), None
+        except AsaasError as e:
+            pendencias, error_pendencias = None, e.error
+    return _resultado_cliente_e_pendencias(cliente, error, pendencias, error_pendencias, chave_cliente)
+
+
+async def _abuscar_cliente_e_pendencias(base_url: str, headers: dict, customer_id: str, chave_cliente: str, input: ConsultaFinanceiraInput):
+    """Versão assíncrona de _buscar_cliente_e_pendencias, com asyncio.gather."""
+    resposta_cliente, pendencias = await asyncio.gather(
+        _ahandle_asaas_request("GET", f"{base_url}/customers/{customer_id}", headers),
+        _abuscar_pendencias(base_url, headers, customer_id, input),
+        return_exceptions=True,
+    )
+    if isinstance(resposta_cliente, BaseException):
+        raise resposta_cliente
+    error_pendencias = None
+    if isinstance(pendencias, AsaasError):
+        pendencias, error_pendencias = None, pendencias.error
+    elif isinstance(pendencias, BaseException):
+        raise pendencias
+    cliente, error = resposta_cliente
+    return _resultado_cliente_e_pendencias(cliente, error, pendencias, error_pendencias, chave_cliente)
+
+
+def _snapshot_com_pagamento(snapshot: dict, pagamento: dict) -> dict:
+    """Aplica um pagamento atualizado às listas de um snapshot de pendências.
+
+    Se o novo status não estiver entre os filtrados, o item sai da lista. Listas
+    filtradas por vencimento são descartadas, pois a nova data pode colocar o
+    pagamento dentro ou fora da janela pedida. Também são descartadas as listas
+    em que o pagamento passa a entrar (ex.: OVERDUE -> PENDING numa lista de
+    PENDING) sem estar nelas, já que a posição e o truncamento dele só o Asaas sabe.
+    """
+    pendencia = _normalizar_pendencia(pagamento)
+    atualizado = {}
+    for chave, pendencias in snapshot.items():
+        filtros, _ = json.loads(chave)
+        if any("dueDate[ge]" in f or "dueDate[le]" in f for f in filtros):
+            continue
+        status_filtrados = {f.get("status") for f in filtros}
+        manter = None in status_filtrados or pendencia["status"] in status_filtrados
+        presente = any(p["id"] == pendencia["id"] for p in pendencias)
+        if manter and not presente:
+            continue
+        atualizado[chave] = [
+            pendencia if p["id"] == pendencia["id"] else p
+            for p in pendencias
+            if p["id"] != pendencia["id"] or manter
+        ]
+    return atualizado
+
+
+def _consulta_financeira_output(
+    cliente: dict, pendencias: list[dict], max_itens: int
+) -> ConsultaFinanceiraOutput:
+    """Monta a saída de consulta_financeira a partir do cliente e das pendências.
+
+    `pendencias` pode trazer um item além de max_itens, usado só para indicar truncamento.
+    """
+    return ConsultaFinanceiraOutput(
+        status="sucesso",
+        cliente=_normalizar_cliente(cliente),
+        pendencias=pendencias[:max_itens],
+        total_pendencias=len(pendencias[:max_itens]),
+        truncado=len(pendencias) > max_itens,
+    )
+
+
+def _consulta_pelo_espelho(input: ConsultaFinanceiraInput) -> ConsultaFinanceiraOutput | None:
+    """Responde a consulta pelo espelho local do Asaas, se habilitado e atualizado.
+
+    Retorna None quando a consulta deve seguir para a API (espelho desabilitado,
+    cliente fora do espelho, espelho desatualizado ou indisponível).
+    """
+    if not _espelho_habilitado():
+        return None
+    try:
+        espelho = ler_espelho(_chave_cnpj(input.cnpj), _filtros_pagamentos(input), input.max_itens + 1)
+    except Exception:
+        return None
+    if espelho is None:
+        return None
+
+    cliente, pagamentos = espelho
+    pendencias = [_normalizar_pendencia(pagamento) for pagamento in pagamentos]
+    return _consulta_financeira_output(cliente, pendencias, input.max_itens)
+
+
+async def _aconsulta_pelo_espelho(input: ConsultaFinanceiraInput) -> ConsultaFinanceiraOutput | None:
+    """Versão assíncrona de _consulta_pelo_espelho."""
+    if not _espelho_habilitado():
+        return None
+    try:
+        espelho = await aler_espelho(_chave_cnpj(input.cnpj), _filtros_pagamentos(input), input.max_itens + 1)
+    except Exception:
+        return None
+    if espelho is None:
+        return None
+
+    cliente, pagamentos = espelho
+    pendencias = [_normalizar_pendencia(pagamento) for pagamento in pagamentos]
+    return _consulta_financeira_output(cliente, pendencias, input.max_itens)
+
 
 @tool
-def consulta_financeira(input: ConsultaFinanceiraInput) -> ConsultaFinanceiraOutput:
+def consulta_financeira(input: ConsultaFinanceiraInput, config: RunnableConfig = None) -> ConsultaFinanceiraOutput:
     """Busca informações de um cliente e suas pendências no Asaas pelo CNPJ.
 
     Args:
@@ -29,121 +410,159 @@ def consulta_financeira(input: ConsultaFinanceiraInput) -> ConsultaFinanceiraOut
     Returns:
         ConsultaFinanceiraOutput: Informações do cliente e suas pendências
     """
+    thread_id = _thread_id(config)
+
+    # Espelho local alimentado por webhooks; cai para a API se não puder responder
+    espelho = _consulta_pelo_espelho(input)
+    if espelho is not None:
+        return guardar_registros(espelho, thread_id)
+
     # Obter configuração da API do Asaas
-    config, error = _get_asaas_config()
+    asaas_config, error = _get_asaas_config()
     if error:
         return ConsultaFinanceiraOutput(**error)
 
-    base_url = config["base_url"]
-    headers = config["headers"]
-
-    # Primeiro passo: Buscar o cliente pelo CNPJ
-    customer_url = f"{base_url}/customers"
-    customer_params = {"cpfCnpj": input.cnpj}
+    base_url = asaas_config["base_url"]
+    headers = asaas_config["headers"]
 
-    customer_data, error = _handle_asaas_request(
-        "GET", customer_url, headers, params=customer_params
-    )
-    if error:
-        return ConsultaFinanceiraOutput(**error)
+    chave_cliente = _chave_cnpj(input.cnpj)
+    cliente = _clientes_cache.get(chave_cliente)
+    pendencias = None
 
-    # Verificar se encontrou o cliente
-    total_count = customer_data.get("totalCount", 0)
-    data = customer_data.get("data")
+    # Com o id já conhecido (turno anterior ou cache de ids), cliente e
+    # pendências são buscados em paralelo
+    customer_id = input.customer_id or _ids_clientes_cache.get(chave_cliente)
+    if cliente is None and customer_id:
+        cliente, pendencias, error = _buscar_cliente_e_pendencias(
+            base_url, headers, customer_id, chave_cliente, input
+        )
+        if error:
+            return ConsultaFinanceiraOutput(**error)
+        if cliente is None:
+            _ids_clientes_cache.invalidate(chave_cliente)
+        else:
+            _clientes_cache.set(chave_cliente, cliente)
 
-    if total_count <= 0 or not data:
-        return ConsultaFinanceiraOutput(
-            status="nao_encontrado",
-            mensagem="Cliente não encontrado no Asaas",
+    # Primeiro passo: Buscar o cliente pelo CNPJ (ou usar o que está em cache)
+    if cliente is None:
+        customer_data, error = _handle_asaas_request(
+            "GET", f"{base_url}/customers", headers, params={"cpfCnpj": chave_cliente}
         )
+        if error:
+            return ConsultaFinanceiraOutput(**error)
 
-    # Pegar o primeiro cliente encontrado
-    cliente = customer_data["data"][0]
-    customer_id = cliente.get("id")
+        # Pegar o primeiro cliente encontrado
+        cliente = _primeiro_cliente(customer_data)
+        if cliente is None:
+            return ConsultaFinanceiraOutput(
+                status="nao_encontrado",
+                mensagem="Cliente não encontrado no Asaas",
+            )
+        _clientes_cache.set(chave_cliente, cliente)
+        _ids_clientes_cache.set(chave_cliente, cliente.get("id"))
 
-    # Segundo passo: Buscar as pendências do cliente usando o ID
-    payments_url = f"{base_url}/payments"
-    payments_params = {"customer": customer_id}
+    # Segundo passo: Buscar as pendências do cliente usando o ID, com os filtros
+    # aplicados no Asaas (ou reaproveitar o snapshot recente do cliente)
+    if pendencias is None:
+        try:
+            pendencias = _buscar_pendencias(base_url, headers, cliente.get("id"), input)
+        except AsaasError as e:
+            # O cliente em cache pode estar desatualizado (ex.: removido no Asaas)
+            _clientes_cache.invalidate(chave_cliente)
+            _ids_clientes_cache.invalidate(chave_cliente)
+            return ConsultaFinanceiraOutput(**e.error)
 
-    payments_data, error = _handle_asaas_request(
-        "GET", payments_url, headers, params=payments_params
-    )
+    # Retornar as informações completas do cliente e suas pendências
+    # (no formato compacto, os registros completos ficam disponíveis a detalhar_registro)
+    return guardar_registros(_consulta_financeira_output(cliente, pendencias, input.max_itens), thread_id)
+
+
+async def aconsulta_financeira(input: ConsultaFinanceiraInput, config: RunnableConfig = None) -> ConsultaFinanceiraOutput:
+    """Versão assíncrona de consulta_financeira."""
+    thread_id = _thread_id(config)
+    espelho = await _aconsulta_pelo_espelho(input)
+    if espelho is not None:
+        return await guardar_registros_async(espelho, thread_id)
+
+    asaas_config, error = _get_asaas_config()
     if error:
         return ConsultaFinanceiraOutput(**error)
 
-    # Processar as pendências para um formato mais amigável
-    pendencias = []
-    if payments_data.get("data"):
-        for pagamento in payments_data["data"]:
-            # Processar multas e juros
-            fine_value = 0
-            interest_value = 0
-
-            if pagamento.get("fine") and isinstance(pagamento.get("fine"), dict):
-                fine_value = pagamento["fine"].get("value", 0)
-
-            if pagamento.get("interest") and isinstance(
-                pagamento.get("interest"), dict
-            ):
-                interest_value = pagamento["interest"].get("value", 0)
-
-            # Calcular valor total com multas e juros
-            total_value = pagamento.get("value", 0) + fine_value + interest_value
-
-            pendencias.append(
-                {
-                    "id": pagamento.get("id"),
-                    "data_criacao": pagamento.get("dateCreated"),
-                    "status": pagamento.get("status"),
-                    "valor": pagamento.get("value"),
-                    "multa": fine_value,
-                    "juros": interest_value,
-                    "valor_total": total_value,
-                    "data_vencimento": pagamento.get("dueDate"),
-                    "data_vencimento_original": pagamento.get("originalDueDate"),
-                    "tipo_cobranca": pagamento.get("billingType"),
-                    "numero_fatura": pagamento.get("invoiceNumber"),
-                    "link_fatura": pagamento.get("invoiceUrl"),
-                    "link_boleto": pagamento.get("bankSlipUrl"),
-                    "descricao": pagamento.get("description"),
-                    "pago": pagamento.get("status") == "RECEIVED",
-                }
+    base_url = asaas_config["base_url"]
+    headers = asaas_config["headers"]
+
+    chave_cliente = _chave_cnpj(input.cnpj)
+    cliente = await _clientes_cache.aget(chave_cliente)
+    pendencias = None
+
+    customer_id = input.customer_id or await _ids_clientes_cache.aget(chave_cliente)
+    if cliente is None and customer_id:
+        cliente, pendencias, error = await _abuscar_cliente_e_pendencias(
+            base_url, headers, customer_id, chave_cliente, input
+        )
+        if error:
+            return ConsultaFinanceiraOutput(**error)
+        if cliente is None:
+            await _ids_clientes_cache.ainvalidate(chave_cliente)
+        else:
+            await _clientes_cache.aset(chave_cliente, cliente)
+
+    if cliente is None:
+        customer_data, error = await _ahandle_asaas_request(
+            "GET", f"{base_url}/customers", headers, params={"cpfCnpj": chave_cliente}
+        )
+        if error:
+            return ConsultaFinanceiraOutput(**error)
+
+        cliente = _primeiro_cliente(customer_data)
+        if cliente is None:
+            return ConsultaFinanceiraOutput(
+                status="nao_encontrado",
+                mensagem="Cliente não encontrado no Asaas",
             )
+        await _clientes_cache.aset(chave_cliente, cliente)
+        await _ids_clientes_cache.aset(chave_cliente, cliente.get("id"))
 
-    # Retornar as informações completas do cliente e suas pendências
-    return ConsultaFinanceiraOutput(
+    if pendencias is None:
+        try:
+            pendencias = await _abuscar_pendencias(base_url, headers, cliente.get("id"), input)
+        except AsaasError as e:
+            await _clientes_cache.ainvalidate(chave_cliente)
+            await _ids_clientes_cache.ainvalidate(chave_cliente)
+            return ConsultaFinanceiraOutput(**e.error)
+
+    return await guardar_registros_async(_consulta_financeira_output(cliente, pendencias, input.max_itens), thread_id)
+
+
+def _dados_atualizacao_boleto(input: AtualizarBoletoInput) -> dict:
+    """Monta o corpo do PUT /payments/{id} com vencimento para daqui a 3 dias."""
+    # Calcular nova data de vencimento (data atual + 3 dias)
+    nova_data_vencimento = (datetime.now() + timedelta(days=3)).strftime("%Y-%m-%d")
+
+    return {
+        "value": input.valor,
+        "dueDate": nova_data_vencimento,
+        "billingType": "UNDEFINED",
+    }
+
+
+def _atualizar_boleto_output(updated_payment: dict) -> AtualizarBoletoOutput:
+    """Monta a saída de atualizar_boleto a partir do pagamento atualizado no Asaas."""
+    return AtualizarBoletoOutput(
         status="sucesso",
-        cliente={
-            "id": cliente.get("id"),
-            "nome": cliente.get("name"),
-            "email": cliente.get("email"),
-            "empresa": cliente.get("company"),
-            "cpfCnpj": cliente.get("cpfCnpj"),
-            "telefone": cliente.get("phone"),
-            "celular": cliente.get("mobilePhone"),
-            "endereco": cliente.get("address"),
-            "numero": cliente.get("addressNumber"),
-            "complemento": cliente.get("complement"),
-            "bairro": cliente.get("province"),
-            "cep": cliente.get("postalCode"),
-            "cidade": cliente.get("cityName"),
-            "estado": cliente.get("state"),
-            "pais": cliente.get("country"),
-            "tipo_pessoa": cliente.get("personType"),
-            "deletado": cliente.get("deleted"),
-            "grupos": (
-                [grupo.get("name") for grupo in cliente.get("groups", [])]
-                if cliente.get("groups")
-                else []
-            ),
-        },
-        pendencias=pendencias,
-        total_pendencias=len(pendencias),
+        boleto_id=updated_payment.get("id"),
+        valor=updated_payment.get("value"),
+        data_vencimento=updated_payment.get("dueDate"),
+        data_vencimento_original=updated_payment.get("originalDueDate"),
+        link_boleto=updated_payment.get("bankSlipUrl"),
+        link_fatura=updated_payment.get("invoiceUrl"),
+        numero_fatura=updated_payment.get("invoiceNumber"),
+        status_pagamento=updated_payment.get("status"),
     )
 
 
 @tool
-def atualizar_boleto(input: AtualizarBoletoInput) -> AtualizarBoletoOutput:
+def atualizar_boleto(input: AtualizarBoletoInput, config: RunnableConfig = None) -> AtualizarBoletoOutput:
     """Atualiza um boleto existente no Asaas, definindo nova data de vencimento para 3 dias a partir de hoje.
     O desconto é aplicado automaticamente por ser antecipação do vencimento (desconto de juros).
 
@@ -153,72 +572,214 @@ def atualizar_boleto(input: AtualizarBoletoInput) -> AtualizarBoletoOutput:
     Returns:
         AtualizarBoletoOutput: Informações do boleto atualizado
     """
+    # Repetições na mesma thread devolvem o boleto já atualizado, sem novo PUT
+    return executar_idempotente(
+        config, "atualizar_boleto", input, AtualizarBoletoOutput, lambda: _atualizar_boleto(input)
+    )
+
+
+def _atualizar_boleto(input: AtualizarBoletoInput) -> AtualizarBoletoOutput:
     # Obter configuração da API do Asaas
     config, error = _get_asaas_config()
     if error:
         return AtualizarBoletoOutput(**error)
 
-    base_url = config["base_url"]
-    headers = config["headers"]
-
-    # Calcular nova data de vencimento (data atual + 3 dias)
-    nova_data_vencimento = (datetime.now() + timedelta(days=3)).strftime("%Y-%m-%d")
-
-    # Dados para atualização do boleto
-    update_data = {
-        "value": input.valor,
-        "dueDate": nova_data_vencimento,
-        "billingType": "UNDEFINED",
-    }
-
     # Atualizar o pagamento via API PUT
-    payment_url = f"{base_url}/payments/{input.boleto_id}"
+    payment_url = f"{config['base_url']}/payments/{input.boleto_id}"
     updated_payment, error = _handle_asaas_request(
-        "PUT", payment_url, headers, json=update_data
+        "PUT", payment_url, config["headers"], json=_dados_atualizacao_boleto(input)
     )
     if error:
         return AtualizarBoletoOutput(**error)
 
+    # Manter o snapshot de pendências do cliente consistente sem refazer a consulta
+    snapshot = _pendencias_cache.get(updated_payment.get("customer"))
+    if snapshot:
+        _pendencias_cache.set(updated_payment["customer"], _snapshot_com_pagamento(snapshot, updated_payment))
+
+    # Refletir a atualização no espelho antes de o webhook PAYMENT_UPDATED chegar
+    if _espelho_habilitado():
+        try:
+            registrar_pagamento(updated_payment)
+        except Exception:
+            pass
+
     # Retornar informações do boleto atualizado
-    return AtualizarBoletoOutput(
+    return _atualizar_boleto_output(updated_payment)
+
+
+async def aatualizar_boleto(input: AtualizarBoletoInput, config: RunnableConfig = None) -> AtualizarBoletoOutput:
+    """Versão assíncrona de atualizar_boleto."""
+    return await aexecutar_idempotente(
+        config, "atualizar_boleto", input, AtualizarBoletoOutput, lambda: _aatualizar_boleto(input)
+    )
+
+
+async def _aatualizar_boleto(input: AtualizarBoletoInput) -> AtualizarBoletoOutput:
+    config, error = _get_asaas_config()
+    if error:
+        return AtualizarBoletoOutput(**error)
+
+    payment_url = f"{config['base_url']}/payments/{input.boleto_id}"
+    updated_payment, error = await _ahandle_asaas_request(
+        "PUT", payment_url, config["headers"], json=_dados_atualizacao_boleto(input)
+    )
+    if error:
+        return AtualizarBoletoOutput(**error)
+
+    snapshot = await _pendencias_cache.aget(updated_payment.get("customer"))
+    if snapshot:
+        await _pendencias_cache.aset(updated_payment["customer"], _snapshot_com_pagamento(snapshot, updated_payment))
+
+    if _espelho_habilitado():
+        try:
+            await aregistrar_pagamento(updated_payment)
+        except Exception:
+            pass
+
+    return _atualizar_boleto_output(updated_payment)
+
+
+_INSERT_NEGOCIACAO = "INSERT INTO negociacoes (id_externo, cnpj, detalhes) VALUES (%s, %s, %s)"
+
+
+def _negociacao_registrada(negociacao_id: str) -> RegistrarNegociacaoOutput:
+    return RegistrarNegociacaoOutput(
         status="sucesso",
-        boleto_id=updated_payment.get("id"),
-        valor=updated_payment.get("value"),
-        data_vencimento=updated_payment.get("dueDate"),
-        data_vencimento_original=updated_payment.get("originalDueDate"),
-        link_boleto=updated_payment.get("bankSlipUrl"),
-        link_fatura=updated_payment.get("invoiceUrl"),
-        numero_fatura=updated_payment.get("invoiceNumber"),
-        status_pagamento=updated_payment.get("status"),
+        mensagem="Negociação registrada com sucesso",
+        negociacao_id=negociacao_id,
     )
 
 
 @tool
-def registrar_negociacao(input: RegistrarNegociacaoInput) -> RegistrarNegociacaoOutput:
+def registrar_negociacao(input: RegistrarNegociacaoInput, config: RunnableConfig = None) -> RegistrarNegociacaoOutput:
     """Registra uma negociação feita com o cliente, salvando os detalhes no banco de dados.
 
+    Com NEGOCIACOES_WRITE_BEHIND=true a negociação é só enfileirada e gravada
+    em lote logo depois (agent/write_behind.py); o id retornado é o mesmo nos
+    dois modos.
+
     Args:
         input: Dados de entrada contendo CNPJ e detalhes da negociação
 
     Returns:
-        RegistrarNegociacaoOutput: Status da operação
+        RegistrarNegociacaoOutput: Status da operação e id da negociação
     """
-    if not input.cnpj or input.cnpj.strip() == "":
-        return RegistrarNegociacaoOutput(
-            status="erro",
-            mensagem="CNPJ é obrigatório para registrar a negociação"
-        )
+    # Repetições na mesma thread devolvem o id já registrado, sem nova linha
+    return executar_idempotente(
+        config, "registrar_negociacao", input, RegistrarNegociacaoOutput, lambda: _registrar_negociacao(input)
+    )
+
 
+def _registrar_negociacao(input: RegistrarNegociacaoInput) -> RegistrarNegociacaoOutput:
+    if write_behind_habilitado():
+        return _negociacao_registrada(enfileirar_negociacao(input.cnpj, input.detalhes))
+
+    negociacao_id = str(uuid.uuid4())
     with _conn() as conn:
         with conn.cursor() as cur:
-            cur.execute(
-                "INSERT INTO negociacoes (cnpj, detalhes) VALUES (%s, %s)",
-                (input.cnpj, input.detalhes),
-            )
+            cur.execute(_INSERT_NEGOCIACAO, (negociacao_id, input.cnpj, input.detalhes))
             conn.commit()
-    return RegistrarNegociacaoOutput(
+    return _negociacao_registrada(negociacao_id)
+
+
+async def aregistrar_negociacao(input: RegistrarNegociacaoInput, config: RunnableConfig = None) -> RegistrarNegociacaoOutput:
+    """Versão assíncrona de registrar_negociacao."""
+    return await aexecutar_idempotente(
+        config, "registrar_negociacao", input, RegistrarNegociacaoOutput, lambda: _aregistrar_negociacao(input)
+    )
+
+
+async def _aregistrar_negociacao(input: RegistrarNegociacaoInput) -> RegistrarNegociacaoOutput:
+    if write_behind_habilitado():
+        # A escrita no spool faz fsync: fora do event loop, um disco lento não trava as outras conversas
+        negociacao_id = await asyncio.to_thread(enfileirar_negociacao, input.cnpj, input.detalhes)
+        return _negociacao_registrada(negociacao_id)
+
+    negociacao_id = str(uuid.uuid4())
+    async with _aconn() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(_INSERT_NEGOCIACAO, (negociacao_id, input.cnpj, input.detalhes))
+            await conn.commit()
+    return _negociacao_registrada(negociacao_id)
+
+
+# Páginas por keyset em (data_criacao, id), servidas pelo índice
+# idx_negociacoes_cnpj_data (cnpj, data_criacao DESC, id DESC) de sql/07
+_SELECT_NEGOCIACOES = (
+    "SELECT id, cnpj, detalhes, data_criacao FROM negociacoes WHERE cnpj = %s "
+    "ORDER BY data_criacao DESC, id DESC LIMIT %s"
+)
+_SELECT_NEGOCIACOES_APOS = (
+    "SELECT id, cnpj, detalhes, data_criacao FROM negociacoes WHERE cnpj = %s "
+    "AND (data_criacao, id) < (%s, %s) ORDER BY data_criacao DESC, id DESC LIMIT %s"
+)
+_EXISTE_NEGOCIACAO = "SELECT EXISTS (SELECT 1 FROM negociacoes WHERE cnpj = %s)"
+
+
+def _cursor_negociacao(negociacao) -> str:
+    """Cursor opaco para a página seguinte: data_criacao e id da última linha."""
+    return f"{negociacao[3].isoformat()}|{negociacao[0]}"
+
+
+def _ler_cursor_negociacao(cursor: str) -> tuple[datetime, int]:
+    data, _, negociacao_id = cursor.partition("|")
+    return datetime.fromisoformat(data), int(negociacao_id)
+
+
+def _consulta_negociacoes(input: VerificarNegociacaoInput) -> tuple[str, tuple]:
+    """Retorna (SQL, parâmetros) da página pedida; busca uma linha a mais para saber se há outra página."""
+    if input.apenas_primeira:
+        return _EXISTE_NEGOCIACAO, (input.cnpj,)
+    if input.cursor:
+        data_criacao, negociacao_id = _ler_cursor_negociacao(input.cursor)
+        return _SELECT_NEGOCIACOES_APOS, (input.cnpj, data_criacao, negociacao_id, input.max_itens + 1)
+    return _SELECT_NEGOCIACOES, (input.cnpj, input.max_itens + 1)
+
+
+def _verificar_negociacao_output(input: VerificarNegociacaoInput, negociacoes: list) -> VerificarNegociacaoOutput:
+    """Monta a saída de verificar_negociacao a partir das linhas da tabela negociacoes."""
+    if input.apenas_primeira:
+        primeira = not negociacoes[0][0]
+        return VerificarNegociacaoOutput(
+            status="sucesso",
+            primeira_negociacao=primeira,
+            mensagem="Primeira negociação do cliente" if primeira else "Cliente já possui negociação registrada",
+        )
+
+    if not negociacoes:
+        return VerificarNegociacaoOutput(
+            status="nao_encontrado",
+            mensagem="Nenhuma negociação encontrada para este CNPJ",
+            primeira_negociacao=not input.cursor,
+        )
+
+    truncado = len(negociacoes) > input.max_itens
+    negociacoes = negociacoes[:input.max_itens]
+
+    negociacoes_list = []
+    for neg in negociacoes:
+        negociacoes_list.append({
+            "id": neg[0],
+            "cnpj": neg[1],
+            "detalhes": neg[2],
+            "data_criacao": neg[3].isoformat() if neg[3] else None
+        })
+
+    return VerificarNegociacaoOutput(
         status="sucesso",
-        mensagem="Negociação registrada com sucesso"
+        primeira_negociacao=False,
+        negociacoes=negociacoes_list,
+        total=len(negociacoes_list),
+        truncado=truncado,
+        proximo_cursor=_cursor_negociacao(negociacoes[-1]) if truncado else None,
+    )
+
+
+def _cursor_invalido() -> VerificarNegociacaoOutput:
+    return VerificarNegociacaoOutput(
+        status="erro",
+        mensagem="Cursor inválido: use o proximo_cursor retornado pela chamada anterior"
     )
 
 
@@ -226,48 +787,59 @@ def registrar_negociacao(input: RegistrarNegociacaoInput) -> RegistrarNegociacao
 def verificar_negociacao(input: VerificarNegociacaoInput) -> VerificarNegociacaoOutput:
     """Busca as negociações registradas para um CNPJ específico no banco de dados.
 
+    Para decidir se é a primeira negociação, use apenas_primeira=true: a
+    resposta traz só primeira_negociacao, sem listar o histórico. A listagem
+    vem das mais recentes para as mais antigas, em páginas de max_itens;
+    use proximo_cursor para a página seguinte.
+
     Args:
         input: Dados de entrada contendo o CNPJ
 
     Returns:
         VerificarNegociacaoOutput: Lista de negociações encontradas
     """
-    if not input.cnpj or input.cnpj.strip() == "":
-        return VerificarNegociacaoOutput(
-            status="erro",
-            mensagem="CNPJ é obrigatório para verificar negociações"
-        )
+    try:
+        sql, params = _consulta_negociacoes(input)
+    except ValueError:
+        return _cursor_invalido()
 
     try:
+        # Negociações do cliente ainda na fila do write-behind entram na resposta
+        if negociacao_pendente(input.cnpj):
+            flush_negociacoes()
+
         with _conn() as conn:
             with conn.cursor() as cur:
-                cur.execute(
-                    "SELECT id, cnpj, detalhes, data_criacao FROM negociacoes WHERE cnpj = %s ORDER BY data_criacao DESC",
-                    (input.cnpj,)
-                )
+                cur.execute(sql, params)
                 negociacoes = cur.fetchall()
 
-        if not negociacoes:
-            return VerificarNegociacaoOutput(
-                status="nao_encontrado",
-                mensagem="Nenhuma negociação encontrada para este CNPJ"
-            )
-
-        negociacoes_list = []
-        for neg in negociacoes:
-            negociacoes_list.append({
-                "id": neg[0],
-                "cnpj": neg[1],
-                "detalhes": neg[2],
-                "data_criacao": neg[3].isoformat() if neg[3] else None
-            })
+        return _verificar_negociacao_output(input, negociacoes)
 
+    except Exception as e:
         return VerificarNegociacaoOutput(
-            status="sucesso",
-            negociacoes=negociacoes_list,
-            total=len(negociacoes_list)
+            status="erro",
+            mensagem=f"Erro ao buscar negociações: {str(e)}"
         )
 
+
+async def averificar_negociacao(input: VerificarNegociacaoInput) -> VerificarNegociacaoOutput:
+    """Versão assíncrona de verificar_negociacao."""
+    try:
+        sql, params = _consulta_negociacoes(input)
+    except ValueError:
+        return _cursor_invalido()
+
+    try:
+        if negociacao_pendente(input.cnpj):
+            await asyncio.to_thread(flush_negociacoes)
+
+        async with _aconn() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(sql, params)
+                negociacoes = await cur.fetchall()
+
+        return _verificar_negociacao_output(input, negociacoes)
+
     except Exception as e:
         return VerificarNegociacaoOutput(
             status="erro",
@@ -275,47 +847,236 @@ def verificar_negociacao(input: VerificarNegociacaoInput) -> VerificarNegociacao
         )
 
 
+def _sem_cnpj_do_cliente(input: ValidarComprovanteInput) -> ValidarComprovanteOutput | None:
+    """Erro da tool quando a conversa ainda não identificou o cliente.
+
+    O CNPJ do pagador lido no comprovante nunca escolhe o cliente: um
+    comprovante de terceiro quitaria as pendências de outra empresa.
+    """
+    if input.cnpj:
+        return None
+    return ValidarComprovanteOutput(
+        status="erro",
+        mensagem="CNPJ do cliente não informado; peça o CNPJ da empresa antes de validar o comprovante",
+    )
+
+
+def _preparar_validacao(input: ValidarComprovanteInput):
+    """Extrai os campos do OCR e monta a consulta das pendências do cliente da conversa.
+
+    Returns:
+        (campos, consulta)
+    """
+    campos = extrair_campos(input.ocr_text)
+    consulta = ConsultaFinanceiraInput(cnpj=input.cnpj, customer_id=input.customer_id, max_itens=1000)
+    return campos, consulta
+
+
+def _validar_comprovante_output(campos: dict, consulta: ConsultaFinanceiraInput, financeiro) -> ValidarComprovanteOutput:
+    """Confere os campos extraídos com as pendências em aberto retornadas pela consulta."""
+    if financeiro.status != "sucesso":
+        return ValidarComprovanteOutput(status=financeiro.status, mensagem=financeiro.mensagem or "", campos=campos)
+
+    resultado = conferir(campos, IndicePendencias(financeiro.pendencias or []), consulta.cnpj)
+    if resultado["valido"]:
+        mensagem = f"Comprovante confere com a pendência {resultado['pendencia_id']}"
+    else:
+        mensagem = "Comprovante não confere com as pendências em aberto; encaminhe para conferência manual"
+    return ValidarComprovanteOutput(status="sucesso", mensagem=mensagem, campos=campos, **resultado)
+
+
+def _validacao_registrada(saida: ValidarComprovanteOutput) -> ValidarComprovanteOutput:
+    """Registra o resultado da validação (evento amostrado) e devolve a saída."""
+    registrar(
+        "comprovante_validado",
+        status=saida.status,
+        valido=saida.valido,
+        confiabilidade=saida.confiabilidade,
+        pendencia_id=saida.pendencia_id,
+        duplicado=saida.duplicado,
+        motivos=saida.motivos,
+    )
+    return saida
+
+
 @tool
-def validar_comprovante(input: ValidarComprovanteInput) -> ValidarComprovanteOutput:
+def validar_comprovante(input: ValidarComprovanteInput, config: RunnableConfig = None) -> ValidarComprovanteOutput:
     """Valida o texto pós OCR do documento enviado.
-    Retorna se o comprovante é válido ou não e a taxa de confiabilidade.
+    Extrai valor, datas, CNPJs, banco, autenticação e linha digitável/ID do PIX
+    e confere com as pendências em aberto do cliente no Asaas. Reenvios do mesmo
+    comprovante são respondidos com o resultado anterior (duplicado=True).
+    Retorna se o comprovante é válido ou não, a taxa de confiabilidade e a pendência quitada.
 
     Args:
-        input: Dados de entrada contendo o texto do OCR
+        input: Dados de entrada contendo o texto do OCR e o CNPJ do cliente da conversa
 
     Returns:
         ValidarComprovanteOutput: Resultado da validação
     """
-    print(input.ocr_text)
+    # Reenvio do mesmo comprovante: respondido pelo índice antes de qualquer extração
+    error = _sem_cnpj_do_cliente(input)
+    if error:
+        return _validacao_registrada(error)
 
-    # TODO: Implementar lógica de validação real
-    return ValidarComprovanteOutput(
-        status="sucesso",
-        mensagem="Comprovante processado com sucesso",
-        valido=True,
-        confiabilidade=0.95
-    )
+    impressao, repetido = buscar_comprovante(input.ocr_text, input.cnpj)
+    if repetido:
+        return _validacao_registrada(ValidarComprovanteOutput(**repetido))
+
+    campos, consulta = _preparar_validacao(input)
+    transacao, repetido = buscar_transacao(campos, consulta.cnpj)
+    if repetido:
+        saida = ValidarComprovanteOutput(**{**repetido, "campos": campos})
+    else:
+        saida = _validar_comprovante_output(campos, consulta, consulta_financeira.func(consulta, config))
+    registrar_comprovante(impressao, transacao, consulta.cnpj, saida.model_dump(mode="json"))
+    return _validacao_registrada(saida)
+
+
+async def avalidar_comprovante(input: ValidarComprovanteInput, config: RunnableConfig = None) -> ValidarComprovanteOutput:
+    """Versão assíncrona de validar_comprovante."""
+    error = _sem_cnpj_do_cliente(input)
+    if error:
+        return _validacao_registrada(error)
+
+    impressao, repetido = await abuscar_comprovante(input.ocr_text, input.cnpj)
+    if repetido:
+        return _validacao_registrada(ValidarComprovanteOutput(**repetido))
+
+    campos, consulta = _preparar_validacao(input)
+    transacao, repetido = await abuscar_transacao(campos, consulta.cnpj)
+    if repetido:
+        saida = ValidarComprovanteOutput(**{**repetido, "campos": campos})
+    else:
+        saida = _validar_comprovante_output(campos, consulta, await aconsulta_financeira(consulta, config))
+    await aregistrar_comprovante(impressao, transacao, consulta.cnpj, saida.model_dump(mode="json"))
+    return _validacao_registrada(saida)
 
 
 @tool
-def transferir_humano(input: TransferirHumanoInput) -> TransferirHumanoOutput:
+def transferir_humano(input: TransferirHumanoInput, config: RunnableConfig = None) -> TransferirHumanoOutput:
     """Transfere o atendimento para um humano, preservando o contexto.
 
+    O ticket entra na fila dos atendentes (agent/tickets.py); com o CNPJ, o
+    prazo de atendimento é definido pelo valor em atraso do cliente. Uma nova
+    transferência na mesma conversa complementa o ticket ainda não resolvido.
+
     Args:
-        input: Dados de entrada contendo o contexto da conversa
+        input: Dados de entrada contendo o contexto da conversa (e, se conhecido, o CNPJ)
 
     Returns:
         TransferirHumanoOutput: Confirmação da transferência com ticket_id
     """
-    print(input.contexto)
+    if not fila_habilitada():
+        return _transferencia_registrada(input, str(uuid.uuid4())[:8])
+
+    valor_em_atraso = 0.0
+    if input.cnpj:
+        valor_em_atraso = _valor_em_atraso(consulta_financeira.func(_consulta_em_atraso(input.cnpj), config))
+    try:
+        ticket_id = abrir_ticket(input.contexto, input.cnpj, _thread_id(config), valor_em_atraso)
+    except Exception:
+        return _transferencia_sem_fila(input)
+    return _transferencia_registrada(input, ticket_id)
+
+
+def _consulta_em_atraso(cnpj: str) -> ConsultaFinanceiraInput:
+    # Só as vencidas (pelo espelho, se atualizado) e no maior lote aceito: com o
+    # padrão de 50 pendências em aberto, a soma sairia de uma lista truncada
+    return ConsultaFinanceiraInput(cnpj=cnpj, status=["OVERDUE"], max_itens=1000)
 
-    # Simulando geração de ticket
-    ticket_id = str(uuid.uuid4())[:8]
 
+def _valor_em_atraso(financeiro: ConsultaFinanceiraOutput) -> float:
+    """Soma das pendências vencidas (com multa e juros) de uma consulta_financeira; 0 se ela falhou."""
+    if financeiro.status != "sucesso":
+        return 0.0
+    return sum(p.get("valor_total") or 0 for p in financeiro.pendencias or [] if p.get("status") == "OVERDUE")
+
+
+def _transferencia_registrada(input: TransferirHumanoInput, ticket_id: str) -> TransferirHumanoOutput:
+    registrar("transferencia_humano", ticket_id=ticket_id, contexto=input.contexto)
     return TransferirHumanoOutput(
         status="sucesso",
         mensagem="Atendimento transferido para um humano com sucesso",
         ticket_id=ticket_id
     )
 
-# Provavelmente um help desk
\ No newline at end of file
+
+def _transferencia_sem_fila(input: TransferirHumanoInput) -> TransferirHumanoOutput:
+    # Sem a fila (ex.: Postgres fora do ar) a transferência não pode falhar para o
+    # cliente: segue como com TICKETS_FILA=false, com o ticket e o contexto no log
+    ticket_id = str(uuid.uuid4())[:8]
+    registrar("transferencia_humano_sem_fila", nivel=logging.ERROR, ticket_id=ticket_id, cnpj=input.cnpj)
+    return _transferencia_registrada(input, ticket_id)
+
+
+async def atransferir_humano(input: TransferirHumanoInput, config: RunnableConfig = None) -> TransferirHumanoOutput:
+    """Versão assíncrona de transferir_humano."""
+    if not fila_habilitada():
+        return _transferencia_registrada(input, str(uuid.uuid4())[:8])
+
+    valor_em_atraso = 0.0
+    if input.cnpj:
+        valor_em_atraso = _valor_em_atraso(await aconsulta_financeira(_consulta_em_atraso(input.cnpj), config))
+    try:
+        ticket_id = await aabrir_ticket(input.contexto, input.cnpj, _thread_id(config), valor_em_atraso)
+    except Exception:
+        return _transferencia_sem_fila(input)
+    return _transferencia_registrada(input, ticket_id)
+
+
+@tool
+def detalhar_registro(input: DetalharRegistroInput, config: RunnableConfig = None) -> DetalharRegistroOutput:
+    """Retorna o registro completo (links do boleto e da fatura, endereço, etc.) de um
+    cliente ou cobrança citado pelo id numa consulta_financeira.
+
+    Args:
+        input: Dados de entrada contendo o id do registro
+
+    Returns:
+        DetalharRegistroOutput: Registro completo
+    """
+    registro = ler_registro(input.registro_id, _thread_id(config))
+    if registro is None:
+        return DetalharRegistroOutput(
+            status="nao_encontrado",
+            mensagem="Registro não encontrado ou expirado; refaça a consulta_financeira",
+        )
+    return DetalharRegistroOutput(status="sucesso", registro=registro)
+
+
+async def adetalhar_registro(input: DetalharRegistroInput, config: RunnableConfig = None) -> DetalharRegistroOutput:
+    """Versão assíncrona de detalhar_registro."""
+    registro = await aler_registro(input.registro_id, _thread_id(config))
+    if registro is None:
+        return DetalharRegistroOutput(
+            status="nao_encontrado",
+            mensagem="Registro não encontrado ou expirado; refaça a consulta_financeira",
+        )
+    return DetalharRegistroOutput(status="sucesso", registro=registro)
+
+
+# ===== VERSÕES ASSÍNCRONAS =====
+# Registradas como `coroutine` das tools para que ainvoke/astream do agente usem
+# as implementações nativas em vez de rodar as síncronas em um executor.
+
+consulta_financeira.coroutine = aconsulta_financeira
+atualizar_boleto.coroutine = aatualizar_boleto
+registrar_negociacao.coroutine = aregistrar_negociacao
+verificar_negociacao.coroutine = averificar_negociacao
+validar_comprovante.coroutine = avalidar_comprovante
+transferir_humano.coroutine = atransferir_humano
+detalhar_registro.coroutine = adetalhar_registro
+
+# ===== TELEMETRIA =====
+# Cada chamada (sync ou async) vira um span "tool" com o status da saída como resultado
+
+for _ferramenta in (
+    consulta_financeira,
+    atualizar_boleto,
+    registrar_negociacao,
+    verificar_negociacao,
+    validar_comprovante,
+    transferir_humano,
+    detalhar_registro,
+):
+    instrumentar_tool(_ferramenta)
@@ -1,5 +1,20 @@
+import asyncio
 import os
+import threading
+import time
+import weakref
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+import httpx
+import psycopg
 import requests
+from requests.adapters import HTTPAdapter
+
+from agent.cassette import CasseteAdapter, CasseteTransport, obter_cassete
+from agent.resilience import CircuitBreaker, TokenBucket, atraso_retry, parse_retry_after
+from agent.telemetry import contar, rotulo_endpoint, rotulo_sql, span
 
 
 def _db_url() -> str:
@@ -14,9 +29,209 @@ def _db_url() -> str:
     return base
 
 
+# ===== POOL DE CONEXÕES DO POSTGRES =====
+
+_db_pool = None
+_db_pool_lock = threading.Lock()
+
+# Assim como o AsyncClient, o AsyncConnectionPool fica preso ao event loop que o abriu.
+_async_db_pools = weakref.WeakKeyDictionary()
+
+
+def _rotulo_query(query) -> str:
+    if isinstance(query, bytes):
+        query = query.decode("utf-8", "replace")
+    return rotulo_sql(query) if isinstance(query, str) else "SQL composto"
+
+
+class _CursorInstrumentado(psycopg.Cursor):
+    """Cursor das conexões do pool: cada execute/executemany vira um span "db"."""
+
+    def execute(self, query, params=None, **kwargs):
+        with span("db", query=_rotulo_query(query)):
+            return super().execute(query, params, **kwargs)
+
+    def executemany(self, query, params_seq, **kwargs):
+        with span("db", query=_rotulo_query(query)):
+            return super().executemany(query, params_seq, **kwargs)
+
+
+class _AsyncCursorInstrumentado(psycopg.AsyncCursor):
+    """Versão assíncrona de _CursorInstrumentado."""
+
+    async def execute(self, query, params=None, **kwargs):
+        with span("db", query=_rotulo_query(query)):
+            return await super().execute(query, params, **kwargs)
+
+    async def executemany(self, query, params_seq, **kwargs):
+        with span("db", query=_rotulo_query(query)):
+            return await super().executemany(query, params_seq, **kwargs)
+
+
+def _db_pool_kwargs() -> dict:
+    """Parâmetros comuns dos pools síncrono e assíncrono, lidos de DB_POOL_*."""
+    return {
+        "min_size": int(os.getenv("DB_POOL_MIN_SIZE", "1")),
+        "max_size": int(os.getenv("DB_POOL_MAX_SIZE", "10")),
+        "max_idle": float(os.getenv("DB_POOL_MAX_IDLE", "300")),
+        "max_lifetime": float(os.getenv("DB_POOL_MAX_LIFETIME", "3600")),
+        "timeout": float(os.getenv("DB_POOL_TIMEOUT", "10")),
+    }
+
+
+def _get_db_pool():
+    """Retorna o ConnectionPool do processo, criado na primeira utilização.
+
+    O DSN é montado uma única vez e cada conexão é verificada (check_connection)
+    antes de ser entregue, descartando conexões derrubadas pelo servidor.
+    """
+    global _db_pool
+    if _db_pool is None:
+        with _db_pool_lock:
+            if _db_pool is None:
+                from psycopg_pool import ConnectionPool
+
+                _db_pool = ConnectionPool(
+                    _db_url(),
+                    name="nxz-fin-agent",
+                    check=ConnectionPool.check_connection,
+                    kwargs={"cursor_factory": _CursorInstrumentado},
+                    open=True,
+                    **_db_pool_kwargs(),
+                )
+    return _db_pool
+
+
+async def _get_async_db_pool():
+    """Retorna o AsyncConnectionPool do event loop atual, aberto na primeira utilização."""
+    from psycopg_pool import AsyncConnectionPool
+
+    loop = asyncio.get_running_loop()
+    pool = _async_db_pools.get(loop)
+    if pool is None:
+        pool = AsyncConnectionPool(
+            _db_url(),
+            name="nxz-fin-agent-async",
+            check=AsyncConnectionPool.check_connection,
+            kwargs={"cursor_factory": _AsyncCursorInstrumentado},
+            open=False,
+            **_db_pool_kwargs(),
+        )
+        _async_db_pools[loop] = pool
+        await pool.open()
+    return pool
+
+
+_checkpoint_pool = None
+
+# Pools dos checkpointers por event loop, como em _async_db_pools
+_async_checkpoint_pools = weakref.WeakKeyDictionary()
+
+
+def _checkpoint_conn_kwargs() -> dict:
+    """Conexões exigidas pelo PostgresSaver: autocommit, sem prepared statements e linhas como dict."""
+    from psycopg.rows import dict_row
+
+    return {"autocommit": True, "prepare_threshold": 0, "row_factory": dict_row}
+
+
+def _get_checkpoint_pool():
+    """Retorna o ConnectionPool dos checkpoints do grafo, criado na primeira utilização.
+
+    Usa o mesmo banco e os mesmos limites DB_POOL_* de _get_db_pool(), mas em um
+    pool separado, porque o checkpointer exige conexões em autocommit e com dict_row.
+    """
+    global _checkpoint_pool
+    if _checkpoint_pool is None:
+        with _db_pool_lock:
+            if _checkpoint_pool is None:
+                from psycopg_pool import ConnectionPool
+
+                _checkpoint_pool = ConnectionPool(
+                    _db_url(),
+                    name="nxz-fin-agent-checkpoints",
+                    check=ConnectionPool.check_connection,
+                    kwargs=_checkpoint_conn_kwargs(),
+                    open=True,
+                    **_db_pool_kwargs(),
+                )
+    return _checkpoint_pool
+
+
+async def _get_async_checkpoint_pool():
+    """Versão assíncrona de _get_checkpoint_pool(), um pool por event loop."""
+    from psycopg_pool import AsyncConnectionPool
+
+    loop = asyncio.get_running_loop()
+    pool = _async_checkpoint_pools.get(loop)
+    if pool is None:
+        pool = AsyncConnectionPool(
+            _db_url(),
+            name="nxz-fin-agent-checkpoints-async",
+            check=AsyncConnectionPool.check_connection,
+            kwargs=_checkpoint_conn_kwargs(),
+            open=False,
+            **_db_pool_kwargs(),
+        )
+        _async_checkpoint_pools[loop] = pool
+        await pool.open()
+    return pool
+
+
 def _conn():
-    import psycopg
-    return psycopg.connect(_db_url())
+    """Empresta uma conexão do pool, para uso com `with _conn() as conn`.
+
+    Ao sair do bloco a conexão volta ao pool (com commit se não houve erro).
+    """
+    return _get_db_pool().connection()
+
+
+@asynccontextmanager
+async def _aconn():
+    """Versão assíncrona de _conn(), para uso com `async with _aconn() as conn`."""
+    pool = await _get_async_db_pool()
+    async with pool.connection() as conn:
+        yield conn
+
+
+def _close_db_pools():
+    """Fecha os pools síncronos (útil em testes, no shutdown e após fork de processos)."""
+    global _db_pool, _checkpoint_pool
+    with _db_pool_lock:
+        if _db_pool is not None:
+            _db_pool.close()
+            _db_pool = None
+        if _checkpoint_pool is not None:
+            _checkpoint_pool.close()
+            _checkpoint_pool = None
+
+
+def _db_pool_stats() -> dict:
+    """Estatísticas dos pools no formato {métrica: valor}, prontas para exportação.
+
+    Inclui clientes aguardando conexão, tamanho/disponibilidade do pool e o
+    tempo médio de espera por checkout (requests_wait_ms / requests_num).
+    """
+    pools = []
+    if _db_pool is not None:
+        pools.append(("sync", _db_pool))
+    pools.extend(("async", pool) for pool in list(_async_db_pools.values()))
+    if _checkpoint_pool is not None:
+        pools.append(("checkpoint_sync", _checkpoint_pool))
+    pools.extend(("checkpoint_async", pool) for pool in list(_async_checkpoint_pools.values()))
+
+    stats = {}
+    for tipo, pool in pools:
+        for chave, valor in pool.get_stats().items():
+            stats[f"db_pool_{tipo}_{chave}"] = stats.get(f"db_pool_{tipo}_{chave}", 0) + valor
+
+    for tipo in {tipo for tipo, _ in pools}:
+        requests_num = stats.get(f"db_pool_{tipo}_requests_num", 0)
+        requests_wait_ms = stats.get(f"db_pool_{tipo}_requests_wait_ms", 0)
+        stats[f"db_pool_{tipo}_checkout_wait_avg_ms"] = (
+            requests_wait_ms / requests_num if requests_num else 0.0
+        )
+    return stats
 
 
 def _get_asaas_config():
@@ -29,7 +244,7 @@ def _get_asaas_config():
         }
 
     is_sandbox = os.getenv("ASAAS_SANDBOX", "false").lower() == "true"
-    base_url = (
+    base_url = os.getenv("ASAAS_BASE_URL") or (
         "https://sandbox.asaas.com/api/v3" if is_sandbox else "https://api.asaas.com/v3"
     )
     headers = {"access_token": api_key, "Content-Type": "application/json"}
@@ -37,26 +252,497 @@ def _get_asaas_config():
     return {"base_url": base_url, "headers": headers}, None
 
 
-def _handle_asaas_request(method, url, headers, **kwargs):
-    """Faz requisição para API do Asaas com tratamento de erros padronizado."""
-    try:
-        response = requests.request(method, url, headers=headers, **kwargs)
+# ===== CLIENTE HTTP DO ASAAS =====
+
+_asaas_session = None
+_asaas_session_lock = threading.Lock()
+
+# Total de requisições feitas ao Asaas pelo processo (sync + async)
+_asaas_requests = 0
+_asaas_requests_lock = threading.Lock()
+
+
+def _count_asaas_request():
+    global _asaas_requests
+    with _asaas_requests_lock:
+        _asaas_requests += 1
+
+
+def _asaas_request_count() -> int:
+    """Total de requisições feitas ao Asaas desde o início do processo."""
+    return _asaas_requests
+
+
+def _get_asaas_timeout():
+    """Retorna a tupla (connect, read) de timeouts das chamadas ao Asaas, em segundos."""
+    connect = float(os.getenv("ASAAS_CONNECT_TIMEOUT", "3.05"))
+    read = float(os.getenv("ASAAS_READ_TIMEOUT", "15"))
+    return connect, read
+
+
+def _get_asaas_session() -> requests.Session:
+    """Retorna a sessão HTTP compartilhada pelo processo para chamadas ao Asaas.
+
+    A sessão mantém um pool de conexões keep-alive por host, evitando um novo
+    handshake TCP+TLS a cada chamada de ferramenta. O tamanho do pool é
+    configurável por ASAAS_POOL_CONNECTIONS (hosts distintos) e
+    ASAAS_POOL_MAXSIZE (conexões simultâneas por host). Com ASAAS_CASSETE, as
+    trocas são gravadas ou reproduzidas do cassete (agent/cassette.py).
+    """
+    global _asaas_session
+    if _asaas_session is None:
+        with _asaas_session_lock:
+            if _asaas_session is None:
+                pool = {
+                    "pool_connections": int(os.getenv("ASAAS_POOL_CONNECTIONS", "2")),
+                    "pool_maxsize": int(os.getenv("ASAAS_POOL_MAXSIZE", "20")),
+                    "pool_block": False,
+                }
+                cassete = obter_cassete()
+                adapter = CasseteAdapter(cassete, **pool) if cassete else HTTPAdapter(**pool)
+                session = requests.Session()
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers.update({"Connection": "keep-alive"})
+                _asaas_session = session
+    return _asaas_session
+
+
+def _reset_asaas_session():
+    """Fecha a sessão compartilhada (útil em testes e após fork de processos)."""
+    global _asaas_session
+    with _asaas_session_lock:
+        if _asaas_session is not None:
+            _asaas_session.close()
+            _asaas_session = None
+
+
+# ===== LIMITE DE TAXA, RETRIES E CIRCUIT BREAKER DO ASAAS =====
+
+# Status tratados como falha transitória: retry em GETs e contagem no circuit breaker
+_ASAAS_STATUS_TRANSITORIOS = {500, 502, 503, 504}
+
+_asaas_limiter = None
+_asaas_breaker = None
+_asaas_resiliencia_lock = threading.Lock()
+_asaas_retries = 0
+
+
+def _get_asaas_limiter() -> TokenBucket:
+    """Token bucket do processo, dimensionado pela cota do Asaas.
+
+    ASAAS_RATE_LIMIT: requisições por segundo; ASAAS_RATE_BURST: rajada máxima.
+    """
+    global _asaas_limiter
+    if _asaas_limiter is None:
+        with _asaas_resiliencia_lock:
+            if _asaas_limiter is None:
+                _asaas_limiter = TokenBucket(
+                    taxa=float(os.getenv("ASAAS_RATE_LIMIT", "20")),
+                    capacidade=float(os.getenv("ASAAS_RATE_BURST", "40")),
+                )
+    return _asaas_limiter
+
+
+def _get_asaas_breaker() -> CircuitBreaker:
+    """Circuit breaker do processo para a API do Asaas.
+
+    Abre após ASAAS_BREAKER_FAILURES falhas transitórias consecutivas e
+    aceita uma chamada de teste após ASAAS_BREAKER_RESET segundos.
+    """
+    global _asaas_breaker
+    if _asaas_breaker is None:
+        with _asaas_resiliencia_lock:
+            if _asaas_breaker is None:
+                _asaas_breaker = CircuitBreaker(
+                    limite_falhas=int(os.getenv("ASAAS_BREAKER_FAILURES", "5")),
+                    tempo_recuperacao=float(os.getenv("ASAAS_BREAKER_RESET", "30")),
+                )
+    return _asaas_breaker
+
+
+def _reset_asaas_resiliencia():
+    """Recria limiter e breaker na próxima chamada (útil em testes)."""
+    global _asaas_limiter, _asaas_breaker, _asaas_retries
+    with _asaas_resiliencia_lock:
+        _asaas_limiter = None
+        _asaas_breaker = None
+        _asaas_retries = 0
+
+
+def _get_asaas_retry_config():
+    """Retorna (tentativas extras, base, teto) do backoff dos GETs, em segundos."""
+    return (
+        int(os.getenv("ASAAS_MAX_RETRIES", "3")),
+        float(os.getenv("ASAAS_RETRY_BASE", "0.5")),
+        float(os.getenv("ASAAS_RETRY_MAX", "8")),
+    )
 
-        if response.status_code != 200:
-            return None, {
-                "status": "erro",
-                "mensagem": f"Erro na requisição: {response.status_code} - {response.text}",
-            }
 
-        return response.json(), None
+def _count_asaas_retry():
+    global _asaas_retries
+    with _asaas_requests_lock:
+        _asaas_retries += 1
 
-    except requests.exceptions.RequestException as e:
+
+def _asaas_resiliencia_stats() -> dict:
+    """Estado do limiter e do circuit breaker do Asaas, no formato {métrica: valor}."""
+    return {
+        "asaas_requisicoes": _asaas_requests,
+        "asaas_retries": _asaas_retries,
+        **_get_asaas_limiter().stats("asaas_limiter"),
+        **_get_asaas_breaker().stats("asaas_breaker"),
+    }
+
+
+def _tentativas_asaas(method) -> int:
+    """Somente GETs (idempotentes) são repetidos automaticamente."""
+    return _get_asaas_retry_config()[0] + 1 if method.upper() == "GET" else 1
+
+
+def _erro_breaker_aberto(breaker):
+    return {
+        "status": "erro",
+        "mensagem": (
+            "API do Asaas temporariamente indisponível (muitas falhas seguidas). "
+            f"Tente novamente em {int(breaker.segundos_para_tentar()) + 1}s."
+        ),
+    }
+
+
+def _reservar_asaas(limiter):
+    """Reserva um token do limiter; retorna (espera, erro) respeitando ASAAS_RATE_MAX_WAIT."""
+    espera = limiter.reservar()
+    if espera > float(os.getenv("ASAAS_RATE_MAX_WAIT", "10")):
+        limiter.devolver()
         return None, {
             "status": "erro",
-            "mensagem": f"Erro de conexão com a API do Asaas: {str(e)}",
+            "mensagem": "Limite de requisições da API do Asaas atingido. Tente novamente em instantes.",
         }
-    except Exception as e:
-        return None, {
+    return espera, None
+
+
+def _avaliar_resposta_asaas(status_code, retry_after_header, body, breaker, limiter):
+    """Classifica uma resposta não-200 do Asaas.
+
+    Retorna (erro, retry_after, transitorio): 429 penaliza o limiter de todo o
+    processo (o Asaas está respondendo, então não conta no breaker); 5xx
+    contam como falha no breaker; os demais 4xx são definitivos.
+    """
+    retry_after = parse_retry_after(retry_after_header)
+    if status_code == 429:
+        breaker.registrar_sucesso()
+        limiter.penalizar(retry_after if retry_after is not None else 1.0)
+        return {
             "status": "erro",
-            "mensagem": f"Erro inesperado: {str(e)}",
-        }
+            "mensagem": "Limite de requisições da API do Asaas atingido (429). Tente novamente em instantes.",
+        }, retry_after, True
+    erro = {
+        "status": "erro",
+        "mensagem": f"Erro na requisição: {status_code} - {body}",
+    }
+    if status_code in _ASAAS_STATUS_TRANSITORIOS:
+        breaker.registrar_falha()
+        return erro, retry_after, True
+    breaker.registrar_sucesso()
+    return erro, None, False
+
+
+def _handle_asaas_request(method, url, headers, **kwargs):
+    """Faz requisição para API do Asaas com tratamento de erros padronizado.
+
+    Passa pelo token bucket e pelo circuit breaker do processo. GETs com
+    falha transitória (429, 5xx, timeout ou erro de conexão) são repetidos
+    com backoff exponencial e jitter, respeitando o Retry-After; um
+    Retry-After maior que ASAAS_RETRY_MAX devolve o erro na hora.
+    """
+    kwargs.setdefault("timeout", _get_asaas_timeout())
+    limiter, breaker = _get_asaas_limiter(), _get_asaas_breaker()
+    _, base, maximo = _get_asaas_retry_config()
+    tentativas = _tentativas_asaas(method)
+    endpoint = rotulo_endpoint(url)
+
+    for tentativa in range(tentativas):
+        espera, error = _reservar_asaas(limiter)
+        if error:
+            return None, error
+        if not breaker.permitir():
+            limiter.devolver()
+            return None, _erro_breaker_aberto(breaker)
+        if espera:
+            time.sleep(espera)
+
+        _count_asaas_request()
+        retry_after = None
+        try:
+            with span("asaas", method=method, endpoint=endpoint) as s:
+                response = _get_asaas_session().request(method, url, headers=headers, **kwargs)
+                s.resultado = response.status_code
+            contar("asaas_bytes", len(response.content), method=method, endpoint=endpoint)
+
+            if response.status_code == 200:
+                data = response.json()
+                breaker.registrar_sucesso()
+                return data, None
+
+            error, retry_after, transitorio = _avaliar_resposta_asaas(
+                response.status_code, response.headers.get("Retry-After"), response.text, breaker, limiter,
+            )
+            if not transitorio:
+                return None, error
+
+        except requests.exceptions.Timeout as e:
+            breaker.registrar_falha()
+            error = {
+                "status": "erro",
+                "mensagem": f"Tempo limite excedido na API do Asaas: {str(e)}",
+            }
+        except requests.exceptions.RequestException as e:
+            breaker.registrar_falha()
+            error = {
+                "status": "erro",
+                "mensagem": f"Erro de conexão com a API do Asaas: {str(e)}",
+            }
+        except Exception as e:
+            breaker.registrar_falha()
+            return None, {
+                "status": "erro",
+                "mensagem": f"Erro inesperado: {str(e)}",
+            }
+
+        if tentativa + 1 < tentativas:
+            atraso = atraso_retry(tentativa, base, maximo, retry_after)
+            if atraso is None:
+                break
+            _count_asaas_retry()
+            time.sleep(atraso)
+
+    return None, error
+
+
+# ===== CLIENTE HTTP ASSÍNCRONO DO ASAAS =====
+
+# Um AsyncClient fica preso ao event loop em que foi criado, então mantemos um por loop.
+_asaas_async_clients = weakref.WeakKeyDictionary()
+
+
+def _get_asaas_async_client() -> httpx.AsyncClient:
+    """Retorna o httpx.AsyncClient compartilhado do event loop atual.
+
+    Usa os mesmos limites de pool e timeouts (e o mesmo cassete) do cliente síncrono.
+    """
+    loop = asyncio.get_running_loop()
+    client = _asaas_async_clients.get(loop)
+    if client is None or client.is_closed:
+        connect, read = _get_asaas_timeout()
+        limits = httpx.Limits(
+            max_connections=int(os.getenv("ASAAS_POOL_MAXSIZE", "20")),
+            max_keepalive_connections=int(os.getenv("ASAAS_POOL_MAXSIZE", "20")),
+        )
+        cassete = obter_cassete()
+        client = httpx.AsyncClient(
+            timeout=httpx.Timeout(read, connect=connect),
+            limits=limits,
+            transport=CasseteTransport(cassete, httpx.AsyncHTTPTransport(limits=limits)) if cassete else None,
+        )
+        _asaas_async_clients[loop] = client
+    return client
+
+
+async def _ahandle_asaas_request(method, url, headers, **kwargs):
+    """Versão assíncrona de _handle_asaas_request, com o mesmo contrato (data, error).
+
+    Compartilha o limiter e o circuit breaker com o cliente síncrono.
+    """
+    limiter, breaker = _get_asaas_limiter(), _get_asaas_breaker()
+    _, base, maximo = _get_asaas_retry_config()
+    tentativas = _tentativas_asaas(method)
+    endpoint = rotulo_endpoint(url)
+
+    for tentativa in range(tentativas):
+        espera, error = _reservar_asaas(limiter)
+        if error:
+            return None, error
+        if not breaker.permitir():
+            limiter.devolver()
+            return None, _erro_breaker_aberto(breaker)
+        if espera:
+            await asyncio.sleep(espera)
+
+        _count_asaas_request()
+        retry_after = None
+        try:
+            with span("asaas", method=method, endpoint=endpoint) as s:
+                response = await _get_asaas_async_client().request(method, url, headers=headers, **kwargs)
+                s.resultado = response.status_code
+            contar("asaas_bytes", len(response.content), method=method, endpoint=endpoint)
+
+            if response.status_code == 200:
+                data = response.json()
+                breaker.registrar_sucesso()
+                return data, None
+
+            error, retry_after, transitorio = _avaliar_resposta_asaas(
+                response.status_code, response.headers.get("Retry-After"), response.text, breaker, limiter,
+            )
+            if not transitorio:
+                return None, error
+
+        except httpx.TimeoutException as e:
+            breaker.registrar_falha()
+            error = {
+                "status": "erro",
+                "mensagem": f"Tempo limite excedido na API do Asaas: {str(e)}",
+            }
+        except httpx.HTTPError as e:
+            breaker.registrar_falha()
+            error = {
+                "status": "erro",
+                "mensagem": f"Erro de conexão com a API do Asaas: {str(e)}",
+            }
+        except Exception as e:
+            breaker.registrar_falha()
+            return None, {
+                "status": "erro",
+                "mensagem": f"Erro inesperado: {str(e)}",
+            }
+
+        if tentativa + 1 < tentativas:
+            atraso = atraso_retry(tentativa, base, maximo, retry_after)
+            if atraso is None:
+                break
+            _count_asaas_retry()
+            await asyncio.sleep(atraso)
+
+    return None, error
+
+
+# ===== PAGINAÇÃO DO ASAAS =====
+
+# Maior página aceita pelas listagens do Asaas (/payments, /customers, ...)
+ASAAS_MAX_PAGE_SIZE = 100
+
+
+class AsaasError(Exception):
+    """Falha em uma chamada ao Asaas durante uma iteração paginada.
+
+    Carrega em `error` o mesmo dicionário {"status", "mensagem"} retornado por
+    _handle_asaas_request, para que as tools o repassem ao modelo de saída.
+    """
+
+    def __init__(self, error: dict):
+        super().__init__(error.get("mensagem"))
+        self.error = error
+
+
+def _get_asaas_page_concurrency() -> int:
+    """Número de páginas buscadas em paralelo quando o totalCount é conhecido."""
+    return max(1, int(os.getenv("ASAAS_PAGE_CONCURRENCY", "1")))
+
+
+def _offsets_restantes(primeira_pagina: dict, limit: int) -> range:
+    """Offsets das páginas seguintes à primeira, a partir do totalCount."""
+    total_count = primeira_pagina.get("totalCount") or 0
+    return range(limit, total_count, limit)
+
+
+def _iter_asaas_list(url, headers, params=None, concurrency=None, page_size=None):
+    """Itera sobre todos os itens de uma listagem paginada do Asaas.
+
+    Segue offset/limit/hasMore usando a página máxima (ou `page_size`, quando o
+    chamador sabe que precisa de menos itens). Com concurrency > 1, as
+    páginas restantes são buscadas em paralelo assim que o totalCount é
+    conhecido, mantendo no máximo `concurrency` páginas em memória e
+    entregando os itens na ordem original.
+
+    Raises:
+        AsaasError: se qualquer página falhar
+    """
+    params = dict(params or {})
+    concurrency = concurrency or _get_asaas_page_concurrency()
+    page_size = min(page_size or ASAAS_MAX_PAGE_SIZE, ASAAS_MAX_PAGE_SIZE)
+
+    def buscar_pagina(offset):
+        data, error = _handle_asaas_request(
+            "GET", url, headers,
+            params={**params, "offset": offset, "limit": page_size},
+        )
+        if error:
+            raise AsaasError(error)
+        return data
+
+    pagina = buscar_pagina(0)
+    yield from pagina.get("data") or []
+    if not pagina.get("hasMore"):
+        return
+
+    limit = pagina.get("limit") or page_size
+    offset = limit
+
+    if concurrency > 1:
+        offsets = iter(_offsets_restantes(pagina, limit))
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            pendentes = [executor.submit(buscar_pagina, o) for o in islice(offsets, concurrency)]
+            while pendentes:
+                pagina = pendentes.pop(0).result()
+                proximo = next(offsets, None)
+                if proximo is not None:
+                    pendentes.append(executor.submit(buscar_pagina, proximo))
+                yield from pagina.get("data") or []
+        if not pagina.get("hasMore"):
+            return
+        # Itens criados durante a iteração: continua sequencialmente
+        offset = pagina.get("offset", 0) + limit
+
+    while True:
+        pagina = buscar_pagina(offset)
+        yield from pagina.get("data") or []
+        if not pagina.get("hasMore"):
+            return
+        offset += limit
+
+
+async def _aiter_asaas_list(url, headers, params=None, concurrency=None, page_size=None):
+    """Versão assíncrona de _iter_asaas_list (async generator)."""
+    params = dict(params or {})
+    concurrency = concurrency or _get_asaas_page_concurrency()
+    page_size = min(page_size or ASAAS_MAX_PAGE_SIZE, ASAAS_MAX_PAGE_SIZE)
+
+    async def buscar_pagina(offset):
+        data, error = await _ahandle_asaas_request(
+            "GET", url, headers,
+            params={**params, "offset": offset, "limit": page_size},
+        )
+        if error:
+            raise AsaasError(error)
+        return data
+
+    pagina = await buscar_pagina(0)
+    for item in pagina.get("data") or []:
+        yield item
+    if not pagina.get("hasMore"):
+        return
+
+    limit = pagina.get("limit") or page_size
+    offset = limit
+
+    if concurrency > 1:
+        offsets = list(_offsets_restantes(pagina, limit))
+        for inicio in range(0, len(offsets), concurrency):
+            paginas = await asyncio.gather(
+                *(buscar_pagina(o) for o in offsets[inicio:inicio + concurrency])
+            )
+            for pagina in paginas:
+                for item in pagina.get("data") or []:
+                    yield item
+        if not pagina.get("hasMore"):
+            return
+        offset = pagina.get("offset", 0) + limit
+
+    while True:
+        pagina = await buscar_pagina(offset)
+        for item in pagina.get("data") or []:
+            yield item
+        if not pagina.get("hasMore"):
+            return
+        offset += limit
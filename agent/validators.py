@@ -0,0 +1,137 @@
+import re
+from typing import Annotated
+
+from pydantic import BeforeValidator
+
+# Pesos dos dígitos verificadores (módulo 11)
+_PESOS_CNPJ_1 = (5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2)
+_PESOS_CNPJ_2 = (6, *_PESOS_CNPJ_1)
+_PESOS_CPF_1 = tuple(range(10, 1, -1))
+_PESOS_CPF_2 = tuple(range(11, 1, -1))
+
+# Caracteres aceitos num CNPJ/CPF digitado: dígitos e a pontuação usual
+_CARACTERES_DOCUMENTO = frozenset("0123456789 .-/")
+
+
+def somente_digitos(valor: str) -> str:
+    """Remove pontuação, espaços e demais caracteres que não são dígitos (0-9)."""
+    return re.sub(r"[^0-9]", "", valor)
+
+
+def _digito(digitos: str, pesos) -> int:
+    resto = sum(int(d) * p for d, p in zip(digitos, pesos)) % 11
+    return 0 if resto < 2 else 11 - resto
+
+
+def cnpj_valido(valor: str) -> bool:
+    """Indica se o CNPJ (com ou sem formatação) tem 14 dígitos e dígitos verificadores corretos."""
+    digitos = somente_digitos(valor)
+    if len(digitos) != 14 or len(set(digitos)) == 1:
+        return False
+    return _digito(digitos[:12], _PESOS_CNPJ_1) == int(digitos[12]) and _digito(digitos[:13], _PESOS_CNPJ_2) == int(digitos[13])
+
+
+def cpf_valido(valor: str) -> bool:
+    """Indica se o CPF (com ou sem formatação) tem 11 dígitos e dígitos verificadores corretos."""
+    digitos = somente_digitos(valor)
+    if len(digitos) != 11 or len(set(digitos)) == 1:
+        return False
+    return _digito(digitos[:9], _PESOS_CPF_1) == int(digitos[9]) and _digito(digitos[:10], _PESOS_CPF_2) == int(digitos[10])
+
+
+def formatar_documento(digitos: str) -> str:
+    """Formata um CNPJ (00.000.000/0000-00) ou CPF (000.000.000-00) dado só com dígitos."""
+    if len(digitos) == 14:
+        return f"{digitos[:2]}.{digitos[2:5]}.{digitos[5:8]}/{digitos[8:12]}-{digitos[12:]}"
+    if len(digitos) == 11:
+        return f"{digitos[:3]}.{digitos[3:6]}.{digitos[6:9]}-{digitos[9:]}"
+    return digitos
+
+
+def normalizar_documento(valor) -> str:
+    """Normaliza um CNPJ/CPF para só dígitos, validando os dígitos verificadores.
+
+    Raises:
+        ValueError: com a mensagem exata do problema (vazio, caracteres
+            inválidos, quantidade de dígitos ou dígitos verificadores)
+    """
+    if valor is None or not str(valor).strip():
+        raise ValueError("CNPJ é obrigatório")
+    valor = str(valor).strip()
+    invalidos = sorted(set(valor) - _CARACTERES_DOCUMENTO)
+    if invalidos:
+        raise ValueError(f"CNPJ/CPF '{valor}' contém caracteres inválidos: {''.join(invalidos)}")
+
+    digitos = somente_digitos(valor)
+    if len(digitos) == 14:
+        if not cnpj_valido(digitos):
+            raise ValueError(f"CNPJ {formatar_documento(digitos)} inválido: dígitos verificadores não conferem")
+        return digitos
+    if len(digitos) == 11:
+        if not cpf_valido(digitos):
+            raise ValueError(f"CPF {formatar_documento(digitos)} inválido: dígitos verificadores não conferem")
+        return digitos
+    raise ValueError(f"CNPJ/CPF '{valor}' inválido: são esperados 14 dígitos (CNPJ) ou 11 (CPF), recebidos {len(digitos)}")
+
+
+# Tipo dos campos de CNPJ/CPF dos modelos de entrada: chega formatado ou não e
+# segue para o Asaas e para o banco só com dígitos
+Documento = Annotated[str, BeforeValidator(normalizar_documento)]
+
+
+def _documento_ou_none(valor) -> str | None:
+    try:
+        return normalizar_documento(valor)
+    except ValueError:
+        return None
+
+
+# Para entradas em que o documento é só um complemento (ex.: transferência para
+# um humano): um CNPJ/CPF inválido vira None em vez de recusar a chamada
+DocumentoOpcional = Annotated[str | None, BeforeValidator(_documento_ou_none)]
+
+
+def _digitos_verificadores(matriz, pesos_1, pesos_2):
+    """Dígitos verificadores esperados de cada linha de uma matriz de dígitos (numpy)."""
+    import numpy as np
+
+    def digito(parte, pesos):
+        resto = (parte * np.asarray(pesos)).sum(axis=1) % 11
+        return np.where(resto < 2, 0, 11 - resto)
+
+    n = len(pesos_1)
+    return digito(matriz[:, :n], pesos_1), digito(matriz[:, : n + 1], pesos_2)
+
+
+def validar_documentos_em_lote(valores) -> list[str | None]:
+    """Valida e normaliza muitos CNPJs/CPFs de uma vez, para jobs em lote.
+
+    Aceita os mesmos valores que normalizar_documento: só dígitos e pontuação
+    usual. Os dígitos verificadores são calculados com numpy sobre a matriz de
+    dígitos de todos os valores do mesmo tamanho, em vez de um por um.
+
+    Returns:
+        lista alinhada com `valores`: o documento só com dígitos, ou None se inválido
+    """
+    import numpy as np
+
+    digitos = [
+        somente_digitos(v) if isinstance(v, str) and _CARACTERES_DOCUMENTO.issuperset(v.strip()) else ""
+        for v in valores
+    ]
+    resultado: list[str | None] = [None] * len(digitos)
+
+    for tamanho, pesos in ((14, (_PESOS_CNPJ_1, _PESOS_CNPJ_2)), (11, (_PESOS_CPF_1, _PESOS_CPF_2))):
+        indices = [i for i, d in enumerate(digitos) if len(d) == tamanho]
+        if not indices:
+            continue
+        # Matriz (n, tamanho) com os dígitos: bytes ASCII menos '0'
+        texto = "".join(digitos[i] for i in indices).encode("ascii")
+        matriz = (np.frombuffer(texto, dtype=np.uint8) - ord("0")).astype(np.int64).reshape(-1, tamanho)
+
+        dv1, dv2 = _digitos_verificadores(matriz, *pesos)
+        validos = (matriz[:, -2] == dv1) & (matriz[:, -1] == dv2)
+        validos &= (matriz != matriz[:, :1]).any(axis=1)  # todos os dígitos iguais
+        for i in np.asarray(indices)[validos]:
+            resultado[i] = digitos[i]
+    return resultado
@@ -0,0 +1,115 @@
+import hmac
+import os
+import uuid
+
+from fastapi import FastAPI, Header, HTTPException
+from fastapi.responses import PlainTextResponse, Response
+from pydantic import BaseModel, Field
+
+from agent.cache import cache_stats, cache_stats_conversa
+from agent.idempotency import idempotencia_stats
+from agent.logs import logs_stats
+from agent.mirror import aprocessar_evento
+from agent.receipt_index import comprovantes_stats
+from agent.router import roteador_stats
+from agent.telemetry import exportar_prometheus, telemetria_stats
+from agent.tickets import aassumir_ticket, aresolver_ticket, tickets_stats
+from agent.utils import _aconn, _asaas_resiliencia_stats, _db_pool_stats
+from agent.write_behind import write_behind_stats
+
+app = FastAPI(title="NXZ Fin Agent - Webhooks do Asaas")
+
+
+@app.post("/webhooks/asaas")
+async def receber_webhook_asaas(
+    evento: dict,
+    asaas_access_token: str | None = Header(default=None),
+):
+    """Recebe eventos de pagamento do Asaas (PAYMENT_CREATED, PAYMENT_UPDATED,
+    PAYMENT_RECEIVED, ...) e os aplica ao espelho local no Postgres.
+
+    O token configurado no painel do Asaas chega no header asaas-access-token
+    e é comparado com ASAAS_WEBHOOK_TOKEN. Eventos repetidos são ignorados.
+    """
+    token_esperado = os.getenv("ASAAS_WEBHOOK_TOKEN")
+    if not token_esperado or not hmac.compare_digest(asaas_access_token or "", token_esperado):
+        raise HTTPException(status_code=401, detail="Token do webhook inválido")
+
+    if not evento.get("id") or not evento.get("event"):
+        raise HTTPException(status_code=400, detail="Evento sem id ou tipo")
+
+    async with _aconn() as conn:
+        novo = await aprocessar_evento(conn, evento)
+
+    return {"recebido": True, "duplicado": not novo}
+
+
+class Atendente(BaseModel):
+    atendente: str = Field(..., min_length=1, max_length=100, description="Identificador do atendente humano")
+
+
+def _autorizar_atendente(token: str | None):
+    """Confere o header tickets-token com TICKETS_TOKEN (sem ele configurado, nega tudo)."""
+    token_esperado = os.getenv("TICKETS_TOKEN")
+    if not token_esperado or not hmac.compare_digest(token or "", token_esperado):
+        raise HTTPException(status_code=401, detail="Token de atendente inválido")
+
+
+@app.post("/tickets/assumir")
+async def assumir_ticket(corpo: Atendente, tickets_token: str | None = Header(default=None)):
+    """Entrega ao atendente o próximo ticket da fila (prazo de atendimento mais
+    próximo), já marcado como em atendimento; 204 com a fila vazia."""
+    _autorizar_atendente(tickets_token)
+    ticket = await aassumir_ticket(corpo.atendente)
+    if ticket is None:
+        return Response(status_code=204)
+    return ticket
+
+
+@app.post("/tickets/{ticket_id}/resolver")
+async def resolver_ticket(ticket_id: str, corpo: Atendente, tickets_token: str | None = Header(default=None)):
+    """Encerra um ticket assumido pelo mesmo atendente."""
+    _autorizar_atendente(tickets_token)
+    try:
+        uuid.UUID(ticket_id)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Ticket não encontrado")
+    ticket = await aresolver_ticket(ticket_id, corpo.atendente)
+    if ticket is None:
+        raise HTTPException(status_code=404, detail="Ticket não encontrado ou não está em atendimento por este atendente")
+    return ticket
+
+
+@app.get("/metricas")
+async def metricas():
+    """Métricas do processo: limiter e circuit breaker do Asaas, caches, pools do Postgres,
+    roteador, fila de negociações, idempotência das tools, índice de comprovantes, spans medidos,
+    fila de logs e tickets de atendimento humano."""
+    return {
+        **_asaas_resiliencia_stats(),
+        **cache_stats(),
+        **_db_pool_stats(),
+        **roteador_stats(),
+        **write_behind_stats(),
+        **idempotencia_stats(),
+        **comprovantes_stats(),
+        **telemetria_stats(),
+        **logs_stats(),
+        **tickets_stats(),
+    }
+
+
+@app.get("/metricas/conversas/{thread_id}")
+async def metricas_conversa(thread_id: str):
+    """Hits e misses dos caches em uma conversa: quantas chamadas ao Asaas ela evitou."""
+    return cache_stats_conversa(thread_id)
+
+
+@app.get("/metricas/prometheus", response_class=PlainTextResponse)
+async def metricas_prometheus():
+    """Histogramas de duração de tools, Asaas e Postgres, mais as métricas de /metricas
+    como gauges, no formato texto do Prometheus."""
+    return PlainTextResponse(
+        exportar_prometheus(await metricas()),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
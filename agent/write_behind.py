@@ -0,0 +1,273 @@
+import atexit
+import json
+import os
+import threading
+import uuid
+from datetime import datetime, timezone
+
+from agent.utils import _conn
+
+# As linhas de um lote vão por COPY para uma tabela temporária e de lá para
+# negociacoes; o ON CONFLICT em id_externo torna idempotente a reaplicação do
+# spool após uma queda entre o COMMIT e a limpeza do arquivo.
+_CRIAR_STAGING = (
+    "CREATE TEMP TABLE IF NOT EXISTS negociacoes_staging "
+    "(id_externo UUID, cnpj VARCHAR(18), detalhes TEXT, data_criacao TIMESTAMPTZ) ON COMMIT DELETE ROWS"
+)
+_COPY_STAGING = "COPY negociacoes_staging (id_externo, cnpj, detalhes, data_criacao) FROM STDIN"
+_INSERT_STAGING = """
+INSERT INTO negociacoes (id_externo, cnpj, detalhes, data_criacao)
+SELECT id_externo, cnpj, detalhes, data_criacao FROM negociacoes_staging
+ORDER BY data_criacao, id_externo
+ON CONFLICT (id_externo) DO NOTHING
+"""
+
+
+def _get_write_behind_config():
+    """Retorna (write-behind ligado, linhas por lote, intervalo do worker em segundos, caminho do spool).
+
+    NEGOCIACOES_WRITE_BEHIND: registrar_negociacao enfileira e responde na hora,
+        e um worker grava as negociações em lote (padrão: false, INSERT síncrono)
+    NEGOCIACOES_WB_BATCH: máximo de linhas por COPY
+    NEGOCIACOES_WB_INTERVAL: espera máxima do worker antes de gravar um lote incompleto
+    NEGOCIACOES_SPOOL_PATH: arquivo append-only (JSON por linha) com as negociações
+        ainda não gravadas, reaplicado na próxima inicialização; vazio desliga o spool
+    """
+    return (
+        os.getenv("NEGOCIACOES_WRITE_BEHIND", "false").lower() == "true",
+        int(os.getenv("NEGOCIACOES_WB_BATCH", "500")),
+        float(os.getenv("NEGOCIACOES_WB_INTERVAL", "0.5")),
+        os.getenv("NEGOCIACOES_SPOOL_PATH") or None,
+    )
+
+
+def _linha_negociacao(cnpj: str, detalhes: str) -> dict:
+    return {
+        "id_externo": str(uuid.uuid4()),
+        "cnpj": cnpj,
+        "detalhes": detalhes,
+        "data_criacao": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def gravar_negociacoes(conn, linhas: list[dict]):
+    """Grava um lote de negociações com um único COPY, na transação de `conn`."""
+    conn.execute(_CRIAR_STAGING)
+    with conn.cursor() as cur:
+        with cur.copy(_COPY_STAGING) as copy:
+            for linha in linhas:
+                copy.write_row((linha["id_externo"], linha["cnpj"], linha["detalhes"], linha["data_criacao"]))
+        cur.execute(_INSERT_STAGING)
+
+
+class FilaNegociacoes:
+    """Fila em memória de negociações a gravar, esvaziada em lotes por um worker.
+
+    `enfileirar` só acrescenta a linha à fila (e ao spool, com fsync, se houver)
+    e devolve o id_externo gerado. O worker, uma thread daemon iniciada no
+    primeiro uso, grava até `lote` linhas por vez assim que o lote enche ou a
+    cada `intervalo` segundos. Só quem grava remove linhas do início da fila, e
+    só depois do COMMIT: em caso de erro as linhas ficam para a próxima rodada.
+    """
+
+    def __init__(self, lote: int, intervalo: float, spool_path: str | None = None):
+        self.lote = lote
+        self.intervalo = intervalo
+        self.spool_path = spool_path
+        self._fila: list[dict] = []
+        self._cond = threading.Condition()
+        self._gravacao = threading.Lock()
+        self._worker = None
+        self._parar = False
+        self._spool = None
+        self.enfileiradas = 0
+        self.gravadas = 0
+        self.lotes = 0
+        self.erros = 0
+        self.recuperadas = 0
+        if spool_path:
+            self._recuperar_spool()
+            self._spool = open(spool_path, "a", encoding="utf-8")
+
+    def _recuperar_spool(self):
+        """Recoloca na fila as negociações do spool que não chegaram ao banco."""
+        if not os.path.exists(self.spool_path):
+            return
+        with open(self.spool_path, encoding="utf-8") as arquivo:
+            for texto in arquivo:
+                try:
+                    self._fila.append(json.loads(texto))
+                except json.JSONDecodeError:
+                    # Última linha cortada por uma queda durante a escrita
+                    continue
+        self.recuperadas = len(self._fila)
+
+    def _escrever_spool(self, linha: dict):
+        self._spool.write(json.dumps(linha, ensure_ascii=False) + "\n")
+        self._spool.flush()
+        os.fsync(self._spool.fileno())
+
+    def _compactar_spool(self):
+        """Reescreve o spool só com o que ainda está na fila (chamado com o lock)."""
+        if self._spool is None:
+            return
+        if not self._fila:
+            self._spool.truncate(0)
+            return
+        temporario = f"{self.spool_path}.tmp"
+        with open(temporario, "w", encoding="utf-8") as arquivo:
+            arquivo.writelines(json.dumps(linha, ensure_ascii=False) + "\n" for linha in self._fila)
+            arquivo.flush()
+            os.fsync(arquivo.fileno())
+        self._spool.close()
+        os.replace(temporario, self.spool_path)
+        self._spool = open(self.spool_path, "a", encoding="utf-8")
+
+    def _iniciar_worker(self):
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._executar, name="negociacoes-write-behind", daemon=True)
+            self._worker.start()
+
+    def enfileirar(self, cnpj: str, detalhes: str) -> str:
+        """Enfileira uma negociação e retorna o id_externo gerado para ela."""
+        linha = _linha_negociacao(cnpj, detalhes)
+        with self._cond:
+            if self._spool is not None:
+                self._escrever_spool(linha)
+            self._fila.append(linha)
+            self.enfileiradas += 1
+            self._iniciar_worker()
+            if len(self._fila) >= self.lote:
+                self._cond.notify()
+        return linha["id_externo"]
+
+    def pendente(self, cnpj: str) -> bool:
+        """Indica se há negociações desse CNPJ ainda não gravadas."""
+        with self._cond:
+            return any(linha["cnpj"] == cnpj for linha in self._fila)
+
+    def _gravar_lote(self) -> int:
+        """Grava o próximo lote da fila; retorna quantas linhas foram gravadas."""
+        with self._gravacao:
+            with self._cond:
+                linhas = self._fila[:self.lote]
+            if not linhas:
+                return 0
+            with _conn() as conn:
+                gravar_negociacoes(conn, linhas)
+            with self._cond:
+                del self._fila[:len(linhas)]
+                self.gravadas += len(linhas)
+                self.lotes += 1
+                self._compactar_spool()
+            return len(linhas)
+
+    def flush(self):
+        """Grava tudo o que está na fila antes de retornar (testes, shutdown).
+
+        Raises:
+            psycopg.Error: se o banco recusar um lote; as linhas continuam na fila
+        """
+        while self._gravar_lote():
+            pass
+
+    def _executar(self):
+        while True:
+            with self._cond:
+                if not self._fila and not self._parar:
+                    self._cond.wait(self.intervalo)
+                elif len(self._fila) < self.lote and not self._parar:
+                    self._cond.wait_for(lambda: len(self._fila) >= self.lote or self._parar, self.intervalo)
+                if self._parar:
+                    return
+            try:
+                while self._gravar_lote() == self.lote:
+                    pass
+            except Exception:
+                with self._cond:
+                    self.erros += 1
+                    self._cond.wait(self.intervalo)
+
+    def fechar(self):
+        """Para o worker, grava o que restou e fecha o spool."""
+        with self._cond:
+            self._parar = True
+            self._cond.notify_all()
+        if self._worker is not None:
+            self._worker.join()
+        try:
+            self.flush()
+        finally:
+            if self._spool is not None:
+                self._spool.close()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "write_behind_enfileiradas": self.enfileiradas,
+                "write_behind_gravadas": self.gravadas,
+                "write_behind_pendentes": len(self._fila),
+                "write_behind_lotes": self.lotes,
+                "write_behind_erros": self.erros,
+                "write_behind_recuperadas": self.recuperadas,
+            }
+
+
+_fila = None
+_fila_lock = threading.Lock()
+
+
+def _get_fila() -> FilaNegociacoes:
+    """Retorna a fila de negociações do processo, criada (e o spool reaplicado) no primeiro uso."""
+    global _fila
+    if _fila is None:
+        with _fila_lock:
+            if _fila is None:
+                _, lote, intervalo, spool_path = _get_write_behind_config()
+                _fila = FilaNegociacoes(lote, intervalo, spool_path)
+    return _fila
+
+
+def write_behind_habilitado() -> bool:
+    return _get_write_behind_config()[0]
+
+
+def enfileirar_negociacao(cnpj: str, detalhes: str) -> str:
+    """Enfileira uma negociação para gravação em lote e retorna seu id_externo."""
+    return _get_fila().enfileirar(cnpj, detalhes)
+
+
+def negociacao_pendente(cnpj: str) -> bool:
+    """Indica se há negociações desse CNPJ na fila (sem criar a fila se ela não existe)."""
+    return _fila is not None and _fila.pendente(cnpj)
+
+
+def flush_negociacoes():
+    """Grava de forma síncrona todas as negociações enfileiradas."""
+    if _fila is not None:
+        _fila.flush()
+
+
+def write_behind_stats() -> dict:
+    """Contadores da fila de negociações (vazio enquanto a fila não foi usada)."""
+    return _fila.stats() if _fila is not None else {}
+
+
+def _fechar_fila():
+    """Fecha a fila do processo (shutdown e testes); a próxima chamada cria outra."""
+    global _fila
+    with _fila_lock:
+        fila, _fila = _fila, None
+    if fila is not None:
+        fila.fechar()
+
+
+def _fechar_fila_no_exit():
+    try:
+        _fechar_fila()
+    except Exception:
+        # Sem banco no shutdown: com spool, as linhas são reaplicadas na próxima inicialização
+        pass
+
+
+atexit.register(_fechar_fila_no_exit)
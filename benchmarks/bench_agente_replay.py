@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Benchmark do grafo completo (roteador + create_react_agent) sem rede, com os
+cassetes do Asaas e do modelo de chat (agent/cassette.py).
+
+Cada conversa é um cenário de evals/cenarios.yaml, em uma thread própria do
+InMemorySaver, com ainvoke turno a turno, como no webhook. A latência de cada
+troca é a gravada ou a fixada por --latencia-asaas/--latencia-llm. Para cada
+nível de concorrência (conversas simultâneas) mede:
+  - turnos por segundo
+  - latência do turno: p50/p95/p99
+  - tempo por tool e no modelo: chamadas e média por chamada
+
+Com --gravar, os cassetes são gravados antes: com o servidor fake do Asaas e o
+modelo roteirizado de tests/fake_llm.py ou, com --real, com o Asaas
+(ASAAS_API_KEY/ASAAS_BASE_URL) e a OpenAI. Cassetes gravados do Asaas real
+têm dados de clientes: não versione.
+
+Exemplos:
+  python benchmarks/bench_agente_replay.py
+  python benchmarks/bench_agente_replay.py --concorrencia 1,16,256 --latencia-asaas 120 --latencia-llm 1500
+  python benchmarks/bench_agente_replay.py --gravar --cassetes /tmp/cassetes
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from collections import defaultdict
+from contextlib import nullcontext
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.prebuilt import create_react_agent
+
+from agent.cassette import Cassete, CasseteChatModel, _reset_cassete
+from agent.compact import formato_compacto
+from agent.history import criar_pre_model_hook
+from agent.prompt import basic_prompt
+from agent.router import com_roteador
+from agent.tools import (
+    _clientes_cache,
+    _ids_clientes_cache,
+    _pendencias_cache,
+    atualizar_boleto,
+    consulta_financeira,
+    detalhar_registro,
+    registrar_negociacao,
+    transferir_humano,
+    validar_comprovante,
+    verificar_negociacao,
+)
+from agent.utils import _asaas_request_count, _reset_asaas_resiliencia, _reset_asaas_session
+from evals.cenarios import carregar_cenarios
+
+CASSETES_PADRAO = Path(__file__).resolve().parents[1] / "tests" / "fixtures" / "cassetes"
+# Nas trocas reproduzidas o host nunca é resolvido; só o caminho depois de /v3 entra na chave
+BASE_URL_REPRODUCAO = "http://asaas.cassete/v3"
+MODELO = "(modelo)"
+
+
+def percentil(amostras, p):
+    ordenadas = sorted(amostras)
+    indice = min(len(ordenadas) - 1, int(round(p / 100 * (len(ordenadas) - 1))))
+    return ordenadas[indice]
+
+
+class TempoPorEtapa(BaseCallbackHandler):
+    """Soma o tempo de cada tool e das chamadas ao modelo (rodando na própria task)."""
+
+    run_inline = True
+
+    def __init__(self):
+        self.inicios = {}
+        self.tempos = defaultdict(list)
+
+    def _fim(self, run_id):
+        nome, inicio = self.inicios.pop(run_id, (None, None))
+        if nome is not None:
+            self.tempos[nome].append(time.perf_counter() - inicio)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        self.inicios[run_id] = (serialized.get("name") or kwargs.get("name"), time.perf_counter())
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self.inicios[run_id] = (MODELO, time.perf_counter())
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._fim(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._fim(run_id)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._fim(run_id)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._fim(run_id)
+
+
+def criar_agente(modelo):
+    """O mesmo grafo de agent/graph.py, com o modelo dado e checkpointer em memória."""
+    tools = [
+        consulta_financeira,
+        atualizar_boleto,
+        validar_comprovante,
+        transferir_humano,
+        registrar_negociacao,
+        verificar_negociacao,
+        *([detalhar_registro] if formato_compacto() else []),
+    ]
+    return com_roteador(
+        create_react_agent(modelo, prompt=basic_prompt, tools=tools, pre_model_hook=criar_pre_model_hook(basic_prompt)),
+        tools,
+        checkpointer=InMemorySaver(),
+    )
+
+
+def _limpar_estado():
+    _clientes_cache.clear()
+    _ids_clientes_cache.clear()
+    _pendencias_cache.clear()
+    _reset_asaas_session()
+    _reset_asaas_resiliencia()
+    _reset_cassete()
+
+
+async def rodar(agente, cenarios, conversas, concorrencia, etapas, prefixo, sem_cache=False):
+    """Roda `conversas` cenários com até `concorrencia` simultâneos; retorna (latências dos turnos, erros)."""
+    semaforo = asyncio.Semaphore(concorrencia)
+    latencias, erros = [], []
+
+    async def conversa(i):
+        cenario = cenarios[i % len(cenarios)]
+        config = {"configurable": {"thread_id": f"{prefixo}-{i}"}, "callbacks": [etapas]}
+        async with semaforo:
+            for mensagem in cenario["messages"]:
+                if sem_cache:
+                    _clientes_cache.clear()
+                    _ids_clientes_cache.clear()
+                    _pendencias_cache.clear()
+                inicio = time.perf_counter()
+                try:
+                    await agente.ainvoke({"messages": [{"role": "user", "content": mensagem}]}, config)
+                except Exception as e:
+                    erros.append(f"{cenario['name']}: {type(e).__name__}: {e}")
+                    return
+                latencias.append(time.perf_counter() - inicio)
+
+    await asyncio.gather(*(conversa(i) for i in range(conversas)))
+    return latencias, erros
+
+
+def gravar(pasta: Path, cenarios, real: bool):
+    """Grava os cassetes do Asaas e do modelo rodando cada cenário uma vez."""
+    pasta.mkdir(parents=True, exist_ok=True)
+    os.environ.update({"ASAAS_CASSETE": str(pasta / "asaas.json"), "ASAAS_CASSETE_MODO": "gravar"})
+    _limpar_estado()
+
+    if real:
+        from langchain_openai import ChatOpenAI
+
+        modelo = ChatOpenAI(model="gpt-5-nano", output_version="responses/v1", reasoning={"effort": "low"}, verbosity="low")
+        ambiente = nullcontext()
+    else:
+        from tests.fake_asaas import FakeAsaasServer, gerar_cliente, gerar_pagamentos
+        from tests.fake_llm import FakeChatModel
+
+        modelo = FakeChatModel()
+        ambiente = FakeAsaasServer()
+        ambiente.adicionar_cliente(gerar_cliente(), gerar_pagamentos("cus_000000000001", 24))
+
+    with ambiente as server:
+        if server is not None:
+            os.environ.update({"ASAAS_API_KEY": "bench", "ASAAS_BASE_URL": server.base_url})
+        agente = criar_agente(CasseteChatModel(cassete=Cassete(pasta / "llm.json", "gravar"), modelo=modelo))
+        _, erros = asyncio.run(rodar(agente, cenarios, len(cenarios), 1, TempoPorEtapa(), "gravacao"))
+    _limpar_estado()
+    return erros
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark do agente com Asaas e modelo reproduzidos de cassetes")
+    parser.add_argument("--cassetes", default=str(CASSETES_PADRAO), help="Pasta com asaas.json e llm.json")
+    parser.add_argument("--cenarios", default=None, help="Dataset YAML/JSONL (default: evals/cenarios.yaml)")
+    parser.add_argument("--concorrencia", default="1,4,16,64,256", help="Conversas simultâneas, separadas por vírgula")
+    parser.add_argument("--rodadas", type=int, default=4, help="Conversas por nível = concorrência x rodadas (default: 4)")
+    parser.add_argument("--latencia-asaas", type=float, default=None, help="ms por troca com o Asaas (default: gravada)")
+    parser.add_argument("--latencia-llm", type=float, default=None, help="ms por chamada ao modelo (default: gravada)")
+    parser.add_argument("--sem-cache", action="store_true", help="Limpa os caches das tools antes de cada turno")
+    parser.add_argument("--gravar", action="store_true", help="Grava os cassetes antes de medir")
+    parser.add_argument("--real", action="store_true", help="Com --gravar: grava do Asaas e da OpenAI reais")
+    args = parser.parse_args(argv)
+
+    pasta = Path(args.cassetes)
+    cenarios = carregar_cenarios(args.cenarios)
+    niveis = [int(n) for n in args.concorrencia.split(",")]
+
+    # O benchmark mede o agente, não a cota do Asaas nem o Postgres da idempotência e dos tickets
+    os.environ.setdefault("ASAAS_RATE_LIMIT", "1000000")
+    os.environ.setdefault("ASAAS_RATE_BURST", "1000000")
+    os.environ.setdefault("IDEMPOTENCY_ENABLED", "false")
+    os.environ.setdefault("TICKETS_FILA", "false")
+    # transferir_humano imprime o contexto; silencia para não poluir a tabela
+    sys.stdout, stdout = open(os.devnull, "w"), sys.stdout
+
+    try:
+        if args.gravar:
+            erros = gravar(pasta, cenarios, args.real)
+            if erros:
+                sys.stdout = stdout
+                print("Falha na gravação:\n  " + "\n  ".join(erros))
+                return 1
+
+        os.environ.update({
+            "ASAAS_CASSETE": str(pasta / "asaas.json"),
+            "ASAAS_CASSETE_MODO": "reproduzir",
+            "ASAAS_CASSETE_LATENCIA": "gravada" if args.latencia_asaas is None else str(args.latencia_asaas),
+            "ASAAS_API_KEY": "cassete",
+            "ASAAS_BASE_URL": BASE_URL_REPRODUCAO,
+        })
+        resultados = []
+        for nivel in niveis:
+            _limpar_estado()
+            modelo = CasseteChatModel(cassete=Cassete(pasta / "llm.json", "reproduzir", args.latencia_llm))
+            agente = criar_agente(modelo)
+            etapas = TempoPorEtapa()
+            requisicoes = _asaas_request_count()
+            inicio = time.perf_counter()
+            latencias, erros = asyncio.run(rodar(
+                agente, cenarios, nivel * args.rodadas, nivel, etapas, f"nivel{nivel}", args.sem_cache,
+            ))
+            duracao = time.perf_counter() - inicio
+            resultados.append((nivel, latencias, erros, duracao, etapas.tempos, _asaas_request_count() - requisicoes))
+    finally:
+        sys.stdout = stdout
+        _limpar_estado()
+
+    latencia_asaas = "gravada" if args.latencia_asaas is None else f"{args.latencia_asaas:g} ms"
+    latencia_llm = "gravada" if args.latencia_llm is None else f"{args.latencia_llm:g} ms"
+    print(f"{len(cenarios)} cenários | cassetes: {pasta} | latência Asaas: {latencia_asaas} | modelo: {latencia_llm}\n")
+    print(f"{'conc.':>6} {'conversas':>10} {'turnos':>7} {'turnos/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'asaas':>6} {'erros':>6}")
+    for nivel, latencias, erros, duracao, _, requisicoes in resultados:
+        ms = [t * 1000 for t in latencias] or [0.0]
+        print(
+            f"{nivel:>6} {nivel * args.rodadas:>10} {len(latencias):>7} {len(latencias) / duracao:>9.1f} "
+            f"{percentil(ms, 50):>8.1f} {percentil(ms, 95):>8.1f} {percentil(ms, 99):>8.1f} {requisicoes:>6} {len(erros):>6}"
+        )
+
+    etapas = sorted({nome for *_, tempos, _ in resultados for nome in tempos})
+    print("\nTempo médio por chamada (ms) e chamadas por turno:")
+    print(f"{'etapa':<22}" + "".join(f"{f'conc. {nivel}':>16}" for nivel, *_ in resultados))
+    for nome in etapas:
+        linha = f"{nome:<22}"
+        for _, latencias, _, _, tempos, _ in resultados:
+            amostras = tempos.get(nome, [])
+            media = statistics.fmean(amostras) * 1000 if amostras else 0.0
+            linha += f"{media:>9.1f} ({len(amostras) / max(1, len(latencias)):.1f})"
+        print(linha)
+
+    for nivel, _, erros, *_ in resultados:
+        for erro in erros[:3]:
+            print(f"\nErro (conc. {nivel}): {erro}")
+    return 1 if any(erros for _, _, erros, *_ in resultados) else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
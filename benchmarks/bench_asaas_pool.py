@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Benchmark do cliente HTTP do Asaas: conexões em pool (keep-alive) vs. sem pool.
+
+Sobe o servidor fake do Asaas localmente e mede a latência por chamada
+(p50/p99) de GET /customers?cpfCnpj=... nos dois modos:
+  - sem pool: requests.request(...) a cada chamada (comportamento antigo)
+  - com pool: agent.utils._handle_asaas_request (sessão compartilhada)
+
+Exemplos:
+  python benchmarks/bench_asaas_pool.py
+  python benchmarks/bench_asaas_pool.py --calls 2000 --threads 8 --latency 0.002
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import requests
+
+from agent.utils import _handle_asaas_request, _reset_asaas_session
+from tests.fake_asaas import FakeAsaasServer, gerar_cliente
+
+
+def percentil(amostras, p):
+    ordenadas = sorted(amostras)
+    indice = min(len(ordenadas) - 1, int(round(p / 100 * (len(ordenadas) - 1))))
+    return ordenadas[indice]
+
+
+def chamada_sem_pool(url, headers, params):
+    response = requests.request("GET", url, headers=headers, params=params)
+    return response.json()
+
+
+def chamada_com_pool(url, headers, params):
+    data, error = _handle_asaas_request("GET", url, headers, params=params)
+    if error:
+        raise RuntimeError(error["mensagem"])
+    return data
+
+
+def medir(funcao, url, headers, params, calls, threads):
+    def uma_chamada(_):
+        inicio = time.perf_counter()
+        funcao(url, headers, params)
+        return time.perf_counter() - inicio
+
+    # Aquecimento
+    for _ in range(min(20, calls)):
+        uma_chamada(None)
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        latencias = list(executor.map(uma_chamada, range(calls)))
+    duracao = time.perf_counter() - inicio
+    return latencias, duracao
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark pool HTTP do Asaas")
+    parser.add_argument("--calls", type=int, default=1000, help="Chamadas por modo (default: 1000)")
+    parser.add_argument("--threads", type=int, default=4, help="Chamadas concorrentes (default: 4)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Latência artificial do servidor em segundos")
+    args = parser.parse_args(argv)
+
+    # O benchmark mede o transporte, não o limite de taxa do cliente
+    os.environ.setdefault("ASAAS_RATE_LIMIT", "1000000")
+    os.environ.setdefault("ASAAS_RATE_BURST", "1000000")
+
+    with FakeAsaasServer(latencia=args.latency) as server:
+        server.adicionar_cliente(gerar_cliente())
+        url = f"{server.base_url}/customers"
+        headers = {"access_token": "bench", "Content-Type": "application/json"}
+        params = {"cpfCnpj": "01248526000158"}
+
+        print(f"Chamadas por modo: {args.calls} | threads: {args.threads} | latência: {args.latency * 1000:.1f} ms\n")
+        print(f"{'modo':<10} {'p50 (ms)':>10} {'p99 (ms)':>10} {'média (ms)':>11} {'req/s':>9} {'conexões':>9}")
+
+        for nome, funcao in (("sem pool", chamada_sem_pool), ("com pool", chamada_com_pool)):
+            _reset_asaas_session()
+            conexoes_antes = server.conexoes
+            latencias, duracao = medir(funcao, url, headers, params, args.calls, args.threads)
+            ms = [l * 1000 for l in latencias]
+            print(
+                f"{nome:<10} {percentil(ms, 50):>10.3f} {percentil(ms, 99):>10.3f} "
+                f"{statistics.mean(ms):>11.3f} {args.calls / duracao:>9.0f} "
+                f"{server.conexoes - conexoes_antes:>9}"
+            )
+
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Benchmark da latência por turno em função do tamanho da conversa: reenvio do
+histórico completo a cada chamada versus checkpointer Postgres com thread_id.
+
+Simula conversas de N turnos (padrão 40) no grafo create_react_agent com o
+modelo roteirizado de tests/fake_llm.py, o servidor fake do Asaas e o mesmo
+pre_model_hook do agente. No modo "reenvio" o chamador manda toda a conversa
+(como o avaliador fazia); no modo "checkpointer" manda só a nova mensagem e o
+histórico vem do checkpoint, gravado a cada passo do grafo (durability padrão,
+"async") ou só ao fim do turno (durability="exit"). Mede a latência de cada
+turno e o tamanho da entrada enviada ao grafo.
+
+Requer o Postgres das variáveis DB_* com sql/05_create_checkpoints.sql aplicado.
+
+Exemplos:
+  python benchmarks/bench_checkpointer.py
+  python benchmarks/bench_checkpointer.py --turns 80 --payments 48
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from langchain_core.messages import messages_to_dict
+from langgraph.prebuilt import create_react_agent
+
+from agent.checkpoint import criar_checkpointer
+from agent.history import criar_pre_model_hook
+from agent.prompt import basic_prompt
+from agent.tools import (
+    _clientes_cache,
+    _ids_clientes_cache,
+    _pendencias_cache,
+    atualizar_boleto,
+    consulta_financeira,
+    transferir_humano,
+)
+from tests.fake_asaas import FakeAsaasServer, gerar_cliente, gerar_pagamentos
+from tests.fake_llm import FakeChatModel
+
+MENSAGENS = (
+    "Oi, meu CNPJ é 01248526000158",
+    "Preciso da segunda via do boleto",
+    "Quais boletos ainda estão em aberto?",
+    "Preciso da segunda via do boleto de novo, perdi o link",
+    "Tenho uma questão muito específica sobre meu contrato",
+    "Obrigado!",
+)
+
+
+def _bytes(messages) -> int:
+    dados = [m if isinstance(m, dict) else messages_to_dict([m])[0] for m in messages]
+    return len(json.dumps(dados, ensure_ascii=False, default=str).encode("utf-8"))
+
+
+def rodar_conversa(turnos, checkpointer, durability=None):
+    _clientes_cache.clear()
+    _ids_clientes_cache.clear()
+    _pendencias_cache.clear()
+
+    agent = create_react_agent(
+        FakeChatModel(),
+        prompt=basic_prompt,
+        tools=[consulta_financeira, atualizar_boleto, transferir_humano],
+        pre_model_hook=criar_pre_model_hook(basic_prompt),
+        checkpointer=checkpointer,
+    )
+    config = {"configurable": {"thread_id": f"bench_{uuid.uuid4().hex}"}}
+    extras = {"durability": durability} if durability else {}
+
+    historico = []
+    latencias, entradas = [], []
+    for turno in range(turnos):
+        mensagem = {"role": "user", "content": MENSAGENS[turno % len(MENSAGENS)]}
+        entrada = [mensagem] if checkpointer is not None else [*historico, mensagem]
+        inicio = time.perf_counter()
+        historico = agent.invoke({"messages": entrada}, config, **extras)["messages"]
+        latencias.append(time.perf_counter() - inicio)
+        entradas.append(_bytes(entrada))
+    return latencias, entradas, len(historico)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark do checkpointer em conversas longas")
+    parser.add_argument("--turns", type=int, default=40, help="Turnos por conversa (default: 40)")
+    parser.add_argument("--payments", type=int, default=24, help="Pagamentos do cliente sintético (default: 24)")
+    parser.add_argument("--step", type=int, default=10, help="Intervalo de turnos na tabela (default: 10)")
+    args = parser.parse_args(argv)
+
+    os.environ["AGENT_CHECKPOINTER"] = "postgres"
+    # transferir_humano imprime o contexto; silencia para não poluir a tabela
+    sys.stdout, stdout = open(os.devnull, "w"), sys.stdout
+
+    with FakeAsaasServer() as server:
+        server.adicionar_cliente(gerar_cliente(), gerar_pagamentos("cus_000000000001", args.payments))
+        os.environ["ASAAS_API_KEY"] = "bench"
+        os.environ["ASAAS_BASE_URL"] = server.base_url
+        os.environ.setdefault("ASAAS_RATE_LIMIT", "1000")
+        os.environ.setdefault("ASAAS_RATE_BURST", "1000")
+
+        # Aquecimento: pools, conexões e imports
+        rodar_conversa(2, criar_checkpointer())
+        reenvio = rodar_conversa(args.turns, None)
+        checkpoint = rodar_conversa(args.turns, criar_checkpointer())
+        no_fim = rodar_conversa(args.turns, criar_checkpointer(), durability="exit")
+
+    sys.stdout = stdout
+    print(f"Conversa de {args.turns} turnos | {args.payments} pagamentos | mensagens no estado: {checkpoint[2]}\n")
+    print("Latência mediana por turno (ms) e entrada do último turno da faixa (KB)")
+    print(f"{'turnos':>7} {'reenvio':>9} {'ckpt':>9} {'ckpt exit':>10} {'reenvio KB':>11} {'ckpt KB':>9}")
+    for fim in range(args.step, args.turns + 1, args.step):
+        janela = slice(fim - args.step, fim)
+        print(
+            f"{fim:>7} {statistics.median(reenvio[0][janela]) * 1000:>9.1f} "
+            f"{statistics.median(checkpoint[0][janela]) * 1000:>9.1f} "
+            f"{statistics.median(no_fim[0][janela]) * 1000:>10.1f} "
+            f"{reenvio[1][fim - 1] / 1024:>11.1f} {checkpoint[1][fim - 1] / 1024:>9.1f}"
+        )
+
+    print(f"\n{'':<24} {'reenvio':>9} {'ckpt':>9} {'ckpt exit':>10}")
+    print(f"{'tempo total (s)':<24} {sum(reenvio[0]):>9.2f} {sum(checkpoint[0]):>9.2f} {sum(no_fim[0]):>10.2f}")
+    print(
+        f"{'entrada enviada (KB)':<24} {sum(reenvio[1]) / 1024:>9.1f} "
+        f"{sum(checkpoint[1]) / 1024:>9.1f} {sum(no_fim[1]) / 1024:>10.1f}"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
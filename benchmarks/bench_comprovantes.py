@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Benchmark da validação local de comprovantes (agent/receipts.py).
+
+Gera o corpus sintético rotulado de tests/fake_comprovantes.py e mede:
+  - vazão: comprovantes por segundo (extração + conferência com o índice de
+    pendências do cliente), em uma thread, sem LLM
+  - qualidade: acerto de valido, da pendência escolhida e da extração do valor
+  - calibração: Brier score e erro de calibração esperado (ECE) da
+    confiabilidade, com a tabela de confiabilidade por faixa
+
+Com --ajustar, ajusta a regressão logística (numpy) no corpus de treino
+(seed diferente da avaliação) e imprime os pesos para agent/receipts.py.
+
+Exemplos:
+  python benchmarks/bench_comprovantes.py
+  python benchmarks/bench_comprovantes.py --quantidade 20000
+  python benchmarks/bench_comprovantes.py --ajustar
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from agent import receipts
+from agent.receipts import SINAIS, SINAIS_NEGATIVOS, IndicePendencias, conferir, extrair_campos, sinais
+from tests.fake_comprovantes import CNPJ_NEXUZ, HOJE, gerar_corpus
+
+
+def validar_corpus(corpus):
+    """Valida todos os comprovantes, com um índice por carteira de pendências."""
+    indices = {}
+    resultados = []
+    for item in corpus:
+        chave = id(item["pendencias"])
+        if chave not in indices:
+            indices[chave] = IndicePendencias(item["pendencias"])
+        campos = extrair_campos(item["texto"], HOJE)
+        resultados.append((campos, conferir(campos, indices[chave], item["cnpj_cliente"], HOJE)))
+    return resultados
+
+
+def matriz_de_sinais(corpus, resultados):
+    """Sinais da pendência escolhida em cada comprovante (a que foi usada na confiabilidade)."""
+    linhas = []
+    for item, (campos, resultado) in zip(corpus, resultados):
+        pendencia = next((p for p in item["pendencias"] if p["id"] == resultado["pendencia_id"]), None)
+        s = sinais(campos, pendencia, item["cnpj_cliente"], {CNPJ_NEXUZ}, HOJE)
+        linhas.append([float(s[nome]) for nome in SINAIS])
+    return linhas
+
+
+def ajustar(corpus, rodadas=3, iteracoes=50, l2=1.0):
+    """Regressão logística dos rótulos sobre os sinais (Newton com restrição de sinal).
+
+    Cada peso fica com o sinal esperado (SINAIS_NEGATIVOS <= 0, os demais >= 0):
+    sinais quase sempre presentes nos dois rótulos do corpus (ex.: autenticação)
+    não viram pesos negativos que puniriam o comprovante em produção. Pesos
+    presos em zero com o gradiente apontando para fora ficam fora do passo.
+    A pendência escolhida depende dos pesos, então o ajuste é repetido algumas
+    rodadas com a escolha feita pelos pesos da rodada anterior.
+    """
+    import numpy as np
+
+    y = np.array([item["valido"] for item in corpus], dtype=float)
+    sinal = np.array([0.0] + [-1.0 if nome in SINAIS_NEGATIVOS else 1.0 for nome in SINAIS])
+    regularizacao = l2 * np.diag(np.where(sinal != 0, 1.0, 1e-3))
+    for _ in range(rodadas):
+        x = np.array(matriz_de_sinais(corpus, validar_corpus(corpus)))
+        x = np.hstack([np.ones((len(x), 1)), x])
+        w = np.array([receipts._INTERCEPTO] + [receipts._PESOS[nome] for nome in SINAIS])
+        for _ in range(iteracoes):
+            p = 1 / (1 + np.exp(-np.clip(x @ w, -30, 30)))
+            gradiente = x.T @ (p - y) + regularizacao @ w
+            hessiana = (x * (p * (1 - p))[:, None]).T @ x + regularizacao
+            livres = ~((w == 0) & (sinal * gradiente > 0))
+            passo = np.linalg.solve(hessiana[np.ix_(livres, livres)], gradiente[livres])
+            # Passo limitado: com rótulos quase separáveis o Newton puro oscila
+            w[livres] -= passo / max(1.0, np.abs(passo).max() / 2)
+            w = np.where(sinal > 0, np.maximum(w, 0), np.where(sinal < 0, np.minimum(w, 0), w))
+        receipts._INTERCEPTO = round(float(w[0]), 1)
+        receipts._PESOS = {nome: round(float(peso), 1) for nome, peso in zip(SINAIS, w[1:])}
+    return receipts._INTERCEPTO, receipts._PESOS
+
+
+def calibracao(probabilidades, rotulos, faixas=10):
+    """Brier score, ECE e a tabela (faixa, n, confiabilidade média, fração de válidos)."""
+    brier = sum((p - y) ** 2 for p, y in zip(probabilidades, rotulos)) / len(rotulos)
+    tabela, ece = [], 0.0
+    for faixa in range(faixas):
+        inicio, fim = faixa / faixas, (faixa + 1) / faixas
+        itens = [(p, y) for p, y in zip(probabilidades, rotulos) if inicio <= p < fim or (fim == 1 and p == 1)]
+        if not itens:
+            continue
+        media = sum(p for p, _ in itens) / len(itens)
+        observada = sum(y for _, y in itens) / len(itens)
+        ece += len(itens) / len(rotulos) * abs(media - observada)
+        tabela.append((f"{inicio:.1f}-{fim:.1f}", len(itens), media, observada))
+    return brier, ece, tabela
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark da validação de comprovantes")
+    parser.add_argument("--quantidade", type=int, default=5000, help="Comprovantes avaliados (default: 5000)")
+    parser.add_argument("--seed", type=int, default=7, help="Semente do corpus de avaliação (default: 7)")
+    parser.add_argument("--ajustar", action="store_true", help="Ajusta os pesos no corpus de treino antes de avaliar")
+    args = parser.parse_args(argv)
+
+    os.environ["COMPROVANTE_CNPJS_BENEFICIARIO"] = CNPJ_NEXUZ
+
+    if args.ajustar:
+        intercepto, pesos = ajustar(gerar_corpus(4000, seed=42))
+        print("Pesos ajustados (agent/receipts.py):")
+        print(f"_INTERCEPTO = {intercepto}")
+        for nome, peso in pesos.items():
+            print(f'    "{nome}": {peso},')
+        print()
+
+    corpus = gerar_corpus(args.quantidade, seed=args.seed)
+    inicio = time.perf_counter()
+    resultados = validar_corpus(corpus)
+    duracao = time.perf_counter() - inicio
+
+    rotulos = [item["valido"] for item in corpus]
+    probabilidades = [resultado["confiabilidade"] for _, resultado in resultados]
+    acertos = sum(resultado["valido"] == item["valido"] for item, (_, resultado) in zip(corpus, resultados))
+    validos = [(item, resultado) for item, (_, resultado) in zip(corpus, resultados) if item["valido"]]
+    pendencia_certa = sum(resultado["pendencia_id"] == item["pendencia_id"] for item, resultado in validos)
+    com_valor = [(item, campos) for item, (campos, _) in zip(corpus, resultados) if item["defeito"] != "sem_valor"]
+    valor_extraido = sum(campos["valor"] is not None for _, campos in com_valor)
+
+    print(f"Comprovantes: {len(corpus)} | {duracao:.3f}s | {len(corpus) / duracao:,.0f} comprovantes/s")
+    print(f"Acerto de valido: {acertos / len(corpus):.1%}")
+    print(f"Pendência correta nos válidos: {pendencia_certa / len(validos):.1%}")
+    print(f"Valor extraído: {valor_extraido / len(com_valor):.1%}")
+
+    brier, ece, tabela = calibracao(probabilidades, rotulos)
+    print(f"\nBrier: {brier:.4f} | ECE: {ece:.4f}")
+    print(f"{'faixa':<10} {'n':>6} {'confiab.':>9} {'válidos':>8}")
+    for faixa, n, media, observada in tabela:
+        print(f"{faixa:<10} {n:>6} {media:>9.3f} {observada:>8.3f}")
+
+    print("\nAcerto por defeito:")
+    for defeito in sorted({item["defeito"] or "nenhum" for item in corpus}):
+        itens = [(item, r) for item, (_, r) in zip(corpus, resultados) if (item["defeito"] or "nenhum") == defeito]
+        certos = sum(r["valido"] == item["valido"] for item, r in itens)
+        print(f"  {defeito:<22} {certos}/{len(itens)}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Benchmark dos filtros de consulta_financeira: histórico completo vs. visão padrão.
+
+Cria no servidor fake do Asaas um cliente sintético com N pagamentos (padrão 500)
+e compara, para cada modo de consulta:
+  - bytes recebidos do Asaas
+  - tamanho da saída da tool (o que vira ToolMessage no histórico)
+  - tokens de prompt dessa saída (tiktoken o200k_base; sem tiktoken, estima chars/4)
+
+Exemplos:
+  python benchmarks/bench_consulta_filtros.py
+  python benchmarks/bench_consulta_filtros.py --payments 2000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from agent.tools import consulta_financeira
+from tests.fake_asaas import FakeAsaasServer, gerar_cliente, gerar_pagamentos
+
+
+def contador_de_tokens():
+    try:
+        import tiktoken
+
+        encoding = tiktoken.get_encoding("o200k_base")
+        return lambda texto: len(encoding.encode(texto)), "tiktoken o200k_base"
+    except Exception:
+        return lambda texto: len(texto) // 4, "estimativa chars/4"
+
+
+MODOS = (
+    ("histórico completo", {"historico_completo": True, "max_itens": 1000}),
+    ("em aberto (padrão)", {}),
+    ("em aberto, 10 itens", {"max_itens": 10}),
+    ("vencidas no ano", {"status": ["OVERDUE"], "vencimento_de": "2021-01-01", "vencimento_ate": "2021-12-31"}),
+)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark dos filtros de consulta_financeira")
+    parser.add_argument("--payments", type=int, default=500, help="Pagamentos do cliente sintético (default: 500)")
+    args = parser.parse_args(argv)
+
+    contar_tokens, metodo = contador_de_tokens()
+
+    with FakeAsaasServer() as server:
+        server.adicionar_cliente(gerar_cliente(), gerar_pagamentos("cus_000000000001", args.payments))
+        os.environ["ASAAS_API_KEY"] = "bench"
+        os.environ["ASAAS_BASE_URL"] = server.base_url
+
+        print(f"Cliente sintético com {args.payments} pagamentos | tokens: {metodo}\n")
+        print(f"{'modo':<22} {'itens':>6} {'req':>5} {'bytes Asaas':>12} {'bytes saída':>12} {'tokens':>8} {'ms':>8}")
+
+        resultados = {}
+        for nome, filtros in MODOS:
+            bytes_antes = server.bytes_enviados
+            requisicoes_antes = len(server.requisicoes)
+
+            inicio = time.perf_counter()
+            result = consulta_financeira.invoke({"input": {"cnpj": "01248526000158", **filtros}})
+            duracao = (time.perf_counter() - inicio) * 1000
+
+            # str(output) é o conteúdo que a ToolMessage leva de volta ao modelo
+            saida = str(result)
+            linha = (
+                result.total_pendencias,
+                len(server.requisicoes) - requisicoes_antes,
+                server.bytes_enviados - bytes_antes,
+                len(saida.encode("utf-8")),
+                contar_tokens(saida),
+            )
+            resultados[nome] = linha
+            print(f"{nome:<22} {linha[0]:>6} {linha[1]:>5} {linha[2]:>12} {linha[3]:>12} {linha[4]:>8} {duracao:>8.1f}")
+
+        completo = resultados[MODOS[0][0]]
+        padrao = resultados[MODOS[1][0]]
+        print("\nVisão padrão vs. histórico completo:")
+        print(f"  bytes do Asaas: -{100 * (1 - padrao[2] / completo[2]):.1f}%")
+        print(f"  tokens de prompt: -{100 * (1 - padrao[4] / completo[4]):.1f}%")
+
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Benchmark de consulta_financeira: busca sequencial vs. cliente e pendências em paralelo.
+
+Sobe o servidor fake do Asaas com latência artificial (padrão 50 ms por
+requisição) e mede a latência da tool (p50/p99) em dois cenários, nas
+versões síncrona e assíncrona:
+  - sequencial: só o CNPJ é conhecido (GET /customers?cpfCnpj=..., depois /payments)
+  - paralelo: customer_id já conhecido (GET /customers/{id} junto com /payments)
+
+Os caches de cliente e de pendências são limpos a cada chamada, para medir
+sempre o caminho até o Asaas.
+
+Exemplos:
+  python benchmarks/bench_consulta_paralela.py
+  python benchmarks/bench_consulta_paralela.py --calls 50 --latency 0.1
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from agent.models import ConsultaFinanceiraInput
+from agent.tools import (
+    _clientes_cache,
+    _ids_clientes_cache,
+    _pendencias_cache,
+    aconsulta_financeira,
+    consulta_financeira,
+)
+from tests.fake_asaas import FakeAsaasServer, gerar_cliente, gerar_pagamentos
+
+CNPJ = "01248526000158"
+CUSTOMER_ID = "cus_000000000001"
+
+
+def percentil(amostras, p):
+    ordenadas = sorted(amostras)
+    indice = min(len(ordenadas) - 1, int(round(p / 100 * (len(ordenadas) - 1))))
+    return ordenadas[indice]
+
+
+def limpar_caches():
+    _clientes_cache.clear()
+    _ids_clientes_cache.clear()
+    _pendencias_cache.clear()
+
+
+def medir(entrada, calls):
+    latencias = []
+    for _ in range(calls):
+        limpar_caches()
+        inicio = time.perf_counter()
+        result = consulta_financeira.invoke({"input": entrada})
+        latencias.append((time.perf_counter() - inicio) * 1000)
+        if result.status != "sucesso":
+            raise RuntimeError(result.mensagem)
+    return latencias
+
+
+async def amedir(entrada, calls):
+    # Um único event loop, para reaproveitar o AsyncClient (e suas conexões) entre chamadas
+    latencias = []
+    for _ in range(calls):
+        limpar_caches()
+        inicio = time.perf_counter()
+        result = await aconsulta_financeira(ConsultaFinanceiraInput(**entrada))
+        latencias.append((time.perf_counter() - inicio) * 1000)
+        if result.status != "sucesso":
+            raise RuntimeError(result.mensagem)
+    return latencias
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark da busca paralela em consulta_financeira")
+    parser.add_argument("--calls", type=int, default=30, help="Chamadas por cenário (default: 30)")
+    parser.add_argument("--latency", type=float, default=0.05, help="Latência do servidor em segundos (default: 0.05)")
+    parser.add_argument("--status", nargs="*", default=["OVERDUE"], help="Status consultados (default: OVERDUE)")
+    args = parser.parse_args(argv)
+
+    with FakeAsaasServer(latencia=args.latency) as server:
+        server.adicionar_cliente(gerar_cliente(), gerar_pagamentos(CUSTOMER_ID, 60))
+        os.environ["ASAAS_API_KEY"] = "bench"
+        os.environ["ASAAS_BASE_URL"] = server.base_url
+        os.environ.setdefault("ASAAS_RATE_LIMIT", "1000")
+        os.environ.setdefault("ASAAS_RATE_BURST", "1000")
+
+        cenarios = (
+            ("sequencial", {"cnpj": CNPJ, "status": args.status}),
+            ("paralelo", {"cnpj": CNPJ, "status": args.status, "customer_id": CUSTOMER_ID}),
+        )
+
+        print(f"Chamadas por cenário: {args.calls} | latência: {args.latency * 1000:.1f} ms | status: {args.status}\n")
+        print(f"{'versão':<8} {'cenário':<12} {'p50 (ms)':>10} {'p99 (ms)':>10} {'média (ms)':>11}")
+
+        for versao, assincrono in (("sync", False), ("async", True)):
+            medias = {}
+            for nome, entrada in cenarios:
+                ms = asyncio.run(amedir(entrada, args.calls)) if assincrono else medir(entrada, args.calls)
+                medias[nome] = statistics.mean(ms)
+                print(
+                    f"{versao:<8} {nome:<12} {percentil(ms, 50):>10.1f} "
+                    f"{percentil(ms, 99):>10.1f} {medias[nome]:>11.1f}"
+                )
+            print(f"{'':<8} {'ganho':<12} {100 * (1 - medias['paralelo'] / medias['sequencial']):>9.1f}%\n")
+
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
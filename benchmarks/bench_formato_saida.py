@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Benchmark do formato das saídas das tools: padrão (repr do pydantic) vs. compacto.
+
+Roda os cenários de evals/trajetory_eval.py (evals/cenarios.py) no grafo
+create_react_agent com o modelo roteirizado de tests/fake_llm.py e o servidor
+fake do Asaas, e mede por conversa:
+  - tokens de prompt somados em todas as chamadas ao modelo (histórico + schema das tools)
+  - latência ponta a ponta (com prefill simulado, --ms-por-mil-tokens)
+
+Exemplos:
+  python benchmarks/bench_formato_saida.py
+  python benchmarks/bench_formato_saida.py --payments 60 --ms-por-mil-tokens 100
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from langgraph.prebuilt import create_react_agent
+
+from agent.prompt import basic_prompt
+from agent.tools import (
+    _clientes_cache,
+    _ids_clientes_cache,
+    _pendencias_cache,
+    atualizar_boleto,
+    consulta_financeira,
+    detalhar_registro,
+    registrar_negociacao,
+    transferir_humano,
+    validar_comprovante,
+    verificar_negociacao,
+)
+from evals.cenarios import CENARIOS
+from tests.fake_asaas import FakeAsaasServer, gerar_cliente, gerar_pagamentos
+from tests.fake_llm import FakeChatModel, contador_de_tokens
+
+FORMATOS = ("padrao", "compacto")
+
+
+def rodar_conversa(formato, mensagens, ms_por_mil_tokens):
+    os.environ["TOOL_OUTPUT_FORMAT"] = formato
+    _clientes_cache.clear()
+    _ids_clientes_cache.clear()
+    _pendencias_cache.clear()
+
+    model = FakeChatModel(ms_por_mil_tokens=ms_por_mil_tokens)
+    tools = [
+        consulta_financeira,
+        atualizar_boleto,
+        validar_comprovante,
+        transferir_humano,
+        registrar_negociacao,
+        verificar_negociacao,
+    ]
+    if formato == "compacto":
+        tools.append(detalhar_registro)
+    agent = create_react_agent(model, prompt=basic_prompt, tools=tools)
+
+    historico = []
+    inicio = time.perf_counter()
+    for mensagem in mensagens:
+        historico.append({"role": "user", "content": mensagem})
+        result = agent.invoke({"messages": historico})
+        historico = result["messages"]
+    duracao = (time.perf_counter() - inicio) * 1000
+    return len(model.tokens_por_chamada), sum(model.tokens_por_chamada), duracao
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark do formato das saídas das tools")
+    parser.add_argument("--payments", type=int, default=24, help="Pagamentos do cliente sintético (default: 24)")
+    parser.add_argument(
+        "--ms-por-mil-tokens", type=float, default=50.0,
+        help="Prefill simulado do modelo, em ms por mil tokens de prompt (default: 50)",
+    )
+    args = parser.parse_args(argv)
+
+    _, metodo = contador_de_tokens()
+
+    with FakeAsaasServer() as server:
+        server.adicionar_cliente(gerar_cliente(), gerar_pagamentos("cus_000000000001", args.payments))
+        os.environ["ASAAS_API_KEY"] = "bench"
+        os.environ["ASAAS_BASE_URL"] = server.base_url
+
+        print(f"Cliente com {args.payments} pagamentos | tokens: {metodo} | prefill: {args.ms_por_mil_tokens} ms/1k\n")
+        print(f"{'cenário':<32} {'formato':<9} {'chamadas':>9} {'tokens':>8} {'ms':>8}")
+
+        totais = {formato: [0, 0.0] for formato in FORMATOS}
+        for cenario in CENARIOS:
+            for formato in FORMATOS:
+                chamadas, tokens, ms = rodar_conversa(formato, cenario["messages"], args.ms_por_mil_tokens)
+                totais[formato][0] += tokens
+                totais[formato][1] += ms
+                print(f"{cenario['name'][:32]:<32} {formato:<9} {chamadas:>9} {tokens:>8} {ms:>8.1f}")
+
+        padrao, compacto = totais["padrao"], totais["compacto"]
+        print("\nTotal dos cenários, compacto vs. padrão:")
+        print(f"  tokens de prompt: {padrao[0]} -> {compacto[0]} (-{100 * (1 - compacto[0] / padrao[0]):.1f}%)")
+        print(f"  latência: {padrao[1]:.0f} ms -> {compacto[1]:.0f} ms (-{100 * (1 - compacto[1] / padrao[1]):.1f}%)")
+
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Benchmark do crescimento do prompt em conversas longas, com e sem o pre_model_hook
+de agent/history.py.
+
+Simula conversas de N turnos (padrão 30) no grafo create_react_agent com o
+modelo roteirizado de tests/fake_llm.py e o servidor fake do Asaas. O usuário
+alterna pedidos que disparam consulta_financeira, atualizar_boleto e
+transferir_humano, acumulando saídas de tools no histórico. Mede os tokens
+de prompt da última chamada de cada turno e o total da conversa.
+
+Exemplos:
+  python benchmarks/bench_historico.py
+  python benchmarks/bench_historico.py --turns 50 --max-tokens 4000 --max-turns 2
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from langgraph.prebuilt import create_react_agent
+
+from agent.history import criar_pre_model_hook
+from agent.prompt import basic_prompt
+from agent.tools import (
+    _clientes_cache,
+    _ids_clientes_cache,
+    _pendencias_cache,
+    atualizar_boleto,
+    consulta_financeira,
+    transferir_humano,
+)
+from tests.fake_asaas import FakeAsaasServer, gerar_cliente, gerar_pagamentos
+from tests.fake_llm import FakeChatModel, contador_de_tokens
+
+MENSAGENS = (
+    "Oi, meu CNPJ é 01248526000158",
+    "Preciso da segunda via do boleto",
+    "Quais boletos ainda estão em aberto?",
+    "Preciso da segunda via do boleto de novo, perdi o link",
+    "Tenho uma questão muito específica sobre meu contrato",
+    "Obrigado!",
+)
+
+
+def rodar_conversa(turnos, pre_model_hook):
+    _clientes_cache.clear()
+    _ids_clientes_cache.clear()
+    _pendencias_cache.clear()
+
+    model = FakeChatModel()
+    agent = create_react_agent(
+        model,
+        prompt=basic_prompt,
+        tools=[consulta_financeira, atualizar_boleto, transferir_humano],
+        pre_model_hook=pre_model_hook,
+    )
+
+    historico = []
+    tokens_por_turno = []
+    inicio = time.perf_counter()
+    for turno in range(turnos):
+        chamadas_antes = len(model.tokens_por_chamada)
+        historico.append({"role": "user", "content": MENSAGENS[turno % len(MENSAGENS)]})
+        historico = agent.invoke({"messages": historico})["messages"]
+        tokens_por_turno.append(max(model.tokens_por_chamada[chamadas_antes:]))
+    duracao = time.perf_counter() - inicio
+    return tokens_por_turno, sum(model.tokens_por_chamada), len(historico), duracao
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark do histórico em conversas longas")
+    parser.add_argument("--turns", type=int, default=30, help="Turnos por conversa (default: 30)")
+    parser.add_argument("--payments", type=int, default=24, help="Pagamentos do cliente sintético (default: 24)")
+    parser.add_argument("--max-turns", type=int, default=None, help="HISTORY_MAX_TURNS (default: variável ou 4)")
+    parser.add_argument("--max-tokens", type=int, default=None, help="HISTORY_MAX_TOKENS (default: variável ou 8000)")
+    args = parser.parse_args(argv)
+
+    _, metodo = contador_de_tokens()
+    # transferir_humano imprime o contexto; silencia para não poluir a tabela
+    sys.stdout, stdout = open(os.devnull, "w"), sys.stdout
+
+    with FakeAsaasServer() as server:
+        server.adicionar_cliente(gerar_cliente(), gerar_pagamentos("cus_000000000001", args.payments))
+        os.environ["ASAAS_API_KEY"] = "bench"
+        os.environ["ASAAS_BASE_URL"] = server.base_url
+        os.environ.setdefault("ASAAS_RATE_LIMIT", "1000")
+        os.environ.setdefault("ASAAS_RATE_BURST", "1000")
+
+        sem_hook = rodar_conversa(args.turns, None)
+        com_hook = rodar_conversa(
+            args.turns, criar_pre_model_hook(basic_prompt, max_turnos=args.max_turns, max_tokens=args.max_tokens)
+        )
+
+    sys.stdout = stdout
+    print(f"Conversa de {args.turns} turnos | {args.payments} pagamentos | tokens: {metodo}\n")
+    print(f"{'turno':>6} {'sem hook':>10} {'com hook':>10}")
+    for turno in range(args.turns):
+        if turno == 0 or (turno + 1) % 5 == 0:
+            print(f"{turno + 1:>6} {sem_hook[0][turno]:>10} {com_hook[0][turno]:>10}")
+
+    print(f"\n{'':<28} {'sem hook':>10} {'com hook':>10}")
+    print(f"{'maior prompt (tokens)':<28} {max(sem_hook[0]):>10} {max(com_hook[0]):>10}")
+    print(f"{'tokens na conversa':<28} {sem_hook[1]:>10} {com_hook[1]:>10}")
+    print(f"{'mensagens no estado':<28} {sem_hook[2]:>10} {com_hook[2]:>10}")
+    print(f"{'tempo (s)':<28} {sem_hook[3]:>10.2f} {com_hook[3]:>10.2f}")
+    print(f"\nTokens na conversa: -{100 * (1 - com_hook[1] / sem_hook[1]):.1f}%")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
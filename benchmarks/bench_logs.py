@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Benchmark da latência das tools com log ligado, em alta concorrência.
+
+Roda N conversas simultâneas (asyncio) chamando transferir_humano.ainvoke com
+um contexto de conversa realista (CNPJ, e-mail e telefone no texto) e mede a
+latência por chamada (p50/p99) e a vazão em quatro modos:
+  - desligado: LOG_NIVEL=CRITICAL
+  - print: o comportamento antigo, print() do contexto sem redação
+  - sincrono: o JSON redigido escrito na própria tool (handler sem fila)
+  - fila: agent/logs.py, QueueHandler com buffer limitado e QueueListener
+
+A saída simula um stdout/driver de logs lento: --atraso-saida ms por escrita.
+Com a fila, a tool não espera a saída; se o buffer (--buffer) enche, os
+eventos excedentes são descartados (coluna descartados).
+
+Exemplos:
+  python benchmarks/bench_logs.py
+  python benchmarks/bench_logs.py --concorrencia 1,64,256 --chamadas 20 --atraso-saida 2 --buffer 1000
+"""
+
+import argparse
+import asyncio
+import io
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from agent import tools
+from agent.logs import FormatoJSON, _obter_pipeline, _reset_logs, logs_stats
+from agent.tools import transferir_humano
+
+CONTEXTO = (
+    "Cliente Lanchonete Sabor Divino LTDA, CNPJ 01.248.526/0001-58, contato financeiro@sabordivino.com.br, "
+    "telefone (11) 98765-4321. Pediu a segunda via do boleto de junho, mas contesta a multa: "
+    "diz que pagou em 12/06 pelo PIX e enviou o comprovante. Já recebeu duas segundas vias nesta semana. "
+) * 4
+
+
+class SaidaLenta(io.TextIOBase):
+    """Destino de escrita com atraso fixo por write(), como um pipe de logs congestionado."""
+
+    def __init__(self, atraso: float):
+        self.atraso = atraso
+        self.escritas = 0
+
+    def write(self, texto):
+        time.sleep(self.atraso)
+        self.escritas += 1
+        return len(texto)
+
+    def flush(self):
+        pass
+
+
+def percentil(amostras, p):
+    ordenadas = sorted(amostras)
+    indice = min(len(ordenadas) - 1, int(round(p / 100 * (len(ordenadas) - 1))))
+    return ordenadas[indice]
+
+
+def preparar(modo: str, saida: SaidaLenta, buffer: int):
+    """Configura o log do modo; retorna a função de restauração."""
+    _reset_logs()
+    os.environ["LOG_NIVEL"] = "CRITICAL" if modo == "desligado" else "INFO"
+    os.environ["LOG_BUFFER"] = str(buffer)
+    # Só o log: sem a gravação do ticket no Postgres
+    os.environ["TICKETS_FILA"] = "false"
+    registrar_original, stderr = tools.registrar, sys.stderr
+    direto = None
+
+    if modo == "print":
+        def registrar_com_print(evento, nivel=logging.INFO, **campos):
+            print(campos.get("contexto", evento), file=saida)
+
+        tools.registrar = registrar_com_print
+    else:
+        sys.stderr = saida
+        pipeline = _obter_pipeline()
+        if modo == "sincrono":
+            pipeline.logger.removeHandler(pipeline.handler)
+            direto = logging.StreamHandler(saida)
+            direto.setFormatter(FormatoJSON())
+            pipeline.logger.addHandler(direto)
+
+    def restaurar():
+        tools.registrar = registrar_original
+        if direto is not None:
+            logging.getLogger(pipeline.logger.name).removeHandler(direto)
+        stats = logs_stats()
+        _reset_logs()
+        sys.stderr = stderr
+        return stats
+
+    return restaurar
+
+
+async def medir(concorrencia: int, chamadas: int):
+    latencias = []
+
+    async def conversa():
+        for _ in range(chamadas):
+            inicio = time.perf_counter()
+            await transferir_humano.ainvoke({"input": {"contexto": CONTEXTO}})
+            latencias.append(time.perf_counter() - inicio)
+            await asyncio.sleep(0)
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(conversa() for _ in range(concorrencia)))
+    return latencias, time.perf_counter() - inicio
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark das tools com log ligado")
+    parser.add_argument("--concorrencia", default="1,16,64,256", help="Conversas simultâneas, separadas por vírgula")
+    parser.add_argument("--chamadas", type=int, default=10, help="Chamadas de transferir_humano por conversa (default: 10)")
+    parser.add_argument("--atraso-saida", type=float, default=1.0, help="ms por escrita na saída (default: 1)")
+    parser.add_argument("--buffer", type=int, default=10000, help="LOG_BUFFER do modo fila (default: 10000)")
+    args = parser.parse_args(argv)
+
+    print(f"Saída com {args.atraso_saida:g} ms por escrita | buffer {args.buffer} | {args.chamadas} chamadas por conversa\n")
+    print(f"{'modo':<10} {'conc.':>6} {'chamadas/s':>11} {'p50 ms':>8} {'p99 ms':>8} {'escritas':>9} {'descartados':>12}")
+    restaurar = preparar("desligado", SaidaLenta(0), args.buffer)
+    asyncio.run(medir(1, 50))
+    restaurar()
+    for concorrencia in [int(n) for n in args.concorrencia.split(",")]:
+        for modo in ("desligado", "print", "sincrono", "fila"):
+            saida = SaidaLenta(args.atraso_saida / 1000)
+            restaurar = preparar(modo, saida, args.buffer)
+            try:
+                latencias, duracao = asyncio.run(medir(concorrencia, args.chamadas))
+            finally:
+                stats = restaurar()
+            ms = [t * 1000 for t in latencias]
+            print(
+                f"{modo:<10} {concorrencia:>6} {len(latencias) / duracao:>11.0f} {percentil(ms, 50):>8.2f} "
+                f"{percentil(ms, 99):>8.2f} {saida.escritas:>9} {stats['logs_descartados']:>12}"
+            )
+        print()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
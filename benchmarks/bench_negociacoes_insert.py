@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Benchmark da gravação de negociações: INSERT unitário vs. gravação em lote.
+
+Usa o Postgres configurado pelas variáveis DB_* (aplica sql/02, sql/07 e sql/08
+e esvazia a tabela negociacoes) e mede as linhas por segundo de cada modo:
+  - unitário: um INSERT e um COMMIT por negociação (registrar_negociacao síncrona)
+  - executemany: INSERTs em uma transação por lote (pipeline do psycopg)
+  - COPY: um COPY por lote via tabela temporária (agent.write_behind.gravar_negociacoes)
+  - write-behind: latência de registrar_negociacao só enfileirando, com e sem spool
+
+Exemplos:
+  python benchmarks/bench_negociacoes_insert.py
+  python benchmarks/bench_negociacoes_insert.py --linhas 20000 --lote 500
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from agent.tools import _INSERT_NEGOCIACAO
+from agent.utils import _conn
+from agent.write_behind import FilaNegociacoes, _linha_negociacao, gravar_negociacoes
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+CNPJ = "01248526000158"
+
+
+def preparar_banco():
+    with _conn() as conn:
+        conn.execute((REPO_ROOT / "sql" / "02_create_tables.sql").read_text(encoding="utf-8").split("-- Trigger")[0])
+        for migracao in ("07_negociacoes_keyset_index.sql", "08_negociacoes_id_externo.sql"):
+            conn.execute((REPO_ROOT / "sql" / migracao).read_text(encoding="utf-8"))
+        conn.execute("TRUNCATE negociacoes RESTART IDENTITY")
+
+
+def gerar_linhas(n):
+    return [_linha_negociacao(CNPJ, f"Parcelamento em {i % 12 + 1}x com entrada de 10%") for i in range(n)]
+
+
+def lotes(linhas, tamanho):
+    for inicio in range(0, len(linhas), tamanho):
+        yield linhas[inicio:inicio + tamanho]
+
+
+def gravar_unitario(linhas, _):
+    for linha in linhas:
+        with _conn() as conn:
+            conn.execute(_INSERT_NEGOCIACAO, (linha["id_externo"], linha["cnpj"], linha["detalhes"]))
+            conn.commit()
+
+
+def gravar_executemany(linhas, tamanho):
+    for lote in lotes(linhas, tamanho):
+        with _conn() as conn:
+            with conn.cursor() as cur:
+                cur.executemany(_INSERT_NEGOCIACAO, [(l["id_externo"], l["cnpj"], l["detalhes"]) for l in lote])
+
+
+def gravar_copy(linhas, tamanho):
+    for lote in lotes(linhas, tamanho):
+        with _conn() as conn:
+            gravar_negociacoes(conn, lote)
+
+
+def medir_gravacao(nome, funcao, n, tamanho):
+    preparar_banco()
+    linhas = gerar_linhas(n)
+    inicio = time.perf_counter()
+    funcao(linhas, tamanho)
+    duracao = time.perf_counter() - inicio
+    with _conn() as conn:
+        gravadas = conn.execute("SELECT count(*) FROM negociacoes").fetchone()[0]
+    assert gravadas == n, f"{nome}: {gravadas} de {n} linhas"
+    print(f"{nome:<22} {n:>7} linhas  {duracao:8.3f}s  {n / duracao:>10.0f} linhas/s")
+    return n / duracao
+
+
+def medir_enfileirar(nome, n, tamanho, spool_path=None):
+    preparar_banco()
+    fila = FilaNegociacoes(lote=tamanho, intervalo=0.05, spool_path=spool_path)
+    latencias = []
+    for i in range(n):
+        inicio = time.perf_counter()
+        fila.enfileirar(CNPJ, f"Parcelamento em {i % 12 + 1}x com entrada de 10%")
+        latencias.append(time.perf_counter() - inicio)
+    fila.fechar()
+    ordenadas = sorted(latencias)
+    p99 = ordenadas[min(len(ordenadas) - 1, int(0.99 * len(ordenadas)))]
+    print(
+        f"{nome:<22} {n:>7} chamadas  p50 {statistics.median(latencias) * 1e6:7.1f}µs  "
+        f"p99 {p99 * 1e6:8.1f}µs  gravadas {fila.gravadas} em {fila.lotes} lotes"
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark da gravação de negociações")
+    parser.add_argument("--linhas", type=int, default=5000, help="Negociações por modo (default: 5000)")
+    parser.add_argument("--lote", type=int, default=500, help="Linhas por lote (default: 500)")
+    args = parser.parse_args(argv)
+
+    print(f"Gravação de {args.linhas} negociações (lotes de {args.lote})\n")
+    unitario = medir_gravacao("unitário", gravar_unitario, args.linhas, args.lote)
+    executemany = medir_gravacao("executemany", gravar_executemany, args.linhas, args.lote)
+    copy = medir_gravacao("COPY", gravar_copy, args.linhas, args.lote)
+    print(f"\nexecutemany: {executemany / unitario:.1f}x | COPY: {copy / unitario:.1f}x o INSERT unitário\n")
+
+    medir_enfileirar("write-behind", args.linhas, args.lote)
+    with tempfile.TemporaryDirectory() as diretorio:
+        medir_enfileirar("write-behind + spool", args.linhas, args.lote, os.path.join(diretorio, "negociacoes.spool"))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Benchmark do custo da telemetria (agent/telemetry.py) no caminho quente.
+
+Mede em três modos — desligada (TELEMETRIA_ENABLED=false), só métricas (o
+padrão: histogramas, sem tracing) e tracing para arquivo JSONL:
+  - custo de um span vazio, em µs, descontado o laço sem span
+  - custo por chamada de consulta_financeira com o Asaas reproduzido do cassete
+    de tests/fixtures/cassetes sem latência (3 spans "asaas" e 1 "tool" por
+    chamada, caches das tools limpos a cada chamada)
+
+O orçamento é de 5 µs por span com o tracing desligado; o script termina com
+código 1 se o modo só métricas passar dele. Na consulta, 4 spans somam ~12 µs
+em uma chamada de milissegundos: a diferença entre os modos fica no ruído.
+
+Exemplos:
+  python benchmarks/bench_telemetria.py
+  python benchmarks/bench_telemetria.py --spans 1000000 --chamadas 5000
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import nullcontext
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from agent.cassette import _reset_cassete
+from agent.telemetry import _reset_telemetria, exportar_prometheus, span
+from agent.tools import _clientes_cache, _ids_clientes_cache, _pendencias_cache, consulta_financeira
+from agent.utils import _reset_asaas_resiliencia, _reset_asaas_session
+
+ORCAMENTO_US = 5.0
+RODADAS = 5
+CASSETE = Path(__file__).resolve().parents[1] / "tests" / "fixtures" / "cassetes" / "asaas.json"
+
+
+def configurar(modo: str, arquivo_spans: str):
+    os.environ["TELEMETRIA_ENABLED"] = "false" if modo == "desligada" else "true"
+    os.environ["TELEMETRIA_TRACING"] = "true" if modo == "tracing" else "false"
+    os.environ["TELEMETRIA_SPANS_ARQUIVO"] = arquivo_spans
+    _reset_telemetria()
+
+
+def custo_por_span(n: int, repeticoes: int = 5) -> float:
+    """Menor tempo por iteração (µs) de um span vazio, em `repeticoes` rodadas de n spans."""
+    medidas = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        for _ in range(n):
+            with span("bench", tool="consulta_financeira"):
+                pass
+        medidas.append((time.perf_counter() - inicio) / n * 1e6)
+    return min(medidas)
+
+
+def custo_sem_span(n: int, repeticoes: int = 5) -> float:
+    medidas = []
+    contexto = nullcontext()
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        for _ in range(n):
+            with contexto:
+                pass
+        medidas.append((time.perf_counter() - inicio) / n * 1e6)
+    return min(medidas)
+
+
+def custo_da_tool(chamadas: int) -> list[float]:
+    """Tempos por chamada de consulta_financeira (µs), Asaas reproduzido sem latência."""
+    amostras = []
+    for _ in range(chamadas):
+        _clientes_cache.clear()
+        _ids_clientes_cache.clear()
+        _pendencias_cache.clear()
+        inicio = time.perf_counter()
+        saida = consulta_financeira.invoke({"input": {"cnpj": "01248526000158"}})
+        amostras.append((time.perf_counter() - inicio) * 1e6)
+        if saida.status != "sucesso":
+            raise RuntimeError(saida.mensagem)
+    return amostras
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark do custo da telemetria")
+    parser.add_argument("--spans", type=int, default=200_000, help="Spans por rodada do micro benchmark (default: 200000)")
+    parser.add_argument("--chamadas", type=int, default=2000, help="Chamadas de consulta_financeira por modo (default: 2000)")
+    args = parser.parse_args(argv)
+
+    os.environ.update({
+        "ASAAS_API_KEY": "cassete",
+        "ASAAS_BASE_URL": "http://asaas.cassete/v3",
+        "ASAAS_CASSETE": str(CASSETE),
+        "ASAAS_CASSETE_MODO": "reproduzir",
+        "ASAAS_CASSETE_LATENCIA": "0",
+        "ASAAS_RATE_LIMIT": "1000000",
+        "ASAAS_RATE_BURST": "1000000",
+    })
+    _reset_asaas_session()
+    _reset_asaas_resiliencia()
+    _reset_cassete()
+
+    modos = ("desligada", "metricas", "tracing")
+    base = custo_sem_span(args.spans)
+    por_span, tool = {}, {modo: [] for modo in modos}
+    with tempfile.TemporaryDirectory() as pasta:
+        arquivo = os.path.join(pasta, "spans.jsonl")
+        for modo in modos:
+            configurar(modo, arquivo)
+            por_span[modo] = custo_por_span(args.spans if modo != "tracing" else max(1, args.spans // 10)) - base
+        # Os modos se alternam em rodadas, para a deriva da máquina não pesar em um só
+        custo_da_tool(50)
+        for _ in range(RODADAS):
+            for modo in modos:
+                configurar(modo, arquivo)
+                tool[modo] += custo_da_tool(max(1, args.chamadas // RODADAS))
+                if modo == "metricas":
+                    series = exportar_prometheus().count("_count{")
+        linhas_de_span = sum(1 for _ in open(arquivo, encoding="utf-8"))
+    configurar("metricas", "")
+    resultados = {modo: (por_span[modo], statistics.median(tool[modo])) for modo in modos}
+
+    print(f"Laço sem span: {base:.3f} µs | séries no export Prometheus (só métricas): {series}\n")
+    print(f"{'modo':<12} {'µs/span':>9} {'consulta µs':>12} {'overhead':>9}")
+    referencia = resultados["desligada"][1]
+    for modo, (us_span, us_consulta) in resultados.items():
+        print(f"{modo:<12} {us_span:>9.3f} {us_consulta:>12.1f} {100 * (us_consulta / referencia - 1):>8.1f}%")
+    print(f"\nSpans gravados no modo tracing: {linhas_de_span}")
+
+    dentro = resultados["metricas"][0] <= ORCAMENTO_US
+    print(f"Orçamento com tracing desligado: {ORCAMENTO_US} µs/span -> {'ok' if dentro else 'ESTOURADO'}")
+    return 0 if dentro else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
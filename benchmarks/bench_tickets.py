@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Benchmark da fila de tickets de atendimento humano (agent/tickets.py).
+
+Usa o Postgres configurado pelas variáveis DB_* (aplica sql/11 e esvazia a
+tabela tickets). Para cada tamanho de fila (--abertos tickets já abertos, com
+valores em atraso variados, mais os das operações medidas) mede vazão e
+latência (p50/p99) de:
+  - abrir: aabrir_ticket em --conexoes tarefas simultâneas, uma thread por ticket
+  - assumir: aassumir_ticket em --conexoes atendentes simultâneos
+    (FOR UPDATE SKIP LOCKED, como em produção)
+  - assumir sem SKIP LOCKED: a mesma query só com FOR UPDATE; os atendentes
+    disputam o mesmo ticket do topo da fila e quem perde volta sem nenhum
+    (coluna vazias) e tenta de novo
+
+Com o índice parcial idx_tickets_fila, abrir e assumir devem ficar estáveis
+de centenas a dezenas de milhares de tickets abertos.
+
+Exemplos:
+  python benchmarks/bench_tickets.py
+  python benchmarks/bench_tickets.py --abertos 0,10000,100000 --operacoes 5000 --conexoes 32
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from agent.tickets import _ASSUMIR_TICKET, aabrir_ticket, aassumir_ticket
+from agent.utils import _aconn, _conn, _get_async_db_pool
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+CONTEXTO = "Cliente pediu parcelamento especial das mensalidades em atraso e quer falar com o financeiro."
+
+# Prazos e prioridades das faixas padrão de TICKETS_SLA, distribuídos pelos tickets pré-abertos
+_ENCHER = """
+INSERT INTO tickets (id, thread_id, cnpj, contexto, valor_em_atraso, prioridade, prazo_atendimento)
+SELECT gen_random_uuid(), NULL, '01248526000158', %s, (i * 37) %% 8000,
+       CASE WHEN (i * 37) %% 8000 >= 5000 THEN 2 WHEN (i * 37) %% 8000 >= 500 THEN 1 ELSE 0 END,
+       CURRENT_TIMESTAMP + make_interval(mins => CASE WHEN (i * 37) %% 8000 >= 5000 THEN 15
+                                                     WHEN (i * 37) %% 8000 >= 500 THEN 60 ELSE 240 END)
+FROM generate_series(1, %s) AS i
+"""
+
+_ASSUMIR_SEM_SKIP_LOCKED = _ASSUMIR_TICKET.replace("FOR UPDATE SKIP LOCKED", "FOR UPDATE")
+
+
+def percentil(amostras, p):
+    ordenadas = sorted(amostras)
+    indice = min(len(ordenadas) - 1, int(round(p / 100 * (len(ordenadas) - 1))))
+    return ordenadas[indice]
+
+
+def preparar_banco():
+    with _conn() as conn:
+        conn.execute((REPO_ROOT / "sql" / "11_create_tickets.sql").read_text(encoding="utf-8"))
+        conn.execute("TRUNCATE tickets")
+
+
+def encher(quantidade: int):
+    if quantidade:
+        with _conn() as conn:
+            conn.execute(_ENCHER, (CONTEXTO, quantidade))
+            conn.execute("ANALYZE tickets")
+
+
+async def _assumir_sem_skip_locked(atendente: str):
+    async with _aconn() as conn:
+        cur = await conn.execute(_ASSUMIR_SEM_SKIP_LOCKED, (atendente,))
+        return await cur.fetchone()
+
+
+async def medir(operacao: str, conexoes: int, total: int, nivel: int):
+    """Executa `total` operações em `conexoes` tarefas; retorna (latências ok, vazias, duração, ids)."""
+    latencias, ids = [], []
+    vazias = 0
+    restantes = total
+
+    async def tarefa(numero: int):
+        nonlocal restantes, vazias
+        while restantes > 0:
+            restantes -= 1
+            while True:
+                inicio = time.perf_counter()
+                if operacao == "abrir":
+                    resultado = await aabrir_ticket(CONTEXTO, "01248526000158", f"bench-{nivel}-{numero}-{len(ids)}", 750.0)
+                elif operacao == "assumir":
+                    resultado = await aassumir_ticket(f"atendente-{numero}")
+                else:
+                    resultado = await _assumir_sem_skip_locked(f"atendente-{numero}")
+                if resultado is not None:
+                    break
+                vazias += 1
+            latencias.append(time.perf_counter() - inicio)
+            if operacao == "assumir":
+                resultado = resultado["id"]
+            elif operacao != "abrir":
+                resultado = str(resultado[0])
+            ids.append(resultado)
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(tarefa(n) for n in range(conexoes)))
+    return latencias, vazias, time.perf_counter() - inicio, ids
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark da fila de tickets de atendimento humano")
+    parser.add_argument("--abertos", default="0,1000,10000,50000", help="Tickets já abertos na fila, separados por vírgula")
+    parser.add_argument("--operacoes", type=int, default=2000, help="Aberturas e assunções medidas por nível (default: 2000)")
+    parser.add_argument("--conexoes", type=int, default=16, help="Tarefas simultâneas e tamanho do pool (default: 16)")
+    args = parser.parse_args(argv)
+
+    # Uma conexão por tarefa (o pool assíncrono é criado dentro de asyncio.run):
+    # a medida é da fila, não da espera pelo pool
+    os.environ["DB_POOL_MIN_SIZE"] = os.environ["DB_POOL_MAX_SIZE"] = str(args.conexoes)
+
+    async def rodar():
+        resultados = []
+        await _get_async_db_pool()
+        for abertos in [int(n) for n in args.abertos.split(",")]:
+            preparar_banco()
+            encher(abertos)
+            for operacao in ("abrir", "assumir", "assumir sem SKIP LOCKED"):
+                if operacao == "assumir sem SKIP LOCKED":
+                    # Repõe os tickets assumidos na rodada anterior
+                    encher(args.operacoes)
+                latencias, vazias, duracao, ids = await medir(operacao, args.conexoes, args.operacoes, abertos)
+                if len(set(ids)) != len(ids):
+                    raise RuntimeError(f"{operacao}: ticket entregue a dois atendentes")
+                resultados.append((abertos, operacao, latencias, vazias, duracao))
+        await (await _get_async_db_pool()).close()
+        return resultados
+
+    resultados = asyncio.run(rodar())
+
+    print(f"{args.operacoes} operações por nível | {args.conexoes} conexões simultâneas\n")
+    print(f"{'abertos':>8} {'operação':<24} {'ops/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'vazias':>7}")
+    for abertos, operacao, latencias, vazias, duracao in resultados:
+        ms = [t * 1000 for t in latencias]
+        print(
+            f"{abertos:>8} {operacao:<24} {len(latencias) / duracao:>8.0f} {percentil(ms, 50):>8.2f} "
+            f"{percentil(ms, 99):>8.2f} {vazias:>7}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
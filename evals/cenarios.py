@@ -0,0 +1,31 @@
+"""
+Cenários de conversa usados pela avaliação de conformidade e pelos benchmarks.
+
+Os cenários ficam em um dataset (evals/cenarios.yaml por padrão, ou JSONL com
+um cenário por linha), com os campos name, messages e, opcionalmente, esperado.
+"""
+
+import json
+from pathlib import Path
+
+import yaml
+
+CENARIOS_PADRAO = Path(__file__).with_name("cenarios.yaml")
+
+
+def carregar_cenarios(caminho: str | Path | None = None) -> list[dict]:
+    """Carrega os cenários de um arquivo YAML (lista) ou JSONL (um cenário por linha)."""
+    caminho = Path(caminho or CENARIOS_PADRAO)
+    texto = caminho.read_text(encoding="utf-8")
+    if caminho.suffix == ".jsonl":
+        cenarios = [json.loads(linha) for linha in texto.splitlines() if linha.strip()]
+    else:
+        cenarios = yaml.safe_load(texto) or []
+
+    for i, cenario in enumerate(cenarios, 1):
+        if not cenario.get("name") or not cenario.get("messages"):
+            raise ValueError(f"{caminho}: cenário {i} sem name ou messages")
+    return cenarios
+
+
+CENARIOS = carregar_cenarios()
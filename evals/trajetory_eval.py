@@ -2,11 +2,34 @@
 """
 Script Simplificado de Avaliação NEXUZ
 Testa conformidade do agente financeiro Fernanda
+
+Os cenários vêm de um dataset (evals/cenarios.yaml, ou outro YAML/JSONL com
+--cenarios) e rodam em paralelo (--workers), cada um em sua thread do agente,
+com ainvoke. Os vereditos do juiz ficam em cache (SQLite em --cache-juiz),
+indexados pelo hash de (trajetória, prompt do juiz): rodar de novo uma
+trajetória idêntica não chama o juiz.
+
+Com --offline, o agente usa o modelo roteirizado de tests/fake_llm.py, as
+tools falam com o servidor fake do Asaas (tests/fake_asaas.py) e o Postgres
+local (variáveis DB_*), e o juiz confere as ferramentas chamadas com o campo
+esperado de cada cenário: a execução é reproduzível e não usa a OpenAI.
+
+Exemplos:
+  python evals/trajetory_eval.py
+  python evals/trajetory_eval.py --workers 8 --cenarios evals/cenarios.yaml
+  python evals/trajetory_eval.py --offline
 """
 
+import argparse
+import asyncio
+import hashlib
 import json
 import os
 import sys
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
 from dotenv import load_dotenv
@@ -18,9 +41,8 @@ sys.path.insert(0, str(project_root))
 # Carregar variáveis de ambiente
 load_dotenv()
 
+from langgraph.checkpoint.memory import InMemorySaver
 from langgraph.prebuilt import create_react_agent
-from langchain_openai import ChatOpenAI
-from agentevals.trajectory.llm import create_trajectory_llm_as_judge
 
 # Importar dependências do agente
 from agent.tools import (
@@ -29,42 +51,132 @@ from agent.tools import (
     validar_comprovante,
     transferir_humano,
     registrar_negociacao,
-    verificar_negociacao
+    verificar_negociacao,
+    detalhar_registro,
 )
+from agent.cache import SQLiteCacheStore, TTLCache
+from agent.checkpoint import acriar_checkpointer
+from agent.compact import formato_compacto
+from agent.history import criar_pre_model_hook
 from agent.prompt import basic_prompt
+from agent.router import com_roteador, roteador_stats
+from agent.utils import _asaas_request_count
+from evals.cenarios import carregar_cenarios
+
+CACHE_JUIZ_PADRAO = str(project_root / "evals" / ".cache_juiz.sqlite3")
+# Um veredito só muda se a trajetória ou o prompt do juiz mudarem (ambos estão na chave)
+TTL_VEREDITO = 90 * 86400
+
+
+def chave_veredito(trajetoria: list[dict], prompt: str) -> str:
+    """SHA-256 de (trajetória, prompt do juiz), em JSON canônico."""
+    texto = json.dumps([trajetoria, prompt], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+
+async def juiz_por_regras(trajetoria: list[dict], cenario: dict) -> dict:
+    """Juiz determinístico do modo offline: as ferramentas de `esperado` foram chamadas, nesta ordem?
+
+    Sem ferramentas esperadas, o cenário só é conforme se nenhuma ferramenta for chamada.
+    """
+    esperado = cenario.get("esperado") or []
+    chamadas = [nome for turno in trajetoria for nome in turno.get("tools_called", [])]
+    if not esperado:
+        conforme = not chamadas
+    else:
+        restantes = iter(chamadas)
+        conforme = all(nome in restantes for nome in esperado)
+    return {
+        "score": conforme,
+        "reasoning": f"Esperado: {esperado or 'nenhuma ferramenta'} | Chamadas: {chamadas or 'nenhuma'}",
+    }
+
+
+@contextmanager
+def ambiente_offline(pagamentos: int = 24):
+    """Sobe o servidor fake do Asaas com o cliente dos cenários e aponta as tools para ele."""
+    from tests.fake_asaas import FakeAsaasServer, gerar_cliente, gerar_pagamentos
+
+    anteriores = {chave: os.environ.get(chave) for chave in ("ASAAS_API_KEY", "ASAAS_BASE_URL")}
+    with FakeAsaasServer() as server:
+        server.adicionar_cliente(gerar_cliente(), gerar_pagamentos("cus_000000000001", pagamentos))
+        os.environ["ASAAS_API_KEY"] = "eval_offline"
+        os.environ["ASAAS_BASE_URL"] = server.base_url
+        try:
+            yield server
+        finally:
+            for chave, valor in anteriores.items():
+                if valor is None:
+                    os.environ.pop(chave, None)
+                else:
+                    os.environ[chave] = valor
 
-class NexuzEvaluator:
-    def __init__(self, model_name="gpt-5-nano"):
-        """Inicializa o avaliador NEXUZ"""
-
-        # Configurar agente
-        self.model = ChatOpenAI(
-            model=model_name,
-            output_version="responses/v1",
-            reasoning={"effort": "low"},
-            verbosity="low"
-        )
-        self.agent = create_react_agent(
-            self.model,
-            prompt=basic_prompt,
-            tools=[
-                consulta_financeira,
-                atualizar_boleto,
-                validar_comprovante,
-                transferir_humano,
-                registrar_negociacao,
-                verificar_negociacao
-            ],
-        )
 
-        # Configurar avaliador
-        self.evaluator = create_trajectory_llm_as_judge(
+class NexuzEvaluator:
+    def __init__(self, model_name="gpt-5-nano", model=None, juiz=None, workers=4, cache_juiz=CACHE_JUIZ_PADRAO):
+        """Inicializa o avaliador NEXUZ
+
+        Args:
+            model_name: modelo da OpenAI do agente e do juiz LLM
+            model: modelo de chat do agente (ex.: o roteirizado do modo offline); padrão ChatOpenAI
+            juiz: corrotina (trajetoria, cenario) -> {"score", "reasoning"}; padrão o juiz LLM
+            workers: cenários executados ao mesmo tempo
+            cache_juiz: arquivo SQLite do cache de vereditos (None desliga o cache)
+        """
+        if model is None:
+            from langchain_openai import ChatOpenAI
+
+            model = ChatOpenAI(
+                model=model_name,
+                output_version="responses/v1",
+                reasoning={"effort": "low"},
+                verbosity="low"
+            )
+        self.model = model
+        self.model_name = model_name
+        self.tools = [
+            consulta_financeira,
+            atualizar_boleto,
+            validar_comprovante,
+            transferir_humano,
+            registrar_negociacao,
+            verificar_negociacao,
+            *([detalhar_registro] if formato_compacto() else []),
+        ]
+        self.workers = workers
+
+        # Configurar avaliador; o prompt (com a identificação do juiz) entra na chave do cache
+        if juiz is None:
+            self.juiz = self._criar_juiz_llm(model_name)
+            self.prompt_juiz = f"openai:{model_name}\n{self._get_evaluation_prompt()}"
+        else:
+            self.juiz = juiz
+            self.prompt_juiz = getattr(juiz, "__name__", repr(juiz))
+        self.cache_juiz = None
+        if cache_juiz:
+            store = SQLiteCacheStore(cache_juiz, "cache_juiz")
+            self.cache_juiz = TTLCache("juiz", ttl=TTL_VEREDITO, maxsize=10_000, store=store)
+
+    def _criar_juiz_llm(self, model_name):
+        """Juiz LLM assíncrono do agentevals, adaptado para a assinatura (trajetoria, cenario)."""
+        from agentevals.trajectory.llm import create_async_trajectory_llm_as_judge
+
+        avaliador = create_async_trajectory_llm_as_judge(
             model=f"openai:{model_name}",
             prompt=self._get_evaluation_prompt(),
             continuous=False,
             use_reasoning=True
         )
 
+        async def juiz_llm(trajetoria, cenario):
+            evaluation = await avaliador(outputs=trajetoria)
+            return {
+                "score": bool(evaluation.get("score", False)),
+                "reasoning": evaluation.get("comment") or evaluation.get("reasoning") or "Sem explicação",
+            }
+
+        return juiz_llm
+
     def _get_evaluation_prompt(self):
         """Prompt simplificado para avaliação"""
         return """
@@ -88,47 +200,85 @@ class NexuzEvaluator:
         Conversa: {outputs}
         """
 
-    def test_scenario(self, user_messages, scenario_name):
-        """Testa um cenário específico"""
+    async def _criar_agente(self):
+        """Grafo do agente; criado dentro do event loop por causa do checkpointer assíncrono."""
+        return com_roteador(
+            create_react_agent(
+                self.model,
+                prompt=basic_prompt,
+                tools=self.tools,
+                pre_model_hook=criar_pre_model_hook(basic_prompt),
+            ),
+            self.tools,
+            # O histórico de cada cenário fica no checkpoint da sua thread
+            checkpointer=await acriar_checkpointer() or InMemorySaver(),
+        )
 
-        print(f"\n🔍 Teste: {scenario_name}")
-        print("-" * 50)
+    async def _avaliar(self, trajetoria, cenario):
+        """Veredito do juiz para a trajetória, pelo cache quando a mesma trajetória já foi julgada."""
+        chave = chave_veredito(trajetoria, f"{self.prompt_juiz}\n{json.dumps(cenario.get('esperado'))}")
+        if self.cache_juiz is not None:
+            veredito = await self.cache_juiz.aget(chave)
+            if veredito is not None:
+                return veredito, True
+        veredito = await self.juiz(trajetoria, cenario)
+        if self.cache_juiz is not None:
+            await self.cache_juiz.aset(chave, veredito)
+        return veredito, False
+
+    async def atest_scenario(self, agent, cenario):
+        """Testa um cenário específico; a saída é impressa de uma vez ao fim, sem misturar com os outros cenários"""
+        scenario_name = cenario["name"]
+        log = [f"\n🔍 Teste: {scenario_name}", "-" * 50]
 
         # Configurar thread
-        thread_id = f"test_{datetime.now().strftime('%H%M%S')}"
+        thread_id = f"test_{datetime.now().strftime('%H%M%S')}_{uuid.uuid4().hex[:8]}"
         config = {"configurable": {"thread_id": thread_id}}
 
         # Executar conversa
         trajectory = []
-        conversation_history = []
-
-        for i, user_msg in enumerate(user_messages):
-            print(f"Cliente: {user_msg}")
-
-            # Adicionar mensagem do usuário ao histórico
-            conversation_history.append({"role": "user", "content": user_msg})
+        mensagens_no_estado = 0
+        tokens_entrada = 0
+        tokens_saida = 0
+        chamadas_modelo = 0
+        ferramentas = Counter()
+        inicio = time.perf_counter()
+
+        for user_msg in cenario["messages"]:
+            log.append(f"Cliente: {user_msg}")
             trajectory.append({"role": "user", "content": user_msg})
 
-            # Chamar agente com todo o histórico
-            result = self.agent.invoke(
-                {"messages": conversation_history},
-                config=config
+            # Chamar agente só com a nova mensagem; o histórico vem do checkpoint da thread
+            # (durability="exit": o checkpoint é gravado uma vez, ao fim do turno)
+            result = await agent.ainvoke(
+                {"messages": [{"role": "user", "content": user_msg}]},
+                config=config,
+                durability="exit"
             )
 
-            # Extrair todas as mensagens do agente (incluindo chamadas de ferramentas)
-            agent_messages = result["messages"][len(conversation_history):]
+            # Extrair todas as mensagens do agente (incluindo chamadas de ferramentas),
+            # que vêm depois do estado anterior e da mensagem do usuário
+            agent_messages = result["messages"][mensagens_no_estado + 1:]
+            mensagens_no_estado = len(result["messages"])
 
             full_response = ""
             tools_called = []
 
             for msg in agent_messages:
+                # Tokens de cada chamada ao modelo
+                usage = getattr(msg, 'usage_metadata', None) or {}
+                if usage:
+                    chamadas_modelo += 1
+                tokens_entrada += usage.get('input_tokens', 0)
+                tokens_saida += usage.get('output_tokens', 0)
+
                 if hasattr(msg, 'tool_calls') and msg.tool_calls:
                     # Capturar chamadas de ferramentas
                     for tool_call in msg.tool_calls:
                         tools_called.append(tool_call['name'])
                         full_response += f"[FERRAMENTA: {tool_call['name']}] "
 
-                if hasattr(msg, 'content') and msg.content:
+                if hasattr(msg, 'content') and msg.content and getattr(msg, 'type', None) == "ai":
                     # Extrair conteúdo de texto
                     if isinstance(msg.content, list):
                         text_blocks = [block for block in msg.content if block.get("type") == "text"]
@@ -138,110 +288,161 @@ class NexuzEvaluator:
 
                     full_response += text_content
 
-            print(f"Fernanda: {full_response}")
+            ferramentas.update(tools_called)
+            log.append(f"Fernanda: {full_response}")
             if tools_called:
-                print(f"Ferramentas chamadas: {', '.join(tools_called)}")
+                log.append(f"Ferramentas chamadas: {', '.join(tools_called)}")
 
-            # Adicionar resposta do agente ao histórico e trajetória
-            conversation_history.extend(agent_messages)
+            # Adicionar resposta do agente à trajetória
             trajectory.append({"role": "assistant", "content": full_response, "tools_called": tools_called})
+            log.append("-" * 30)
 
-            print("-" * 30)
+        latencia = time.perf_counter() - inicio
+        log.append(f"Tokens: {tokens_entrada} de entrada, {tokens_saida} de saída | Latência: {latencia:.1f}s")
 
         # Avaliar conformidade
-        print("Analisando atendimento...")
-        evaluation = self.evaluator(outputs=trajectory)
+        inicio_juiz = time.perf_counter()
+        evaluation, em_cache = await self._avaliar(trajectory, cenario)
+        tempo_juiz = time.perf_counter() - inicio_juiz
 
         # Exibir resultado
         is_compliant = evaluation.get("score", False)
         reasoning = evaluation.get("reasoning", "Sem explicação")
 
         status = "✅ APROVADO" if is_compliant else "❌ REPROVADO"
-        print(f"\nResultado: {status}")
-        print(f"Observações: {reasoning}")
-        print("=" * 50)
+        log.append(f"\nResultado: {status}{' (veredito em cache)' if em_cache else ''}")
+        log.append(f"Observações: {reasoning}")
+        log.append("=" * 50)
+        print("\n".join(log))
 
         return {
             "scenario": scenario_name,
             "is_compliant": is_compliant,
             "reasoning": reasoning,
+            "latencia_s": round(latencia, 3),
+            "tempo_juiz_s": round(tempo_juiz, 3),
+            "veredito_em_cache": em_cache,
+            "tokens_entrada": tokens_entrada,
+            "tokens_saida": tokens_saida,
+            "chamadas_modelo": chamadas_modelo,
+            "chamadas_ferramentas": sum(ferramentas.values()),
+            "ferramentas": dict(ferramentas),
+            "formato_saida": "compacto" if formato_compacto() else "padrao",
             "trajectory": trajectory
         }
 
-    def run_tests(self):
-        """Executa bateria de testes"""
+    async def arun_tests(self, cenarios=None):
+        """Executa a bateria de testes com até `workers` cenários ao mesmo tempo
 
-        scenarios = [
-            {
-                "name": "Segunda Via Simples",
-                "messages": [
-                    "Meu CNPJ é 01248526000158",
-                    "Preciso da segunda via do boleto"
-                ]
-            },
-            {
-                "name": "Transferir para Humano",
-                "messages": [
-                    "CNPJ: 01248526000158",
-                    "Tenho uma questão muito específica sobre meu contrato"
-                ]
-            },
-            {
-                "name": "❌ TESTE NEGATIVO - Sem CNPJ",
-                "messages": [
-                    "Preciso da segunda via do boleto"
-                ]
-            }
-        ]
+        Returns:
+            dict com o resumo da execução e os resultados, na ordem do dataset
+        """
+        cenarios = cenarios if cenarios is not None else carregar_cenarios()
 
         print("🚀 INICIANDO TESTES DE CONFORMIDADE")
+        print(f"{len(cenarios)} cenários | {self.workers} em paralelo")
         print("=" * 60)
 
-        results = []
-        for scenario in scenarios:
-            result = self.test_scenario(
-                scenario["messages"],
-                scenario["name"]
-            )
-            results.append(result)
+        agent = await self._criar_agente()
+        limite = asyncio.Semaphore(self.workers)
+        requisicoes_asaas_antes = _asaas_request_count()
+        desviados_antes = roteador_stats()["roteador_desviados"]
+        inicio = time.perf_counter()
+
+        async def executar(cenario):
+            async with limite:
+                return await self.atest_scenario(agent, cenario)
+
+        results = await asyncio.gather(*(executar(cenario) for cenario in cenarios))
+        duracao = time.perf_counter() - inicio
+
+        # Contadores globais do processo: com cenários em paralelo, só o total da execução é exato
+        relatorio = {
+            "resumo": {
+                "total": len(results),
+                "aprovados": sum(1 for r in results if r["is_compliant"]),
+                "workers": self.workers,
+                "duracao_s": round(duracao, 3),
+                "soma_latencias_s": round(sum(r["latencia_s"] for r in results), 3),
+                "vereditos_em_cache": sum(1 for r in results if r["veredito_em_cache"]),
+                "tokens_entrada": sum(r["tokens_entrada"] for r in results),
+                "tokens_saida": sum(r["tokens_saida"] for r in results),
+                "chamadas_ferramentas": sum(r["chamadas_ferramentas"] for r in results),
+                "requisicoes_asaas": _asaas_request_count() - requisicoes_asaas_antes,
+                "turnos_roteados": roteador_stats()["roteador_desviados"] - desviados_antes,
+            },
+            "resultados": list(results),
+        }
 
         # Relatório final
-        self._print_summary(results)
-        return results
+        self._print_summary(relatorio)
+        return relatorio
+
+    def run_tests(self, cenarios=None):
+        """Versão síncrona de arun_tests"""
+        return asyncio.run(self.arun_tests(cenarios))
 
-    def _print_summary(self, results):
+    def _print_summary(self, relatorio):
         """Exibe resumo dos testes"""
 
-        total = len(results)
-        compliant = sum(1 for r in results if r["is_compliant"])
-        rate = (compliant / total) * 100
+        resumo = relatorio["resumo"]
+        total = resumo["total"]
+        rate = (resumo["aprovados"] / total) * 100 if total else 0.0
 
         print(f"\nRESUMO DOS TESTES")
         print("=" * 40)
-        print(f"Total: {total} | Aprovados: {compliant} | Taxa de Sucesso: {rate:.1f}%")
+        print(f"Total: {total} | Aprovados: {resumo['aprovados']} | Taxa de Sucesso: {rate:.1f}%")
+        print(
+            f"Duração: {resumo['duracao_s']}s ({resumo['soma_latencias_s']}s somando os cenários) | "
+            f"Vereditos em cache: {resumo['vereditos_em_cache']} | Req. Asaas: {resumo['requisicoes_asaas']}"
+        )
 
-        for i, result in enumerate(results, 1):
+        for i, result in enumerate(relatorio["resultados"], 1):
             status = "✅" if result["is_compliant"] else "❌"
-            print(f"{i}. {status} {result['scenario']}")
+            print(
+                f"{i}. {status} {result['scenario']} ({result['latencia_s']}s, "
+                f"{result['tokens_entrada']}+{result['tokens_saida']} tokens, "
+                f"{result['chamadas_ferramentas']} chamadas de ferramentas)"
+            )
 
-def main():
+def main(argv=None):
     """Função principal"""
+    parser = argparse.ArgumentParser(description="Avaliação de conformidade do agente")
+    parser.add_argument("--cenarios", default=None, help="Dataset de cenários, YAML ou JSONL (default: evals/cenarios.yaml)")
+    parser.add_argument("--workers", type=int, default=4, help="Cenários executados ao mesmo tempo (default: 4)")
+    parser.add_argument("--modelo", default="gpt-5-nano", help="Modelo da OpenAI do agente e do juiz (default: gpt-5-nano)")
+    parser.add_argument("--offline", action="store_true", help="Modelo roteirizado, Asaas fake e juiz por regras (sem OpenAI)")
+    parser.add_argument("--cache-juiz", default=CACHE_JUIZ_PADRAO, help="Arquivo SQLite do cache de vereditos")
+    parser.add_argument("--sem-cache", action="store_true", help="Sempre chama o juiz")
+    parser.add_argument("--saida", default=None, help="Arquivo do relatório JSON (default: eval_AAAAMMDD_HHMM.json)")
+    args = parser.parse_args(argv)
 
     print("📋 SISTEMA DE AVALIAÇÃO - NEXUZ")
     print("=" * 40)
 
-    # Criar avaliador
-    evaluator = NexuzEvaluator()
+    cenarios = carregar_cenarios(args.cenarios)
+    cache_juiz = None if args.sem_cache else args.cache_juiz
 
     # Executar testes
-    results = evaluator.run_tests()
+    if args.offline:
+        from tests.fake_llm import FakeChatModel
 
-    # Salvar resultados (opcional)
-    filename = f"eval_{datetime.now().strftime('%Y%m%d_%H%M')}.json"
+        evaluator = NexuzEvaluator(
+            args.modelo, model=FakeChatModel(), juiz=juiz_por_regras, workers=args.workers, cache_juiz=cache_juiz
+        )
+        with ambiente_offline():
+            relatorio = evaluator.run_tests(cenarios)
+    else:
+        evaluator = NexuzEvaluator(args.modelo, workers=args.workers, cache_juiz=cache_juiz)
+        relatorio = evaluator.run_tests(cenarios)
+
+    # Salvar resultados
+    filename = args.saida or f"eval_{datetime.now().strftime('%Y%m%d_%H%M')}.json"
     with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(results, f, indent=2, ensure_ascii=False)
+        json.dump(relatorio, f, indent=2, ensure_ascii=False)
 
     print(f"\nRelatório salvo em: {filename}")
+    return 0
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    raise SystemExit(main())
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Backfill do espelho local do Asaas (tabelas clientes/pagamentos).
+
+Percorre todas as páginas de /customers e /payments da conta (ou só de um
+CNPJ) e grava no Postgres, em lotes. Depois do backfill, os webhooks mantêm
+o espelho atualizado. Usa as mesmas variáveis de ambiente do agente:
+  ASAAS_API_KEY, ASAAS_SANDBOX, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, DB_NAME
+
+Exemplos:
+  python scripts/backfill_asaas.py                      # conta inteira
+  python scripts/backfill_asaas.py --cnpj 01248526000158
+  python scripts/backfill_asaas.py --batch-size 1000
+
+Requer as tabelas de sql/04_create_asaas_mirror.sql (scripts/migrate.py).
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+repo_root = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(repo_root))
+
+from agent.mirror import backfill
+from agent.utils import AsaasError, _get_asaas_config
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Backfill do espelho local do Asaas")
+    parser.add_argument("--cnpj", help="Carregar apenas o cliente com este CNPJ/CPF.")
+    parser.add_argument("--batch-size", type=int, default=500, help="Linhas por lote de upsert (default: 500)")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    env_alt = repo_root / ".env"
+    if env_alt.exists():
+        load_dotenv(env_alt, override=False)
+
+    config, error = _get_asaas_config()
+    if error:
+        print(error["mensagem"])
+        return 2
+
+    inicio = time.perf_counter()
+    try:
+        resultado = backfill(config["base_url"], config["headers"], cpf_cnpj=args.cnpj, tamanho_lote=args.batch_size)
+    except AsaasError as e:
+        print(f"ERRO no backfill: {e.error['mensagem']}")
+        return 1
+
+    print(
+        f"Concluído em {time.perf_counter() - inicio:.1f}s. "
+        f"Clientes: {resultado['clientes']} | Pagamentos: {resultado['pagamentos']}"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Abre no help desk os tickets de atendimento humano ainda não enviados
+(sql/11_create_tickets.sql), inclusive os complementados por uma nova
+transferência na mesma conversa.
+
+O help desk vem de HELPDESK ("local", padrão, ou "webhook" com HELPDESK_URL e
+HELPDESK_TOKEN). Sem --intervalo envia uma rodada e sai (cron/agendador); com
+ele, fica em laço. Vários processos podem rodar juntos: cada lote é travado
+com SKIP LOCKED. Usa as variáveis DB_* do .env.
+
+Exemplos:
+  python scripts/enviar_tickets.py
+  python scripts/enviar_tickets.py --intervalo 5 --lote 200
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from agent.tickets import criar_helpdesk, enviar_tickets
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Envio dos tickets de atendimento humano ao help desk")
+    parser.add_argument("--lote", type=int, default=100, help="Tickets por transação (default: 100)")
+    parser.add_argument("--intervalo", type=float, default=None, help="Segundos entre rodadas; sem ele, roda uma vez")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    env_alt = Path(__file__).resolve().parents[1] / ".env"
+    if env_alt.exists():
+        load_dotenv(env_alt, override=False)
+
+    helpdesk = criar_helpdesk()
+    while True:
+        total = enviados = enviar_tickets(helpdesk, args.lote)
+        # Lote cheio: pode haver mais esperando, sem pausa
+        while enviados == args.lote:
+            enviados = enviar_tickets(helpdesk, args.lote)
+            total += enviados
+        print(f"Tickets enviados ao help desk: {total}")
+        if args.intervalo is None:
+            return 0
+        time.sleep(args.intervalo)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Poda periódica dos dados do agente com prazo de retenção:
+  - threads: checkpoints das threads sem atividade há mais que o TTL
+    (sql/05_create_checkpoints.sql)
+  - idempotencia: chaves de idempotência das tools já expiradas
+    (sql/09_create_idempotencia.sql)
+  - comprovantes: comprovantes fora da retenção do índice
+    (sql/10_create_comprovantes.sql)
+  - cache: entradas expiradas do cache compartilhado (CACHE_STORE=postgres)
+    (sql/03_create_cache_table.sql)
+
+Cada etapa roda na sua própria transação e falha sozinha: uma etapa cujas
+tabelas não existem (ex.: sem checkpointer no Postgres) é pulada, e as demais
+seguem. Pensado para rodar periodicamente (cron/agendador). Usa as variáveis
+DB_* do .env e, sem --ttl-dias, o CHECKPOINT_THREAD_TTL (segundos, padrão 30 dias).
+
+Exemplos:
+  python scripts/podar_retencao.py
+  python scripts/podar_retencao.py --ttl-dias 7 --lote-threads 1000
+  python scripts/podar_retencao.py --tabelas idempotencia comprovantes cache
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+import psycopg
+from dotenv import load_dotenv
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from agent.cache import podar_cache
+from agent.checkpoint import podar_threads
+from agent.idempotency import podar_idempotencia
+from agent.receipt_index import podar_comprovantes
+
+# Etapas da poda, na ordem em que rodam: (rótulo do resultado, script SQL das tabelas)
+ETAPAS = {
+    "threads": ("Threads removidas", "sql/05_create_checkpoints.sql"),
+    "idempotencia": ("Chaves de idempotência removidas", "sql/09_create_idempotencia.sql"),
+    "comprovantes": ("Comprovantes removidos", "sql/10_create_comprovantes.sql"),
+    "cache": ("Entradas de cache removidas", "sql/03_create_cache_table.sql"),
+}
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Poda dos checkpoints, chaves de idempotência, comprovantes e entradas de cache fora da retenção")
+    parser.add_argument("--ttl-dias", type=float, default=None, help="Idade máxima da última atividade de uma thread (default: CHECKPOINT_THREAD_TTL)")
+    parser.add_argument("--tabelas", nargs="+", choices=list(ETAPAS), default=list(ETAPAS), help="Etapas a executar (default: todas)")
+    parser.add_argument("--lote-threads", type=int, default=500, help="Threads removidas por transação (default: 500)")
+    parser.add_argument("--lote-idempotencia", type=int, default=1000, help="Chaves removidas por transação (default: 1000)")
+    parser.add_argument("--lote-comprovantes", type=int, default=1000, help="Comprovantes removidos por transação (default: 1000)")
+    parser.add_argument("--lote-cache", type=int, default=1000, help="Entradas de cache removidas por transação (default: 1000)")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    env_alt = Path(__file__).resolve().parents[1] / ".env"
+    if env_alt.exists():
+        load_dotenv(env_alt, override=False)
+
+    ttl = args.ttl_dias * 86400 if args.ttl_dias is not None else None
+    podas = {
+        "threads": lambda: podar_threads(ttl, lote=args.lote_threads),
+        "idempotencia": lambda: podar_idempotencia(args.lote_idempotencia),
+        "comprovantes": lambda: podar_comprovantes(args.lote_comprovantes),
+        "cache": lambda: podar_cache(args.lote_cache),
+    }
+
+    # Cada etapa roda e falha sozinha: sem as tabelas de checkpoint (AGENT_CHECKPOINTER
+    # diferente de "postgres"), por exemplo, as demais ainda são podadas
+    falhas = 0
+    for etapa in ETAPAS:
+        if etapa not in args.tabelas:
+            continue
+        rotulo, sql = ETAPAS[etapa]
+        try:
+            print(f"{rotulo}: {podas[etapa]()}")
+        except psycopg.errors.UndefinedTable:
+            print(f"{rotulo}: tabelas ausentes, etapa pulada ({sql} não aplicado)")
+        except Exception as e:
+            falhas += 1
+            print(f"{rotulo}: erro na poda: {e}", file=sys.stderr)
+    return 1 if falhas else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
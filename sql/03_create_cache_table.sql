@@ -0,0 +1,11 @@
+-- Store compartilhado dos caches do agente (CACHE_STORE=postgres)
+CREATE TABLE IF NOT EXISTS cache_entradas (
+    namespace VARCHAR(50) NOT NULL,
+    chave VARCHAR(200) NOT NULL,
+    valor JSONB NOT NULL,
+    expira_em TIMESTAMPTZ NOT NULL,
+    PRIMARY KEY (namespace, chave)
+);
+
+-- Índice para a limpeza periódica das entradas expiradas (scripts/podar_retencao.py)
+CREATE INDEX IF NOT EXISTS idx_cache_entradas_expira_em ON cache_entradas(expira_em);
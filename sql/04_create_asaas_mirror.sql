@@ -0,0 +1,41 @@
+-- Espelho local de clientes e pagamentos do Asaas, alimentado por webhooks e backfill
+
+-- Clientes do Asaas. sincronizado_em só é preenchido pelo backfill: até lá o
+-- espelho não tem o histórico completo do cliente e a consulta usa a API.
+CREATE TABLE IF NOT EXISTS clientes (
+    id VARCHAR(40) PRIMARY KEY,
+    cpf_cnpj VARCHAR(14),
+    dados JSONB NOT NULL DEFAULT '{}',
+    sincronizado_em TIMESTAMPTZ,
+    data_atualizacao TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_clientes_cpf_cnpj ON clientes(cpf_cnpj);
+
+-- Pagamentos do Asaas. evento_em guarda a data do evento que gerou a versão
+-- atual, para que eventos entregues fora de ordem não sobrescrevam dados novos.
+CREATE TABLE IF NOT EXISTS pagamentos (
+    id VARCHAR(40) PRIMARY KEY,
+    cliente_id VARCHAR(40) NOT NULL,
+    status VARCHAR(40) NOT NULL,
+    valor NUMERIC(14, 2),
+    data_vencimento DATE,
+    deletado BOOLEAN NOT NULL DEFAULT FALSE,
+    dados JSONB NOT NULL,
+    evento_em TIMESTAMPTZ NOT NULL,
+    data_atualizacao TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Índice para a consulta de pendências por cliente, status e vencimento
+CREATE INDEX IF NOT EXISTS idx_pagamentos_cliente_status_vencimento
+    ON pagamentos(cliente_id, status, data_vencimento);
+
+-- Eventos de webhook já processados (idempotência pelo id do evento)
+CREATE TABLE IF NOT EXISTS asaas_eventos (
+    id VARCHAR(120) PRIMARY KEY,
+    evento VARCHAR(60) NOT NULL,
+    recebido_em TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Índice para obter o último evento recebido (limite de atualização do espelho)
+CREATE INDEX IF NOT EXISTS idx_asaas_eventos_recebido_em ON asaas_eventos(recebido_em);
@@ -0,0 +1,20 @@
+-- Normaliza negociacoes.cnpj para só dígitos, o formato gravado pelas tools
+-- desde a validação de CNPJ/CPF nos modelos de entrada (agent/validators.py).
+-- Sem isso, "01.248.526/0001-58" e "01248526000158" são chaves diferentes e a
+-- busca por CNPJ de verificar_negociacao não encontra as linhas formatadas.
+UPDATE negociacoes
+SET cnpj = regexp_replace(cnpj, '[^0-9]', '', 'g')
+WHERE cnpj ~ '[^0-9]';
+
+-- Novas linhas só com 11 (CPF) ou 14 (CNPJ) dígitos. NOT VALID: linhas antigas
+-- com tamanho inesperado não impedem a migração, mas continuam visíveis para correção.
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'negociacoes_cnpj_digitos') THEN
+        ALTER TABLE negociacoes
+            ADD CONSTRAINT negociacoes_cnpj_digitos CHECK (cnpj ~ '^([0-9]{11}|[0-9]{14})$') NOT VALID;
+    END IF;
+END $$;
+
+-- Atualiza as estatísticas de idx_negociacoes_cnpj após a reescrita das chaves
+ANALYZE negociacoes;
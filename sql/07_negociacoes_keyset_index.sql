@@ -0,0 +1,15 @@
+-- data_criacao é a chave das páginas e do cursor: uma linha sem data ficaria
+-- fora de (data_criacao, id) < (...) em todas as páginas seguintes. Linhas antigas
+-- sem data recebem a da última atualização e a coluna passa a ser obrigatória
+UPDATE negociacoes SET data_criacao = COALESCE(data_atualizacao, CURRENT_TIMESTAMP) WHERE data_criacao IS NULL;
+ALTER TABLE negociacoes ALTER COLUMN data_criacao SET NOT NULL;
+
+-- Índice das páginas de verificar_negociacao: filtro por CNPJ e ordem
+-- (data_criacao DESC, id DESC) lidos direto do índice, sem sort, e o
+-- EXISTS de apenas_primeira resolvido com uma única entrada
+CREATE INDEX IF NOT EXISTS idx_negociacoes_cnpj_data ON negociacoes (cnpj, data_criacao DESC, id DESC);
+
+-- O prefixo (cnpj) do índice composto já atende às buscas só por CNPJ
+DROP INDEX IF EXISTS idx_negociacoes_cnpj;
+
+ANALYZE negociacoes;
@@ -0,0 +1,9 @@
+-- Identificador gerado pela aplicação ao registrar a negociação. No modo
+-- write-behind (agent/write_behind.py) a tool responde antes do INSERT, então
+-- o id devolvido ao agente não pode ser o SERIAL; o índice único torna a
+-- reaplicação do spool idempotente (ON CONFLICT (id_externo) DO NOTHING).
+-- Linhas antigas recebem um UUID aleatório do DEFAULT.
+ALTER TABLE negociacoes
+    ADD COLUMN IF NOT EXISTS id_externo UUID NOT NULL DEFAULT gen_random_uuid();
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_negociacoes_id_externo ON negociacoes (id_externo);
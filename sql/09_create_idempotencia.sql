@@ -0,0 +1,14 @@
+-- Resultados das tools com efeito colateral (atualizar_boleto, registrar_negociacao)
+-- por chave de idempotência: hash de (thread, tool, argumentos). Uma chamada
+-- repetida na mesma thread devolve o resultado gravado sem novo PUT no Asaas
+-- nem novo INSERT em negociacoes. resultado NULL = execução em andamento.
+CREATE TABLE IF NOT EXISTS idempotencia (
+    chave CHAR(64) PRIMARY KEY,
+    ferramenta VARCHAR(50) NOT NULL,
+    resultado JSONB,
+    criado_em TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    expira_em TIMESTAMPTZ NOT NULL
+);
+
+-- Índice para a poda periódica das chaves expiradas
+CREATE INDEX IF NOT EXISTS idx_idempotencia_expira_em ON idempotencia(expira_em);
@@ -0,0 +1,24 @@
+-- Comprovantes já validados por validar_comprovante, para responder reenvios
+-- sem novo OCR/validação. impressao = SHA-256 do texto do OCR normalizado
+-- (consultado antes de qualquer extração); id_transacao = ID do PIX,
+-- autenticação ou linha digitável extraídos, que pegam o mesmo comprovante
+-- com outro texto (outro print, OCR com linhas perdidas) e o reuso do mesmo
+-- comprovante por outro CNPJ.
+CREATE TABLE IF NOT EXISTS comprovantes (
+    impressao CHAR(64) PRIMARY KEY,
+    id_transacao VARCHAR(100),
+    cnpj VARCHAR(14) NOT NULL,
+    pendencia_id VARCHAR(50),
+    resultado JSONB NOT NULL,
+    envios INTEGER NOT NULL DEFAULT 1,
+    criado_em TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    visto_em TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    expira_em TIMESTAMPTZ NOT NULL
+);
+
+-- Busca pelo ID da transação (o primeiro envio de cada transação vem antes)
+CREATE INDEX IF NOT EXISTS idx_comprovantes_id_transacao
+    ON comprovantes(id_transacao, criado_em) WHERE id_transacao IS NOT NULL;
+
+-- Índice para a poda periódica dos comprovantes fora da retenção
+CREATE INDEX IF NOT EXISTS idx_comprovantes_expira_em ON comprovantes(expira_em);
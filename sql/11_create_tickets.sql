@@ -0,0 +1,37 @@
+-- Tickets de atendimento humano abertos por transferir_humano: a fila de onde
+-- os atendentes assumem as conversas (SELECT ... FOR UPDATE SKIP LOCKED).
+-- prazo_atendimento é o SLA do primeiro atendimento, mais curto quanto maior o
+-- valor em atraso do cliente (faixas de TICKETS_SLA); a fila é servida pelo
+-- prazo mais próximo. enviado_em NULL = ainda não aberto no help desk externo.
+CREATE TABLE IF NOT EXISTS tickets (
+    id UUID PRIMARY KEY,
+    thread_id VARCHAR(100),
+    cnpj VARCHAR(14),
+    contexto TEXT NOT NULL,
+    valor_em_atraso NUMERIC(12, 2) NOT NULL DEFAULT 0,
+    prioridade SMALLINT NOT NULL DEFAULT 0,
+    estado VARCHAR(20) NOT NULL DEFAULT 'aberto'
+        CHECK (estado IN ('aberto', 'em_atendimento', 'resolvido')),
+    atendente VARCHAR(100),
+    criado_em TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    prazo_atendimento TIMESTAMPTZ NOT NULL,
+    assumido_em TIMESTAMPTZ,
+    resolvido_em TIMESTAMPTZ,
+    id_helpdesk VARCHAR(100),
+    enviado_em TIMESTAMPTZ,
+    tentativas_envio SMALLINT NOT NULL DEFAULT 0
+);
+
+-- Fila: só os tickets abertos, na ordem em que são assumidos. O índice parcial
+-- não cresce com o histórico de tickets resolvidos
+CREATE INDEX IF NOT EXISTS idx_tickets_fila
+    ON tickets(prazo_atendimento) WHERE estado = 'aberto';
+
+-- Uma conversa tem no máximo um ticket não resolvido; uma nova transferência
+-- na mesma thread acrescenta o contexto ao ticket existente
+CREATE UNIQUE INDEX IF NOT EXISTS idx_tickets_thread_ativo
+    ON tickets(thread_id) WHERE estado <> 'resolvido';
+
+-- Tickets ainda não abertos no help desk, na ordem de criação
+CREATE INDEX IF NOT EXISTS idx_tickets_envio
+    ON tickets(criado_em) WHERE enviado_em IS NULL;
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Servidor HTTP local que imita a API do Asaas para testes e benchmarks.
+
+Mantém clientes e pagamentos em memória e responde no mesmo formato
+paginado da API real (offset/limit/hasMore/totalCount). Falhas (429, 5xx,
+lentidão) podem ser injetadas para exercitar retries e circuit breaker.
+"""
+
+import json
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+ASAAS_DEFAULT_LIMIT = 10
+ASAAS_MAX_LIMIT = 100
+
+
+def gerar_cliente(customer_id="cus_000000000001", cpf_cnpj="01248526000158", **extra):
+    """Gera um cliente no formato retornado por GET /customers"""
+    cliente = {
+        "object": "customer",
+        "id": customer_id,
+        "name": "Lanchonete Sabor Divino",
+        "email": "financeiro@sabordivino.com.br",
+        "company": "Sabor Divino LTDA",
+        "cpfCnpj": cpf_cnpj,
+        "phone": "1133334444",
+        "mobilePhone": "11999998888",
+        "address": "Rua das Flores",
+        "addressNumber": "100",
+        "complement": None,
+        "province": "Centro",
+        "postalCode": "01001000",
+        "cityName": "São Paulo",
+        "state": "SP",
+        "country": "Brasil",
+        "personType": "JURIDICA",
+        "deleted": False,
+        "groups": [],
+    }
+    cliente.update(extra)
+    return cliente
+
+
+def gerar_pagamentos(customer_id, quantidade, status_ciclo=("RECEIVED", "PENDING", "OVERDUE")):
+    """Gera pagamentos sintéticos em ordem de vencimento, alternando os status"""
+    pagamentos = []
+    for i in range(quantidade):
+        ano = 2020 + (i // 12) % 8
+        mes = i % 12 + 1
+        status = status_ciclo[i % len(status_ciclo)]
+        pagamentos.append({
+            "object": "payment",
+            "id": f"pay_{i:012d}",
+            "dateCreated": f"{ano}-{mes:02d}-01",
+            "customer": customer_id,
+            "status": status,
+            "value": 199.9 + (i % 7),
+            "netValue": 195.0,
+            "fine": {"value": 2.0 if status == "OVERDUE" else 0},
+            "interest": {"value": 1.0 if status == "OVERDUE" else 0},
+            "dueDate": f"{ano}-{mes:02d}-10",
+            "originalDueDate": f"{ano}-{mes:02d}-10",
+            "billingType": "BOLETO",
+            "invoiceNumber": f"{100000 + i}",
+            "invoiceUrl": f"https://www.asaas.com/i/{i:012d}",
+            "bankSlipUrl": f"https://www.asaas.com/b/pdf/{i:012d}",
+            "description": f"Mensalidade NEXUZ {mes:02d}/{ano}",
+            "deleted": False,
+        })
+    return pagamentos
+
+
+class FakeAsaasServer:
+    """Servidor fake do Asaas executado em uma thread de background.
+
+    Uso:
+        with FakeAsaasServer(latencia=0.01) as server:
+            server.adicionar_cliente(gerar_cliente(), gerar_pagamentos("cus_000000000001", 50))
+            os.environ["ASAAS_BASE_URL"] = server.base_url
+    """
+
+    def __init__(self, latencia=0.0, host="127.0.0.1", port=0):
+        self.latencia = latencia
+        self.clientes = {}
+        self.pagamentos = {}
+        self.requisicoes = []
+        self.conexoes = 0
+        self.bytes_enviados = 0
+        self.falhas = deque()
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v3"
+
+    def adicionar_cliente(self, cliente, pagamentos=()):
+        with self._lock:
+            self.clientes[cliente["id"]] = cliente
+            for pagamento in pagamentos:
+                self.pagamentos[pagamento["id"]] = pagamento
+
+    def injetar_falhas(self, *status, retry_after=None, atraso=0.0):
+        """Faz as próximas requisições responderem com os status informados, na ordem.
+
+        retry_after: valor do header Retry-After das respostas injetadas
+        atraso: segundos de espera antes de responder (para simular timeouts)
+        """
+        headers = {"Retry-After": str(retry_after)} if retry_after is not None else {}
+        with self._lock:
+            for codigo in status:
+                self.falhas.append((codigo, headers, atraso))
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # ----- rotas -----
+
+    def _paginar(self, itens, query):
+        offset = int(query.get("offset", ["0"])[0])
+        limit = min(int(query.get("limit", [str(ASAAS_DEFAULT_LIMIT)])[0]), ASAAS_MAX_LIMIT)
+        pagina = itens[offset:offset + limit]
+        return {
+            "object": "list",
+            "hasMore": offset + limit < len(itens),
+            "totalCount": len(itens),
+            "limit": limit,
+            "offset": offset,
+            "data": pagina,
+        }
+
+    def _listar_clientes(self, query):
+        cpf_cnpj = query.get("cpfCnpj", [None])[0]
+        with self._lock:
+            itens = [c for c in self.clientes.values() if cpf_cnpj in (None, c["cpfCnpj"])]
+        return 200, self._paginar(itens, query)
+
+    def _obter_cliente(self, customer_id):
+        with self._lock:
+            cliente = self.clientes.get(customer_id)
+        if cliente is None:
+            return 404, {"errors": [{"code": "not_found", "description": "Cliente não encontrado"}]}
+        return 200, cliente
+
+    def _listar_pagamentos(self, query):
+        customer = query.get("customer", [None])[0]
+        status = query.get("status", [None])[0]
+        vencimento_de = query.get("dueDate[ge]", [None])[0]
+        vencimento_ate = query.get("dueDate[le]", [None])[0]
+        with self._lock:
+            itens = [
+                p for p in self.pagamentos.values()
+                if customer in (None, p["customer"])
+                and status in (None, p["status"])
+                and (vencimento_de is None or p["dueDate"] >= vencimento_de)
+                and (vencimento_ate is None or p["dueDate"] <= vencimento_ate)
+            ]
+        return 200, self._paginar(itens, query)
+
+    def _atualizar_pagamento(self, payment_id, body):
+        with self._lock:
+            pagamento = self.pagamentos.get(payment_id)
+            if pagamento is None:
+                return 404, {"errors": [{"code": "not_found", "description": "Cobrança não encontrada"}]}
+            if "value" in body:
+                pagamento["value"] = body["value"]
+            if "dueDate" in body:
+                pagamento["dueDate"] = body["dueDate"]
+            if "billingType" in body:
+                pagamento["billingType"] = body["billingType"]
+            pagamento["status"] = "PENDING"
+            return 200, dict(pagamento)
+
+    def _rotear(self, method, path, query, body):
+        partes = [p for p in path.split("/") if p][1:]  # remove "v3"
+        if method == "GET" and partes == ["customers"]:
+            return self._listar_clientes(query)
+        if method == "GET" and len(partes) == 2 and partes[0] == "customers":
+            return self._obter_cliente(partes[1])
+        if method == "GET" and partes == ["payments"]:
+            return self._listar_pagamentos(query)
+        if method == "PUT" and len(partes) == 2 and partes[0] == "payments":
+            return self._atualizar_pagamento(partes[1], body)
+        return 404, {"errors": [{"code": "not_found", "description": "Rota inexistente"}]}
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                with server._lock:
+                    server.conexoes += 1
+
+            def log_message(self, format, *args):
+                pass
+
+            def _responder(self):
+                parsed = urlparse(self.path)
+                query = parse_qs(parsed.query)
+                tamanho = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(tamanho) or b"{}") if tamanho else {}
+                with server._lock:
+                    server.requisicoes.append((self.command, parsed.path, query))
+                    falha = server.falhas.popleft() if server.falhas else None
+                if server.latencia:
+                    time.sleep(server.latencia)
+                headers_extra = {}
+                if falha:
+                    status, headers_extra, atraso = falha
+                    time.sleep(atraso)
+                    payload = {"errors": [{"code": "falha_injetada", "description": f"Falha injetada {status}"}]}
+                else:
+                    status, payload = server._rotear(self.command, parsed.path, query, body)
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                for nome, valor in headers_extra.items():
+                    self.send_header(nome, valor)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+                with server._lock:
+                    server.bytes_enviados += len(data)
+
+            do_GET = _responder
+            do_PUT = _responder
+            do_POST = _responder
+
+        return Handler
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+Corpus sintético de comprovantes (texto pós-OCR) para testes, benchmark e
+ajuste da confiabilidade de agent/receipts.py.
+
+Cada comprovante é gerado a partir das pendências em aberto de um cliente
+sintético, em um dos layouts comuns (PIX, boleto e TED de bancos diferentes),
+e rotulado como válido ou não. Os inválidos imitam os casos reais de
+rejeição: valor que não confere, beneficiário de terceiros, agendamento,
+comprovante antigo reaproveitado e comprovante de outro pagador. Parte dos
+válidos tem ruído de OCR (linhas perdidas, caracteres trocados).
+"""
+
+import random
+import re
+from datetime import date, timedelta
+
+from agent.receipts import _BASE_FATOR, _BASE_FATOR_2025, _modulo_10, _modulo_11_boleto
+
+HOJE = date(2025, 6, 15)
+CNPJ_NEXUZ = "11444777000161"
+
+_PESOS_CNPJ_1 = (5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2)
+_PESOS_CNPJ_2 = (6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2)
+_MESES = ("JAN", "FEV", "MAR", "ABR", "MAI", "JUN", "JUL", "AGO", "SET", "OUT", "NOV", "DEZ")
+_RE_LINHA_COM_VALOR = re.compile(r"R\$|VALOR|Valor|\d{5}\.\d{5}")
+_RAZOES = ("Lanchonete Sabor Divino LTDA", "Pizzaria Forno Real ME", "Restaurante Bom Prato LTDA", "Padaria Pão Quente EIRELI")
+
+
+def gerar_cnpj(rng: random.Random) -> str:
+    """CNPJ aleatório com dígitos verificadores corretos."""
+    def digito(digitos, pesos):
+        resto = sum(int(d) * p for d, p in zip(digitos, pesos)) % 11
+        return "0" if resto < 2 else str(11 - resto)
+
+    base = "".join(rng.choice("0123456789") for _ in range(8)) + "0001"
+    base += digito(base, _PESOS_CNPJ_1)
+    return base + digito(base, _PESOS_CNPJ_2)
+
+
+def formatar_cnpj(cnpj: str) -> str:
+    return f"{cnpj[:2]}.{cnpj[2:5]}.{cnpj[5:8]}/{cnpj[8:12]}-{cnpj[12:]}"
+
+
+def formatar_valor(valor: float) -> str:
+    inteiro, centavos = f"{valor:.2f}".split(".")
+    return f"{int(inteiro):,}".replace(",", ".") + f",{centavos}"
+
+
+def gerar_linha_digitavel(rng: random.Random, valor: float, vencimento: date, banco: str = "341") -> str:
+    """Linha digitável de boleto (47 dígitos, formatada) com dígitos verificadores corretos."""
+    if vencimento >= _BASE_FATOR_2025:
+        fator = 1000 + (vencimento - _BASE_FATOR_2025).days
+    else:
+        fator = (vencimento - _BASE_FATOR).days
+    campo_livre = "".join(rng.choice("0123456789") for _ in range(25))
+    sem_dv = f"{banco}9{fator:04d}{int(round(valor * 100)):010d}{campo_livre}"
+    codigo = sem_dv[:4] + str(_modulo_11_boleto(sem_dv)) + sem_dv[4:]
+
+    campo1 = codigo[0:4] + codigo[19:24]
+    campo2 = codigo[24:34]
+    campo3 = codigo[34:44]
+    campo1 += str(_modulo_10(campo1))
+    campo2 += str(_modulo_10(campo2))
+    campo3 += str(_modulo_10(campo3))
+    return (
+        f"{campo1[:5]}.{campo1[5:]} {campo2[:5]}.{campo2[5:]} {campo3[:5]}.{campo3[5:]} "
+        f"{codigo[4]} {codigo[5:19]}"
+    )
+
+
+def gerar_pendencias(rng: random.Random, customer_id: str, hoje: date = HOJE, quantidade: int = 4) -> list[dict]:
+    """Pendências em aberto no formato de consulta_financeira: a vencer e vencidas, com o mesmo valor de mensalidade."""
+    mensalidade = round(rng.uniform(89, 990), 2)
+    pendencias = []
+    for i in range(quantidade):
+        vencimento = date(hoje.year, hoje.month, 10) - timedelta(days=30 * (quantidade - 2 - i))
+        vencida = vencimento < hoje
+        multa = round(mensalidade * 0.02, 2) if vencida else 0
+        juros = round(mensalidade * 0.01 * max(1, (hoje - vencimento).days // 30), 2) if vencida else 0
+        valor = mensalidade if i % 3 else round(mensalidade + rng.choice((0, 49.9, 120)), 2)
+        pendencias.append({
+            "id": f"pay_{customer_id[-4:]}{i:08d}",
+            "status": "OVERDUE" if vencida else "PENDING",
+            "valor": valor,
+            "multa": multa,
+            "juros": juros,
+            "valor_total": round(valor + multa + juros, 2),
+            "data_vencimento": vencimento.isoformat(),
+        })
+    return pendencias
+
+
+def _hora(rng):
+    return f"{rng.randint(7, 22):02d}:{rng.randint(0, 59):02d}:{rng.randint(0, 59):02d}"
+
+
+def _pix_id(rng, pago_em):
+    sufixo = "".join(rng.choice("ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz0123456789") for _ in range(11))
+    return f"E{rng.randint(10**7, 10**8 - 1)}{pago_em:%Y%m%d}{rng.randint(0, 23):02d}{rng.randint(0, 59):02d}{sufixo}"
+
+
+def _autenticacao(rng):
+    blocos = ["".join(rng.choice("0123456789ABCDEF") for _ in range(4)) for _ in range(5)]
+    return ".".join(blocos)
+
+
+def layout_pix_nubank(rng, c):
+    return f"""Comprovante de transferência
+{c['pago_em'].day:02d} {_MESES[c['pago_em'].month - 1]} {c['pago_em'].year} - {_hora(rng)}
+Valor
+R$ {formatar_valor(c['valor'])}
+Tipo de transferência
+Pix
+Destino
+Nome
+{c['nome_beneficiario']}
+CNPJ
+{formatar_cnpj(c['cnpj_beneficiario'])}
+Instituição
+ASAAS IP S.A.
+Origem
+Nome
+{c['razao']}
+Instituição
+NU PAGAMENTOS - IP
+CNPJ
+{formatar_cnpj(c['cnpj_pagador'])}
+ID da transação:
+{_pix_id(rng, c['pago_em'])}
+Nu Pagamentos S.A. - Instituição de Pagamento
+Ouvidoria: 0800 887 0463"""
+
+
+def layout_boleto_itau(rng, c):
+    return f"""Banco Itaú - Comprovante de Pagamento
+Boleto
+Beneficiário: {c['nome_beneficiario']}
+CPF/CNPJ do beneficiário: {formatar_cnpj(c['cnpj_beneficiario'])}
+Pagador: {c['razao']}
+CPF/CNPJ do pagador: {formatar_cnpj(c['cnpj_pagador'])}
+Código de barras: {c['linha']}
+Data de vencimento: {c['vencimento']:%d/%m/%Y}
+Data do pagamento: {c['pago_em']:%d/%m/%Y}
+Valor do documento: R$ {formatar_valor(c['valor_documento'])}
+(+) Juros/Multa: R$ {formatar_valor(max(0.0, c['valor'] - c['valor_documento']))}
+Valor pago: R$ {formatar_valor(c['valor'])}
+Operação efetuada em {c['pago_em']:%d/%m/%Y} às {_hora(rng)} via Itaú Empresas.
+Autenticação:
+{_autenticacao(rng)}"""
+
+
+def layout_boleto_bb(rng, c):
+    return f"""BANCO DO BRASIL
+COMPROVANTE DE PAGAMENTO DE TITULOS
+CLIENTE: {c['razao'].upper()}
+LINHA DIGITAVEL
+{c['linha']}
+BENEFICIARIO:
+{c['nome_beneficiario'].upper()}
+CNPJ: {formatar_cnpj(c['cnpj_beneficiario'])}
+PAGADOR:
+{c['razao'].upper()}
+CNPJ: {formatar_cnpj(c['cnpj_pagador'])}
+DATA DE VENCIMENTO {c['vencimento']:%d/%m/%Y}
+DATA DO PAGAMENTO {c['pago_em']:%d/%m/%Y}
+VALOR DO DOCUMENTO {formatar_valor(c['valor_documento'])}
+VALOR COBRADO {formatar_valor(c['valor'])}
+NR.AUTENTICACAO {_autenticacao(rng)}"""
+
+
+def layout_ted_bradesco(rng, c):
+    return f"""Bradesco Net Empresa
+Comprovante de Transferência - TED
+Conta de origem
+Razão social: {c['razao']}
+CNPJ: {formatar_cnpj(c['cnpj_pagador'])}
+Favorecido
+Nome: {c['nome_beneficiario']}
+CNPJ: {formatar_cnpj(c['cnpj_beneficiario'])}
+Banco: 461 - ASAAS IP S.A.
+Valor: R$ {formatar_valor(c['valor'])}
+Data da transferência: {c['pago_em']:%d/%m/%Y}
+Controle: {rng.randint(10**11, 10**12 - 1)}"""
+
+
+def layout_agendamento_itau(rng, c):
+    return f"""Banco Itaú - Comprovante de Agendamento
+Pagamento agendado para {c['pago_em']:%d/%m/%Y}
+Beneficiário: {c['nome_beneficiario']}
+CPF/CNPJ do beneficiário: {formatar_cnpj(c['cnpj_beneficiario'])}
+Pagador: {c['razao']}
+CPF/CNPJ do pagador: {formatar_cnpj(c['cnpj_pagador'])}
+Código de barras: {c['linha']}
+Data de vencimento: {c['vencimento']:%d/%m/%Y}
+Valor: R$ {formatar_valor(c['valor'])}"""
+
+
+LAYOUTS = {
+    "pix_nubank": layout_pix_nubank,
+    "boleto_itau": layout_boleto_itau,
+    "boleto_bb": layout_boleto_bb,
+    "ted_bradesco": layout_ted_bradesco,
+}
+
+# Defeitos dos comprovantes inválidos e a fração do corpus de cada um
+DEFEITOS = {
+    None: 0.5,
+    "valor_divergente": 0.1,
+    "beneficiario_terceiro": 0.1,
+    "agendamento": 0.08,
+    "comprovante_antigo": 0.1,
+    "outro_pagador": 0.07,
+    "sem_valor": 0.05,
+}
+
+
+def _ruido_ocr(rng, texto):
+    """Remove linhas e troca caracteres como um OCR ruim, sem tocar nos campos principais."""
+    linhas = texto.split("\n")
+    linhas = [l for l in linhas if rng.random() > 0.12 or "Valor" in l or "VALOR" in l]
+    trocas = {"o": "0", "l": "1", "S": "5", "e": "c", "a": "o"}
+    return "\n".join(
+        "".join(trocas.get(ch, ch) if rng.random() < 0.03 else ch for ch in linha) if not any(d.isdigit() for d in linha) else linha
+        for linha in linhas
+    )
+
+
+def gerar_comprovante(rng: random.Random, pendencias: list[dict], cnpj_cliente: str, razao: str, hoje: date = HOJE, defeito=None):
+    """Gera um comprovante para uma das pendências, aplicando o `defeito` (None = válido).
+
+    Returns:
+        (texto, pendencia_id esperado ou None, layout)
+    """
+    pendencia = rng.choice(pendencias)
+    vencimento = date.fromisoformat(pendencia["data_vencimento"])
+    atrasado = vencimento < hoje
+    valor = pendencia["valor_total"] if atrasado else pendencia["valor"]
+    if not atrasado and rng.random() < 0.3:
+        valor = round(valor * 0.95, 2)  # desconto por antecipação
+    pago_em = min(hoje, vencimento + timedelta(days=rng.randint(-5, 20))) if atrasado else hoje - timedelta(days=rng.randint(0, 3))
+
+    c = {
+        "valor": valor,
+        "valor_documento": pendencia["valor"],
+        "vencimento": vencimento,
+        "pago_em": pago_em,
+        "razao": razao,
+        "cnpj_pagador": cnpj_cliente,
+        "cnpj_beneficiario": CNPJ_NEXUZ,
+        "nome_beneficiario": "NEXUZ TECNOLOGIA LTDA",
+    }
+    layout = rng.choice(list(LAYOUTS))
+
+    if defeito == "valor_divergente":
+        c["valor"] = round(valor * rng.choice((0.4, 0.6, 1.5, 2.3)), 2)
+    elif defeito == "beneficiario_terceiro":
+        c["cnpj_beneficiario"], c["nome_beneficiario"] = gerar_cnpj(rng), "COMERCIAL SILVA ME"
+    elif defeito == "agendamento":
+        c["pago_em"] = hoje + timedelta(days=rng.randint(1, 20))
+        layout = "agendamento_itau"
+    elif defeito == "comprovante_antigo":
+        # Mensalidade do mesmo valor paga há mais de um ano, reenviada
+        c["pago_em"] = vencimento - timedelta(days=rng.randint(380, 500))
+        c["vencimento"] = c["pago_em"] + timedelta(days=rng.randint(0, 5))
+        c["valor"] = pendencia["valor"]
+    elif defeito == "outro_pagador":
+        c["cnpj_pagador"], c["razao"] = gerar_cnpj(rng), "Bar do Zé LTDA"
+        c["valor"] = round(rng.uniform(50, 2000), 2)
+
+    c["linha"] = gerar_linha_digitavel(rng, c["valor_documento"] if defeito != "valor_divergente" else c["valor"], c["vencimento"])
+    funcao = LAYOUTS.get(layout) or layout_agendamento_itau
+    texto = funcao(rng, c)
+    if defeito == "sem_valor":
+        # OCR perdeu a região do valor (e a linha digitável, que também o traz)
+        texto = "\n".join(l for l in texto.split("\n") if not _RE_LINHA_COM_VALOR.search(l))
+    elif defeito is None and rng.random() < 0.25:
+        texto = _ruido_ocr(rng, texto)
+    return texto, (pendencia["id"] if defeito is None else None), layout
+
+
+def gerar_corpus(quantidade: int = 500, seed: int = 42, hoje: date = HOJE, clientes: int = 25) -> list[dict]:
+    """Corpus rotulado: cada item traz texto, pendências e CNPJ do cliente, rótulo e pendência esperada."""
+    rng = random.Random(seed)
+    carteira = []
+    for i in range(clientes):
+        cnpj = gerar_cnpj(rng)
+        carteira.append((cnpj, rng.choice(_RAZOES), gerar_pendencias(rng, f"cus_{i:012d}", hoje)))
+
+    defeitos, pesos = zip(*DEFEITOS.items())
+    corpus = []
+    for _ in range(quantidade):
+        cnpj, razao, pendencias = rng.choice(carteira)
+        defeito = rng.choices(defeitos, pesos)[0]
+        texto, pendencia_id, layout = gerar_comprovante(rng, pendencias, cnpj, razao, hoje, defeito)
+        corpus.append({
+            "texto": texto,
+            "pendencias": pendencias,
+            "cnpj_cliente": cnpj,
+            "valido": defeito is None,
+            "pendencia_id": pendencia_id,
+            "layout": layout,
+            "defeito": defeito,
+        })
+    return corpus
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Modelo de chat roteirizado que imita a Fernanda sem chamar a OpenAI.
+
+Decide a próxima ação olhando só para a conversa (CNPJ informado, pedido de
+segunda via, assunto para humano) e registra os tokens de prompt de cada
+chamada, incluindo o schema das tools. Serve para testes e benchmarks do
+grafo com create_react_agent.
+"""
+
+import functools
+import json
+import re
+import time
+import uuid
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import Field
+
+RE_CNPJ = re.compile(r"\d{2}\.?\d{3}\.?\d{3}/?\d{4}-?\d{2}")
+RE_PAGAMENTO = re.compile(r"pay_\w+")
+
+
+@functools.cache
+def contador_de_tokens():
+    """Retorna (função que conta tokens de um texto, nome do método).
+
+    O resultado é memorizado: sem o arquivo do tiktoken em cache local, cada
+    tentativa de carregá-lo faz uma requisição de rede.
+    """
+    try:
+        import tiktoken
+
+        encoding = tiktoken.get_encoding("o200k_base")
+        return lambda texto: len(encoding.encode(texto)), "tiktoken o200k_base"
+    except Exception:
+        return lambda texto: len(texto) // 4, "estimativa chars/4"
+
+
+def _texto(mensagem) -> str:
+    conteudo = mensagem.content
+    if isinstance(conteudo, list):
+        conteudo = " ".join(bloco.get("text", "") for bloco in conteudo if isinstance(bloco, dict))
+    chamadas = getattr(mensagem, "tool_calls", None) or []
+    return conteudo + "".join(json.dumps(c["args"], ensure_ascii=False) for c in chamadas)
+
+
+def _chamada(nome, args):
+    return AIMessage(content="", tool_calls=[{"name": nome, "args": {"input": args}, "id": f"call_{uuid.uuid4().hex[:12]}"}])
+
+
+class FakeChatModel(BaseChatModel):
+    """Modelo roteirizado para o grafo da Fernanda.
+
+    ms_por_mil_tokens simula o tempo de prefill do modelo real, proporcional
+    aos tokens de prompt de cada chamada.
+    """
+
+    ms_por_mil_tokens: float = 0.0
+    tokens_por_chamada: list = Field(default_factory=list)
+    tools_schema: str = ""
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-fernanda"
+
+    def bind_tools(self, tools, **kwargs):
+        self.tools_schema = json.dumps([convert_to_openai_tool(t) for t in tools], ensure_ascii=False)
+        return self
+
+    def _tokens_do_prompt(self, messages) -> int:
+        contar, _ = contador_de_tokens()
+        return contar(self.tools_schema) + sum(contar(_texto(m)) for m in messages)
+
+    def _decidir(self, messages) -> AIMessage:
+        humanas = [m for m in messages if isinstance(m, HumanMessage)]
+        ultima_humana = max(i for i, m in enumerate(messages) if isinstance(m, HumanMessage))
+        turno = messages[ultima_humana:]
+        ferramentas_no_turno = [m.name for m in turno if isinstance(m, ToolMessage)]
+        ferramentas_na_conversa = [m.name for m in messages if isinstance(m, ToolMessage)]
+        pedido = _texto(humanas[-1]).lower()
+
+        # O CNPJ pode vir do usuário ou de uma nota de histórico resumido
+        fontes = [m for m in messages if isinstance(m, (HumanMessage, SystemMessage))]
+        cnpj = next((RE_CNPJ.search(_texto(m)) for m in reversed(fontes) if RE_CNPJ.search(_texto(m))), None)
+        if cnpj is None:
+            return AIMessage(content="Olá! Para continuar, me informe o CNPJ da empresa, por favor. Intent: cliente_validar")
+
+        if "consulta_financeira" not in ferramentas_na_conversa or (
+            "consulta_financeira" not in ferramentas_no_turno and "segunda via" in pedido
+        ):
+            return _chamada("consulta_financeira", {"cnpj": cnpj.group(0)})
+
+        if "segunda via" in pedido and "atualizar_boleto" not in ferramentas_no_turno:
+            consulta = next(m for m in reversed(messages) if isinstance(m, ToolMessage) and m.name == "consulta_financeira")
+            pagamento = RE_PAGAMENTO.search(_texto(consulta))
+            if pagamento:
+                return _chamada("atualizar_boleto", {"boleto_id": pagamento.group(0), "valor": 199.9})
+
+        if ("contrato" in pedido or "específica" in pedido) and "transferir_humano" not in ferramentas_no_turno:
+            return _chamada("transferir_humano", {"contexto": _texto(humanas[-1])})
+
+        return AIMessage(content="Prontinho! Qualquer outra dúvida, estou por aqui. Intent: status_cliente_consultar")
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        tokens = self._tokens_do_prompt(messages)
+        self.tokens_por_chamada.append(tokens)
+        if self.ms_por_mil_tokens:
+            time.sleep(tokens / 1000 * self.ms_por_mil_tokens / 1000)
+        mensagem = self._decidir(messages)
+        mensagem.usage_metadata = {"input_tokens": tokens, "output_tokens": 0, "total_tokens": tokens}
+        return ChatResult(generations=[ChatGeneration(message=mensagem)])
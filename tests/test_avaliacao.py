@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Arquivo de teste para o runner da avaliação de conformidade (evals/trajetory_eval.py)
+
+Roda os cenários no modo offline: modelo roteirizado, servidor fake do Asaas e juiz por regras.
+"""
+
+import asyncio
+import json
+import sys
+import os
+
+import pytest
+
+# Adicionar o diretório do projeto ao path para poder importar os módulos
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from evals.cenarios import CENARIOS, carregar_cenarios
+from evals.trajetory_eval import NexuzEvaluator, ambiente_offline, chave_veredito, juiz_por_regras
+from tests.fake_llm import FakeChatModel
+
+
+def test_carregar_cenarios(tmp_path):
+    """Testa o dataset padrão em YAML, um dataset JSONL e a recusa de cenários incompletos"""
+    print("=== Teste 1: datasets de cenários ===")
+    assert [c["name"] for c in CENARIOS][0] == "Segunda Via Simples"
+    assert all("esperado" in c for c in CENARIOS)
+
+    jsonl = tmp_path / "cenarios.jsonl"
+    jsonl.write_text(
+        "\n".join(json.dumps(c, ensure_ascii=False) for c in CENARIOS[:2]) + "\n\n", encoding="utf-8"
+    )
+    assert carregar_cenarios(jsonl) == CENARIOS[:2]
+
+    incompleto = tmp_path / "incompleto.yaml"
+    incompleto.write_text("- name: Sem mensagens\n", encoding="utf-8")
+    with pytest.raises(ValueError):
+        carregar_cenarios(incompleto)
+    print("✓ Teste passou\n")
+
+
+def test_juiz_por_regras():
+    """Testa o juiz determinístico: ferramentas esperadas em ordem, ou nenhuma"""
+    print("=== Teste 2: juiz por regras ===")
+    cenario = {"esperado": ["consulta_financeira", "atualizar_boleto"]}
+
+    def trajetoria(*turnos):
+        return [{"role": "assistant", "content": "", "tools_called": list(t)} for t in turnos]
+
+    avaliar = lambda t, c: asyncio.run(juiz_por_regras(t, c))["score"]
+    assert avaliar(trajetoria(["consulta_financeira"], ["consulta_financeira", "atualizar_boleto"]), cenario)
+    assert not avaliar(trajetoria(["atualizar_boleto", "consulta_financeira"]), cenario)
+    assert not avaliar(trajetoria(["consulta_financeira"]), cenario)
+    assert avaliar(trajetoria([]), {"esperado": []})
+    assert not avaliar(trajetoria(["consulta_financeira"]), {"esperado": []})
+
+    t = trajetoria(["consulta_financeira"])
+    assert chave_veredito(t, "prompt") == chave_veredito(json.loads(json.dumps(t)), "prompt")
+    assert chave_veredito(t, "prompt") != chave_veredito(t, "outro prompt")
+    print("✓ Teste passou\n")
+
+
+def test_execucao_offline_paralela_com_cache(tmp_path):
+    """Testa a execução offline em paralelo, as métricas do relatório e o cache de vereditos"""
+    print("=== Teste 3: execução offline ===")
+    chamadas_juiz = []
+
+    async def juiz(trajetoria, cenario):
+        chamadas_juiz.append(cenario["name"])
+        return await juiz_por_regras(trajetoria, cenario)
+
+    cache = str(tmp_path / "juiz.sqlite3")
+    with ambiente_offline():
+        primeiro = NexuzEvaluator(model=FakeChatModel(), juiz=juiz, workers=3, cache_juiz=cache).run_tests(CENARIOS)
+        # Novo avaliador (cache em memória vazio): os vereditos vêm do SQLite
+        segundo = NexuzEvaluator(model=FakeChatModel(), juiz=juiz, workers=3, cache_juiz=cache).run_tests(CENARIOS)
+
+    resumo = primeiro["resumo"]
+    print(f"Resumo: {resumo}")
+    assert resumo["total"] == len(CENARIOS) and resumo["aprovados"] == len(CENARIOS)
+    assert [r["scenario"] for r in primeiro["resultados"]] == [c["name"] for c in CENARIOS]
+    segunda_via = primeiro["resultados"][0]
+    assert segunda_via["tokens_entrada"] > 0 and segunda_via["chamadas_modelo"] > 0
+    assert segunda_via["ferramentas"]["atualizar_boleto"] == 1
+    assert segunda_via["chamadas_ferramentas"] == sum(segunda_via["ferramentas"].values())
+    assert segunda_via["latencia_s"] > 0
+
+    assert len(chamadas_juiz) == len(CENARIOS)
+    assert segundo["resumo"]["vereditos_em_cache"] == len(CENARIOS)
+    assert segundo["resumo"]["aprovados"] == len(CENARIOS)
+    print("✓ Teste passou\n")
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+
+    print("Executando testes para o runner da avaliação...\n")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        test_carregar_cenarios(Path(tmp))
+    test_juiz_por_regras()
+    with tempfile.TemporaryDirectory() as tmp:
+        test_execucao_offline_paralela_com_cache(Path(tmp))
+
+    print("Todos os testes passaram!")
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Arquivo de teste para o cache TTL/LRU (agent.cache) e seu uso em consulta_financeira
+"""
+
+import asyncio
+import io
+import sqlite3
+import sys
+import os
+import tempfile
+import time
+from contextlib import redirect_stdout
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+# Adicionar o diretório do projeto ao path para poder importar os módulos
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from agent.cache import PostgresCacheStore, SQLiteCacheStore, TTLCache, cache_stats_conversa
+from agent.tools import _clientes_cache, _ids_clientes_cache, _pendencias_cache, atualizar_boleto, consulta_financeira
+from agent.utils import _conn
+from tests.fake_asaas import FakeAsaasServer, gerar_cliente, gerar_pagamentos
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+
+def test_ttl_expira_entradas():
+    """Testa que entradas expiram após o TTL"""
+    print("=== Teste 1: expiração por TTL ===")
+
+    cache = TTLCache("teste_ttl", ttl=60, maxsize=10)
+    with patch('agent.cache.time.time', return_value=1000.0):
+        cache.set("a", 1)
+        assert cache.get("a") == 1
+    with patch('agent.cache.time.time', return_value=1061.0):
+        assert cache.get("a") is None
+
+    stats = cache.stats()
+    print(f"Stats: {stats}")
+    assert stats["cache_teste_ttl_hits"] == 1
+    assert stats["cache_teste_ttl_misses"] == 1
+    print("✓ Teste passou\n")
+
+
+def test_lru_respeita_tamanho_maximo():
+    """Testa a evicção LRU quando o cache atinge maxsize"""
+    print("=== Teste 2: evicção LRU ===")
+
+    cache = TTLCache("teste_lru", ttl=60, maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")  # "b" passa a ser o menos usado
+    cache.set("c", 3)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    assert cache.stats()["cache_teste_lru_evictions"] == 1
+    print("✓ Teste passou\n")
+
+
+def test_store_em_disco_compartilhado():
+    """Testa que dois caches (processos) compartilham entradas pelo store SQLite"""
+    print("=== Teste 3: store em disco compartilhado ===")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "cache.sqlite3")
+        processo_a = TTLCache("teste_disco_a", ttl=60, maxsize=10, store=SQLiteCacheStore(path, "cache_clientes"))
+        processo_b = TTLCache("teste_disco_b", ttl=60, maxsize=10, store=SQLiteCacheStore(path, "cache_clientes"))
+
+        processo_a.set("01248526000158", {"id": "cus_1"})
+        assert processo_b.get("01248526000158") == {"id": "cus_1"}
+
+        processo_b.invalidate("01248526000158")
+        processo_a.clear()
+        assert processo_a.get("01248526000158") is None
+    print("✓ Teste passou\n")
+
+
+def test_consulta_financeira_reutiliza_cliente_em_cache():
+    """Testa que a segunda consulta do mesmo CNPJ não busca /customers de novo"""
+    print("=== Teste 4: consulta_financeira com cliente em cache ===")
+
+    _clientes_cache.clear()
+    _ids_clientes_cache.clear()
+    _pendencias_cache.clear()
+    with FakeAsaasServer() as server:
+        server.adicionar_cliente(gerar_cliente(), gerar_pagamentos("cus_000000000001", 3))
+        with patch.dict(os.environ, {"ASAAS_API_KEY": "test_key", "ASAAS_BASE_URL": server.base_url}):
+            hits_antes = _clientes_cache.hits
+            primeira = consulta_financeira.invoke({"input": {"cnpj": "01.248.526/0001-58"}})
+            segunda = consulta_financeira.invoke({"input": {"cnpj": "01248526000158"}})
+
+        buscas_cliente = [r for r in server.requisicoes if r[1].endswith("/customers")]
+
+    assert primeira.status == segunda.status == 'sucesso'
+    assert len(buscas_cliente) == 1
+    assert _clientes_cache.hits - hits_antes == 1
+    print("✓ Teste passou\n")
+
+
+def test_consulta_financeira_invalida_cache_em_erro():
+    """Testa que um erro ao buscar pendências invalida o cliente em cache"""
+    print("=== Teste 5: invalidação em erro ===")
+
+    _clientes_cache.clear()
+    _ids_clientes_cache.clear()
+    _pendencias_cache.clear()
+    _clientes_cache.set("01248526000158", gerar_cliente())
+
+    server = FakeAsaasServer().start()
+    base_url = server.base_url
+    server.stop()
+
+    with patch.dict(os.environ, {"ASAAS_API_KEY": "test_key", "ASAAS_BASE_URL": base_url}):
+        result = consulta_financeira.invoke({"input": {"cnpj": "01248526000158"}})
+
+    assert result.status == 'erro'
+    assert _clientes_cache.get("01248526000158") is None
+    print("✓ Teste passou\n")
+
+
+def test_snapshot_de_pendencias_reutilizado_e_atualizado():
+    """Testa o snapshot de pendências: reuso na mesma conversa e patch por atualizar_boleto"""
+    print("=== Teste 6: snapshot de pendências ===")
+
+    _clientes_cache.clear()
+    _ids_clientes_cache.clear()
+    _pendencias_cache.clear()
+    with FakeAsaasServer() as server:
+        server.adicionar_cliente(gerar_cliente(), gerar_pagamentos("cus_000000000001", 6))
+        with patch.dict(os.environ, {"ASAAS_API_KEY": "test_key", "ASAAS_BASE_URL": server.base_url}):
+            primeira = consulta_financeira.invoke({"input": {"cnpj": "01248526000158"}})
+            requisicoes_apos_primeira = len(server.requisicoes)
+
+            segunda = consulta_financeira.invoke({"input": {"cnpj": "01248526000158"}})
+            assert len(server.requisicoes) == requisicoes_apos_primeira
+
+            boleto = atualizar_boleto.invoke({"input": {"boleto_id": "pay_000000000002", "valor": 150.0}})
+            terceira = consulta_financeira.invoke({"input": {"cnpj": "01248526000158"}})
+
+        # Apenas o PUT foi feito depois da primeira consulta
+        assert len(server.requisicoes) == requisicoes_apos_primeira + 1
+
+    atualizada = next(p for p in terceira.pendencias if p["id"] == "pay_000000000002")
+    print(f"Pendência atualizada: {atualizada}")
+    assert primeira.pendencias == segunda.pendencias
+    assert boleto.status == 'sucesso'
+    assert atualizada["valor"] == 150.0
+    assert atualizada["status"] == "PENDING"
+    assert atualizada["data_vencimento"] == boleto.data_vencimento
+    print("✓ Teste passou\n")
+
+
+class StoreForaDoAr:
+    """Store cujas operações sempre falham, como um SQLite travado ou um Postgres fora do ar."""
+
+    def get(self, chave):
+        raise sqlite3.OperationalError("database is locked")
+
+    set = delete = get
+
+
+def test_erro_no_store_cai_para_a_memoria():
+    """Testa consulta_financeira (sync e async) com o store fora do ar: responde pela memória e pelo Asaas"""
+    print("=== Teste 7: erro no store ===")
+
+    caches = (_clientes_cache, _ids_clientes_cache, _pendencias_cache)
+    for cache in caches:
+        cache.clear()
+    erros_antes = sum(cache.store_errors for cache in caches)
+    with FakeAsaasServer() as server:
+        server.adicionar_cliente(gerar_cliente(), gerar_pagamentos("cus_000000000001", 3))
+        with patch.dict(os.environ, {"ASAAS_API_KEY": "test_key", "ASAAS_BASE_URL": server.base_url}), \
+                patch.object(_clientes_cache, "store", StoreForaDoAr()), \
+                patch.object(_ids_clientes_cache, "store", StoreForaDoAr()), \
+                patch.object(_pendencias_cache, "store", StoreForaDoAr()):
+            primeira = consulta_financeira.invoke({"input": {"cnpj": "01248526000158"}})
+            segunda = asyncio.run(consulta_financeira.ainvoke({"input": {"cnpj": "01248526000158"}}))
+            _clientes_cache.invalidate("01248526000158")
+
+        buscas_cliente = [r for r in server.requisicoes if r[1].endswith("/customers")]
+
+    erros = sum(cache.store_errors for cache in caches) - erros_antes
+    print(f"Status: {primeira.status}/{segunda.status} | erros no store: {erros}")
+    assert primeira.status == segunda.status == 'sucesso'
+    assert primeira.pendencias == segunda.pendencias
+    # A segunda consulta sai da memória, sem nova busca de /customers
+    assert len(buscas_cliente) == 1
+    assert erros > 0 and _clientes_cache.stats()["cache_clientes_asaas_store_errors"] == _clientes_cache.store_errors
+    print("✓ Teste passou\n")
+
+
+def test_poda_das_entradas_expiradas():
+    """Testa a etapa cache de scripts/podar_retencao.py sobre cache_entradas (CACHE_STORE=postgres)"""
+    print("=== Teste 8: poda das entradas expiradas ===")
+    from scripts.podar_retencao import main
+
+    try:
+        with _conn() as conn:
+            conn.execute((REPO_ROOT / "sql" / "03_create_cache_table.sql").read_text(encoding="utf-8"))
+            conn.execute("TRUNCATE cache_entradas")
+    except Exception as e:
+        pytest.skip(f"Postgres local indisponível: {e}")
+
+    store = PostgresCacheStore("teste_poda")
+    for i in range(5):
+        store.set(f"expirada_{i}", {"id": i}, time.time() - 60)
+    store.set("valida", {"id": "ok"}, time.time() + 3600)
+
+    with redirect_stdout(io.StringIO()) as saida:
+        codigo = main(["--tabelas", "cache", "--lote-cache", "2"])
+
+    with _conn() as conn:
+        restantes = [row[0] for row in conn.execute("SELECT chave FROM cache_entradas").fetchall()]
+    print(saida.getvalue())
+    assert codigo == 0
+    assert "Entradas de cache removidas: 5" in saida.getvalue()
+    assert restantes == ["valida"]
+    print("✓ Teste passou\n")
+
+
+def test_chamadas_evitadas_por_conversa():
+    """Testa os hits/misses por conversa (thread_id), também em /metricas/conversas/{thread_id}"""
+    print("=== Teste 9: contagem por conversa ===")
+    from fastapi.testclient import TestClient
+    from agent.webhook_app import app
+
+    _clientes_cache.clear()
+    _ids_clientes_cache.clear()
+    _pendencias_cache.clear()
+    conversa_a = {"configurable": {"thread_id": "conversa_cache_a"}}
+    conversa_b = {"configurable": {"thread_id": "conversa_cache_b"}}
+    with FakeAsaasServer() as server:
+        server.adicionar_cliente(gerar_cliente(), gerar_pagamentos("cus_000000000001", 3))
+        with patch.dict(os.environ, {"ASAAS_API_KEY": "test_key", "ASAAS_BASE_URL": server.base_url}):
+            consulta_financeira.invoke({"input": {"cnpj": "01248526000158"}}, conversa_a)
+            consulta_financeira.invoke({"input": {"cnpj": "01248526000158"}}, conversa_a)
+            asyncio.run(consulta_financeira.ainvoke({"input": {"cnpj": "01248526000158"}}, conversa_b))
+
+    stats_a = cache_stats_conversa("conversa_cache_a")
+    with TestClient(app) as client:
+        stats_b = client.get("/metricas/conversas/conversa_cache_b").json()
+    print(f"Conversa A: {stats_a} | conversa B: {stats_b}")
+    # Primeira consulta: faltas em tudo; a segunda sai do cache de clientes e do snapshot de pendências
+    assert stats_a["cache_clientes_asaas_misses"] == 1 and stats_a["cache_clientes_asaas_hits"] == 1
+    assert stats_a["cache_pendencias_hits"] == 1
+    # A conversa B encontra o cache aquecido pela A, sem nenhuma falta
+    assert stats_b["cache_clientes_asaas_hits"] == 1 and "cache_clientes_asaas_misses" not in stats_b
+    assert cache_stats_conversa("conversa_inexistente") == {}
+    print("✓ Teste passou\n")
+
+
+def test_pagamento_que_entra_no_filtro_do_snapshot():
+    """Testa atualizar_boleto levando um pagamento OVERDUE para PENDING com um snapshot só de PENDING"""
+    print("=== Teste 10: pagamento que passa a entrar no filtro ===")
+
+    _clientes_cache.clear()
+    _ids_clientes_cache.clear()
+    _pendencias_cache.clear()
+    consulta = {"input": {"cnpj": "01248526000158", "status": ["PENDING"]}}
+    with FakeAsaasServer() as server:
+        server.adicionar_cliente(gerar_cliente(), gerar_pagamentos("cus_000000000001", 6))
+        with patch.dict(os.environ, {"ASAAS_API_KEY": "test_key", "ASAAS_BASE_URL": server.base_url}):
+            antes = consulta_financeira.invoke(consulta)
+            boleto = atualizar_boleto.invoke({"input": {"boleto_id": "pay_000000000002", "valor": 150.0}})
+            depois = consulta_financeira.invoke(consulta)
+
+        buscas_pagamentos = [r for r in server.requisicoes if r[0] == "GET" and r[1].endswith("/payments")]
+
+    print(f"Antes: {[p['id'] for p in antes.pendencias]} | depois: {[p['id'] for p in depois.pendencias]}")
+    assert boleto.status_pagamento == "PENDING"
+    assert "pay_000000000002" not in {p["id"] for p in antes.pendencias}
+    # A lista de PENDING em cache não tinha o pagamento: foi descartada e buscada de novo
+    assert "pay_000000000002" in {p["id"] for p in depois.pendencias}
+    assert len(buscas_pagamentos) == 2
+    print("✓ Teste passou\n")
+
+
+if __name__ == "__main__":
+    print("Executando testes para o cache de clientes...\n")
+
+    test_ttl_expira_entradas()
+    test_lru_respeita_tamanho_maximo()
+    test_store_em_disco_compartilhado()
+    test_consulta_financeira_reutiliza_cliente_em_cache()
+    test_consulta_financeira_invalida_cache_em_erro()
+    test_snapshot_de_pendencias_reutilizado_e_atualizado()
+    test_erro_no_store_cai_para_a_memoria()
+    test_poda_das_entradas_expiradas()
+    test_chamadas_evitadas_por_conversa()
+    test_pagamento_que_entra_no_filtro_do_snapshot()
+
+    print("Todos os testes passaram!")
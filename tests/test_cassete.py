@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Arquivo de teste para os cassetes do Asaas e do modelo de chat (agent/cassette.py)
+"""
+
+import asyncio
+import sys
+import os
+import time
+from contextlib import contextmanager
+from unittest.mock import patch
+
+# Adicionar o diretório do projeto ao path para poder importar os módulos
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.prebuilt import create_react_agent
+
+from agent.cassette import Cassete, CasseteChatModel, _reset_cassete, chave_http
+from agent.prompt import basic_prompt
+from agent.tools import (
+    _clientes_cache,
+    _ids_clientes_cache,
+    _pendencias_cache,
+    atualizar_boleto,
+    consulta_financeira,
+    transferir_humano,
+)
+from agent.utils import _reset_asaas_resiliencia, _reset_asaas_session
+from tests.fake_asaas import FakeAsaasServer, gerar_cliente, gerar_pagamentos
+from tests.fake_llm import FakeChatModel
+
+BASE_URL_REPRODUCAO = "http://asaas.cassete.invalid/v3"
+
+
+def _limpar():
+    _clientes_cache.clear()
+    _ids_clientes_cache.clear()
+    _pendencias_cache.clear()
+    _reset_asaas_session()
+    _reset_asaas_resiliencia()
+    _reset_cassete()
+
+
+@contextmanager
+def _cassete_asaas(caminho, modo, base_url=BASE_URL_REPRODUCAO, **extra):
+    env = {
+        "ASAAS_API_KEY": "test_key",
+        "ASAAS_BASE_URL": base_url,
+        "ASAAS_CASSETE": str(caminho),
+        "ASAAS_CASSETE_MODO": modo,
+        "IDEMPOTENCY_ENABLED": "false",
+        **extra,
+    }
+    with patch.dict(os.environ, env):
+        _limpar()
+        try:
+            yield
+        finally:
+            _limpar()
+
+
+def _servidor(pagamentos=5):
+    server = FakeAsaasServer()
+    server.adicionar_cliente(gerar_cliente(), gerar_pagamentos("cus_000000000001", pagamentos))
+    return server
+
+
+def _consultar():
+    return consulta_financeira.invoke({"input": {"cnpj": "01248526000158"}})
+
+
+def test_chave_http():
+    """Testa que a chave ignora host, prefixo da base e ordem da query"""
+    print("=== Teste 1: chave das trocas HTTP ===")
+    with patch.dict(os.environ, {"ASAAS_BASE_URL": "https://sandbox.asaas.com/api/v3"}):
+        a = chave_http("get", "https://sandbox.asaas.com/api/v3/payments?status=PENDING&customer=cus_1")
+    with patch.dict(os.environ, {"ASAAS_BASE_URL": "http://127.0.0.1:8080/v3"}):
+        b = chave_http("GET", "http://127.0.0.1:8080/v3/payments?customer=cus_1&status=PENDING")
+    assert a == b == "GET /payments?customer=cus_1&status=PENDING"
+    print("✓ Teste passou\n")
+
+
+def test_gravacao_e_reproducao_asaas(tmp_path):
+    """Testa que a consulta gravada do servidor fake é reproduzida sem rede (sync e async)"""
+    print("=== Teste 2: gravação e reprodução do Asaas ===")
+    caminho = tmp_path / "asaas.json"
+    with _servidor() as server, _cassete_asaas(caminho, "gravar", server.base_url):
+        gravada = _consultar()
+        requisicoes = len(server.requisicoes)
+
+    with _cassete_asaas(caminho, "reproduzir"):
+        reproduzida = _consultar()
+        _pendencias_cache.clear()
+        assincrona = asyncio.run(consulta_financeira.ainvoke({"input": {"cnpj": "01248526000158"}}))
+
+    print(f"Gravada: {gravada.mensagem} ({requisicoes} requisições)")
+    assert gravada.status == "sucesso" and requisicoes > 0
+    assert reproduzida.model_dump() == gravada.model_dump()
+    assert assincrona.model_dump() == gravada.model_dump()
+    print("✓ Teste passou\n")
+
+
+def test_troca_ausente_e_latencia(tmp_path):
+    """Testa a troca fora do cassete como erro de conexão e a latência fixa injetada"""
+    print("=== Teste 3: troca ausente e latência ===")
+    caminho = tmp_path / "asaas.json"
+    with _servidor() as server, _cassete_asaas(caminho, "gravar", server.base_url):
+        _consultar()
+
+    with _cassete_asaas(caminho, "reproduzir", ASAAS_CASSETE_LATENCIA="40", ASAAS_MAX_RETRIES="0"):
+        inicio = time.perf_counter()
+        _consultar()
+        duracao = time.perf_counter() - inicio
+        ausente = atualizar_boleto.invoke({"input": {"boleto_id": "pay_000000000001", "valor": 10.0}})
+
+    print(f"Duração com latência: {duracao * 1000:.0f} ms | {ausente.mensagem}")
+    assert duracao >= 0.04 * 2
+    assert ausente.status == "erro" and "cassete" in ausente.mensagem
+    print("✓ Teste passou\n")
+
+
+def _agente(modelo):
+    return create_react_agent(
+        modelo, prompt=basic_prompt, tools=[consulta_financeira, atualizar_boleto, transferir_humano],
+        checkpointer=InMemorySaver(),
+    )
+
+
+async def _conversar(agente, thread_id):
+    config = {"configurable": {"thread_id": thread_id}}
+    for mensagem in ("Meu CNPJ é 01248526000158", "Preciso da segunda via do boleto"):
+        estado = await agente.ainvoke({"messages": [{"role": "user", "content": mensagem}]}, config)
+    return estado["messages"]
+
+
+def _chamadas(mensagens):
+    return [(c["name"], c["args"]) for m in mensagens for c in getattr(m, "tool_calls", None) or []]
+
+
+def test_grafo_reproduzido_sem_rede(tmp_path):
+    """Testa o create_react_agent de ponta a ponta com o modelo e o Asaas reproduzidos"""
+    print("=== Teste 4: grafo reproduzido ===")
+    with _servidor() as server, _cassete_asaas(tmp_path / "asaas.json", "gravar", server.base_url):
+        modelo = CasseteChatModel(cassete=Cassete(tmp_path / "llm.json", "gravar"), modelo=FakeChatModel())
+        gravadas = asyncio.run(_conversar(_agente(modelo), "gravacao"))
+
+    with _cassete_asaas(tmp_path / "asaas.json", "reproduzir"):
+        modelo = CasseteChatModel(cassete=Cassete(tmp_path / "llm.json", "reproduzir", latencia_ms=0))
+        agente = _agente(modelo)
+
+        async def varias():
+            return await asyncio.gather(*(_conversar(agente, f"replay-{i}") for i in range(8)))
+
+        reproduzidas = asyncio.run(varias())
+
+    print(f"Chamadas: {[nome for nome, _ in _chamadas(gravadas)]}")
+    assert [nome for nome, _ in _chamadas(gravadas)] == ["consulta_financeira", "consulta_financeira", "atualizar_boleto"]
+    ids = set()
+    for mensagens in reproduzidas:
+        assert _chamadas(mensagens) == _chamadas(gravadas)
+        assert mensagens[-1].content == gravadas[-1].content
+        ids.update(c["id"] for m in mensagens for c in getattr(m, "tool_calls", None) or [])
+    assert len(ids) == 8 * 3
+    print("✓ Teste passou\n")
+
+
+def test_benchmark_com_cassetes_versionados():
+    """Testa o benchmark do agente com os cassetes de tests/fixtures/cassetes"""
+    print("=== Teste 5: benchmark reproduzido ===")
+    from benchmarks.bench_agente_replay import main
+
+    with patch.dict(os.environ, {}):
+        assert main(["--concorrencia", "1,8", "--rodadas", "1"]) == 0
+    print("✓ Teste passou\n")
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+
+    print("Executando testes para os cassetes...\n")
+
+    test_chave_http()
+    for teste in (test_gravacao_e_reproducao_asaas, test_troca_ausente_e_latencia, test_grafo_reproduzido_sem_rede):
+        with tempfile.TemporaryDirectory() as pasta:
+            teste(Path(pasta))
+    test_benchmark_com_cassetes_versionados()
+
+    print("Todos os testes passaram!")
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Arquivo de teste para o checkpointer Postgres das threads do agente (agent/checkpoint.py)
+
+Requer um Postgres local configurado pelas variáveis DB_* (o mesmo do agente).
+As tabelas de sql/05_create_checkpoints.sql são criadas e esvaziadas aqui.
+"""
+
+import asyncio
+import importlib
+import sys
+import os
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+# Adicionar o diretório do projeto ao path para poder importar os módulos
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from langchain_core.messages import HumanMessage, ToolMessage
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.checkpoint.postgres import PostgresSaver
+from langgraph.prebuilt import create_react_agent
+
+from agent.checkpoint import acriar_checkpointer, apodar_threads, criar_checkpointer, podar_threads
+from agent.prompt import basic_prompt
+from agent.tools import _clientes_cache, _ids_clientes_cache, _pendencias_cache, consulta_financeira
+from agent.utils import _conn
+from tests.fake_asaas import FakeAsaasServer, gerar_cliente, gerar_pagamentos
+from tests.fake_llm import FakeChatModel
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+ENV_POSTGRES = {"AGENT_CHECKPOINTER": "postgres"}
+
+
+def _preparar_banco():
+    """Cria as tabelas de checkpoint e limpa os dados; pula o teste sem Postgres."""
+    try:
+        with _conn() as conn:
+            conn.execute((REPO_ROOT / "sql" / "05_create_checkpoints.sql").read_text(encoding="utf-8"))
+            conn.execute("TRUNCATE checkpoints, checkpoint_blobs, checkpoint_writes")
+    except Exception as e:
+        pytest.skip(f"Postgres local indisponível: {e}")
+
+
+def _threads():
+    with _conn() as conn:
+        return {row[0] for row in conn.execute("SELECT DISTINCT thread_id FROM checkpoints").fetchall()}
+
+
+def _envelhecer(thread_id):
+    """Faz a última atividade da thread parecer antiga."""
+    with _conn() as conn:
+        conn.execute(
+            "UPDATE checkpoints SET checkpoint = jsonb_set(checkpoint, '{ts}', '\"2020-01-01T00:00:00+00:00\"') "
+            "WHERE thread_id = %s",
+            (thread_id,),
+        )
+
+
+def _agente(checkpointer):
+    return create_react_agent(FakeChatModel(), prompt=basic_prompt, tools=[consulta_financeira], checkpointer=checkpointer)
+
+
+def _servidor():
+    _clientes_cache.clear()
+    _ids_clientes_cache.clear()
+    _pendencias_cache.clear()
+    server = FakeAsaasServer()
+    server.adicionar_cliente(gerar_cliente(), gerar_pagamentos("cus_000000000001", 6))
+    return server
+
+
+def test_tipo_do_checkpointer_por_variavel():
+    """Testa a escolha do checkpointer por AGENT_CHECKPOINTER"""
+    print("=== Teste 1: AGENT_CHECKPOINTER ===")
+
+    with patch.dict(os.environ, {"AGENT_CHECKPOINTER": "nenhum"}):
+        assert criar_checkpointer() is None
+    with patch.dict(os.environ, {"AGENT_CHECKPOINTER": "memoria"}):
+        assert isinstance(criar_checkpointer(), InMemorySaver)
+    print("✓ Teste passou\n")
+
+
+def test_migracao_dispensa_setup():
+    """Testa que sql/05 deixa o schema no ponto em que setup() não tem o que fazer"""
+    print("=== Teste 2: migração das tabelas de checkpoint ===")
+    _preparar_banco()
+
+    with patch.dict(os.environ, ENV_POSTGRES):
+        checkpointer = criar_checkpointer()
+    assert isinstance(checkpointer, PostgresSaver)
+
+    with _conn() as conn:
+        versao = conn.execute("SELECT max(v) FROM checkpoint_migrations").fetchone()[0]
+    assert versao == len(PostgresSaver.MIGRATIONS) - 1
+
+    checkpointer.setup()
+    with _conn() as conn:
+        assert conn.execute("SELECT max(v) FROM checkpoint_migrations").fetchone()[0] == versao
+    print("✓ Teste passou\n")
+
+
+def test_conversa_so_com_a_nova_mensagem():
+    """Testa que o histórico vem do checkpoint, inclusive em outra instância do grafo"""
+    print("=== Teste 3: conversa com thread_id ===")
+    _preparar_banco()
+    config = {"configurable": {"thread_id": "thread_conversa"}}
+
+    with _servidor() as server:
+        env = {**ENV_POSTGRES, "ASAAS_API_KEY": "test_key", "ASAAS_BASE_URL": server.base_url}
+        with patch.dict(os.environ, env):
+            _agente(criar_checkpointer()).invoke(
+                {"messages": [{"role": "user", "content": "Meu CNPJ é 01248526000158"}]}, config
+            )
+            # Outra instância (ex.: outro worker) continua a mesma thread
+            result = _agente(criar_checkpointer()).invoke(
+                {"messages": [{"role": "user", "content": "Obrigado!"}]}, config
+            )
+
+    messages = result["messages"]
+    print(f"Mensagens no estado: {len(messages)}")
+    assert [m.content for m in messages if isinstance(m, HumanMessage)] == ["Meu CNPJ é 01248526000158", "Obrigado!"]
+    assert sum(1 for m in messages if isinstance(m, ToolMessage)) == 1
+    assert _threads() == {"thread_conversa"}
+    print("✓ Teste passou\n")
+
+
+def test_poda_remove_so_threads_antigas():
+    """Testa a remoção por TTL das threads sem atividade recente"""
+    print("=== Teste 4: poda por TTL ===")
+    _preparar_banco()
+
+    with patch.dict(os.environ, {**ENV_POSTGRES, "CHECKPOINT_THREAD_TTL": "86400"}):
+        agent = _agente(criar_checkpointer())
+        for thread_id in ("antiga_1", "antiga_2", "antiga_3", "recente"):
+            agent.invoke({"messages": [{"role": "user", "content": "Olá"}]}, {"configurable": {"thread_id": thread_id}})
+        for thread_id in ("antiga_1", "antiga_2", "antiga_3"):
+            _envelhecer(thread_id)
+
+        removidas = podar_threads(lote=2)
+
+    with _conn() as conn:
+        blobs = conn.execute("SELECT DISTINCT thread_id FROM checkpoint_blobs").fetchall()
+
+    assert removidas == 3
+    assert _threads() == {"recente"}
+    assert {row[0] for row in blobs} == {"recente"}
+    print("✓ Teste passou\n")
+
+
+def test_checkpointer_assincrono():
+    """Testa o AsyncPostgresSaver com ainvoke e a poda assíncrona"""
+    print("=== Teste 5: checkpointer assíncrono ===")
+    _preparar_banco()
+
+    async def conversar():
+        with patch.dict(os.environ, ENV_POSTGRES):
+            agent = _agente(await acriar_checkpointer())
+            config = {"configurable": {"thread_id": "thread_async"}}
+            await agent.ainvoke({"messages": [{"role": "user", "content": "Olá"}]}, config)
+            result = await agent.ainvoke({"messages": [{"role": "user", "content": "Tudo bem?"}]}, config)
+            _envelhecer("thread_async")
+            return result, await apodar_threads(ttl=60)
+
+    result, removidas = asyncio.run(conversar())
+    assert sum(1 for m in result["messages"] if isinstance(m, HumanMessage)) == 2
+    assert removidas == 1
+    assert _threads() == set()
+    print("✓ Teste passou\n")
+
+
+def test_grafo_exportado_com_ainvoke():
+    """Testa o agent de agent/graph.py com AGENT_CHECKPOINTER=postgres: ainvoke e invoke na mesma thread"""
+    print("=== Teste 6: grafo exportado com ainvoke ===")
+    _preparar_banco()
+    config = {"configurable": {"thread_id": "thread_grafo"}}
+
+    with _servidor() as server:
+        env = {**ENV_POSTGRES, "ASAAS_API_KEY": "test_key", "ASAAS_BASE_URL": server.base_url, "OPENAI_API_KEY": "test_key"}
+        with patch.dict(os.environ, env), patch("langchain_openai.ChatOpenAI", lambda **kwargs: FakeChatModel()):
+            sys.modules.pop("agent.graph", None)
+            graph = importlib.import_module("agent.graph")
+            try:
+                asyncio.run(graph.agent.ainvoke(
+                    {"messages": [{"role": "user", "content": "Meu CNPJ é 01248526000158"}]}, config
+                ))
+                result = graph.agent.invoke({"messages": [{"role": "user", "content": "Obrigado!"}]}, config)
+            finally:
+                sys.modules.pop("agent.graph", None)
+
+    messages = result["messages"]
+    print(f"Checkpointer: {type(graph.agent.checkpointer).__name__} | mensagens no estado: {len(messages)}")
+    assert [m.content for m in messages if isinstance(m, HumanMessage)] == ["Meu CNPJ é 01248526000158", "Obrigado!"]
+    assert sum(1 for m in messages if isinstance(m, ToolMessage)) == 1
+    assert _threads() == {"thread_grafo"}
+    print("✓ Teste passou\n")
+
+
+if __name__ == "__main__":
+    print("Executando testes para o checkpointer das threads...\n")
+
+    test_tipo_do_checkpointer_por_variavel()
+    test_migracao_dispensa_setup()
+    test_conversa_so_com_a_nova_mensagem()
+    test_poda_remove_so_threads_antigas()
+    test_checkpointer_assincrono()
+    test_grafo_exportado_com_ainvoke()
+
+    print("Todos os testes passaram!")
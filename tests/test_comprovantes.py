@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Arquivo de teste para a validação de comprovantes (agent/receipts.py e a tool validar_comprovante)
+"""
+
+import asyncio
+import random
+import sys
+import os
+from datetime import date, timedelta
+from unittest.mock import patch
+
+# Adicionar o diretório do projeto ao path para poder importar os módulos
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from agent.receipts import IndicePendencias, extrair_campos, linha_digitavel_valida, validar_texto, vencimento_do_fator
+from agent.tools import validar_comprovante
+from tests.fake_asaas import FakeAsaasServer, gerar_cliente
+from tests.fake_comprovantes import (
+    CNPJ_NEXUZ,
+    HOJE,
+    LAYOUTS,
+    gerar_cnpj,
+    gerar_corpus,
+    gerar_linha_digitavel,
+    gerar_pendencias,
+    layout_pix_nubank,
+)
+
+ENV_BENEFICIARIO = {"COMPROVANTE_CNPJS_BENEFICIARIO": CNPJ_NEXUZ}
+
+
+def _dados(rng, valor=437.27, vencimento=date(2025, 6, 10), pago_em=date(2025, 6, 12), cnpj_pagador="01248526000158"):
+    return {
+        "valor": valor,
+        "valor_documento": 424.53,
+        "vencimento": vencimento,
+        "pago_em": pago_em,
+        "razao": "Lanchonete Sabor Divino LTDA",
+        "cnpj_pagador": cnpj_pagador,
+        "cnpj_beneficiario": CNPJ_NEXUZ,
+        "nome_beneficiario": "NEXUZ TECNOLOGIA LTDA",
+        "linha": gerar_linha_digitavel(rng, 424.53, vencimento),
+    }
+
+
+def test_extracao_por_layout():
+    """Testa a extração de valor, datas, CNPJs e banco em cada layout"""
+    print("=== Teste 1: extração por layout ===")
+    rng = random.Random(1)
+    c = _dados(rng)
+
+    for nome, layout in LAYOUTS.items():
+        campos = extrair_campos(layout(rng, c), HOJE)
+        print(f"{nome}: {campos['valor']} {campos['data_pagamento']} {campos['banco']}")
+        assert campos["valor"] == 437.27, nome
+        assert campos["data_pagamento"] == "2025-06-12", nome
+        assert campos["cnpj_pagador"] == "01248526000158", nome
+        assert campos["cnpj_beneficiario"] == CNPJ_NEXUZ, nome
+        assert campos["banco"], nome
+        assert campos["autenticacao"] or campos["pix_id"], nome
+        assert not campos["agendamento"], nome
+
+    boleto = extrair_campos(LAYOUTS["boleto_itau"](rng, c), HOJE)
+    assert boleto["linha_valida"] is True and boleto["valor_boleto"] == 424.53
+    assert boleto["data_vencimento"] == "2025-06-10"
+    print("✓ Teste passou\n")
+
+
+def test_linha_digitavel():
+    """Testa os dígitos verificadores da linha digitável e o fator de vencimento (inclusive o reinício de 2025)"""
+    print("=== Teste 2: linha digitável ===")
+    rng = random.Random(2)
+    linha = gerar_linha_digitavel(rng, 199.9, date(2025, 7, 10))
+
+    assert linha_digitavel_valida(linha)
+    digitos = "".join(ch for ch in linha if ch.isdigit())
+    adulterada = digitos[:-1] + str((int(digitos[-1]) + 1) % 10)
+    assert not linha_digitavel_valida(adulterada)
+
+    assert vencimento_do_fator(1000, date(2025, 3, 1)) == date(2025, 2, 22)
+    assert vencimento_do_fator(9999, date(2025, 2, 1)) == date(2025, 2, 21)
+    assert vencimento_do_fator(1000, date(2000, 7, 1)) == date(2000, 7, 3)
+    print("✓ Teste passou\n")
+
+
+def test_indice_pendencias():
+    """Testa a busca de candidatas por faixa de valor e por vencimento"""
+    print("=== Teste 3: índice de pendências ===")
+    pendencias = [
+        {"id": "a", "valor": 100.0, "valor_total": 100.0, "data_vencimento": "2025-06-10"},
+        {"id": "b", "valor": 100.0, "valor_total": 103.0, "data_vencimento": "2025-05-10"},
+        {"id": "c", "valor": 300.0, "valor_total": 300.0, "data_vencimento": "2025-07-10"},
+    ]
+    indice = IndicePendencias(pendencias)
+
+    assert {pendencias[i]["id"] for i in indice.exatas(103.0)} == {"b"}
+    assert {pendencias[i]["id"] for i in indice.candidatas(95.0, None)} == {"a", "b"}
+    assert {pendencias[i]["id"] for i in indice.candidatas(500.0, "2025-07-10")} == {"c"}
+    assert indice.candidatas(None, None) == []
+    print("✓ Teste passou\n")
+
+
+def test_escolha_da_pendencia():
+    """Testa que, entre mensalidades de mesmo valor, fica a de vencimento mais próximo do pagamento"""
+    print("=== Teste 4: escolha entre pendências de mesmo valor ===")
+    rng = random.Random(4)
+    pendencias = [
+        {"id": "jun", "valor": 424.53, "valor_total": 424.53, "data_vencimento": "2025-06-20"},
+        {"id": "jul", "valor": 424.53, "valor_total": 424.53, "data_vencimento": "2025-07-20"},
+    ]
+    texto = layout_pix_nubank(rng, _dados(rng, valor=424.53))
+
+    with patch.dict(os.environ, ENV_BENEFICIARIO):
+        resultado = validar_texto(texto, pendencias, "01248526000158", HOJE)
+        terceiro = validar_texto(texto.replace("11.444.777/0001-61", "19.482.199/0001-60"), pendencias, "01248526000158", HOJE)
+
+    print(f"Resultado: {resultado['valido']} {resultado['confiabilidade']} {resultado['pendencia_id']}")
+    assert resultado["valido"] and resultado["pendencia_id"] == "jun"
+    assert not terceiro["valido"] and any("beneficiário" in m for m in terceiro["motivos"])
+    print("✓ Teste passou\n")
+
+
+def test_corpus_sintetico():
+    """Testa acerto e calibração da confiabilidade no corpus sintético rotulado"""
+    print("=== Teste 5: corpus sintético ===")
+    from benchmarks.bench_comprovantes import calibracao, validar_corpus
+
+    corpus = gerar_corpus(1500, seed=11)
+    with patch.dict(os.environ, ENV_BENEFICIARIO):
+        resultados = validar_corpus(corpus)
+
+    acertos = sum(r["valido"] == item["valido"] for item, (_, r) in zip(corpus, resultados))
+    falsos_validos = sum(r["valido"] and not item["valido"] for item, (_, r) in zip(corpus, resultados))
+    brier, ece, _ = calibracao([r["confiabilidade"] for _, r in resultados], [item["valido"] for item in corpus])
+    print(f"Acerto: {acertos / len(corpus):.1%} | falsos válidos: {falsos_validos} | Brier: {brier:.4f} | ECE: {ece:.4f}")
+    assert acertos / len(corpus) >= 0.94
+    assert falsos_validos <= len(corpus) * 0.005
+    assert brier < 0.04 and ece < 0.05
+    print("✓ Teste passou\n")
+
+
+def _asaas_com_pendencia(cnpj, vencimento):
+    server = FakeAsaasServer()
+    cliente = gerar_cliente("cus_000000000019", cnpj)
+    pagamento = {
+        "object": "payment", "id": "pay_comprovante01", "customer": "cus_000000000019",
+        "status": "PENDING", "value": 424.53, "fine": {"value": 0}, "interest": {"value": 0},
+        "dueDate": vencimento.isoformat(), "billingType": "BOLETO", "deleted": False,
+    }
+    server.adicionar_cliente(cliente, [pagamento])
+    return server
+
+
+def test_tool_validar_comprovante():
+    """Testa a tool: pendências buscadas pelo CNPJ do cliente da conversa, nunca pelo do pagador (sync e async)"""
+    print("=== Teste 6: tool validar_comprovante ===")
+    rng = random.Random(6)
+    cnpj, terceiro = gerar_cnpj(rng), gerar_cnpj(rng)
+    hoje = date.today()
+    texto = layout_pix_nubank(rng, _dados(rng, valor=424.53, pago_em=hoje, cnpj_pagador=cnpj))
+    de_terceiro = layout_pix_nubank(rng, _dados(rng, valor=424.53, pago_em=hoje, cnpj_pagador=terceiro))
+
+    with _asaas_com_pendencia(cnpj, hoje + timedelta(days=5)) as server:
+        env = {**ENV_BENEFICIARIO, "ASAAS_API_KEY": "test_key", "ASAAS_BASE_URL": server.base_url, "COMPROVANTES_DEDUP": "false"}
+        with patch.dict(os.environ, env):
+            resultado = validar_comprovante.invoke({"input": {"ocr_text": texto, "cnpj": cnpj}})
+            assincrono = asyncio.run(validar_comprovante.ainvoke({"input": {"ocr_text": texto, "cnpj": cnpj}}))
+            divergente = validar_comprovante.invoke({"input": {"ocr_text": texto.replace("424,53", "99,00"), "cnpj": cnpj}})
+            pago_por_outro = validar_comprovante.invoke({"input": {"ocr_text": de_terceiro, "cnpj": cnpj}})
+            requisicoes = len(server.requisicoes)
+            sem_cnpj = validar_comprovante.invoke({"input": {"ocr_text": texto}})
+            requisicoes_sem_cnpj = len(server.requisicoes) - requisicoes
+
+    print(f"Resultado: {resultado.mensagem} ({resultado.confiabilidade})")
+    assert resultado.status == "sucesso" and resultado.valido
+    assert resultado.pendencia_id == "pay_comprovante01" and resultado.confiabilidade >= 0.8
+    assert resultado.campos["cnpj_pagador"] == cnpj
+    assert assincrono.valido and assincrono.pendencia_id == "pay_comprovante01"
+    assert divergente.status == "sucesso" and not divergente.valido
+
+    # Mesmo valor e vencimento da pendência, mas pago por outro CNPJ: vai para conferência manual
+    assert pago_por_outro.status == "sucesso" and not pago_por_outro.valido
+    assert pago_por_outro.campos["cnpj_pagador"] == terceiro
+    assert "pagador diferente do cliente" in pago_por_outro.motivos
+
+    # Sem o CNPJ da conversa, o do pagador não é usado para escolher o cliente
+    assert sem_cnpj.status == "erro" and "CNPJ do cliente" in sem_cnpj.mensagem
+    assert requisicoes_sem_cnpj == 0
+    print("✓ Teste passou\n")
+
+
+if __name__ == "__main__":
+    print("Executando testes para a validação de comprovantes...\n")
+
+    test_extracao_por_layout()
+    test_linha_digitavel()
+    test_indice_pendencias()
+    test_escolha_da_pendencia()
+    test_corpus_sintetico()
+    test_tool_validar_comprovante()
+
+    print("Todos os testes passaram!")
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Arquivo de teste para o índice de comprovantes já vistos (agent/receipt_index.py)
+
+Requer um Postgres local configurado pelas variáveis DB_* (o mesmo do agente).
+A tabela comprovantes é criada e esvaziada aqui.
+"""
+
+import asyncio
+import io
+import random
+import sys
+import os
+from contextlib import redirect_stderr, redirect_stdout
+from datetime import date, timedelta
+from pathlib import Path
+from unittest.mock import patch
+
+import psycopg
+import pytest
+
+# Adicionar o diretório do projeto ao path para poder importar os módulos
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from agent.receipt_index import (
+    _reset_comprovantes_stats,
+    comprovantes_stats,
+    impressao_comprovante,
+    podar_comprovantes,
+)
+from agent.tools import _clientes_cache, _ids_clientes_cache, _pendencias_cache, validar_comprovante
+from agent.utils import _conn
+from tests.fake_asaas import FakeAsaasServer, gerar_cliente
+from tests.fake_comprovantes import CNPJ_NEXUZ, gerar_cnpj, gerar_linha_digitavel, layout_boleto_itau, layout_pix_nubank
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+
+def _preparar_banco():
+    """Cria a tabela comprovantes vazia; pula o teste sem Postgres."""
+    try:
+        with _conn() as conn:
+            conn.execute((REPO_ROOT / "sql" / "10_create_comprovantes.sql").read_text(encoding="utf-8"))
+            conn.execute("TRUNCATE comprovantes")
+    except Exception as e:
+        pytest.skip(f"Postgres local indisponível: {e}")
+    _reset_comprovantes_stats()
+
+
+def _comprovante(rng, cnpj, layout=layout_pix_nubank):
+    hoje = date.today()
+    c = {
+        "valor": 424.53,
+        "valor_documento": 424.53,
+        "vencimento": hoje + timedelta(days=5),
+        "pago_em": hoje,
+        "razao": "Lanchonete Sabor Divino LTDA",
+        "cnpj_pagador": cnpj,
+        "cnpj_beneficiario": CNPJ_NEXUZ,
+        "nome_beneficiario": "NEXUZ TECNOLOGIA LTDA",
+        "linha": gerar_linha_digitavel(rng, 424.53, hoje + timedelta(days=5)),
+    }
+    return layout(rng, c)
+
+
+def _asaas(*cnpjs):
+    server = FakeAsaasServer()
+    for i, cnpj in enumerate(cnpjs):
+        customer_id = f"cus_00000000002{i}"
+        pagamento = {
+            "object": "payment", "id": f"pay_repetido{i:04d}", "customer": customer_id,
+            "status": "PENDING", "value": 424.53, "fine": {"value": 0}, "interest": {"value": 0},
+            "dueDate": (date.today() + timedelta(days=5)).isoformat(), "billingType": "BOLETO", "deleted": False,
+        }
+        server.adicionar_cliente(gerar_cliente(customer_id, cnpj), [pagamento])
+    return server
+
+
+def _env(server):
+    return {
+        "ASAAS_API_KEY": "test_key",
+        "ASAAS_BASE_URL": server.base_url,
+        "COMPROVANTE_CNPJS_BENEFICIARIO": CNPJ_NEXUZ,
+        "COMPROVANTES_DEDUP": "true",
+    }
+
+
+def _validar(texto, cnpj):
+    return validar_comprovante.invoke({"input": {"ocr_text": texto, "cnpj": cnpj}})
+
+
+def test_impressao_tolera_ruido_de_ocr():
+    """Testa que variações de OCR do mesmo texto têm a mesma impressão e textos diferentes não"""
+    print("=== Teste 1: impressão do texto ===")
+    texto = "Comprovante de Transferência\nValor: R$ 424,53\nNEXUZ TECNOLOGIA LTDA\nData: 12/06/2025"
+
+    variacoes = [
+        texto.upper(),
+        texto.replace("\n", "  \n ").replace(": ", ":"),
+        texto.replace("ê", "e"),
+        texto.replace("o", "0").replace("l", "1").replace("S", "5"),
+        texto.replace("Transferência", "Transfcrência").replace("Valor", "Volor"),
+    ]
+    assert all(impressao_comprovante(v) == impressao_comprovante(texto) for v in variacoes)
+    assert impressao_comprovante(texto.replace("424,53", "424,58")) != impressao_comprovante(texto)
+    assert impressao_comprovante(texto.replace("12/06", "13/06")) != impressao_comprovante(texto)
+    print("✓ Teste passou\n")
+
+
+def test_reenvio_respondido_pelo_indice():
+    """Testa que o reenvio idêntico (e o quase idêntico) volta o resultado anterior sem consultar o Asaas"""
+    print("=== Teste 2: reenvio do mesmo comprovante ===")
+    _preparar_banco()
+    rng = random.Random(20)
+    cnpj = gerar_cnpj(rng)
+    texto = _comprovante(rng, cnpj)
+
+    with _asaas(cnpj) as server, patch.dict(os.environ, _env(server)):
+        primeiro = _validar(texto, cnpj)
+        requisicoes = len(server.requisicoes)
+        reenvios = [_validar(texto, cnpj), _validar(texto.upper(), cnpj), _validar(texto.replace("Valor", "Va1or"), cnpj)]
+        requisicoes_depois = len(server.requisicoes)
+
+    print(f"Primeiro: {primeiro.mensagem} | {comprovantes_stats()}")
+    assert primeiro.valido and not primeiro.duplicado
+    assert requisicoes_depois == requisicoes
+    assert all(r.duplicado and r.valido and r.pendencia_id == primeiro.pendencia_id for r in reenvios)
+    assert "já recebido" in reenvios[0].mensagem
+    assert comprovantes_stats()["comprovantes_repetidos"] == 3
+    with _conn() as conn:
+        assert conn.execute("SELECT envios FROM comprovantes").fetchone()[0] == 4
+    print("✓ Teste passou\n")
+
+
+def test_mesma_transacao_com_outro_texto():
+    """Testa o mesmo comprovante com linhas perdidas no OCR: pego pelo ID da transação"""
+    print("=== Teste 3: mesma transação, texto diferente ===")
+    _preparar_banco()
+    rng = random.Random(21)
+    cnpj = gerar_cnpj(rng)
+    texto = _comprovante(rng, cnpj, layout_boleto_itau)
+    cortado = "\n".join(linha for linha in texto.split("\n") if not linha.startswith(("(+)", "Operação")))
+
+    with _asaas(cnpj) as server, patch.dict(os.environ, _env(server)):
+        primeiro = _validar(texto, cnpj)
+        requisicoes = len(server.requisicoes)
+        segundo = _validar(cortado, cnpj)
+        terceiro = _validar(cortado, cnpj)
+        requisicoes_depois = len(server.requisicoes)
+
+    stats = comprovantes_stats()
+    print(f"Stats: {stats}")
+    assert impressao_comprovante(cortado) != impressao_comprovante(texto)
+    assert primeiro.valido and segundo.duplicado and segundo.pendencia_id == primeiro.pendencia_id
+    assert terceiro.duplicado and requisicoes_depois == requisicoes
+    assert stats["comprovantes_mesma_transacao"] == 1 and stats["comprovantes_repetidos"] == 1
+    print("✓ Teste passou\n")
+
+
+def test_reuso_por_outro_cnpj():
+    """Testa que o comprovante de um cliente enviado por outro CNPJ é recusado"""
+    print("=== Teste 4: reuso por outro CNPJ ===")
+    _preparar_banco()
+    rng = random.Random(22)
+    cnpj, outro = gerar_cnpj(rng), gerar_cnpj(rng)
+    texto = _comprovante(rng, cnpj)
+    # Outro print do mesmo PIX, enviado por outro cliente
+    outro_print = texto.replace("Comprovante de transferência", "Pix enviado")
+
+    with _asaas(cnpj, outro) as server, patch.dict(os.environ, _env(server)):
+        original = _validar(texto, cnpj)
+        mesmo_texto = _validar(texto, outro)
+        mesmo_pix = _validar(outro_print, outro)
+        de_novo = _validar(outro_print, outro)
+
+    print(f"Reuso: {mesmo_texto.mensagem} | {comprovantes_stats()}")
+    assert original.valido
+    for reuso in (mesmo_texto, mesmo_pix, de_novo):
+        assert reuso.duplicado and not reuso.valido and reuso.pendencia_id is None
+        assert "outro cliente" in reuso.mensagem
+    assert comprovantes_stats()["comprovantes_outro_cnpj"] == 2
+    print("✓ Teste passou\n")
+
+
+def test_retencao_e_poda():
+    """Testa que comprovantes fora da retenção são validados de novo e removidos pela poda,
+    inclusive por scripts/podar_retencao.py com as outras etapas falhando"""
+    print("=== Teste 5: retenção ===")
+    from scripts.podar_retencao import main
+
+    _preparar_banco()
+    rng = random.Random(23)
+    cnpj = gerar_cnpj(rng)
+    texto = _comprovante(rng, cnpj)
+    sem_tabela = psycopg.errors.UndefinedTable('relation "checkpoints" does not exist')
+
+    with _asaas(cnpj) as server, patch.dict(os.environ, {**_env(server), "COMPROVANTES_RETENCAO_DIAS": "0"}):
+        primeiro = _validar(texto, cnpj)
+        segundo = _validar(texto, cnpj)
+        removidos = podar_comprovantes(lote=1)
+        _validar(texto, cnpj)
+        with patch("scripts.podar_retencao.podar_threads", side_effect=sem_tabela), \
+                patch("scripts.podar_retencao.podar_idempotencia", side_effect=psycopg.OperationalError("timeout")), \
+                redirect_stdout(io.StringIO()) as saida, redirect_stderr(io.StringIO()):
+            codigo = main(["--lote-comprovantes", "1"])
+
+    print(saida.getvalue())
+    assert not primeiro.duplicado and not segundo.duplicado
+    assert removidos == 1
+    assert codigo == 1 and "Comprovantes removidos: 1" in saida.getvalue()
+    with _conn() as conn:
+        assert conn.execute("SELECT count(*) FROM comprovantes").fetchone()[0] == 0
+    print("✓ Teste passou\n")
+
+
+def test_versao_assincrona():
+    """Testa o índice na versão assíncrona da tool"""
+    print("=== Teste 6: versão assíncrona ===")
+    _preparar_banco()
+    rng = random.Random(24)
+    cnpj = gerar_cnpj(rng)
+    texto = _comprovante(rng, cnpj)
+
+    async def enviar():
+        primeiro = await validar_comprovante.ainvoke({"input": {"ocr_text": texto, "cnpj": cnpj}})
+        segundo = await validar_comprovante.ainvoke({"input": {"ocr_text": texto.lower(), "cnpj": cnpj}})
+        return primeiro, segundo
+
+    with _asaas(cnpj) as server, patch.dict(os.environ, _env(server)):
+        primeiro, segundo = asyncio.run(enviar())
+
+    assert primeiro.valido and not primeiro.duplicado
+    assert segundo.duplicado and segundo.pendencia_id == primeiro.pendencia_id
+    print("✓ Teste passou\n")
+
+
+def _retencao(impressao):
+    with _conn() as conn:
+        return conn.execute(
+            "SELECT expira_em - criado_em FROM comprovantes WHERE impressao = %s", (impressao,)
+        ).fetchone()[0]
+
+
+def test_negativo_com_retencao_curta():
+    """Testa que um comprovante que não conferiu fica pouco no índice e é validado de novo
+    depois que a cobrança aparece no Asaas"""
+    print("=== Teste 7: retenção curta dos negativos ===")
+    _preparar_banco()
+    rng = random.Random(25)
+    cnpj = gerar_cnpj(rng)
+    texto = _comprovante(rng, cnpj)
+    impressao = impressao_comprovante(texto)
+    caches = (_clientes_cache, _ids_clientes_cache, _pendencias_cache)
+
+    # Primeiro envio antes de a cobrança existir no Asaas
+    for cache in caches:
+        cache.clear()
+    with FakeAsaasServer() as server, patch.dict(os.environ, _env(server)):
+        server.adicionar_cliente(gerar_cliente("cus_000000000020", cnpj), [])
+        negativo = _validar(texto, cnpj)
+        reenvio = _validar(texto, cnpj)
+    retencao_negativo = _retencao(impressao)
+
+    # Passados os minutos da retenção dos negativos, a cobrança já foi criada
+    with _conn() as conn:
+        conn.execute("UPDATE comprovantes SET expira_em = CURRENT_TIMESTAMP WHERE impressao = %s", (impressao,))
+    for cache in caches:
+        cache.clear()
+    with _asaas(cnpj) as server, patch.dict(os.environ, _env(server)):
+        positivo = _validar(texto, cnpj)
+    retencao_positivo = _retencao(impressao)
+
+    print(f"Retenção: negativo {retencao_negativo} | positivo {retencao_positivo}")
+    assert not negativo.valido and not negativo.duplicado
+    assert reenvio.duplicado and not reenvio.valido
+    assert retencao_negativo == timedelta(minutes=15)
+    assert positivo.valido and not positivo.duplicado
+    assert retencao_positivo == timedelta(days=180)
+    print("✓ Teste passou\n")
+
+
+if __name__ == "__main__":
+    print("Executando testes para o índice de comprovantes...\n")
+
+    test_impressao_tolera_ruido_de_ocr()
+    test_reenvio_respondido_pelo_indice()
+    test_mesma_transacao_com_outro_texto()
+    test_reuso_por_outro_cnpj()
+    test_retencao_e_poda()
+    test_versao_assincrona()
+    test_negativo_com_retencao_curta()
+
+    print("Todos os testes passaram!")
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Arquivo de teste para a busca paralela de cliente e pendências em consulta_financeira
+
+Quando o id do cliente já é conhecido (customer_id na entrada ou cache de ids),
+GET /customers/{id} e GET /payments são feitos ao mesmo tempo.
+"""
+
+import asyncio
+import sys
+import os
+import time
+from unittest.mock import patch
+
+# Adicionar o diretório do projeto ao path para poder importar os módulos
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from agent.tools import (
+    _clientes_cache,
+    _ids_clientes_cache,
+    _pendencias_cache,
+    aconsulta_financeira,
+    consulta_financeira,
+)
+from agent.models import ConsultaFinanceiraInput
+from agent.utils import AsaasError, _get_asaas_async_client, _reset_asaas_resiliencia
+from tests.fake_asaas import FakeAsaasServer, gerar_cliente, gerar_pagamentos
+
+CNPJ = "01248526000158"
+LATENCIA = 0.3
+
+# A visão padrão faz um GET /payments por status em aberto (OVERDUE, PENDING)
+ROTAS_PARALELAS = [
+    ("GET", "/v3/customers/cus_000000000001"), ("GET", "/v3/payments"), ("GET", "/v3/payments"),
+]
+
+
+def _limpar_caches():
+    _clientes_cache.clear()
+    _ids_clientes_cache.clear()
+    _pendencias_cache.clear()
+    _reset_asaas_resiliencia()
+
+
+def _servidor(latencia=LATENCIA):
+    server = FakeAsaasServer(latencia=latencia)
+    server.adicionar_cliente(gerar_cliente(), gerar_pagamentos("cus_000000000001", 6))
+    server.adicionar_cliente(
+        gerar_cliente(customer_id="cus_000000000002", cpf_cnpj="11222333000181"),
+        [],
+    )
+    return server
+
+
+def _rotas(server, inicio=0):
+    return [(method, path) for method, path, _ in server.requisicoes[inicio:]]
+
+
+def test_customer_id_informado_busca_em_paralelo():
+    """Testa que com customer_id as duas requisições saem juntas"""
+    print("=== Teste 1: customer_id informado ===")
+    _limpar_caches()
+
+    with _servidor() as server:
+        with patch.dict(os.environ, {"ASAAS_API_KEY": "test_key", "ASAAS_BASE_URL": server.base_url}):
+            inicio = time.perf_counter()
+            result = consulta_financeira.invoke({"input": {"cnpj": CNPJ, "customer_id": "cus_000000000001"}})
+            duracao = time.perf_counter() - inicio
+
+    print(f"Duração: {duracao:.2f}s | Rotas: {_rotas(server)}")
+    assert result.status == 'sucesso'
+    assert result.cliente["id"] == "cus_000000000001"
+    assert result.total_pendencias == 4
+    assert sorted(_rotas(server)) == ROTAS_PARALELAS
+    # Sequencial seriam 3 latências (cliente + 2 páginas); em paralelo, 2
+    assert duracao < 2.5 * LATENCIA
+    print("✓ Teste passou\n")
+
+
+def test_id_em_cache_busca_em_paralelo():
+    """Testa que o cache de ids dispensa a busca por CNPJ quando os dados do cliente expiram"""
+    print("=== Teste 2: id em cache ===")
+    _limpar_caches()
+
+    with _servidor(latencia=0) as server:
+        with patch.dict(os.environ, {"ASAAS_API_KEY": "test_key", "ASAAS_BASE_URL": server.base_url}):
+            primeira = consulta_financeira.invoke({"input": {"cnpj": CNPJ}})
+            _clientes_cache.clear()
+            _pendencias_cache.clear()
+            requisicoes_antes = len(server.requisicoes)
+            segunda = consulta_financeira.invoke({"input": {"cnpj": CNPJ}})
+
+    assert _rotas(server)[:2] == [("GET", "/v3/customers"), ("GET", "/v3/payments")]
+    assert sorted(_rotas(server, requisicoes_antes)) == ROTAS_PARALELAS
+    assert segunda == primeira
+    print("✓ Teste passou\n")
+
+
+def test_customer_id_de_outro_cnpj_usa_busca_por_cnpj():
+    """Testa que um customer_id que não pertence ao CNPJ não vaza dados de outro cliente"""
+    print("=== Teste 3: customer_id de outro cliente ===")
+    _limpar_caches()
+
+    with _servidor(latencia=0) as server:
+        with patch.dict(os.environ, {"ASAAS_API_KEY": "test_key", "ASAAS_BASE_URL": server.base_url}):
+            result = consulta_financeira.invoke({"input": {"cnpj": CNPJ, "customer_id": "cus_000000000002"}})
+            inexistente = consulta_financeira.invoke({"input": {"cnpj": "11222333000181", "customer_id": "cus_999"}})
+
+    assert result.status == 'sucesso'
+    assert result.cliente["id"] == "cus_000000000001"
+    assert result.total_pendencias == 4
+    assert inexistente.status == 'sucesso'
+    assert inexistente.cliente["id"] == "cus_000000000002"
+    assert _ids_clientes_cache.get(CNPJ) == "cus_000000000001"
+    print("✓ Teste passou\n")
+
+
+def test_erro_nas_pendencias_mantem_formato():
+    """Testa que uma falha em /payments na busca paralela volta como ConsultaFinanceiraOutput"""
+    print("=== Teste 4: erro nas pendências ===")
+    _limpar_caches()
+    erro = {"status": "erro", "mensagem": "Erro na requisição: 400 - invalido"}
+
+    with _servidor(latencia=0) as server:
+        with patch.dict(os.environ, {"ASAAS_API_KEY": "test_key", "ASAAS_BASE_URL": server.base_url}), \
+                patch("agent.tools._buscar_pendencias", side_effect=AsaasError(erro)):
+            result = consulta_financeira.invoke({"input": {"cnpj": CNPJ, "customer_id": "cus_000000000001"}})
+
+    assert result.status == 'erro'
+    assert result.mensagem == erro["mensagem"]
+    print("✓ Teste passou\n")
+
+
+def test_aconsulta_financeira_em_paralelo():
+    """Testa a versão assíncrona com asyncio.gather"""
+    print("=== Teste 5: versão assíncrona ===")
+    _limpar_caches()
+
+    with _servidor() as server:
+        with patch.dict(os.environ, {"ASAAS_API_KEY": "test_key", "ASAAS_BASE_URL": server.base_url}):
+            entrada = ConsultaFinanceiraInput(cnpj=CNPJ, customer_id="cus_000000000001")
+
+            async def consultar():
+                # Cria o AsyncClient do loop antes de medir (a criação do contexto SSL é lenta)
+                _get_asaas_async_client()
+                inicio = time.perf_counter()
+                result = await aconsulta_financeira(entrada)
+                return result, time.perf_counter() - inicio
+
+            result, duracao = asyncio.run(consultar())
+
+    print(f"Duração: {duracao:.2f}s")
+    assert result.status == 'sucesso'
+    assert result.total_pendencias == 4
+    assert sorted(_rotas(server)) == ROTAS_PARALELAS
+    assert duracao < 2.5 * LATENCIA
+    print("✓ Teste passou\n")
+
+
+if __name__ == "__main__":
+    print("Executando testes para a busca paralela em consulta_financeira...\n")
+
+    test_customer_id_informado_busca_em_paralelo()
+    test_id_em_cache_busca_em_paralelo()
+    test_customer_id_de_outro_cnpj_usa_busca_por_cnpj()
+    test_erro_nas_pendencias_mantem_formato()
+    test_aconsulta_financeira_em_paralelo()
+
+    print("Todos os testes passaram!")
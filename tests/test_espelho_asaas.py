@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Arquivo de teste para o espelho local do Asaas (webhooks, backfill e leitura)
+
+Requer um Postgres local configurado pelas variáveis DB_* (o mesmo do agente).
+As tabelas de sql/04_create_asaas_mirror.sql são criadas e esvaziadas aqui.
+"""
+
+import json
+import sys
+import os
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+# Adicionar o diretório do projeto ao path para poder importar os módulos
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from agent.mirror import backfill, ler_espelho, processar_evento
+from agent.tools import _clientes_cache, _ids_clientes_cache, _pendencias_cache, consulta_financeira
+from agent.utils import _conn
+from tests.fake_asaas import FakeAsaasServer, gerar_cliente, gerar_pagamentos
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+FIXTURES = Path(__file__).parent / "fixtures" / "asaas_webhooks"
+
+
+def _evento(nome):
+    return json.loads((FIXTURES / f"{nome}.json").read_text(encoding="utf-8"))
+
+
+def _preparar_banco():
+    """Cria as tabelas do espelho e limpa os dados; pula o teste sem Postgres."""
+    try:
+        with _conn() as conn:
+            conn.execute((REPO_ROOT / "sql" / "04_create_asaas_mirror.sql").read_text(encoding="utf-8"))
+            conn.execute("TRUNCATE clientes, pagamentos, asaas_eventos")
+    except Exception as e:
+        pytest.skip(f"Postgres local indisponível: {e}")
+
+
+def _pagamento(payment_id):
+    with _conn() as conn:
+        return conn.execute(
+            "SELECT status, valor, deletado FROM pagamentos WHERE id = %s", (payment_id,)
+        ).fetchone()
+
+
+def test_evento_repetido_e_idempotente():
+    """Testa que o mesmo evento entregue duas vezes só é aplicado uma vez"""
+    print("=== Teste 1: idempotência pelo id do evento ===")
+    _preparar_banco()
+
+    with _conn() as conn:
+        assert processar_evento(conn, _evento("payment_created")) is True
+    with _conn() as conn:
+        assert processar_evento(conn, _evento("payment_created")) is False
+        eventos = conn.execute("SELECT count(*) FROM asaas_eventos").fetchone()[0]
+
+    assert eventos == 1
+    assert _pagamento("pay_080225913252")[0] == "PENDING"
+    print("✓ Teste passou\n")
+
+
+def test_eventos_fora_de_ordem_nao_regridem_o_pagamento():
+    """Testa que um evento antigo entregue depois não sobrescreve o estado atual"""
+    print("=== Teste 2: eventos fora de ordem ===")
+    _preparar_banco()
+
+    with _conn() as conn:
+        for nome in ("payment_created", "payment_received", "payment_updated", "payment_overdue"):
+            processar_evento(conn, _evento(nome))
+
+    status, valor, deletado = _pagamento("pay_080225913252")
+    print(f"Estado final: {status} {valor} {deletado}")
+    assert status == "RECEIVED"
+    assert float(valor) == 284.9
+    assert deletado is False
+    print("✓ Teste passou\n")
+
+
+def test_evento_de_remocao():
+    """Testa que PAYMENT_DELETED marca o pagamento como removido"""
+    print("=== Teste 3: PAYMENT_DELETED ===")
+    _preparar_banco()
+
+    with _conn() as conn:
+        processar_evento(conn, _evento("payment_created"))
+        processar_evento(conn, _evento("payment_deleted"))
+
+    assert _pagamento("pay_080225913252")[2] is True
+    print("✓ Teste passou\n")
+
+
+def test_backfill_e_consulta_pelo_espelho():
+    """Testa o backfill a partir da API e a consulta servida pelo espelho"""
+    print("=== Teste 4: backfill + consulta pelo espelho ===")
+    _preparar_banco()
+    _clientes_cache.clear()
+    _ids_clientes_cache.clear()
+    _pendencias_cache.clear()
+
+    with FakeAsaasServer() as server:
+        server.adicionar_cliente(gerar_cliente(), gerar_pagamentos("cus_000000000001", 300))
+        outros = gerar_pagamentos("cus_000000000002", 5)
+        for pagamento in outros:
+            pagamento["id"] = pagamento["id"].replace("pay_", "pay_b")
+        server.adicionar_cliente(gerar_cliente(customer_id="cus_000000000002", cpf_cnpj="11222333000181"), outros)
+        headers = {"access_token": "test_key"}
+        resultado = backfill(server.base_url, headers, tamanho_lote=50)
+        print(f"Backfill: {resultado}")
+
+        env = {"ASAAS_API_KEY": "test_key", "ASAAS_BASE_URL": server.base_url, "ASAAS_MIRROR_ENABLED": "true"}
+        with patch.dict(os.environ, env):
+            requisicoes_antes = len(server.requisicoes)
+            result = consulta_financeira.invoke({"input": {"cnpj": "01248526000158", "max_itens": 1000}})
+            assert len(server.requisicoes) == requisicoes_antes
+
+    assert resultado == {"clientes": 2, "pagamentos": 305}
+    assert result.status == 'sucesso'
+    assert result.cliente["id"] == "cus_000000000001"
+    assert result.total_pendencias == 200
+    assert {p["status"] for p in result.pendencias} == {"OVERDUE", "PENDING"}
+    print("✓ Teste passou\n")
+
+
+def test_espelho_desatualizado_usa_api():
+    """Testa o fallback para a API quando o espelho passou do limite de atualização"""
+    print("=== Teste 5: espelho desatualizado ===")
+    _preparar_banco()
+    _clientes_cache.clear()
+    _ids_clientes_cache.clear()
+    _pendencias_cache.clear()
+
+    with FakeAsaasServer() as server:
+        server.adicionar_cliente(gerar_cliente(), gerar_pagamentos("cus_000000000001", 3))
+        backfill(server.base_url, {"access_token": "test_key"})
+        with _conn() as conn:
+            conn.execute("UPDATE clientes SET sincronizado_em = now() - interval '2 hours'")
+
+        assert ler_espelho("01248526000158", [{"status": "PENDING"}], 10) is None
+
+        env = {"ASAAS_API_KEY": "test_key", "ASAAS_BASE_URL": server.base_url, "ASAAS_MIRROR_ENABLED": "true"}
+        with patch.dict(os.environ, env):
+            requisicoes_antes = len(server.requisicoes)
+            result = consulta_financeira.invoke({"input": {"cnpj": "01248526000158"}})
+            requisicoes_api = len(server.requisicoes) - requisicoes_antes
+
+    assert result.status == 'sucesso'
+    assert requisicoes_api > 0
+    print("✓ Teste passou\n")
+
+
+def test_endpoint_de_webhook():
+    """Testa o endpoint HTTP de webhooks com token e eventos repetidos"""
+    print("=== Teste 6: endpoint /webhooks/asaas ===")
+    _preparar_banco()
+
+    from fastapi.testclient import TestClient
+    from agent.webhook_app import app
+
+    with patch.dict(os.environ, {"ASAAS_WEBHOOK_TOKEN": "segredo"}):
+        with TestClient(app) as client:
+            negado = client.post("/webhooks/asaas", json=_evento("payment_created"))
+            headers = {"asaas-access-token": "segredo"}
+            primeiro = client.post("/webhooks/asaas", json=_evento("payment_created"), headers=headers)
+            repetido = client.post("/webhooks/asaas", json=_evento("payment_created"), headers=headers)
+
+    assert negado.status_code == 401
+    assert primeiro.json() == {"recebido": True, "duplicado": False}
+    assert repetido.json() == {"recebido": True, "duplicado": True}
+    print("✓ Teste passou\n")
+
+
+if __name__ == "__main__":
+    print("Executando testes para o espelho local do Asaas...\n")
+
+    test_evento_repetido_e_idempotente()
+    test_eventos_fora_de_ordem_nao_regridem_o_pagamento()
+    test_evento_de_remocao()
+    test_backfill_e_consulta_pelo_espelho()
+    test_espelho_desatualizado_usa_api()
+    test_endpoint_de_webhook()
+
+    print("Todos os testes passaram!")
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Arquivo de teste para o formato compacto das saídas das tools (TOOL_OUTPUT_FORMAT=compacto)
+"""
+
+import asyncio
+import sys
+import os
+from unittest.mock import patch
+
+# Adicionar o diretório do projeto ao path para poder importar os módulos
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from langchain_core.messages import ToolMessage
+from langgraph.prebuilt import create_react_agent
+
+from agent.compact import _registros, ler_registro
+from agent.models import ConsultaFinanceiraOutput, TransferirHumanoOutput
+from agent.prompt import basic_prompt
+from agent.tools import (
+    _clientes_cache,
+    _ids_clientes_cache,
+    _pendencias_cache,
+    consulta_financeira,
+    detalhar_registro,
+    transferir_humano,
+    validar_comprovante,
+)
+from tests.fake_asaas import FakeAsaasServer, gerar_cliente, gerar_pagamentos
+from tests.fake_llm import FakeChatModel
+
+CNPJ = "01248526000158"
+
+
+def _consultar(server, formato, config=None):
+    _clientes_cache.clear()
+    _ids_clientes_cache.clear()
+    _pendencias_cache.clear()
+    env = {"ASAAS_API_KEY": "test_key", "ASAAS_BASE_URL": server.base_url, "TOOL_OUTPUT_FORMAT": formato}
+    with patch.dict(os.environ, env):
+        result = consulta_financeira.invoke({"input": {"cnpj": CNPJ}}, config)
+        return result, str(result)
+
+
+def _servidor():
+    server = FakeAsaasServer()
+    server.adicionar_cliente(gerar_cliente(), gerar_pagamentos("cus_000000000001", 12))
+    return server
+
+
+def test_consulta_compacta():
+    """Testa a tabela de pendências sem nulos, links e dados cadastrais"""
+    print("=== Teste 1: consulta_financeira compacta ===")
+
+    with _servidor() as server:
+        result, padrao = _consultar(server, "padrao")
+        _, compacto = _consultar(server, "compacto")
+
+    print(compacto)
+    print(f"Tamanho: padrão {len(padrao)} | compacto {len(compacto)}")
+    assert "link_boleto" in padrao
+    assert "None" in padrao
+    assert "https://" not in compacto
+    assert "None" not in compacto
+    assert "cidade" not in compacto
+    assert "id|status|venc|valor|total|fatura|desc" in compacto
+    assert all(p["id"] in compacto for p in result.pendencias)
+    assert "detalhar_registro" in compacto
+    assert len(compacto) < len(padrao) / 3
+    print("✓ Teste passou\n")
+
+
+def test_detalhar_registro_devolve_links():
+    """Testa que os registros completos ficam acessíveis pelo id"""
+    print("=== Teste 2: detalhar_registro ===")
+
+    with _servidor() as server:
+        result, _ = _consultar(server, "compacto")
+
+    pendencia = result.pendencias[0]
+    detalhe = detalhar_registro.invoke({"input": {"registro_id": pendencia["id"]}})
+    cliente = detalhar_registro.invoke({"input": {"registro_id": "cus_000000000001"}})
+    inexistente = detalhar_registro.invoke({"input": {"registro_id": "pay_inexistente"}})
+
+    assert detalhe.status == 'sucesso'
+    assert detalhe.registro["link_boleto"] == pendencia["link_boleto"]
+    assert cliente.registro["cidade"] == "São Paulo"
+    assert inexistente.status == 'nao_encontrado'
+    print("✓ Teste passou\n")
+
+
+def test_registros_restritos_a_conversa():
+    """Testa que detalhar_registro só devolve registros consultados na mesma conversa (sync e async)"""
+    print("=== Teste 3: registros restritos à conversa ===")
+    conversa = {"configurable": {"thread_id": "conversa-1"}}
+    outra = {"configurable": {"thread_id": "conversa-2"}}
+
+    with _servidor() as server:
+        result, _ = _consultar(server, "compacto", conversa)
+
+    pendencia = result.pendencias[0]["id"]
+    mesma = detalhar_registro.invoke({"input": {"registro_id": pendencia}}, conversa)
+    de_outra = detalhar_registro.invoke({"input": {"registro_id": pendencia}}, outra)
+    ade_outra = asyncio.run(detalhar_registro.ainvoke({"input": {"registro_id": "cus_000000000001"}}, outra))
+    amesma = asyncio.run(detalhar_registro.ainvoke({"input": {"registro_id": "cus_000000000001"}}, conversa))
+
+    assert mesma.status == "sucesso" and amesma.status == "sucesso"
+    assert de_outra.status == "nao_encontrado" and ade_outra.status == "nao_encontrado"
+    print("✓ Teste passou\n")
+
+
+def test_consultas_internas_na_conversa():
+    """Testa que validar_comprovante e transferir_humano (sync e async) guardam os registros na conversa que chamou"""
+    print("=== Teste 4: consultas internas na conversa ===")
+    conversas = [{"configurable": {"thread_id": f"conversa-interna-{i}"}} for i in range(4)]
+    comprovante = {"input": {"ocr_text": "Comprovante de pagamento PIX R$ 10,00", "cnpj": CNPJ}}
+    transferencia = {"input": {"contexto": "Cliente contesta a multa", "cnpj": CNPJ}}
+
+    _registros.clear()
+    with _servidor() as server:
+        env = {
+            "ASAAS_API_KEY": "test_key", "ASAAS_BASE_URL": server.base_url, "TOOL_OUTPUT_FORMAT": "compacto",
+            "COMPROVANTES_DEDUP": "false", "TICKETS_FILA": "true",
+        }
+        with patch.dict(os.environ, env), patch("agent.tools.abrir_ticket", return_value="ticket-sync"), \
+                patch("agent.tools.aabrir_ticket", return_value="ticket-async"):
+            validar_comprovante.invoke(comprovante, conversas[0])
+            asyncio.run(validar_comprovante.ainvoke(comprovante, conversas[1]))
+            transferir_humano.invoke(transferencia, conversas[2])
+            asyncio.run(transferir_humano.ainvoke(transferencia, conversas[3]))
+
+    for conversa in conversas:
+        assert ler_registro("cus_000000000001", conversa["configurable"]["thread_id"]) is not None
+    # Nada fica na chave sem conversa, compartilhada por todas
+    assert ler_registro("cus_000000000001") is None
+    print("✓ Teste passou\n")
+
+
+def test_saidas_genericas_sem_nulos():
+    """Testa o formato compacto das demais saídas e dos erros"""
+    print("=== Teste 5: saídas genéricas ===")
+
+    with patch.dict(os.environ, {"TOOL_OUTPUT_FORMAT": "compacto"}):
+        erro = str(ConsultaFinanceiraOutput(status="nao_encontrado", mensagem="Cliente não encontrado no Asaas"))
+        ticket = str(TransferirHumanoOutput(status="sucesso", mensagem="Transferido", ticket_id="ab12cd34"))
+
+    assert erro == "status=nao_encontrado; mensagem=Cliente não encontrado no Asaas"
+    assert ticket == "status=sucesso; mensagem=Transferido; ticket_id=ab12cd34"
+    print("✓ Teste passou\n")
+
+
+def test_tool_message_do_grafo_e_compacta():
+    """Testa que a ToolMessage criada pelo ToolNode usa o formato compacto"""
+    print("=== Teste 6: ToolMessage no grafo ===")
+    _clientes_cache.clear()
+    _ids_clientes_cache.clear()
+    _pendencias_cache.clear()
+
+    with _servidor() as server:
+        env = {"ASAAS_API_KEY": "test_key", "ASAAS_BASE_URL": server.base_url, "TOOL_OUTPUT_FORMAT": "compacto"}
+        with patch.dict(os.environ, env):
+            agent = create_react_agent(FakeChatModel(), prompt=basic_prompt, tools=[consulta_financeira, detalhar_registro])
+            result = agent.invoke({"messages": [{"role": "user", "content": f"Meu CNPJ é {CNPJ}"}]})
+
+    tool_messages = [m for m in result["messages"] if isinstance(m, ToolMessage)]
+    assert len(tool_messages) == 1
+    assert tool_messages[0].content.startswith("status=sucesso\ncliente: id=cus_000000000001")
+    print("✓ Teste passou\n")
+
+
+if __name__ == "__main__":
+    print("Executando testes para o formato compacto das saídas...\n")
+
+    test_consulta_compacta()
+    test_detalhar_registro_devolve_links()
+    test_registros_restritos_a_conversa()
+    test_consultas_internas_na_conversa()
+    test_saidas_genericas_sem_nulos()
+    test_tool_message_do_grafo_e_compacta()
+
+    print("Todos os testes passaram!")
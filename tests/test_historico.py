@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Arquivo de teste para a redução do histórico enviado ao modelo (agent/history.py)
+"""
+
+import sys
+import os
+from unittest.mock import patch
+
+# Adicionar o diretório do projeto ao path para poder importar os módulos
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from langgraph.prebuilt import create_react_agent
+
+from agent.history import criar_pre_model_hook, reduzir_historico
+from agent.prompt import basic_prompt
+from agent.tools import _clientes_cache, _ids_clientes_cache, _pendencias_cache, consulta_financeira
+from tests.fake_asaas import FakeAsaasServer, gerar_cliente, gerar_pagamentos
+from tests.fake_llm import FakeChatModel
+
+SAIDA_LONGA = "status='sucesso' " + "pendencia " * 500
+
+
+def _turno(i, cnpj="01248526000158"):
+    """Um turno com chamada de tool e resposta final."""
+    return [
+        HumanMessage(content=f"Mensagem {i} do cliente {cnpj}"),
+        AIMessage(content="", tool_calls=[{"name": "consulta_financeira", "args": {"input": {"cnpj": cnpj}}, "id": f"call_{i}"}]),
+        ToolMessage(content=SAIDA_LONGA, tool_call_id=f"call_{i}", name="consulta_financeira"),
+        AIMessage(content=f"Resposta {i}"),
+    ]
+
+
+def _conversa(turnos):
+    return [m for i in range(turnos) for m in _turno(i)]
+
+
+def _pares_validos(messages):
+    chamadas = {c["id"] for m in messages if isinstance(m, AIMessage) for c in m.tool_calls}
+    respostas = {m.tool_call_id for m in messages if isinstance(m, ToolMessage)}
+    return chamadas == respostas
+
+
+def test_conversa_curta_nao_muda():
+    """Testa que conversas dentro dos limites vão inteiras ao modelo"""
+    print("=== Teste 1: conversa curta ===")
+
+    messages = _conversa(2)
+    reduzido = reduzir_historico(messages, max_turnos=4, max_tokens=100000)
+
+    assert reduzido == messages
+    print("✓ Teste passou\n")
+
+
+def test_turnos_antigos_tem_saidas_resumidas():
+    """Testa que só as saídas de tools dos turnos antigos são resumidas"""
+    print("=== Teste 2: resumo das saídas antigas ===")
+
+    messages = _conversa(6)
+    reduzido = reduzir_historico(messages, max_turnos=2, max_tokens=100000, limite_resumo=100)
+    tool_messages = [m for m in reduzido if isinstance(m, ToolMessage)]
+
+    assert len(reduzido) == len(messages)
+    assert all(len(m.content) < 200 and "resumida" in m.content for m in tool_messages[:4])
+    assert all(m.content == SAIDA_LONGA for m in tool_messages[4:])
+    assert reduzido[-8:] == messages[-8:]
+    assert _pares_validos(reduzido)
+    assert messages[2].content == SAIDA_LONGA
+    print("✓ Teste passou\n")
+
+
+def test_orcamento_de_tokens():
+    """Testa o corte de turnos inteiros pelo orçamento de tokens, com nota dos identificadores"""
+    print("=== Teste 3: orçamento de tokens ===")
+
+    messages = _conversa(30)
+    reduzido = reduzir_historico(messages, prompt=basic_prompt, max_turnos=3, max_tokens=4000)
+    tokens = count_tokens_approximately([basic_prompt, *reduzido])
+
+    print(f"Mensagens: {len(messages)} -> {len(reduzido)} | tokens: {tokens}")
+    assert tokens <= 4000 + 50
+    assert isinstance(reduzido[0], SystemMessage)
+    assert "01248526000158" in reduzido[0].content
+    assert reduzido[-4:] == messages[-4:]
+    assert _pares_validos(reduzido)
+
+    # O último turno nunca sai, mesmo acima do orçamento
+    ultimo = reduzir_historico(messages, max_turnos=1, max_tokens=10)
+    assert ultimo[1:] == messages[-4:]
+    print("✓ Teste passou\n")
+
+
+def test_configuracao_por_variaveis():
+    """Testa que os limites vêm das variáveis HISTORY_* quando não informados"""
+    print("=== Teste 4: configuração por variáveis ===")
+
+    messages = _conversa(10)
+    with patch.dict(os.environ, {"HISTORY_MAX_TURNS": "1", "HISTORY_MAX_TOKENS": "100000", "HISTORY_TOOL_SUMMARY_CHARS": "50"}):
+        reduzido = criar_pre_model_hook()({"messages": messages})["llm_input_messages"]
+
+    tool_messages = [m for m in reduzido if isinstance(m, ToolMessage)]
+    assert sum(1 for m in tool_messages if m.content == SAIDA_LONGA) == 1
+    print("✓ Teste passou\n")
+
+
+def test_grafo_com_hook_limita_prompt():
+    """Testa o hook no create_react_agent: prompt limitado e estado completo"""
+    print("=== Teste 5: hook no grafo ===")
+    _clientes_cache.clear()
+    _ids_clientes_cache.clear()
+    _pendencias_cache.clear()
+
+    with FakeAsaasServer() as server:
+        server.adicionar_cliente(gerar_cliente(), gerar_pagamentos("cus_000000000001", 24))
+        with patch.dict(os.environ, {"ASAAS_API_KEY": "test_key", "ASAAS_BASE_URL": server.base_url}):
+            model = FakeChatModel()
+            agent = create_react_agent(
+                model, prompt=basic_prompt, tools=[consulta_financeira],
+                pre_model_hook=criar_pre_model_hook(basic_prompt, max_turnos=2, max_tokens=5000),
+            )
+            historico = []
+            for i in range(12):
+                historico.append({"role": "user", "content": "Meu CNPJ é 01248526000158" if i == 0 else "Preciso da segunda via do boleto"})
+                historico = agent.invoke({"messages": historico})["messages"]
+
+    print(f"Maior prompt: {max(model.tokens_por_chamada)} | mensagens no estado: {len(historico)}")
+    assert max(model.tokens_por_chamada) < 6000
+    assert sum(1 for m in historico if isinstance(m, HumanMessage)) == 12
+    assert any(isinstance(m, ToolMessage) and len(m.content) > 1000 for m in historico)
+    print("✓ Teste passou\n")
+
+
+if __name__ == "__main__":
+    print("Executando testes para a redução do histórico...\n")
+
+    test_conversa_curta_nao_muda()
+    test_turnos_antigos_tem_saidas_resumidas()
+    test_orcamento_de_tokens()
+    test_configuracao_por_variaveis()
+    test_grafo_com_hook_limita_prompt()
+
+    print("Todos os testes passaram!")
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Arquivo de teste para a idempotência de atualizar_boleto e registrar_negociacao (agent/idempotency.py)
+
+Requer um Postgres local configurado pelas variáveis DB_* (o mesmo do agente).
+As tabelas idempotencia e negociacoes são criadas e esvaziadas aqui.
+"""
+
+import asyncio
+import io
+import sys
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stderr, redirect_stdout
+from pathlib import Path
+from unittest.mock import patch
+
+import psycopg
+import pytest
+
+# Adicionar o diretório do projeto ao path para poder importar os módulos
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from langchain_core.messages import AIMessage
+from langgraph.prebuilt import ToolNode
+
+from agent.idempotency import _reset_idempotencia_stats, chave_idempotencia, idempotencia_stats
+from agent.tools import atualizar_boleto, registrar_negociacao
+from agent.utils import _conn
+from tests.fake_asaas import FakeAsaasServer, gerar_cliente, gerar_pagamentos
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+CNPJ = "01248526000158"
+BOLETO = {"boleto_id": "pay_000000000000", "valor": 150.0}
+
+
+def _preparar_banco():
+    """Cria as tabelas idempotencia e negociacoes vazias; pula o teste sem Postgres."""
+    try:
+        with _conn() as conn:
+            conn.execute((REPO_ROOT / "sql" / "02_create_tables.sql").read_text(encoding="utf-8").split("-- Trigger")[0])
+            for migracao in ("08_negociacoes_id_externo.sql", "09_create_idempotencia.sql"):
+                conn.execute((REPO_ROOT / "sql" / migracao).read_text(encoding="utf-8"))
+            conn.execute("TRUNCATE negociacoes, idempotencia")
+    except Exception as e:
+        pytest.skip(f"Postgres local indisponível: {e}")
+    _reset_idempotencia_stats()
+
+
+def _thread(nome=None):
+    return {"configurable": {"thread_id": nome or f"idempotencia-{uuid.uuid4()}"}}
+
+
+def _puts(server):
+    return [r for r in server.requisicoes if r[0] == "PUT"]
+
+
+def _asaas(latencia=0.0):
+    server = FakeAsaasServer(latencia=latencia)
+    server.adicionar_cliente(gerar_cliente(), gerar_pagamentos("cus_000000000001", 1))
+    return server
+
+
+def _env(server):
+    return {"ASAAS_API_KEY": "test_key", "ASAAS_BASE_URL": server.base_url, "NEGOCIACOES_WRITE_BEHIND": "false"}
+
+
+def test_chave_idempotencia():
+    """Testa que a chave depende de thread, tool e argumentos já normalizados"""
+    print("=== Teste 1: chave de idempotência ===")
+
+    chave = chave_idempotencia("t1", "atualizar_boleto", {"boleto_id": "pay_1", "valor": 150.0})
+    assert chave == chave_idempotencia("t1", "atualizar_boleto", {"valor": 150.0, "boleto_id": "pay_1"})
+    assert chave != chave_idempotencia("t2", "atualizar_boleto", {"boleto_id": "pay_1", "valor": 150.0})
+    assert chave != chave_idempotencia("t1", "atualizar_boleto", {"boleto_id": "pay_1", "valor": 151.0})
+    assert chave != chave_idempotencia("t1", "registrar_negociacao", {"boleto_id": "pay_1", "valor": 150.0})
+    assert len(chave) == 64
+    print("✓ Teste passou\n")
+
+
+def test_atualizar_boleto_repetido_um_put():
+    """Testa que repetições na mesma thread devolvem o resultado gravado sem novo PUT"""
+    print("=== Teste 2: atualizar_boleto repetido ===")
+    _preparar_banco()
+    config = _thread()
+
+    with _asaas() as server, patch.dict(os.environ, _env(server)):
+        resultados = [atualizar_boleto.invoke({"input": BOLETO}, config) for _ in range(5)]
+        puts_mesma_thread = len(_puts(server))
+        outra_thread = atualizar_boleto.invoke({"input": BOLETO}, _thread())
+        puts_total = len(_puts(server))
+
+    print(f"PUTs: {puts_mesma_thread} na mesma thread, {puts_total} no total | {idempotencia_stats()}")
+    assert puts_mesma_thread == 1 and puts_total == 2
+    assert all(r == resultados[0] for r in resultados) and resultados[0].status == "sucesso"
+    assert outra_thread.status == "sucesso"
+    assert idempotencia_stats()["idempotencia_repeticoes"] == 4
+    print("✓ Teste passou\n")
+
+
+def test_registrar_negociacao_repetida_uma_linha():
+    """Testa que a negociação repetida (inclusive com CNPJ formatado) não duplica a linha"""
+    print("=== Teste 3: registrar_negociacao repetida ===")
+    _preparar_banco()
+    config = _thread()
+
+    with patch.dict(os.environ, {"NEGOCIACOES_WRITE_BEHIND": "false"}):
+        primeira = registrar_negociacao.invoke({"input": {"cnpj": CNPJ, "detalhes": "3x sem juros"}}, config)
+        repetida = registrar_negociacao.invoke({"input": {"cnpj": "01.248.526/0001-58", "detalhes": "3x sem juros"}}, config)
+        outra = registrar_negociacao.invoke({"input": {"cnpj": CNPJ, "detalhes": "5x sem juros"}}, config)
+
+    with _conn() as conn:
+        linhas = conn.execute("SELECT id_externo::text FROM negociacoes ORDER BY id").fetchall()
+    assert repetida.negociacao_id == primeira.negociacao_id
+    assert [l[0] for l in linhas] == [primeira.negociacao_id, outra.negociacao_id]
+    print("✓ Teste passou\n")
+
+
+def test_erro_nao_fica_gravado():
+    """Testa que uma falha libera a chave e a nova tentativa refaz a operação"""
+    print("=== Teste 4: erro não é reaproveitado ===")
+    _preparar_banco()
+    config = _thread()
+
+    with _asaas() as server, patch.dict(os.environ, _env(server)):
+        ausente = {"boleto_id": "pay_inexistente", "valor": 10.0}
+        erros = [atualizar_boleto.invoke({"input": ausente}, config) for _ in range(2)]
+        puts = len(_puts(server))
+
+    assert all(e.status != "sucesso" for e in erros)
+    assert puts == 2
+    with _conn() as conn:
+        assert conn.execute("SELECT count(*) FROM idempotencia").fetchone()[0] == 0
+    print("✓ Teste passou\n")
+
+
+def test_tempestade_de_retentativas():
+    """Testa chamadas repetidas simultâneas: uma executa, as demais não chegam ao Asaas"""
+    print("=== Teste 5: repetições simultâneas ===")
+    _preparar_banco()
+    config = _thread()
+
+    with _asaas(latencia=0.2) as server, patch.dict(os.environ, _env(server)):
+        with ThreadPoolExecutor(max_workers=10) as executor:
+            resultados = list(executor.map(lambda _: atualizar_boleto.invoke({"input": BOLETO}, config), range(10)))
+        depois = atualizar_boleto.invoke({"input": BOLETO}, config)
+        puts = len(_puts(server))
+
+    status = sorted(r.status for r in resultados)
+    print(f"PUTs: {puts} | status: {status}")
+    assert puts == 1
+    assert status.count("sucesso") >= 1 and set(status) <= {"sucesso", "em_andamento"}
+    assert depois.status == "sucesso"
+    print("✓ Teste passou\n")
+
+
+def test_chave_expirada_e_replay_do_tool_node():
+    """Testa a reexecução após o TTL e chamadas duplicadas na mesma AIMessage, via ToolNode"""
+    print("=== Teste 6: TTL e chamadas duplicadas do modelo ===")
+    _preparar_banco()
+    chamada = {"name": "atualizar_boleto", "args": {"input": BOLETO}}
+    mensagem = AIMessage(content="", tool_calls=[{**chamada, "id": "c1"}, {**chamada, "id": "c2"}])
+
+    with _asaas() as server, patch.dict(os.environ, _env(server)):
+        result = ToolNode([atualizar_boleto]).invoke({"messages": [mensagem]}, _thread("tool-node"))
+        puts_tool_node = len(_puts(server))
+        with patch.dict(os.environ, {"IDEMPOTENCY_TTL": "0"}):
+            config = _thread()
+            atualizar_boleto.invoke({"input": BOLETO}, config)
+            atualizar_boleto.invoke({"input": BOLETO}, config)
+        puts_total = len(_puts(server))
+
+    assert len(result["messages"]) == 2
+    assert puts_tool_node == 1
+    assert puts_total == 3
+    print("✓ Teste passou\n")
+
+
+def test_versoes_assincronas():
+    """Testa a idempotência nas versões assíncronas das duas tools"""
+    print("=== Teste 7: versões assíncronas ===")
+    _preparar_banco()
+    config = _thread()
+
+    async def repetir():
+        boletos = await asyncio.gather(*[atualizar_boleto.ainvoke({"input": BOLETO}, config) for _ in range(3)])
+        negociacoes = [
+            await registrar_negociacao.ainvoke({"input": {"cnpj": CNPJ, "detalhes": "entrada + 2x"}}, config)
+            for _ in range(3)
+        ]
+        return boletos, negociacoes
+
+    with _asaas(latencia=0.05) as server, patch.dict(os.environ, _env(server)):
+        boletos, negociacoes = asyncio.run(repetir())
+        puts = len(_puts(server))
+
+    with _conn() as conn:
+        linhas = conn.execute("SELECT count(*) FROM negociacoes").fetchone()[0]
+    assert puts == 1
+    assert linhas == 1 and len({n.negociacao_id for n in negociacoes}) == 1
+    assert any(b.status == "sucesso" for b in boletos)
+    print("✓ Teste passou\n")
+
+
+def test_poda_independente_dos_checkpoints():
+    """Testa scripts/podar_retencao.py: chaves expiradas são podadas mesmo com as outras etapas falhando"""
+    print("=== Teste 8: poda sem as tabelas de checkpoint ===")
+    from scripts.podar_retencao import main
+
+    _preparar_banco()
+    with _conn() as conn:
+        conn.execute(
+            "INSERT INTO idempotencia (chave, ferramenta, resultado, expira_em) "
+            "SELECT md5(i::text) || md5(i::text), 'atualizar_boleto', '{}', CURRENT_TIMESTAMP + make_interval(secs => %s) "
+            "FROM generate_series(1, 5) AS i",
+            (-60,),
+        )
+        conn.execute(
+            "INSERT INTO idempotencia (chave, ferramenta, resultado, expira_em) "
+            "VALUES (repeat('f', 64), 'atualizar_boleto', '{}', CURRENT_TIMESTAMP + interval '1 day')"
+        )
+
+    sem_tabela = psycopg.errors.UndefinedTable('relation "checkpoints" does not exist')
+    with patch("scripts.podar_retencao.podar_threads", side_effect=sem_tabela), \
+            patch("scripts.podar_retencao.podar_comprovantes", side_effect=psycopg.OperationalError("conexão recusada")):
+        with redirect_stdout(io.StringIO()) as saida, redirect_stderr(io.StringIO()) as erros:
+            codigo = main(["--lote-idempotencia", "2"])
+
+    with _conn() as conn:
+        restantes = conn.execute("SELECT count(*) FROM idempotencia").fetchone()[0]
+    print(saida.getvalue())
+    assert "Threads removidas: tabelas ausentes" in saida.getvalue()
+    assert "Chaves de idempotência removidas: 5" in saida.getvalue()
+    assert "conexão recusada" in erros.getvalue()
+    assert codigo == 1 and restantes == 1
+
+    with patch("scripts.podar_retencao.podar_threads") as podar_threads, redirect_stdout(io.StringIO()):
+        assert main(["--tabelas", "idempotencia"]) == 0
+    assert not podar_threads.called
+    print("✓ Teste passou\n")
+
+
+if __name__ == "__main__":
+    print("Executando testes para a idempotência das tools...\n")
+
+    test_chave_idempotencia()
+    test_atualizar_boleto_repetido_um_put()
+    test_registrar_negociacao_repetida_uma_linha()
+    test_erro_nao_fica_gravado()
+    test_tempestade_de_retentativas()
+    test_chave_expirada_e_replay_do_tool_node()
+    test_versoes_assincronas()
+    test_poda_independente_dos_checkpoints()
+
+    print("Todos os testes passaram!")
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Arquivo de teste para os logs estruturados das tools (agent/logs.py)
+"""
+
+import asyncio
+import json
+import sys
+import os
+import threading
+import time
+from contextlib import contextmanager
+from unittest.mock import patch
+
+# Adicionar o diretório do projeto ao path para poder importar os módulos
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from agent.logs import _obter_pipeline, _reset_logs, logs_stats, redigir, registrar
+from agent.tools import transferir_humano
+
+
+@contextmanager
+def _logs(**env):
+    with patch.dict(os.environ, {"LOG_NIVEL": "INFO", "TICKETS_FILA": "false", **env}):
+        _reset_logs()
+        try:
+            yield
+        finally:
+            _reset_logs()
+
+
+def _linhas(arquivo):
+    return [json.loads(linha) for linha in arquivo.read_text(encoding="utf-8").splitlines()]
+
+
+def test_redacao_de_dados_pessoais():
+    """Testa a troca de CNPJ, CPF, e-mail e telefone por marcadores, em textos e estruturas"""
+    print("=== Teste 1: redação de dados pessoais ===")
+    texto = (
+        "CNPJ 01.248.526/0001-58 ou 01248526000158, CPF 123.456.789-09, "
+        "financeiro@sabordivino.com.br, tel (11) 98765-4321, cel 11987654321, valor 1.234,56"
+    )
+    redigido = redigir(texto)
+
+    print(f"Redigido: {redigido}")
+    assert redigido == (
+        "CNPJ [CNPJ] ou [CNPJ], CPF [CPF], [EMAIL], tel [TELEFONE], cel [CPF], valor 1.234,56"
+    )
+    assert redigir({"a": ["01248526000158", 3], "b": None}) == {"a": ["[CNPJ]", 3], "b": None}
+    print("✓ Teste passou\n")
+
+
+def test_transferencia_gera_evento_json(tmp_path):
+    """Testa o evento JSON de transferir_humano (sync e async) com o contexto redigido"""
+    print("=== Teste 2: evento de transferência em JSON ===")
+    arquivo = tmp_path / "eventos.jsonl"
+    contexto = "Cliente CNPJ 01.248.526/0001-58 (financeiro@sabordivino.com.br) contesta a multa"
+    with _logs(LOG_ARQUIVO=str(arquivo)):
+        saida = transferir_humano.invoke({"input": {"contexto": contexto}})
+        asaida = asyncio.run(transferir_humano.ainvoke({"input": {"contexto": contexto}}))
+        stats = logs_stats()
+
+    eventos = _linhas(arquivo)
+    print(f"Eventos: {eventos}")
+    assert saida.status == "sucesso" and asaida.status == "sucesso"
+    assert [e["evento"] for e in eventos] == ["transferencia_humano"] * 2
+    assert [e["ticket_id"] for e in eventos] == [saida.ticket_id, asaida.ticket_id]
+    assert eventos[0]["nivel"] == "info" and eventos[0]["ts"]
+    assert eventos[0]["contexto"] == "Cliente CNPJ [CNPJ] ([EMAIL]) contesta a multa"
+    assert stats["logs_enfileirados"] == 2 and stats["logs_descartados"] == 0
+    print("✓ Teste passou\n")
+
+
+def test_amostragem_e_nivel(tmp_path):
+    """Testa os eventos fora da amostra (LOG_AMOSTRAGEM) e abaixo de LOG_NIVEL"""
+    print("=== Teste 3: amostragem e nível ===")
+    arquivo = tmp_path / "eventos.jsonl"
+    with _logs(LOG_ARQUIVO=str(arquivo), LOG_AMOSTRAGEM="comprovante_validado=0,ruidoso=1"):
+        for _ in range(5):
+            registrar("comprovante_validado", valido=True)
+            registrar("ruidoso")
+        registrar("detalhe", nivel=10)
+        stats = logs_stats()
+
+    eventos = _linhas(arquivo)
+    print(f"Stats: {stats}")
+    assert [e["evento"] for e in eventos] == ["ruidoso"] * 5
+    assert stats["logs_fora_da_amostra"] == 5 and stats["logs_enfileirados"] == 5
+    print("✓ Teste passou\n")
+
+
+def test_saida_lenta_nao_bloqueia(tmp_path):
+    """Testa o descarte com o buffer cheio: a saída travada não segura quem registra"""
+    print("=== Teste 4: saída lenta não bloqueia ===")
+    liberar = threading.Event()
+    with _logs(LOG_ARQUIVO=str(tmp_path / "eventos.jsonl"), LOG_BUFFER="5"):
+        pipeline = _obter_pipeline()
+        emitir = pipeline.saida.emit
+        pipeline.saida.emit = lambda record: (liberar.wait(5), emitir(record))
+
+        inicio = time.perf_counter()
+        for i in range(100):
+            registrar("transferencia_humano", ticket_id=str(i))
+        duracao = time.perf_counter() - inicio
+        stats = logs_stats()
+        liberar.set()
+
+    print(f"100 eventos em {duracao * 1000:.1f} ms | stats: {stats}")
+    assert duracao < 1.0
+    assert stats["logs_descartados"] >= 90
+    assert stats["logs_enfileirados"] + stats["logs_descartados"] == 100
+    print("✓ Teste passou\n")
+
+
+def test_benchmark_roda():
+    """Testa uma rodada curta de benchmarks/bench_logs.py"""
+    print("=== Teste 5: benchmark dos logs ===")
+    from benchmarks.bench_logs import main
+
+    with _logs():
+        assert main(["--concorrencia", "4", "--chamadas", "3", "--atraso-saida", "0"]) == 0
+    print("✓ Teste passou\n")
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+
+    print("Executando testes para os logs estruturados...\n")
+
+    test_redacao_de_dados_pessoais()
+    with tempfile.TemporaryDirectory() as pasta:
+        test_transferencia_gera_evento_json(Path(pasta))
+    with tempfile.TemporaryDirectory() as pasta:
+        test_amostragem_e_nivel(Path(pasta))
+    with tempfile.TemporaryDirectory() as pasta:
+        test_saida_lenta_nao_bloqueia(Path(pasta))
+    test_benchmark_roda()
+
+    print("Todos os testes passaram!")
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Arquivo de teste para a paginação das listagens do Asaas (/payments, /customers)
+"""
+
+import asyncio
+import sys
+import os
+from unittest.mock import patch
+
+# Adicionar o diretório do projeto ao path para poder importar os módulos
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from agent.tools import _clientes_cache, _ids_clientes_cache, _pendencias_cache, consulta_financeira
+from agent.utils import AsaasError, _aiter_asaas_list, _iter_asaas_list
+from tests.fake_asaas import FakeAsaasServer, gerar_cliente, gerar_pagamentos
+
+TOTAL_PAGAMENTOS = 2500
+HEADERS = {"access_token": "test_key", "Content-Type": "application/json"}
+
+
+def _servidor_com_historico_longo():
+    server = FakeAsaasServer()
+    server.adicionar_cliente(
+        gerar_cliente(), gerar_pagamentos("cus_000000000001", TOTAL_PAGAMENTOS)
+    )
+    return server
+
+
+def test_iter_asaas_list_percorre_todas_as_paginas():
+    """Testa que o iterador segue hasMore até o fim usando a página máxima"""
+    print("=== Teste 1: todas as páginas de /payments ===")
+
+    with _servidor_com_historico_longo() as server:
+        ids = [p["id"] for p in _iter_asaas_list(
+            f"{server.base_url}/payments", HEADERS, params={"customer": "cus_000000000001"}, concurrency=1
+        )]
+        limits = {q["limit"][0] for _, path, q in server.requisicoes}
+
+    print(f"Itens: {len(ids)} | Requisições: {len(server.requisicoes)}")
+    assert len(ids) == TOTAL_PAGAMENTOS
+    assert len(set(ids)) == TOTAL_PAGAMENTOS
+    assert ids == sorted(ids)
+    assert limits == {"100"}
+    assert len(server.requisicoes) == TOTAL_PAGAMENTOS // 100
+    print("✓ Teste passou\n")
+
+
+def test_iter_asaas_list_concorrente_mantem_ordem():
+    """Testa a busca concorrente de páginas preservando a ordem dos itens"""
+    print("=== Teste 2: páginas em paralelo ===")
+
+    with _servidor_com_historico_longo() as server:
+        ids = [p["id"] for p in _iter_asaas_list(
+            f"{server.base_url}/payments", HEADERS, params={"customer": "cus_000000000001"}, concurrency=8
+        )]
+
+    assert ids == [f"pay_{i:012d}" for i in range(TOTAL_PAGAMENTOS)]
+    print("✓ Teste passou\n")
+
+
+def test_iter_asaas_list_e_preguicoso():
+    """Testa que consumir só o começo do gerador não busca o histórico inteiro"""
+    print("=== Teste 3: gerador preguiçoso ===")
+
+    with _servidor_com_historico_longo() as server:
+        iterador = _iter_asaas_list(
+            f"{server.base_url}/payments", HEADERS, params={"customer": "cus_000000000001"}, concurrency=1
+        )
+        primeiros = [next(iterador) for _ in range(150)]
+        iterador.close()
+
+    assert len(primeiros) == 150
+    assert len(server.requisicoes) == 2
+    print("✓ Teste passou\n")
+
+
+def test_iter_asaas_list_clientes():
+    """Testa a paginação de /customers"""
+    print("=== Teste 4: paginação de /customers ===")
+
+    with FakeAsaasServer() as server:
+        for i in range(250):
+            server.adicionar_cliente(gerar_cliente(customer_id=f"cus_{i:012d}", cpf_cnpj=f"{i:014d}"))
+        clientes = list(_iter_asaas_list(f"{server.base_url}/customers", HEADERS, concurrency=1))
+
+    assert len(clientes) == 250
+    print("✓ Teste passou\n")
+
+
+def test_iter_asaas_list_erro_de_conexao():
+    """Testa que uma falha de conexão durante a paginação vira AsaasError"""
+    print("=== Teste 5: erro de conexão ===")
+
+    server = _servidor_com_historico_longo().start()
+    url = f"{server.base_url}/payments"
+    server.stop()
+
+    try:
+        list(_iter_asaas_list(url, HEADERS, params={"customer": "cus_000000000001"}))
+        assert False, "Deveria ter lançado AsaasError"
+    except AsaasError as e:
+        print(f"Erro capturado: {e.error}")
+        assert e.error["status"] == "erro"
+    print("✓ Teste passou\n")
+
+
+def test_aiter_asaas_list_concorrente():
+    """Testa o iterador assíncrono com páginas em paralelo"""
+    print("=== Teste 6: iterador assíncrono ===")
+
+    async def coletar(url):
+        return [p["id"] async for p in _aiter_asaas_list(
+            url, HEADERS, params={"customer": "cus_000000000001"}, concurrency=4
+        )]
+
+    with _servidor_com_historico_longo() as server:
+        ids = asyncio.run(coletar(f"{server.base_url}/payments"))
+
+    assert ids == [f"pay_{i:012d}" for i in range(TOTAL_PAGAMENTOS)]
+    print("✓ Teste passou\n")
+
+
+def test_consulta_financeira_historico_longo():
+    """Testa que consulta_financeira sinaliza quando o histórico excede max_itens"""
+    print("=== Teste 7: consulta_financeira com milhares de pagamentos ===")
+    _clientes_cache.clear()
+    _ids_clientes_cache.clear()
+    _pendencias_cache.clear()
+
+    with _servidor_com_historico_longo() as server:
+        with patch.dict(os.environ, {"ASAAS_API_KEY": "test_key", "ASAAS_BASE_URL": server.base_url}):
+            result = consulta_financeira.invoke({"input": {
+                "cnpj": "01248526000158", "historico_completo": True, "max_itens": 1000,
+            }})
+
+    print(f"Total de pendências: {result.total_pendencias}")
+    assert result.status == 'sucesso'
+    assert result.total_pendencias == 1000
+    assert result.truncado is True
+    print("✓ Teste passou\n")
+
+
+def test_consulta_financeira_filtros_no_servidor():
+    """Testa que os filtros padrão (apenas em aberto) são enviados ao Asaas"""
+    print("=== Teste 8: filtros de status e vencimento ===")
+    _clientes_cache.clear()
+    _ids_clientes_cache.clear()
+    _pendencias_cache.clear()
+
+    with _servidor_com_historico_longo() as server:
+        with patch.dict(os.environ, {"ASAAS_API_KEY": "test_key", "ASAAS_BASE_URL": server.base_url}):
+            result = consulta_financeira.invoke({"input": {
+                "cnpj": "01248526000158",
+                "vencimento_de": "2021-01-01",
+                "vencimento_ate": "2021-12-31",
+                "max_itens": 1000,
+            }})
+        status_pedidos = [q.get("status", [None])[0] for _, path, q in server.requisicoes if path.endswith("/payments")]
+
+    print(f"Resultado: {result.total_pendencias} pendências | status pedidos: {status_pedidos}")
+    assert result.status == 'sucesso'
+    assert list(dict.fromkeys(status_pedidos)) == ["OVERDUE", "PENDING"]
+    assert {p["status"] for p in result.pendencias} == {"OVERDUE", "PENDING"}
+    assert all("2021-01-01" <= p["data_vencimento"] <= "2021-12-31" for p in result.pendencias)
+    assert result.truncado is False
+    print("✓ Teste passou\n")
+
+
+if __name__ == "__main__":
+    print("Executando testes para a paginação do Asaas...\n")
+
+    test_iter_asaas_list_percorre_todas_as_paginas()
+    test_iter_asaas_list_concorrente_mantem_ordem()
+    test_iter_asaas_list_e_preguicoso()
+    test_iter_asaas_list_clientes()
+    test_iter_asaas_list_erro_de_conexao()
+    test_aiter_asaas_list_concorrente()
+    test_consulta_financeira_historico_longo()
+    test_consulta_financeira_filtros_no_servidor()
+
+    print("Todos os testes passaram!")
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Arquivo de teste para o pool de conexões do Postgres (agent/utils.py)
+
+Requer um Postgres local configurado pelas variáveis DB_* (o mesmo do agente).
+"""
+
+import asyncio
+import sys
+import os
+from unittest.mock import patch
+
+import pytest
+
+# Adicionar o diretório do projeto ao path para poder importar os módulos
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from agent.utils import (
+    _aconn,
+    _close_db_pools,
+    _conn,
+    _db_pool_kwargs,
+    _db_pool_stats,
+    _get_async_db_pool,
+    _get_db_pool,
+)
+
+ENV_POOL = {
+    "DB_POOL_MIN_SIZE": "2",
+    "DB_POOL_MAX_SIZE": "4",
+    "DB_POOL_MAX_IDLE": "60",
+    "DB_POOL_MAX_LIFETIME": "600",
+    "DB_POOL_TIMEOUT": "2.5",
+}
+
+
+def _pool_novo():
+    """Recria o pool síncrono com ENV_POOL; pula o teste sem Postgres."""
+    _close_db_pools()
+    try:
+        with _conn() as conn:
+            conn.execute("SELECT 1")
+    except Exception as e:
+        _close_db_pools()
+        pytest.skip(f"Postgres local indisponível: {e}")
+    pool = _get_db_pool()
+    pool.wait()
+    return pool
+
+
+def test_parametros_do_pool():
+    """Testa a leitura de DB_POOL_* e os valores padrão"""
+    print("=== Teste 1: parâmetros do pool ===")
+    with patch.dict(os.environ, ENV_POOL):
+        configurado = _db_pool_kwargs()
+    with patch.dict(os.environ):
+        for chave in ENV_POOL:
+            os.environ.pop(chave, None)
+        padrao = _db_pool_kwargs()
+
+    print(f"Configurado: {configurado} | padrão: {padrao}")
+    assert configurado == {"min_size": 2, "max_size": 4, "max_idle": 60.0, "max_lifetime": 600.0, "timeout": 2.5}
+    assert padrao == {"min_size": 1, "max_size": 10, "max_idle": 300.0, "max_lifetime": 3600.0, "timeout": 10.0}
+    print("✓ Teste passou\n")
+
+
+def test_pool_dimensionado_e_reaproveitado():
+    """Testa o pool criado com DB_POOL_* e o reaproveitamento das conexões entre chamadas"""
+    print("=== Teste 2: pool dimensionado e reaproveitado ===")
+    with patch.dict(os.environ, ENV_POOL):
+        pool = _pool_novo()
+        try:
+            abertas = pool.get_stats()["connections_num"]
+            pids = set()
+            for _ in range(10):
+                with _conn() as conn:
+                    pids.add(conn.execute("SELECT pg_backend_pid()").fetchone()[0])
+            limites = (pool.min_size, pool.max_size, pool.max_idle, pool.max_lifetime, pool.timeout)
+            mesmo = _get_db_pool() is pool
+            novas = pool.get_stats()["connections_num"] - abertas
+        finally:
+            _close_db_pools()
+
+    print(f"Limites: {limites} | backends: {len(pids)} | conexões novas: {novas}")
+    assert mesmo
+    assert limites == (2, 4, 60.0, 600.0, 2.5)
+    assert novas == 0 and len(pids) <= 4
+    print("✓ Teste passou\n")
+
+
+def test_estatisticas_do_pool():
+    """Testa _db_pool_stats: tamanho do pool, checkouts e espera média, sync e async"""
+    print("=== Teste 3: estatísticas do pool ===")
+
+    async def consultar():
+        async with _aconn() as conn:
+            await conn.execute("SELECT 1")
+        stats = _db_pool_stats()
+        await (await _get_async_db_pool()).close()
+        return stats
+
+    with patch.dict(os.environ, ENV_POOL):
+        _pool_novo()
+        try:
+            for _ in range(5):
+                with _conn() as conn:
+                    conn.execute("SELECT 1")
+            stats = asyncio.run(consultar())
+        finally:
+            _close_db_pools()
+
+    print(f"Stats: {stats}")
+    assert stats["db_pool_sync_pool_max"] == 4 and stats["db_pool_sync_pool_min"] == 2
+    assert stats["db_pool_sync_requests_num"] >= 6
+    assert stats["db_pool_sync_requests_waiting"] == 0
+    assert stats["db_pool_sync_checkout_wait_avg_ms"] == pytest.approx(
+        stats.get("db_pool_sync_requests_wait_ms", 0) / stats["db_pool_sync_requests_num"]
+    )
+    assert stats["db_pool_async_requests_num"] >= 1
+    assert "db_pool_async_checkout_wait_avg_ms" in stats
+    assert _db_pool_stats().get("db_pool_sync_pool_size") is None
+    print("✓ Teste passou\n")
+
+
+if __name__ == "__main__":
+    print("Executando testes para o pool de conexões do Postgres...\n")
+
+    test_parametros_do_pool()
+    test_pool_dimensionado_e_reaproveitado()
+    test_estatisticas_do_pool()
+
+    print("Todos os testes passaram!")
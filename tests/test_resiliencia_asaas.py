@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Arquivo de teste para limite de taxa, retries e circuit breaker do cliente Asaas
+
+Usa o FakeAsaasServer com falhas injetadas (429, 503) no lugar da API real.
+"""
+
+import asyncio
+import sys
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+# Adicionar o diretório do projeto ao path para poder importar os módulos
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from agent.resilience import parse_retry_after
+from agent.tools import _clientes_cache, _ids_clientes_cache, _pendencias_cache, consulta_financeira
+from agent.utils import (
+    _ahandle_asaas_request,
+    _asaas_resiliencia_stats,
+    _handle_asaas_request,
+    _reset_asaas_resiliencia,
+)
+from tests.fake_asaas import FakeAsaasServer, gerar_cliente, gerar_pagamentos
+
+HEADERS = {"access_token": "test_key", "Content-Type": "application/json"}
+
+ENV_RAPIDO = {
+    "ASAAS_RETRY_BASE": "0.01",
+    "ASAAS_RETRY_MAX": "0.05",
+    "ASAAS_MAX_RETRIES": "3",
+    "ASAAS_BREAKER_FAILURES": "3",
+    "ASAAS_BREAKER_RESET": "0.3",
+    "ASAAS_RATE_LIMIT": "1000",
+    "ASAAS_RATE_BURST": "1000",
+}
+
+
+def _servidor():
+    server = FakeAsaasServer()
+    server.adicionar_cliente(gerar_cliente(), gerar_pagamentos("cus_000000000001", 3))
+    return server
+
+
+def test_get_repete_falhas_transitorias():
+    """Testa que GETs com 503 são repetidos até o sucesso"""
+    print("=== Teste 1: retry em 503 ===")
+    _reset_asaas_resiliencia()
+
+    with patch.dict(os.environ, ENV_RAPIDO), _servidor() as server:
+        server.injetar_falhas(503, 503)
+        data, error = _handle_asaas_request("GET", f"{server.base_url}/customers/cus_000000000001", HEADERS)
+        stats = _asaas_resiliencia_stats()
+
+    assert error is None
+    assert data["id"] == "cus_000000000001"
+    assert len(server.requisicoes) == 3
+    assert stats["asaas_retries"] == 2
+    assert stats["asaas_breaker_estado"] == 0
+    print("✓ Teste passou\n")
+
+
+def test_429_respeita_retry_after():
+    """Testa que o 429 espera o Retry-After antes de repetir e penaliza o limiter"""
+    print("=== Teste 2: 429 com Retry-After ===")
+    _reset_asaas_resiliencia()
+
+    with patch.dict(os.environ, {**ENV_RAPIDO, "ASAAS_RETRY_MAX": "2"}), _servidor() as server:
+        server.injetar_falhas(429, retry_after=1)
+        inicio = time.perf_counter()
+        data, error = _handle_asaas_request("GET", f"{server.base_url}/customers/cus_000000000001", HEADERS)
+        duracao = time.perf_counter() - inicio
+        stats = _asaas_resiliencia_stats()
+
+    print(f"Duração: {duracao:.2f}s")
+    assert error is None
+    assert duracao >= 0.95
+    assert stats["asaas_limiter_penalizacoes"] == 1
+    print("✓ Teste passou\n")
+
+
+def test_retry_after_acima_do_teto_falha_rapido():
+    """Testa que um Retry-After maior que ASAAS_RETRY_MAX devolve o erro sem esperar nem repetir"""
+    print("=== Teste 3: Retry-After acima do teto ===")
+    _reset_asaas_resiliencia()
+
+    with patch.dict(os.environ, ENV_RAPIDO), _servidor() as server:
+        server.injetar_falhas(429, 429, retry_after=120)
+        inicio = time.perf_counter()
+        data, error = _handle_asaas_request("GET", f"{server.base_url}/customers/cus_000000000001", HEADERS)
+        stats = _asaas_resiliencia_stats()
+        # O 429 também penalizou o limiter por 120s; sem o reset a versão async nem chegaria ao servidor
+        _reset_asaas_resiliencia()
+        adata, aerror = asyncio.run(
+            _ahandle_asaas_request("GET", f"{server.base_url}/customers/cus_000000000001", HEADERS)
+        )
+        duracao = time.perf_counter() - inicio
+
+    print(f"Duração: {duracao:.2f}s | erro: {error}")
+    assert data is None and adata is None
+    assert "429" in error["mensagem"] and "429" in aerror["mensagem"]
+    assert duracao < 1.0
+    assert len(server.requisicoes) == 2
+    assert stats["asaas_retries"] == 0
+    print("✓ Teste passou\n")
+
+
+def test_put_nao_e_repetido():
+    """Testa que escritas (PUT) não são repetidas automaticamente"""
+    print("=== Teste 4: PUT sem retry ===")
+    _reset_asaas_resiliencia()
+
+    with patch.dict(os.environ, ENV_RAPIDO), _servidor() as server:
+        server.injetar_falhas(503)
+        data, error = _handle_asaas_request(
+            "PUT", f"{server.base_url}/payments/pay_000000000001", HEADERS, json={"value": 10}
+        )
+
+    assert data is None
+    assert "503" in error["mensagem"]
+    assert len(server.requisicoes) == 1
+    print("✓ Teste passou\n")
+
+
+def test_circuit_breaker_abre_e_recupera():
+    """Testa que o breaker falha rápido enquanto aberto e fecha após a chamada de teste"""
+    print("=== Teste 5: circuit breaker ===")
+    _reset_asaas_resiliencia()
+    url_env = {**ENV_RAPIDO, "ASAAS_MAX_RETRIES": "0"}
+
+    with patch.dict(os.environ, url_env), _servidor() as server:
+        url = f"{server.base_url}/customers/cus_000000000001"
+        server.injetar_falhas(503, 503, 503)
+        for _ in range(3):
+            _handle_asaas_request("GET", url, HEADERS)
+        aberto = _asaas_resiliencia_stats()
+
+        requisicoes_antes = len(server.requisicoes)
+        data, error = _handle_asaas_request("GET", url, HEADERS)
+        assert len(server.requisicoes) == requisicoes_antes
+        assert "temporariamente indisponível" in error["mensagem"]
+
+        time.sleep(0.35)
+        data, error = _handle_asaas_request("GET", url, HEADERS)
+        fechado = _asaas_resiliencia_stats()
+
+    assert aberto["asaas_breaker_estado"] == 2
+    assert aberto["asaas_breaker_aberturas"] == 1
+    assert error is None
+    assert fechado["asaas_breaker_estado"] == 0
+    assert fechado["asaas_breaker_rejeicoes"] == 1
+    print("✓ Teste passou\n")
+
+
+def test_token_bucket_compartilhado_entre_threads_e_tasks():
+    """Testa que o limiter segura a taxa total de threads e tasks assíncronas juntas"""
+    print("=== Teste 6: token bucket compartilhado ===")
+    _reset_asaas_resiliencia()
+    env = {**ENV_RAPIDO, "ASAAS_RATE_LIMIT": "50", "ASAAS_RATE_BURST": "5"}
+
+    async def chamadas_async(url):
+        return await asyncio.gather(*[_ahandle_asaas_request("GET", url, HEADERS) for _ in range(10)])
+
+    with patch.dict(os.environ, env), _servidor() as server:
+        url = f"{server.base_url}/customers/cus_000000000001"
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=10) as executor:
+            futuros = [executor.submit(_handle_asaas_request, "GET", url, HEADERS) for _ in range(20)]
+            resultados_async = asyncio.run(chamadas_async(url))
+            resultados = [f.result() for f in futuros] + resultados_async
+        duracao = time.perf_counter() - inicio
+        stats = _asaas_resiliencia_stats()
+
+    # 30 chamadas, rajada de 5 e 50/s: ao menos 25/50 = 0.5s
+    print(f"Duração: {duracao:.2f}s | Esperas: {stats['asaas_limiter_esperas']}")
+    assert all(error is None for _, error in resultados)
+    assert duracao >= 0.45
+    # Uma chamada que chega no instante da reposição de uma ficha não espera
+    assert stats["asaas_limiter_esperas"] >= 20
+    print("✓ Teste passou\n")
+
+
+def test_consulta_financeira_429_mensagem_amigavel():
+    """Testa que 429 persistente vira uma mensagem amigável em vez do erro cru"""
+    print("=== Teste 7: consulta_financeira com 429 persistente ===")
+    _reset_asaas_resiliencia()
+    _clientes_cache.clear()
+    _ids_clientes_cache.clear()
+    _pendencias_cache.clear()
+
+    with _servidor() as server:
+        env = {**ENV_RAPIDO, "ASAAS_API_KEY": "test_key", "ASAAS_BASE_URL": server.base_url}
+        with patch.dict(os.environ, env):
+            server.injetar_falhas(429, 429, 429, 429, retry_after=0)
+            result = consulta_financeira.invoke({"input": {"cnpj": "01248526000158"}})
+
+    assert result.status == 'erro'
+    assert "Limite de requisições" in result.mensagem
+    assert "429 -" not in result.mensagem
+    print("✓ Teste passou\n")
+
+
+def test_parse_retry_after():
+    """Testa o Retry-After em segundos e em data HTTP"""
+    print("=== Teste 8: parse do Retry-After ===")
+
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("invalido") is None
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    print("✓ Teste passou\n")
+
+
+def test_endpoint_de_metricas():
+    """Testa que o estado do limiter e do breaker é exposto em /metricas"""
+    print("=== Teste 9: endpoint /metricas ===")
+    _reset_asaas_resiliencia()
+
+    from fastapi.testclient import TestClient
+    from agent.webhook_app import app
+
+    with TestClient(app) as client:
+        metricas = client.get("/metricas").json()
+
+    print(f"Métricas: {sorted(metricas)}")
+    assert metricas["asaas_breaker_estado"] == 0
+    assert "asaas_limiter_tokens" in metricas
+    assert "asaas_retries" in metricas
+    print("✓ Teste passou\n")
+
+
+if __name__ == "__main__":
+    print("Executando testes para a resiliência do cliente Asaas...\n")
+
+    test_get_repete_falhas_transitorias()
+    test_429_respeita_retry_after()
+    test_retry_after_acima_do_teto_falha_rapido()
+    test_put_nao_e_repetido()
+    test_circuit_breaker_abre_e_recupera()
+    test_token_bucket_compartilhado_entre_threads_e_tasks()
+    test_consulta_financeira_429_mensagem_amigavel()
+    test_parse_retry_after()
+    test_endpoint_de_metricas()
+
+    print("Todos os testes passaram!")
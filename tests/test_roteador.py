@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Arquivo de teste para o roteador determinístico de intents (agent/router.py)
+"""
+
+import sys
+import os
+from unittest.mock import patch
+
+# Adicionar o diretório do projeto ao path para poder importar os módulos
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.prebuilt import create_react_agent
+
+from agent.prompt import basic_prompt
+from agent.router import (
+    PEDIR_CNPJ,
+    _reset_roteador_stats,
+    classificar,
+    com_roteador,
+    decidir,
+    roteador_stats,
+)
+from agent.tools import (
+    _clientes_cache,
+    _ids_clientes_cache,
+    _pendencias_cache,
+    atualizar_boleto,
+    consulta_financeira,
+    transferir_humano,
+)
+from tests.fake_asaas import FakeAsaasServer, gerar_cliente, gerar_pagamentos
+from tests.fake_llm import FakeChatModel
+
+CNPJ = "01248526000158"
+
+# Mensagens rotuladas: (mensagem, intent esperada); None = o turno vai ao modelo
+MENSAGENS_ROTULADAS = [
+    ("01248526000158", "cliente_validar"),
+    ("Meu CNPJ é 01.248.526/0001-58", "cliente_validar"),
+    ("CNPJ: 01248526000158", "cliente_validar"),
+    ("oi, segue o cnpj 11.222.333/0001-81 preciso da fatura", "cliente_validar"),
+    ("Meu CNPJ é 22.333.444/0001-55", "cliente_validar"),
+    ("Preciso da segunda via do boleto", "boleto_gerar_segunda_via"),
+    ("segunda via", "boleto_gerar_segunda_via"),
+    ("Me manda a 2a via por favor", "boleto_gerar_segunda_via"),
+    ("quero um novo boleto atualizado", "boleto_gerar_segunda_via"),
+    ("Quero falar com atendente", "transferir_atendimento"),
+    ("quero falar com um humano", "transferir_atendimento"),
+    ("Posso falar com uma pessoa?", "transferir_atendimento"),
+    ("Preciso de um especialista, falar com alguém", "transferir_atendimento"),
+    ("Quanto devo?", "status_cliente_consultar"),
+    ("Tenho débitos em aberto?", "status_cliente_consultar"),
+    ("Como está minha situação?", "status_cliente_consultar"),
+    ("Segue o comprovante do pix", "comprovante_validar"),
+    ("Já paguei, vou mandar o comprovante", "comprovante_validar"),
+    # Ambíguas, negadas, longas ou fora das intents: vão ao modelo
+    ("Olá, bom dia!", None),
+    ("Obrigado!", None),
+    ("Não quero segunda via, quero cancelar o contrato", None),
+    ("Tenho uma questão muito específica sobre meu contrato", None),
+    ("Quero parcelar minha dívida em 6 vezes", None),
+    ("fatura", None),
+    ("CNPJ 01248526000158 ou 22333444000155, não lembro qual", None),
+    (
+        "Bom dia, recebi a segunda via mas o valor veio diferente do combinado com o atendente ontem à tarde",
+        None,
+    ),
+]
+
+
+def _agente(model, roteador=True):
+    tools = [consulta_financeira, atualizar_boleto, transferir_humano]
+    agente = create_react_agent(model, prompt=basic_prompt, tools=tools)
+    return com_roteador(agente, tools, checkpointer=InMemorySaver())
+
+
+def _conversar(agent, mensagens):
+    config = {"configurable": {"thread_id": "roteador"}}
+    for mensagem in mensagens:
+        result = agent.invoke({"messages": [{"role": "user", "content": mensagem}]}, config)
+    return result["messages"]
+
+
+def test_mensagens_rotuladas():
+    """Testa a classificação de um conjunto de mensagens rotuladas"""
+    print("=== Teste 1: mensagens rotuladas ===")
+
+    erros = [(m, esperado, classificar(m)[0]) for m, esperado in MENSAGENS_ROTULADAS if classificar(m)[0] != esperado]
+    for mensagem, esperado, obtido in erros:
+        print(f"  {mensagem!r}: esperado {esperado}, obtido {obtido}")
+    print(f"Acertos: {len(MENSAGENS_ROTULADAS) - len(erros)}/{len(MENSAGENS_ROTULADAS)}")
+    assert not erros
+    assert classificar("Meu CNPJ é 01.248.526/0001-58")[1] == CNPJ
+    print("✓ Teste passou\n")
+
+
+def test_decisoes_do_turno():
+    """Testa as ações escolhidas conforme a CNPJ já informada na conversa"""
+    print("=== Teste 2: decisões por turno ===")
+
+    _, pedido = decidir([HumanMessage(content="Preciso da segunda via")])
+    assert pedido.content == PEDIR_CNPJ and not pedido.tool_calls
+
+    historico = [
+        HumanMessage(content=f"CNPJ {CNPJ}"),
+        AIMessage(content="", tool_calls=[{"name": "consulta_financeira", "args": {}, "id": "c1"}]),
+        ToolMessage(content="status='sucesso' cliente={'id': 'cus_000000000001'}", tool_call_id="c1", name="consulta_financeira"),
+        AIMessage(content="Encontrei seu cadastro"),
+    ]
+    intent, consulta = decidir([*historico, HumanMessage(content="segunda via")])
+    assert intent == "boleto_gerar_segunda_via"
+    assert consulta.tool_calls[0]["args"] == {"input": {"cnpj": CNPJ, "customer_id": "cus_000000000001"}}
+
+    _, transferencia = decidir([*historico, HumanMessage(content="quero falar com atendente")])
+    assert transferencia.tool_calls[0]["name"] == "transferir_humano"
+    assert CNPJ in transferencia.tool_calls[0]["args"]["input"]["contexto"]
+
+    # CNPJ com dígitos verificadores errados: resposta direta, sem consultar o Asaas
+    _, invalida = decidir([HumanMessage(content="Meu CNPJ é 01.248.526/0001-59")])
+    assert not invalida.tool_calls
+    assert "CNPJ 01.248.526/0001-59 inválido: dígitos verificadores não conferem" in invalida.content
+    _, pedido = decidir([HumanMessage(content="01.248.526/0001-59"), invalida, HumanMessage(content="segunda via")])
+    assert pedido.content == PEDIR_CNPJ
+
+    # Sem a tool no grafo, o turno fica com o modelo
+    assert decidir([*historico, HumanMessage(content="quero falar com atendente")], {"consulta_financeira"}) == (None, None)
+    print("✓ Teste passou\n")
+
+
+def test_roteador_reduz_chamadas_ao_modelo():
+    """Testa que a conversa roteada chega ao mesmo resultado com menos chamadas ao modelo"""
+    print("=== Teste 3: chamadas ao modelo com e sem roteador ===")
+    mensagens = [
+        "Preciso da segunda via do boleto",
+        f"Meu CNPJ é {CNPJ}",
+        "Preciso da segunda via do boleto",
+        "Obrigado!",
+    ]
+
+    resultados = {}
+    for ligado in ("false", "true"):
+        _clientes_cache.clear()
+        _ids_clientes_cache.clear()
+        _pendencias_cache.clear()
+        _reset_roteador_stats()
+        with FakeAsaasServer() as server:
+            server.adicionar_cliente(gerar_cliente(), gerar_pagamentos("cus_000000000001", 6))
+            env = {"ASAAS_API_KEY": "test_key", "ASAAS_BASE_URL": server.base_url, "ROUTER_ENABLED": ligado}
+            with patch.dict(os.environ, env):
+                model = FakeChatModel()
+                messages = _conversar(_agente(model), mensagens)
+        ferramentas = [m.name for m in messages if isinstance(m, ToolMessage)]
+        resultados[ligado] = (len(model.tokens_por_chamada), ferramentas, roteador_stats())
+
+    sem, com = resultados["false"], resultados["true"]
+    print(f"Chamadas ao modelo: sem roteador {sem[0]} | com roteador {com[0]}")
+    assert com[1] == sem[1] == ["consulta_financeira", "consulta_financeira", "atualizar_boleto"]
+    assert com[0] == sem[0] - 3
+    assert com[2]["roteador_turnos"] == 4
+    assert com[2]["roteador_desviados"] == 3
+    assert com[2]["roteador_intent_boleto_gerar_segunda_via"] == 2
+    assert sem[2]["roteador_turnos"] == 0
+    print("✓ Teste passou\n")
+
+
+def test_transferencia_roteada():
+    """Testa o pedido de atendente com CNPJ já validada"""
+    print("=== Teste 4: transferência roteada ===")
+    _clientes_cache.clear()
+    _ids_clientes_cache.clear()
+    _pendencias_cache.clear()
+
+    with FakeAsaasServer() as server:
+        server.adicionar_cliente(gerar_cliente(), gerar_pagamentos("cus_000000000001", 3))
+        with patch.dict(os.environ, {"ASAAS_API_KEY": "test_key", "ASAAS_BASE_URL": server.base_url}):
+            messages = _conversar(_agente(FakeChatModel()), [f"CNPJ: {CNPJ}", "quero falar com atendente"])
+
+    roteadas = [m for m in messages if isinstance(m, AIMessage) and m.name == "roteador"]
+    assert [m.tool_calls[0]["name"] for m in roteadas] == ["consulta_financeira", "transferir_humano"]
+    assert isinstance(messages[-1], AIMessage) and not messages[-1].tool_calls
+    print("✓ Teste passou\n")
+
+
+if __name__ == "__main__":
+    print("Executando testes para o roteador de intents...\n")
+
+    test_mensagens_rotuladas()
+    test_decisoes_do_turno()
+    test_roteador_reduz_chamadas_ao_modelo()
+    test_transferencia_roteada()
+
+    print("Todos os testes passaram!")
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Arquivo de teste para a sessão HTTP compartilhada do cliente Asaas (agent/utils.py)
+
+Usa o FakeAsaasServer no lugar da API real.
+"""
+
+import sys
+import os
+from unittest.mock import patch
+
+from requests.adapters import HTTPAdapter
+
+# Adicionar o diretório do projeto ao path para poder importar os módulos
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from agent.utils import (
+    _get_asaas_session,
+    _get_asaas_timeout,
+    _handle_asaas_request,
+    _reset_asaas_resiliencia,
+    _reset_asaas_session,
+)
+from tests.fake_asaas import FakeAsaasServer, gerar_cliente, gerar_pagamentos
+
+HEADERS = {"access_token": "test_key", "Content-Type": "application/json"}
+
+
+def test_adaptador_com_pool_configurado():
+    """Testa o HTTPAdapter montado na sessão com ASAAS_POOL_CONNECTIONS e ASAAS_POOL_MAXSIZE"""
+    print("=== Teste 1: adaptador com pool configurado ===")
+    env = {"ASAAS_POOL_CONNECTIONS": "3", "ASAAS_POOL_MAXSIZE": "7"}
+    with patch.dict(os.environ, env):
+        _reset_asaas_session()
+        try:
+            session = _get_asaas_session()
+            adapters = [session.get_adapter("https://api.asaas.com/v3"), session.get_adapter("http://127.0.0.1")]
+            mesma = _get_asaas_session() is session
+        finally:
+            _reset_asaas_session()
+
+    print(f"Adaptadores: {adapters}")
+    assert mesma
+    assert adapters[0] is adapters[1] and isinstance(adapters[0], HTTPAdapter)
+    assert adapters[0]._pool_connections == 3 and adapters[0]._pool_maxsize == 7
+    assert adapters[0]._pool_block is False
+    assert session.headers["Connection"] == "keep-alive"
+    print("✓ Teste passou\n")
+
+
+def test_conexoes_reaproveitadas():
+    """Testa o keep-alive: várias chamadas sequenciais abrem uma única conexão TCP"""
+    print("=== Teste 2: conexões reaproveitadas ===")
+    _reset_asaas_session()
+    _reset_asaas_resiliencia()
+
+    with FakeAsaasServer() as server:
+        server.adicionar_cliente(gerar_cliente(), gerar_pagamentos("cus_000000000001", 3))
+        for _ in range(10):
+            data, error = _handle_asaas_request("GET", f"{server.base_url}/customers/cus_000000000001", HEADERS)
+            assert error is None and data["id"] == "cus_000000000001"
+    _reset_asaas_session()
+
+    print(f"Requisições: {len(server.requisicoes)} | conexões: {server.conexoes}")
+    assert len(server.requisicoes) == 10
+    assert server.conexoes == 1
+    print("✓ Teste passou\n")
+
+
+def test_timeouts_em_toda_requisicao():
+    """Testa os timeouts (connect, read) de ASAAS_CONNECT_TIMEOUT/ASAAS_READ_TIMEOUT em cada chamada"""
+    print("=== Teste 3: timeouts em toda requisição ===")
+    _reset_asaas_resiliencia()
+    env = {"ASAAS_CONNECT_TIMEOUT": "1.5", "ASAAS_READ_TIMEOUT": "4"}
+
+    with patch.dict(os.environ, env), FakeAsaasServer() as server:
+        server.adicionar_cliente(gerar_cliente(), gerar_pagamentos("cus_000000000001", 3))
+        session = _get_asaas_session()
+        with patch.object(session, "request", wraps=session.request) as request:
+            _handle_asaas_request("GET", f"{server.base_url}/customers/cus_000000000001", HEADERS)
+            _handle_asaas_request("GET", f"{server.base_url}/payments", HEADERS, params={"customer": "cus_000000000001"})
+            _handle_asaas_request("GET", f"{server.base_url}/customers", HEADERS, timeout=30)
+        padrao = _get_asaas_timeout()
+    _reset_asaas_session()
+
+    timeouts = [chamada.kwargs["timeout"] for chamada in request.call_args_list]
+    print(f"Timeouts: {timeouts}")
+    assert padrao == (1.5, 4.0)
+    assert timeouts == [(1.5, 4.0), (1.5, 4.0), 30]
+    print("✓ Teste passou\n")
+
+
+if __name__ == "__main__":
+    print("Executando testes para a sessão HTTP do Asaas...\n")
+
+    test_adaptador_com_pool_configurado()
+    test_conexoes_reaproveitadas()
+    test_timeouts_em_toda_requisicao()
+
+    print("Todos os testes passaram!")
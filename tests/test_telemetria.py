@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Arquivo de teste para a telemetria de tools, Asaas e Postgres (agent/telemetry.py)
+"""
+
+import asyncio
+import json
+import sys
+import os
+from contextlib import contextmanager
+from unittest.mock import patch
+
+import pytest
+
+# Adicionar o diretório do projeto ao path para poder importar os módulos
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from agent.telemetry import _reset_telemetria, exportar_prometheus, rotulo_endpoint, rotulo_sql, span, telemetria_stats
+from agent.tools import _clientes_cache, _ids_clientes_cache, _pendencias_cache, consulta_financeira
+from agent.utils import _aconn, _conn, _reset_asaas_resiliencia
+from tests.fake_asaas import FakeAsaasServer, gerar_cliente, gerar_pagamentos
+
+
+@contextmanager
+def _telemetria(**env):
+    with patch.dict(os.environ, {"TELEMETRIA_ENABLED": "true", "TELEMETRIA_TRACING": "false", **env}):
+        _reset_telemetria()
+        try:
+            yield
+        finally:
+            _reset_telemetria()
+
+
+def _consultar(server):
+    _clientes_cache.clear()
+    _ids_clientes_cache.clear()
+    _pendencias_cache.clear()
+    env = {"ASAAS_API_KEY": "test_key", "ASAAS_BASE_URL": server.base_url, "ASAAS_MAX_RETRIES": "0"}
+    with patch.dict(os.environ, env):
+        return consulta_financeira.invoke({"input": {"cnpj": "01248526000158"}})
+
+
+def _servidor():
+    server = FakeAsaasServer()
+    server.adicionar_cliente(gerar_cliente(), gerar_pagamentos("cus_000000000001", 3))
+    return server
+
+
+def test_histograma_e_formato_prometheus():
+    """Testa buckets acumulados, resultado pela exceção e escape dos rótulos"""
+    print("=== Teste 1: histograma e formato Prometheus ===")
+    with _telemetria():
+        for _ in range(3):
+            with span("teste", etapa='a"b'):
+                pass
+        with pytest.raises(ValueError):
+            with span("teste", etapa='a"b'):
+                raise ValueError("falhou")
+        texto = exportar_prometheus({"cache_hits": 7, "ligado": True})
+
+    print(texto)
+    assert '# TYPE nxz_teste_duracao_segundos histogram' in texto
+    assert 'nxz_teste_duracao_segundos_bucket{etapa="a\\"b",resultado="ok",le="+Inf"} 3' in texto
+    assert 'nxz_teste_duracao_segundos_count{etapa="a\\"b",resultado="ValueError"} 1' in texto
+    assert "nxz_cache_hits 7" in texto and "nxz_ligado" not in texto
+    assert rotulo_endpoint("https://api.asaas.com/v3/payments/pay_123abc") == "/payments/{id}"
+    assert rotulo_sql("UPDATE comprovantes SET envios = 1") == "UPDATE comprovantes"
+    assert rotulo_sql("INSERT INTO negociacoes (cnpj) VALUES (%s)") == "INSERT negociacoes"
+    print("✓ Teste passou\n")
+
+
+def test_spans_de_tool_e_asaas():
+    """Testa os spans da tool (status da saída) e de cada requisição ao Asaas (status HTTP e bytes)"""
+    print("=== Teste 2: spans de tool e do Asaas ===")
+    with _telemetria(), _servidor() as server:
+        saida = _consultar(server)
+        server.injetar_falhas(503)
+        falha = _consultar(server)
+        texto = exportar_prometheus()
+        stats = telemetria_stats()
+    _reset_asaas_resiliencia()
+
+    print(f"Stats: {stats}")
+    assert saida.status == "sucesso" and falha.status == "erro"
+    assert 'nxz_tool_duracao_segundos_count{tool="consulta_financeira",resultado="sucesso"} 1' in texto
+    assert 'nxz_tool_duracao_segundos_count{tool="consulta_financeira",resultado="erro"} 1' in texto
+    assert 'nxz_asaas_duracao_segundos_count{method="GET",endpoint="/customers",resultado="200"} 1' in texto
+    assert 'endpoint="/customers",resultado="503"} 1' in texto
+    assert 'nxz_asaas_bytes_total{method="GET",endpoint="/payments"}' in texto
+    assert stats["telemetria_spans_tool"] == 2 and stats["telemetria_spans_asaas"] >= 4
+    print("✓ Teste passou\n")
+
+
+def test_tracing_em_arquivo(tmp_path):
+    """Testa o arquivo de spans: requisições ao Asaas como filhas do span da tool (sync e async)"""
+    print("=== Teste 3: tracing em arquivo ===")
+    arquivo = tmp_path / "spans.jsonl"
+    with _telemetria(TELEMETRIA_TRACING="true", TELEMETRIA_SPANS_ARQUIVO=str(arquivo)), _servidor() as server:
+        _consultar(server)
+        _pendencias_cache.clear()
+        env = {"ASAAS_API_KEY": "test_key", "ASAAS_BASE_URL": server.base_url}
+        with patch.dict(os.environ, env):
+            asyncio.run(consulta_financeira.ainvoke({"input": {"cnpj": "01248526000158"}}))
+
+    spans = [json.loads(linha) for linha in arquivo.read_text(encoding="utf-8").splitlines()]
+    tools = [s for s in spans if s["nome"] == "tool"]
+    print(f"Spans: {[(s['nome'], s['atributos'].get('endpoint')) for s in spans]}")
+    assert len(tools) == 2 and all(t["pai"] is None for t in tools)
+    for tool in tools:
+        filhos = [s for s in spans if s["pai"] == tool["span_id"]]
+        assert filhos and all(f["nome"] == "asaas" and f["trace_id"] == tool["trace_id"] for f in filhos)
+        assert all(f["atributos"]["resultado"] == "200" and f["duracao_ms"] <= tool["duracao_ms"] for f in filhos)
+    print("✓ Teste passou\n")
+
+
+def test_spans_do_postgres():
+    """Testa os spans "db" das queries feitas pelas conexões do pool (sync e async)"""
+    print("=== Teste 4: spans do Postgres ===")
+    with _telemetria():
+        try:
+            with _conn() as conn:
+                conn.execute("SELECT 1").fetchone()
+        except Exception as e:
+            pytest.skip(f"Postgres local indisponível: {e}")
+
+        async def consultar():
+            async with _aconn() as conn:
+                cur = await conn.execute("SELECT count(*) FROM pg_class")
+                await cur.fetchone()
+
+        asyncio.run(consultar())
+        texto = exportar_prometheus()
+
+    assert 'nxz_db_duracao_segundos_count{query="SELECT",resultado="ok"} 1' in texto
+    assert 'nxz_db_duracao_segundos_count{query="SELECT pg_class",resultado="ok"} 1' in texto
+    print("✓ Teste passou\n")
+
+
+def test_custo_dentro_do_orcamento():
+    """Testa o custo de um span com o tracing desligado e a telemetria desligada por completo"""
+    print("=== Teste 5: custo do span ===")
+    from benchmarks.bench_telemetria import ORCAMENTO_US, custo_por_span, custo_sem_span
+
+    base = custo_sem_span(20_000)
+    with _telemetria():
+        metricas = custo_por_span(20_000) - base
+    with _telemetria(TELEMETRIA_ENABLED="false"):
+        desligada = custo_por_span(20_000) - base
+        assert exportar_prometheus() == "\n"
+
+    print(f"Só métricas: {metricas:.2f} µs/span | desligada: {desligada:.2f} µs/span")
+    assert metricas < ORCAMENTO_US
+    assert desligada < metricas
+    print("✓ Teste passou\n")
+
+
+def test_endpoint_prometheus():
+    """Testa GET /metricas/prometheus do webhook_app"""
+    print("=== Teste 6: endpoint Prometheus ===")
+    from fastapi.testclient import TestClient
+
+    from agent.webhook_app import app
+
+    with _telemetria():
+        with span("tool", tool="transferir_humano"):
+            pass
+        with TestClient(app) as client:
+            resposta = client.get("/metricas/prometheus")
+
+    assert resposta.status_code == 200
+    assert resposta.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert 'nxz_tool_duracao_segundos_count{tool="transferir_humano",resultado="ok"} 1' in resposta.text
+    assert "nxz_telemetria_spans_tool 1" in resposta.text
+    print("✓ Teste passou\n")
+
+
+def test_arquivo_de_spans_lento(tmp_path):
+    """Testa o arquivo de spans lento: o span só enfileira e, com a fila cheia, descarta e conta"""
+    print("=== Teste 7: arquivo de spans lento ===")
+    import time
+
+    arquivo = tmp_path / "spans.jsonl"
+
+    class ArquivoLento:
+        def __init__(self, *args, **kwargs):
+            self.arquivo = open(*args, **kwargs)
+
+        def writelines(self, linhas):
+            time.sleep(0.3)
+            self.arquivo.writelines(linhas)
+
+        def flush(self):
+            self.arquivo.flush()
+
+        def close(self):
+            self.arquivo.close()
+
+    env = {"TELEMETRIA_TRACING": "true", "TELEMETRIA_SPANS_ARQUIVO": str(arquivo), "TELEMETRIA_SPANS_BUFFER": "5"}
+    with patch("agent.telemetry.open", ArquivoLento, create=True), _telemetria(**env):
+        inicio = time.perf_counter()
+        for _ in range(50):
+            with span("tool", tool="consulta_financeira"):
+                pass
+        duracao = time.perf_counter() - inicio
+        stats = telemetria_stats()
+
+    escritos = len(arquivo.read_text(encoding="utf-8").splitlines())
+    print(f"50 spans em {duracao * 1000:.1f} ms | escritos: {escritos} | stats: {stats}")
+    assert duracao < 0.2
+    assert stats["telemetria_spans_tool"] == 50
+    assert stats["telemetria_spans_descartados"] > 0
+    assert escritos + stats["telemetria_spans_descartados"] == 50
+    print("✓ Teste passou\n")
+
+
+def test_exportador_segue_apos_erro(tmp_path):
+    """Testa o exportador do arquivo Prometheus: falhas de escrita são contadas e a exportação continua"""
+    print("=== Teste 8: exportador segue após erro ===")
+    import time
+
+    pasta = tmp_path / "prometheus"
+    arquivo = pasta / "metricas.prom"
+
+    def esperar(condicao):
+        limite = time.monotonic() + 5
+        while not condicao() and time.monotonic() < limite:
+            time.sleep(0.02)
+        return condicao()
+
+    with _telemetria(TELEMETRIA_PROMETHEUS_ARQUIVO=str(arquivo), TELEMETRIA_INTERVALO="0.05"):
+        with span("tool", tool="consulta_financeira"):
+            pass
+        # Sem a pasta, cada exportação falha
+        falhou = esperar(lambda: telemetria_stats()["telemetria_exportacao_erros"] >= 2)
+        pasta.mkdir()
+        exportou = esperar(arquivo.exists)
+        erros = telemetria_stats()["telemetria_exportacao_erros"]
+
+    print(f"Erros contados: {erros} | arquivo exportado: {exportou}")
+    assert falhou and exportou
+    assert 'nxz_tool_duracao_segundos_count{tool="consulta_financeira",resultado="ok"} 1' in arquivo.read_text(encoding="utf-8")
+    print("✓ Teste passou\n")
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+
+    print("Executando testes para a telemetria...\n")
+
+    test_histograma_e_formato_prometheus()
+    test_spans_de_tool_e_asaas()
+    with tempfile.TemporaryDirectory() as pasta:
+        test_tracing_em_arquivo(Path(pasta))
+    test_spans_do_postgres()
+    test_custo_dentro_do_orcamento()
+    test_endpoint_prometheus()
+    with tempfile.TemporaryDirectory() as pasta:
+        test_arquivo_de_spans_lento(Path(pasta))
+    with tempfile.TemporaryDirectory() as pasta:
+        test_exportador_segue_apos_erro(Path(pasta))
+
+    print("Todos os testes passaram!")
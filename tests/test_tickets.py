@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Arquivo de teste para a fila de tickets de atendimento humano (agent/tickets.py)
+
+Requer um Postgres local configurado pelas variáveis DB_* (o mesmo do agente).
+A tabela tickets é criada e esvaziada aqui.
+"""
+
+import asyncio
+import json
+import sys
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest.mock import patch
+
+import psycopg
+import pytest
+
+# Adicionar o diretório do projeto ao path para poder importar os módulos
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from agent.tickets import (
+    HelpDeskLocal,
+    _reset_tickets_stats,
+    abrir_ticket,
+    assumir_ticket,
+    enviar_tickets,
+    prioridade_e_prazo,
+    resolver_ticket,
+    tickets_stats,
+)
+from agent.tools import _clientes_cache, _ids_clientes_cache, _pendencias_cache, transferir_humano
+from agent.utils import _conn
+from tests.fake_asaas import FakeAsaasServer, gerar_cliente, gerar_pagamentos
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+
+def _preparar_banco():
+    """Cria a tabela tickets vazia; pula o teste sem Postgres."""
+    try:
+        with _conn() as conn:
+            conn.execute((REPO_ROOT / "sql" / "11_create_tickets.sql").read_text(encoding="utf-8"))
+            conn.execute("TRUNCATE tickets")
+    except Exception as e:
+        pytest.skip(f"Postgres local indisponível: {e}")
+    _reset_tickets_stats()
+
+
+def _ticket_no_banco(ticket_id):
+    with _conn() as conn:
+        return conn.execute(
+            "SELECT thread_id, cnpj, contexto, valor_em_atraso, prioridade, estado, "
+            "prazo_atendimento - criado_em FROM tickets WHERE id = %s",
+            (ticket_id,),
+        ).fetchone()
+
+
+def test_prioridade_pelo_valor_em_atraso():
+    """Testa as faixas de TICKETS_SLA: prioridade e prazo pelo valor em atraso"""
+    print("=== Teste 1: prioridade pelo valor em atraso ===")
+    with patch.dict(os.environ, {"TICKETS_SLA": "0:240,500:60,5000:15"}):
+        assert prioridade_e_prazo(0) == (0, 240 * 60)
+        assert prioridade_e_prazo(499.99) == (0, 240 * 60)
+        assert prioridade_e_prazo(500) == (1, 3600)
+        assert prioridade_e_prazo(12000) == (2, 900)
+    with patch.dict(os.environ, {"TICKETS_SLA": "1000:30, 0:120"}):
+        assert prioridade_e_prazo(10) == (0, 7200)
+        assert prioridade_e_prazo(1000) == (1, 1800)
+    print("✓ Teste passou\n")
+
+
+def test_transferencia_abre_ticket_priorizado():
+    """Testa transferir_humano (sync e async): ticket com o valor vencido da consulta e um ticket por thread"""
+    print("=== Teste 2: transferência abre ticket priorizado ===")
+    _preparar_banco()
+    _clientes_cache.clear()
+    _ids_clientes_cache.clear()
+    _pendencias_cache.clear()
+    pagamentos = gerar_pagamentos("cus_000000000001", 9, status_ciclo=("OVERDUE", "PENDING", "RECEIVED"))
+    em_atraso = sum(p["value"] + 3.0 for p in pagamentos if p["status"] == "OVERDUE")
+    config = {"configurable": {"thread_id": "conversa-1"}}
+
+    with FakeAsaasServer() as server:
+        server.adicionar_cliente(gerar_cliente(), pagamentos)
+        env = {"ASAAS_API_KEY": "test_key", "ASAAS_BASE_URL": server.base_url, "TICKETS_SLA": "0:240,500:60,5000:15"}
+        with patch.dict(os.environ, env):
+            primeira = transferir_humano.invoke(
+                {"input": {"contexto": "Quer parcelar as mensalidades", "cnpj": "01.248.526/0001-58"}}, config
+            )
+            segunda = transferir_humano.invoke({"input": {"contexto": "Cliente insatisfeito com a multa"}}, config)
+            outra = asyncio.run(transferir_humano.ainvoke(
+                {"input": {"contexto": "Pediu falar com o gerente"}}, {"configurable": {"thread_id": "conversa-2"}}
+            ))
+
+    ticket = _ticket_no_banco(primeira.ticket_id)
+    print(f"Ticket: {ticket} | em atraso esperado: {em_atraso:.2f}")
+    assert primeira.status == "sucesso" and segunda.status == "sucesso" and outra.status == "sucesso"
+    assert segunda.ticket_id == primeira.ticket_id and outra.ticket_id != primeira.ticket_id
+    thread_id, cnpj, contexto, valor, prioridade, estado, prazo = ticket
+    assert (thread_id, cnpj, estado) == ("conversa-1", "01248526000158", "aberto")
+    assert contexto == "Quer parcelar as mensalidades\n\nCliente insatisfeito com a multa"
+    assert float(valor) == pytest.approx(em_atraso, abs=0.01) and prioridade == 1
+    assert prazo.total_seconds() == pytest.approx(3600, abs=1)
+    assert _ticket_no_banco(outra.ticket_id)[3:5] == (0, 0)
+    assert tickets_stats()["tickets_abertos"] == 2 and tickets_stats()["tickets_complementados"] == 1
+    print("✓ Teste passou\n")
+
+
+def test_atendentes_assumem_sem_disputa():
+    """Testa a fila: prazo mais próximo primeiro, cada ticket para um só atendente, resolução"""
+    print("=== Teste 3: atendentes assumem sem disputa ===")
+    _preparar_banco()
+    with patch.dict(os.environ, {"TICKETS_SLA": "0:240,500:60,5000:15"}):
+        urgente = abrir_ticket("Débito alto", valor_em_atraso=9000)
+        ids = {abrir_ticket(f"Ticket {i}", thread_id=f"t{i}", valor_em_atraso=i * 10) for i in range(40)}
+        ids.add(urgente)
+
+    assert assumir_ticket("ana")["id"] == urgente
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        assumidos = list(executor.map(lambda i: assumir_ticket(f"atendente-{i % 8}"), range(45)))
+
+    entregues = [t["id"] for t in assumidos if t is not None]
+    print(f"Assumidos: {len(entregues)} | stats: {tickets_stats()}")
+    assert len(entregues) == 40 and len(set(entregues)) == 40
+    assert set(entregues) | {urgente} == ids
+    assert assumir_ticket("ana") is None
+    assert all(t["dentro_do_sla"] for t in assumidos if t is not None)
+
+    assert resolver_ticket(urgente, "bia") is None
+    resolvido = resolver_ticket(urgente, "ana")
+    assert resolvido["estado"] == "resolvido" and resolvido["resolvido_em"]
+    assert resolver_ticket(urgente, "ana") is None
+    stats = tickets_stats()
+    assert stats["tickets_assumidos"] == 41 and stats["tickets_resolvidos"] == 1
+    assert stats["tickets_assumidos_fora_do_sla"] == 0
+    print("✓ Teste passou\n")
+
+
+class _HelpDeskForaDoAr:
+    def enviar(self, ticket):
+        raise ConnectionError("help desk fora do ar")
+
+
+def test_envio_ao_helpdesk(tmp_path):
+    """Testa o envio ao help desk local: falhas ficam para a próxima rodada e tickets complementados são reenviados"""
+    print("=== Teste 4: envio ao help desk ===")
+    _preparar_banco()
+    arquivo = tmp_path / "helpdesk.jsonl"
+    primeiro = abrir_ticket("Quer parcelar", "01248526000158", "conversa-1", 120.0)
+    abrir_ticket("Erro no boleto", None, "conversa-2")
+
+    assert enviar_tickets(_HelpDeskForaDoAr()) == 0
+    helpdesk = HelpDeskLocal(str(arquivo))
+    assert enviar_tickets(helpdesk) == 2
+    assert enviar_tickets(helpdesk) == 0
+
+    abrir_ticket("Voltou a reclamar", None, "conversa-1")
+    assert enviar_tickets(helpdesk) == 1
+
+    enviados = [json.loads(linha) for linha in arquivo.read_text(encoding="utf-8").splitlines()]
+    print(f"Enviados: {[(t['id'][:8], t['id_helpdesk']) for t in enviados]}")
+    assert [t["contexto"] for t in enviados] == ["Quer parcelar", "Erro no boleto", "Quer parcelar\n\nVoltou a reclamar"]
+    assert enviados[2]["id"] == primeiro and enviados[2]["id_helpdesk"] == f"local-{primeiro[:8]}"
+    with _conn() as conn:
+        tentativas = conn.execute("SELECT max(tentativas_envio) FROM tickets").fetchone()[0]
+    stats = tickets_stats()
+    assert tentativas == 1 and stats["tickets_erros_envio"] == 2 and stats["tickets_enviados"] == 3
+    print("✓ Teste passou\n")
+
+
+def test_falha_ao_gravar_ticket(tmp_path):
+    """Testa que transferir_humano confirma a transferência sem a fila (ticket só no log), e TICKETS_FILA=false"""
+    print("=== Teste 5: falha ao gravar o ticket ===")
+    from agent.logs import _reset_logs
+
+    arquivo = tmp_path / "eventos.jsonl"
+    with patch.dict(os.environ, {"LOG_ARQUIVO": str(arquivo), "LOG_NIVEL": "INFO"}):
+        _reset_logs()
+        with patch("agent.tools.abrir_ticket", side_effect=psycopg.OperationalError("conexão recusada")):
+            saida = transferir_humano.invoke({"input": {"contexto": "Quer falar com um humano"}})
+        with patch("agent.tools.aabrir_ticket", side_effect=psycopg.OperationalError("conexão recusada")):
+            asaida = asyncio.run(transferir_humano.ainvoke({"input": {"contexto": "Quer falar com um humano"}}))
+        _reset_logs()
+    with patch.dict(os.environ, {"TICKETS_FILA": "false"}):
+        sem_fila = transferir_humano.invoke({"input": {"contexto": "Quer falar com um humano"}})
+
+    eventos = [json.loads(linha) for linha in arquivo.read_text(encoding="utf-8").splitlines()]
+    print(f"Saída: {saida} | eventos: {[e['evento'] for e in eventos]}")
+    assert saida.status == "sucesso" and len(saida.ticket_id) == 8
+    assert asaida.status == "sucesso" and len(asaida.ticket_id) == 8
+    assert [(e["evento"], e["ticket_id"]) for e in eventos] == [
+        ("transferencia_humano_sem_fila", saida.ticket_id),
+        ("transferencia_humano", saida.ticket_id),
+        ("transferencia_humano_sem_fila", asaida.ticket_id),
+        ("transferencia_humano", asaida.ticket_id),
+    ]
+    assert eventos[0]["nivel"] == "error" and eventos[1]["contexto"] == "Quer falar com um humano"
+    assert sem_fila.status == "sucesso" and len(sem_fila.ticket_id) == 8
+    print("✓ Teste passou\n")
+
+
+def test_valor_em_atraso_sem_truncar():
+    """Testa o valor em atraso de um cliente com mais vencidas que o padrão de 50 itens da consulta"""
+    print("=== Teste 6: valor em atraso sem truncar ===")
+    _preparar_banco()
+    _clientes_cache.clear()
+    _ids_clientes_cache.clear()
+    _pendencias_cache.clear()
+    pagamentos = gerar_pagamentos("cus_000000000001", 240, status_ciclo=("PENDING", "OVERDUE", "RECEIVED"))
+    vencidas = [p for p in pagamentos if p["status"] == "OVERDUE"]
+    em_atraso = sum(p["value"] + 3.0 for p in vencidas)
+
+    with FakeAsaasServer() as server:
+        server.adicionar_cliente(gerar_cliente(), pagamentos)
+        env = {"ASAAS_API_KEY": "test_key", "ASAAS_BASE_URL": server.base_url}
+        with patch.dict(os.environ, env):
+            saida = transferir_humano.invoke(
+                {"input": {"contexto": "Quer renegociar tudo", "cnpj": "01248526000158"}},
+                {"configurable": {"thread_id": "conversa-atrasada"}},
+            )
+
+    valor = _ticket_no_banco(saida.ticket_id)[3]
+    print(f"Vencidas: {len(vencidas)} | em atraso: {float(valor):.2f} (esperado {em_atraso:.2f})")
+    assert float(valor) == pytest.approx(em_atraso, abs=0.01)
+    print("✓ Teste passou\n")
+
+
+def test_endpoints_dos_atendentes():
+    """Testa POST /tickets/assumir e /tickets/{id}/resolver do webhook_app"""
+    print("=== Teste 7: endpoints dos atendentes ===")
+    from fastapi.testclient import TestClient
+
+    from agent.webhook_app import app
+
+    _preparar_banco()
+    ticket_id = abrir_ticket("Quer parcelar", "01248526000158", valor_em_atraso=800)
+    cabecalho = {"tickets-token": "segredo"}
+
+    with patch.dict(os.environ, {"TICKETS_TOKEN": "segredo"}), TestClient(app) as client:
+        negado = client.post("/tickets/assumir", json={"atendente": "ana"})
+        assumido = client.post("/tickets/assumir", json={"atendente": "ana"}, headers=cabecalho)
+        vazio = client.post("/tickets/assumir", json={"atendente": "bia"}, headers=cabecalho)
+        de_outro = client.post(f"/tickets/{ticket_id}/resolver", json={"atendente": "bia"}, headers=cabecalho)
+        invalido = client.post("/tickets/nao-e-uuid/resolver", json={"atendente": "ana"}, headers=cabecalho)
+        resolvido = client.post(f"/tickets/{ticket_id}/resolver", json={"atendente": "ana"}, headers=cabecalho)
+        metricas = client.get("/metricas").json()
+
+    assert negado.status_code == 401
+    assert assumido.status_code == 200 and assumido.json()["id"] == ticket_id
+    assert assumido.json()["contexto"] == "Quer parcelar" and assumido.json()["prioridade"] == 1
+    assert vazio.status_code == 204
+    assert de_outro.status_code == 404 and invalido.status_code == 404
+    assert resolvido.status_code == 200 and resolvido.json()["estado"] == "resolvido"
+    assert metricas["tickets_assumidos"] == 1 and metricas["tickets_resolvidos"] == 1
+    print("✓ Teste passou\n")
+
+
+def test_benchmark_roda():
+    """Testa uma rodada curta de benchmarks/bench_tickets.py"""
+    print("=== Teste 8: benchmark da fila de tickets ===")
+    from benchmarks.bench_tickets import main
+
+    _preparar_banco()
+    with patch.dict(os.environ):
+        assert main(["--abertos", "0,200", "--operacoes", "30", "--conexoes", "4"]) == 0
+    print("✓ Teste passou\n")
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    print("Executando testes para a fila de tickets...\n")
+
+    test_prioridade_pelo_valor_em_atraso()
+    test_transferencia_abre_ticket_priorizado()
+    test_atendentes_assumem_sem_disputa()
+    with tempfile.TemporaryDirectory() as pasta:
+        test_envio_ao_helpdesk(Path(pasta))
+    with tempfile.TemporaryDirectory() as pasta:
+        test_falha_ao_gravar_ticket(Path(pasta))
+    test_valor_em_atraso_sem_truncar()
+    test_endpoints_dos_atendentes()
+    test_benchmark_roda()
+
+    print("Todos os testes passaram!")
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Arquivo de teste para as versões assíncronas das ferramentas (ainvoke)
+"""
+
+import asyncio
+import sys
+import os
+from unittest.mock import patch, MagicMock, AsyncMock
+
+# Adicionar o diretório do projeto ao path para poder importar os módulos
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from agent.tools import _clientes_cache, _ids_clientes_cache, _pendencias_cache, consulta_financeira, atualizar_boleto, registrar_negociacao
+from tests.fake_asaas import FakeAsaasServer, gerar_cliente, gerar_pagamentos
+
+
+def test_consulta_financeira_ainvoke():
+    """Testa consulta_financeira.ainvoke contra o servidor fake do Asaas"""
+    print("=== Teste 1: consulta_financeira assíncrona ===")
+    _clientes_cache.clear()
+    _ids_clientes_cache.clear()
+    _pendencias_cache.clear()
+
+    with FakeAsaasServer() as server:
+        server.adicionar_cliente(gerar_cliente(), gerar_pagamentos("cus_000000000001", 3))
+        with patch.dict(os.environ, {"ASAAS_API_KEY": "test_key", "ASAAS_BASE_URL": server.base_url}):
+            result = asyncio.run(consulta_financeira.ainvoke({"input": {"cnpj": "01248526000158"}}))
+
+    print(f"Resultado: {result}")
+    assert result.status == 'sucesso'
+    assert result.cliente['id'] == 'cus_000000000001'
+    # Visão padrão: só as pendências em aberto (PENDING e OVERDUE)
+    assert result.total_pendencias == 2
+    print("✓ Teste passou\n")
+
+
+def test_consulta_financeira_ainvoke_cliente_nao_encontrado():
+    """Testa consulta_financeira.ainvoke quando o CNPJ não existe no Asaas"""
+    print("=== Teste 2: cliente não encontrado (assíncrono) ===")
+    _clientes_cache.clear()
+    _ids_clientes_cache.clear()
+    _pendencias_cache.clear()
+
+    with FakeAsaasServer() as server:
+        with patch.dict(os.environ, {"ASAAS_API_KEY": "test_key", "ASAAS_BASE_URL": server.base_url}):
+            result = asyncio.run(consulta_financeira.ainvoke({"input": {"cnpj": "01248526000158"}}))
+
+    print(f"Resultado: {result}")
+    assert result.status == 'nao_encontrado'
+    print("✓ Teste passou\n")
+
+
+def test_atualizar_boleto_ainvoke():
+    """Testa atualizar_boleto.ainvoke contra o servidor fake do Asaas"""
+    print("=== Teste 3: atualizar_boleto assíncrono ===")
+
+    with FakeAsaasServer() as server:
+        server.adicionar_cliente(gerar_cliente(), gerar_pagamentos("cus_000000000001", 1))
+        with patch.dict(os.environ, {"ASAAS_API_KEY": "test_key", "ASAAS_BASE_URL": server.base_url}):
+            result = asyncio.run(atualizar_boleto.ainvoke(
+                {"input": {"boleto_id": "pay_000000000000", "valor": 150.0}}
+            ))
+
+    print(f"Resultado: {result}")
+    assert result.status == 'sucesso'
+    assert result.valor == 150.0
+    assert server.requisicoes[-1][0] == 'PUT'
+    print("✓ Teste passou\n")
+
+
+@patch('agent.tools._aconn')
+def test_registrar_negociacao_ainvoke(mock_aconn):
+    """Testa registrar_negociacao.ainvoke usando a conexão assíncrona"""
+    print("=== Teste 4: registrar_negociacao assíncrona ===")
+
+    mock_connection = MagicMock()
+    mock_connection.commit = AsyncMock()
+    mock_cursor = MagicMock()
+    mock_cursor.execute = AsyncMock()
+
+    mock_aconn.return_value.__aenter__.return_value = mock_connection
+    mock_connection.cursor.return_value.__aenter__.return_value = mock_cursor
+
+    result = asyncio.run(registrar_negociacao.ainvoke(
+        {"input": {"cnpj": "01248526000158", "detalhes": "Segunda via com desconto"}}
+    ))
+
+    print(f"Resultado: {result}")
+    mock_cursor.execute.assert_awaited_once()
+    mock_connection.commit.assert_awaited_once()
+    assert result.status == 'sucesso'
+    print("✓ Teste passou\n")
+
+
+if __name__ == "__main__":
+    print("Executando testes para as versões assíncronas das ferramentas...\n")
+
+    test_consulta_financeira_ainvoke()
+    test_consulta_financeira_ainvoke_cliente_nao_encontrado()
+    test_atualizar_boleto_ainvoke()
+    test_registrar_negociacao_ainvoke()
+
+    print("Todos os testes passaram!")
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Arquivo de teste para a validação de CNPJ/CPF (agent/validators.py)
+
+O teste da migração requer um Postgres local configurado pelas variáveis DB_*;
+sem ele, só esse teste é pulado.
+"""
+
+import sys
+import os
+import random
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+from pydantic import ValidationError
+
+# Adicionar o diretório do projeto ao path para poder importar os módulos
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from agent.models import (
+    ConsultaFinanceiraInput,
+    RegistrarNegociacaoInput,
+    TransferirHumanoInput,
+    VerificarNegociacaoInput,
+)
+from agent.tools import consulta_financeira, verificar_negociacao
+from agent.utils import _conn
+from agent.validators import (
+    cnpj_valido,
+    cpf_valido,
+    formatar_documento,
+    normalizar_documento,
+    validar_documentos_em_lote,
+)
+from tests.fake_asaas import FakeAsaasServer
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+CNPJS_VALIDOS = ["01248526000158", "11222333000181", "11.444.777/0001-61"]
+CPFS_VALIDOS = ["11144477735", "529.982.247-25"]
+
+
+def _com_digitos(base: str, pesos_1, pesos_2) -> str:
+    def digito(digitos, pesos):
+        resto = sum(int(d) * p for d, p in zip(digitos, pesos)) % 11
+        return "0" if resto < 2 else str(11 - resto)
+
+    base += digito(base, pesos_1)
+    return base + digito(base, pesos_2)
+
+
+def test_normalizacao_e_digitos_verificadores():
+    """Testa a normalização de CNPJ/CPF formatados e a checagem dos dígitos"""
+    print("=== Teste 1: normalização e dígitos verificadores ===")
+
+    assert normalizar_documento(" 01.248.526/0001-58 ") == "01248526000158"
+    assert normalizar_documento("529.982.247-25") == "52998224725"
+    assert all(cnpj_valido(c) for c in CNPJS_VALIDOS)
+    assert all(cpf_valido(c) for c in CPFS_VALIDOS)
+    assert not cnpj_valido("01248526000159")
+    assert not cnpj_valido("00000000000000")
+    assert not cpf_valido("11111111111")
+    assert formatar_documento("01248526000158") == "01.248.526/0001-58"
+    print("✓ Teste passou\n")
+
+
+def test_mensagens_de_erro():
+    """Testa as mensagens de erro para cada tipo de valor inválido"""
+    print("=== Teste 2: mensagens de erro ===")
+
+    casos = {
+        "": "CNPJ é obrigatório",
+        "   ": "CNPJ é obrigatório",
+        "01.248.526/0001-59": "CNPJ 01.248.526/0001-59 inválido: dígitos verificadores não conferem",
+        "111.444.777-36": "CPF 111.444.777-36 inválido: dígitos verificadores não conferem",
+        "1234567": "são esperados 14 dígitos (CNPJ) ou 11 (CPF), recebidos 7",
+        "01248526OOO158": "contém caracteres inválidos: O",
+    }
+    for valor, mensagem in casos.items():
+        with pytest.raises(ValueError) as erro:
+            normalizar_documento(valor)
+        print(f"{valor!r}: {erro.value}")
+        assert mensagem in str(erro.value)
+    print("✓ Teste passou\n")
+
+
+def test_modelos_de_entrada_normalizam():
+    """Testa que todos os modelos com CNPJ normalizam e recusam valores inválidos"""
+    print("=== Teste 3: modelos de entrada ===")
+
+    assert ConsultaFinanceiraInput(cnpj="01.248.526/0001-58").cnpj == "01248526000158"
+    assert RegistrarNegociacaoInput(cnpj="01.248.526/0001-58", detalhes="x").cnpj == "01248526000158"
+    assert VerificarNegociacaoInput(cnpj="529.982.247-25").cnpj == "52998224725"
+
+    for modelo, extras in ((ConsultaFinanceiraInput, {}), (RegistrarNegociacaoInput, {"detalhes": "x"}), (VerificarNegociacaoInput, {})):
+        with pytest.raises(ValidationError) as erro:
+            modelo(cnpj="12345678901234", **extras)
+        assert "dígitos verificadores não conferem" in str(erro.value)
+
+    # Na transferência o CNPJ é opcional: um valor inválido é descartado, sem bloquear a chamada
+    assert TransferirHumanoInput(contexto="x", cnpj="01.248.526/0001-58").cnpj == "01248526000158"
+    assert TransferirHumanoInput(contexto="x", cnpj="01.248.526/0001-59").cnpj is None
+    assert TransferirHumanoInput(contexto="x", cnpj="não sei").cnpj is None
+    assert TransferirHumanoInput(contexto="x").cnpj is None
+    print("✓ Teste passou\n")
+
+
+def test_cnpj_invalido_nao_chega_ao_asaas():
+    """Testa que um CNPJ inválido é recusado antes de qualquer requisição"""
+    print("=== Teste 4: sem I/O para CNPJ inválido ===")
+
+    with FakeAsaasServer() as server:
+        with patch.dict(os.environ, {"ASAAS_API_KEY": "test_key", "ASAAS_BASE_URL": server.base_url}):
+            with pytest.raises(ValidationError):
+                consulta_financeira.invoke({"input": {"cnpj": "01.248.526/0001-59"}})
+            requisicoes = len(server.requisicoes)
+
+    assert requisicoes == 0
+    print("✓ Teste passou\n")
+
+
+def test_validacao_em_lote():
+    """Testa o validador vetorizado contra o validador unitário"""
+    print("=== Teste 5: validação em lote ===")
+
+    rng = random.Random(42)
+    valores = []
+    for _ in range(2000):
+        base_cnpj = "".join(rng.choice("0123456789") for _ in range(12))
+        base_cpf = "".join(rng.choice("0123456789") for _ in range(9))
+        cnpj = _com_digitos(base_cnpj, (5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2), (6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2))
+        cpf = _com_digitos(base_cpf, range(10, 1, -1), range(11, 1, -1))
+        valores += [cnpj, formatar_documento(cpf), cnpj[:-1] + str((int(cnpj[-1]) + 1) % 10)]
+    # Lixo em volta de documentos válidos: o lote recusa o que normalizar_documento recusa
+    lixo = ["11a222333000181", "529.982.247-25x", "CNPJ 01248526000158", "01_248_526/0001-58", "529,982,247-25"]
+    valores += ["", None, "123", "00000000000000", "11111111111", *lixo, " 529.982.247-25 ", "01.248.526/0001-58"]
+
+    resultado = validar_documentos_em_lote(valores)
+    esperado = []
+    for valor in valores:
+        try:
+            esperado.append(normalizar_documento(valor))
+        except ValueError:
+            esperado.append(None)
+
+    print(f"Válidos: {sum(r is not None for r in resultado)}/{len(valores)}")
+    assert resultado == esperado
+    assert resultado[-len(lixo) - 2:] == [None] * len(lixo) + ["52998224725", "01248526000158"]
+    print("✓ Teste passou\n")
+
+
+def test_migracao_normaliza_negociacoes():
+    """Testa sql/06: CNPJs formatados viram só dígitos e são encontrados pela tool"""
+    print("=== Teste 6: migração de negociacoes.cnpj ===")
+    try:
+        with _conn() as conn:
+            conn.execute((REPO_ROOT / "sql" / "02_create_tables.sql").read_text(encoding="utf-8").split("-- Trigger")[0])
+            conn.execute("ALTER TABLE negociacoes DROP CONSTRAINT IF EXISTS negociacoes_cnpj_digitos")
+            conn.execute("TRUNCATE negociacoes")
+            conn.execute(
+                "INSERT INTO negociacoes (cnpj, detalhes) VALUES (%s, 'formatado'), (%s, 'digitos')",
+                ("01.248.526/0001-58", "01248526000158"),
+            )
+    except Exception as e:
+        pytest.skip(f"Postgres local indisponível: {e}")
+
+    with _conn() as conn:
+        conn.execute((REPO_ROOT / "sql" / "06_normalize_negociacoes_cnpj.sql").read_text(encoding="utf-8"))
+    result = verificar_negociacao.invoke({"input": {"cnpj": "01.248.526/0001-58"}})
+
+    assert result.status == "sucesso"
+    assert result.total == 2
+    with pytest.raises(Exception):
+        with _conn() as conn:
+            conn.execute("INSERT INTO negociacoes (cnpj, detalhes) VALUES ('01.248.526/0001-58', 'x')")
+    print("✓ Teste passou\n")
+
+
+if __name__ == "__main__":
+    print("Executando testes para a validação de CNPJ/CPF...\n")
+
+    test_normalizacao_e_digitos_verificadores()
+    test_mensagens_de_erro()
+    test_modelos_de_entrada_normalizam()
+    test_cnpj_invalido_nao_chega_ao_asaas()
+    test_validacao_em_lote()
+    test_migracao_normaliza_negociacoes()
+
+    print("Todos os testes passaram!")
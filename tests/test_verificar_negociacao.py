@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Arquivo de teste para a paginação por keyset de verificar_negociacao
+
+Requer um Postgres local configurado pelas variáveis DB_* (o mesmo do agente).
+A tabela negociacoes e os índices de sql/07 são criados e esvaziados aqui.
+"""
+
+import asyncio
+import sys
+import os
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+# Adicionar o diretório do projeto ao path para poder importar os módulos
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from agent.tools import verificar_negociacao
+from agent.utils import _conn
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+CNPJ = "01248526000158"
+OUTRO_CNPJ = "11222333000181"
+
+
+def _preparar_banco(negociacoes=0):
+    """Cria a tabela e o índice composto e insere `negociacoes` linhas para CNPJ;
+    pula o teste sem Postgres. Metade das linhas compartilha a mesma data_criacao,
+    para exercitar o desempate por id."""
+    try:
+        with _conn() as conn:
+            conn.execute((REPO_ROOT / "sql" / "02_create_tables.sql").read_text(encoding="utf-8").split("-- Trigger")[0])
+            conn.execute((REPO_ROOT / "sql" / "07_negociacoes_keyset_index.sql").read_text(encoding="utf-8"))
+            conn.execute("TRUNCATE negociacoes RESTART IDENTITY")
+            base = datetime(2025, 1, 1)
+            with conn.cursor() as cur:
+                cur.executemany(
+                    "INSERT INTO negociacoes (cnpj, detalhes, data_criacao) VALUES (%s, %s, %s)",
+                    [(CNPJ, f"negociação {i}", base + timedelta(days=i // 2)) for i in range(negociacoes)]
+                    + [(OUTRO_CNPJ, "outro cliente", base)],
+                )
+    except Exception as e:
+        pytest.skip(f"Postgres local indisponível: {e}")
+
+
+def _verificar(**args):
+    return verificar_negociacao.invoke({"input": {"cnpj": CNPJ, **args}})
+
+
+def test_primeira_negociacao_rapida():
+    """Testa o caminho rápido apenas_primeira, com e sem negociações"""
+    print("=== Teste 1: apenas_primeira ===")
+    _preparar_banco(0)
+
+    primeira = _verificar(apenas_primeira=True)
+    _preparar_banco(3)
+    ja_negociou = _verificar(apenas_primeira=True)
+
+    assert primeira.status == "sucesso" and primeira.primeira_negociacao is True
+    assert ja_negociou.primeira_negociacao is False
+    assert ja_negociou.negociacoes is None
+    print("✓ Teste passou\n")
+
+
+def test_paginas_cobrem_todas_as_negociacoes():
+    """Testa que as páginas seguidas pelo cursor trazem todas as linhas, uma vez, em ordem"""
+    print("=== Teste 2: páginas por keyset ===")
+    _preparar_banco(23)
+
+    ids, paginas, cursor = [], 0, None
+    while True:
+        result = _verificar(max_itens=5, cursor=cursor)
+        paginas += 1
+        ids += [n["id"] for n in result.negociacoes]
+        assert result.total == len(result.negociacoes) <= 5
+        if not result.truncado:
+            break
+        cursor = result.proximo_cursor
+
+    print(f"Páginas: {paginas} | negociações: {len(ids)}")
+    assert paginas == 5
+    assert ids == list(range(23, 0, -1))
+    assert result.proximo_cursor is None
+    print("✓ Teste passou\n")
+
+
+def test_sem_negociacoes_e_cursor_invalido():
+    """Testa o retorno sem negociações e a recusa de um cursor malformado"""
+    print("=== Teste 3: sem negociações e cursor inválido ===")
+    _preparar_banco(0)
+
+    vazio = _verificar()
+    invalido = _verificar(cursor="não é um cursor")
+
+    assert vazio.status == "nao_encontrado" and vazio.primeira_negociacao is True
+    assert invalido.status == "erro" and "Cursor inválido" in invalido.mensagem
+    print("✓ Teste passou\n")
+
+
+def test_indice_composto_sem_ordenacao():
+    """Testa que a página é lida pelo índice composto, sem Sort"""
+    print("=== Teste 4: plano da consulta ===")
+    _preparar_banco(200)
+
+    with _conn() as conn:
+        conn.execute("SET enable_seqscan = off")
+        plano = "\n".join(
+            row[0] for row in conn.execute(
+                "EXPLAIN SELECT id, cnpj, detalhes, data_criacao FROM negociacoes WHERE cnpj = %s "
+                "AND (data_criacao, id) < (%s, %s) ORDER BY data_criacao DESC, id DESC LIMIT 6",
+                (CNPJ, datetime(2025, 2, 1), 100),
+            ).fetchall()
+        )
+        conn.execute("RESET enable_seqscan")
+
+    print(plano)
+    assert "idx_negociacoes_cnpj_data" in plano
+    assert "Sort" not in plano
+    print("✓ Teste passou\n")
+
+
+def test_verificar_negociacao_assincrona():
+    """Testa a versão assíncrona com a mesma paginação"""
+    print("=== Teste 5: verificar_negociacao assíncrona ===")
+    _preparar_banco(7)
+
+    async def paginas():
+        primeira = await verificar_negociacao.ainvoke({"input": {"cnpj": CNPJ, "max_itens": 4}})
+        segunda = await verificar_negociacao.ainvoke(
+            {"input": {"cnpj": CNPJ, "max_itens": 4, "cursor": primeira.proximo_cursor}}
+        )
+        return primeira, segunda
+
+    primeira, segunda = asyncio.run(paginas())
+    assert [n["id"] for n in primeira.negociacoes] == [7, 6, 5, 4]
+    assert [n["id"] for n in segunda.negociacoes] == [3, 2, 1]
+    assert primeira.truncado and not segunda.truncado
+    print("✓ Teste passou\n")
+
+
+def test_linhas_antigas_sem_data_criacao():
+    """Testa sql/07 sobre linhas sem data_criacao: preenchidas na migração e presentes nas páginas"""
+    print("=== Teste 6: linhas antigas sem data_criacao ===")
+    _preparar_banco(0)
+    with _conn() as conn:
+        # Tabela anterior a sql/07, em que data_criacao aceitava NULL
+        conn.execute("ALTER TABLE negociacoes ALTER COLUMN data_criacao DROP NOT NULL")
+        with conn.cursor() as cur:
+            cur.executemany(
+                "INSERT INTO negociacoes (cnpj, detalhes, data_criacao, data_atualizacao) VALUES (%s, %s, %s, %s)",
+                [(CNPJ, f"negociação {i}", None if i % 2 else datetime(2025, 1, 1 + i), datetime(2025, 2, 1 + i))
+                 for i in range(6)],
+            )
+        conn.execute((REPO_ROOT / "sql" / "07_negociacoes_keyset_index.sql").read_text(encoding="utf-8"))
+        sem_data = conn.execute("SELECT count(*) FROM negociacoes WHERE data_criacao IS NULL").fetchone()[0]
+
+    ids, cursor = [], None
+    while True:
+        pagina = _verificar(max_itens=2, **({"cursor": cursor} if cursor else {}))
+        assert pagina.status == "sucesso"
+        ids += [n["id"] for n in pagina.negociacoes]
+        cursor = pagina.proximo_cursor
+        if not cursor:
+            break
+
+    print(f"Ids nas páginas: {ids}")
+    assert sem_data == 0
+    # id 1 é a negociação de OUTRO_CNPJ criada por _preparar_banco
+    assert sorted(ids) == [2, 3, 4, 5, 6, 7] and len(ids) == 6
+    print("✓ Teste passou\n")
+
+
+if __name__ == "__main__":
+    print("Executando testes para verificar_negociacao...\n")
+
+    test_primeira_negociacao_rapida()
+    test_paginas_cobrem_todas_as_negociacoes()
+    test_sem_negociacoes_e_cursor_invalido()
+    test_indice_composto_sem_ordenacao()
+    test_verificar_negociacao_assincrona()
+    test_linhas_antigas_sem_data_criacao()
+
+    print("Todos os testes passaram!")
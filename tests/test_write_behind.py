@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Arquivo de teste para o write-behind de registrar_negociacao (agent/write_behind.py)
+
+Requer um Postgres local configurado pelas variáveis DB_* (o mesmo do agente).
+A tabela negociacoes e as migrações sql/07 e sql/08 são aplicadas e esvaziadas aqui.
+"""
+
+import asyncio
+import sys
+import os
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+# Adicionar o diretório do projeto ao path para poder importar os módulos
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from agent.tools import registrar_negociacao, verificar_negociacao
+from agent.utils import _conn
+from agent.write_behind import FilaNegociacoes, _fechar_fila, write_behind_stats
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+CNPJ = "01248526000158"
+
+# Lote grande e intervalo longo: nada é gravado até o flush explícito
+ENV_WRITE_BEHIND = {
+    "NEGOCIACOES_WRITE_BEHIND": "true",
+    "NEGOCIACOES_WB_BATCH": "1000",
+    "NEGOCIACOES_WB_INTERVAL": "60",
+    "NEGOCIACOES_SPOOL_PATH": "",
+}
+
+
+def _preparar_banco():
+    """Cria a tabela com as migrações de negociacoes e a esvazia; pula o teste sem Postgres."""
+    try:
+        with _conn() as conn:
+            conn.execute((REPO_ROOT / "sql" / "02_create_tables.sql").read_text(encoding="utf-8").split("-- Trigger")[0])
+            for migracao in ("07_negociacoes_keyset_index.sql", "08_negociacoes_id_externo.sql"):
+                conn.execute((REPO_ROOT / "sql" / migracao).read_text(encoding="utf-8"))
+            conn.execute("TRUNCATE negociacoes RESTART IDENTITY")
+    except Exception as e:
+        pytest.skip(f"Postgres local indisponível: {e}")
+    _fechar_fila()
+
+
+def _negociacoes_gravadas() -> list[tuple]:
+    with _conn() as conn:
+        return conn.execute("SELECT id_externo::text, cnpj, detalhes FROM negociacoes ORDER BY id").fetchall()
+
+
+def _registrar(detalhes: str):
+    return registrar_negociacao.invoke({"input": {"cnpj": CNPJ, "detalhes": detalhes}})
+
+
+def _simular_queda(fila: FilaNegociacoes):
+    """Para o worker e fecha o spool sem gravar a fila, como numa queda do processo."""
+    with fila._cond:
+        fila._parar = True
+        fila._cond.notify_all()
+    if fila._worker is not None:
+        fila._worker.join()
+    fila._spool.close()
+
+
+def test_modo_sincrono_retorna_id():
+    """Testa que, sem write-behind, a negociação é gravada na hora com o id retornado"""
+    print("=== Teste 1: modo síncrono ===")
+    _preparar_banco()
+
+    with patch.dict(os.environ, {"NEGOCIACOES_WRITE_BEHIND": "false"}):
+        result = _registrar("parcelamento em 3x")
+
+    assert result.status == "sucesso" and result.negociacao_id
+    assert _negociacoes_gravadas() == [(result.negociacao_id, CNPJ, "parcelamento em 3x")]
+    print("✓ Teste passou\n")
+
+
+def test_write_behind_responde_antes_de_gravar():
+    """Testa que a tool responde sem gravar e que o flush síncrono grava tudo, em ordem"""
+    print("=== Teste 2: enfileirar e flush ===")
+    _preparar_banco()
+
+    with patch.dict(os.environ, ENV_WRITE_BEHIND):
+        resultados = [_registrar(f"negociação {i}") for i in range(20)]
+        antes = _negociacoes_gravadas()
+        _fechar_fila()
+
+    gravadas = _negociacoes_gravadas()
+    print(f"Antes do flush: {len(antes)} | depois: {len(gravadas)}")
+    assert antes == []
+    assert [g[0] for g in gravadas] == [r.negociacao_id for r in resultados]
+    assert [g[2] for g in gravadas] == [f"negociação {i}" for i in range(20)]
+    print("✓ Teste passou\n")
+
+
+def test_worker_grava_em_lotes():
+    """Testa que o worker em segundo plano grava a fila em lotes de até NEGOCIACOES_WB_BATCH"""
+    print("=== Teste 3: worker em lotes ===")
+    _preparar_banco()
+
+    env = {**ENV_WRITE_BEHIND, "NEGOCIACOES_WB_BATCH": "10", "NEGOCIACOES_WB_INTERVAL": "0.05"}
+    with patch.dict(os.environ, env):
+        for i in range(25):
+            _registrar(f"negociação {i}")
+        limite = time.monotonic() + 5
+        while write_behind_stats()["write_behind_pendentes"] and time.monotonic() < limite:
+            time.sleep(0.02)
+        stats = write_behind_stats()
+        _fechar_fila()
+
+    print(f"Stats: {stats}")
+    assert stats["write_behind_gravadas"] == 25
+    assert stats["write_behind_pendentes"] == 0
+    assert 3 <= stats["write_behind_lotes"] < 25
+    assert len(_negociacoes_gravadas()) == 25
+    print("✓ Teste passou\n")
+
+
+def test_spool_recupera_apos_queda(tmp_path):
+    """Testa que o spool reaplica as negociações perdidas numa queda, sem duplicar as já gravadas"""
+    print("=== Teste 4: recuperação pelo spool ===")
+    _preparar_banco()
+    spool = tmp_path / "negociacoes.spool"
+
+    fila = FilaNegociacoes(lote=1000, intervalo=60, spool_path=str(spool))
+    ids = [fila.enfileirar(CNPJ, f"negociação {i}") for i in range(5)]
+    fila.flush()
+    ids += [fila.enfileirar(CNPJ, f"negociação {i}") for i in range(5, 8)]
+    _simular_queda(fila)
+    # Queda entre o COMMIT e a limpeza do spool, com a última linha cortada no meio
+    with open(spool, "a", encoding="utf-8") as arquivo:
+        arquivo.write(f'{{"id_externo": "{ids[0]}", "cnpj": "{CNPJ}", "detalhes": "negociação 0", "data_criacao": "2025-01-01T00:00:00+00:00"}}\n')
+        arquivo.write('{"id_externo": "cortada')
+
+    recuperada = FilaNegociacoes(lote=1000, intervalo=60, spool_path=str(spool))
+    pendentes = recuperada.stats()["write_behind_pendentes"]
+    recuperada.fechar()
+
+    gravadas = _negociacoes_gravadas()
+    print(f"Recuperadas: {pendentes} | gravadas: {len(gravadas)}")
+    assert pendentes == 4
+    assert [g[0] for g in gravadas] == ids
+    assert spool.read_text(encoding="utf-8") == ""
+    print("✓ Teste passou\n")
+
+
+def test_verificar_ve_negociacoes_enfileiradas():
+    """Testa que verificar_negociacao grava antes as negociações do CNPJ ainda na fila"""
+    print("=== Teste 5: leitura após escrita ===")
+    _preparar_banco()
+
+    with patch.dict(os.environ, ENV_WRITE_BEHIND):
+        _registrar("desconto de 10%")
+        result = verificar_negociacao.invoke({"input": {"cnpj": CNPJ}})
+        _fechar_fila()
+
+    assert result.status == "sucesso" and result.total == 1
+    assert result.negociacoes[0]["detalhes"] == "desconto de 10%"
+    print("✓ Teste passou\n")
+
+
+def test_registrar_negociacao_assincrona():
+    """Testa a versão assíncrona nos dois modos"""
+    print("=== Teste 6: registrar_negociacao assíncrona ===")
+    _preparar_banco()
+
+    async def registrar(detalhes):
+        return await registrar_negociacao.ainvoke({"input": {"cnpj": CNPJ, "detalhes": detalhes}})
+
+    with patch.dict(os.environ, {"NEGOCIACOES_WRITE_BEHIND": "false"}):
+        sincrona = asyncio.run(registrar("síncrona"))
+    with patch.dict(os.environ, ENV_WRITE_BEHIND):
+        enfileirada = asyncio.run(registrar("enfileirada"))
+        _fechar_fila()
+
+    assert [g[0] for g in _negociacoes_gravadas()] == [sincrona.negociacao_id, enfileirada.negociacao_id]
+    print("✓ Teste passou\n")
+
+
+def test_spool_lento_nao_trava_o_event_loop(tmp_path):
+    """Testa que a escrita com fsync no spool roda fora do event loop na versão assíncrona"""
+    print("=== Teste 7: spool lento e event loop ===")
+    _preparar_banco()
+    fsync = os.fsync
+
+    def fsync_lento(fd):
+        time.sleep(0.5)
+        fsync(fd)
+
+    async def conversas():
+        inicio = time.perf_counter()
+        registro = asyncio.create_task(
+            registrar_negociacao.ainvoke({"input": {"cnpj": CNPJ, "detalhes": "spool lento"}})
+        )
+        # Outra conversa no mesmo loop, que só precisa de um tique
+        await asyncio.sleep(0.01)
+        latencia = time.perf_counter() - inicio
+        return await registro, latencia
+
+    env = {**ENV_WRITE_BEHIND, "NEGOCIACOES_SPOOL_PATH": str(tmp_path / "negociacoes.spool")}
+    with patch.dict(os.environ, env), patch("agent.write_behind.os.fsync", side_effect=fsync_lento):
+        result, latencia = asyncio.run(conversas())
+        _fechar_fila()
+
+    print(f"Latência da outra conversa: {latencia * 1000:.1f} ms")
+    assert result.status == "sucesso"
+    assert latencia < 0.3
+    assert [g[0] for g in _negociacoes_gravadas()] == [result.negociacao_id]
+    print("✓ Teste passou\n")
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    print("Executando testes para o write-behind de negociações...\n")
+
+    test_modo_sincrono_retorna_id()
+    test_write_behind_responde_antes_de_gravar()
+    test_worker_grava_em_lotes()
+    with tempfile.TemporaryDirectory() as diretorio:
+        test_spool_recupera_apos_queda(Path(diretorio))
+    test_verificar_ve_negociacoes_enfileiradas()
+    test_registrar_negociacao_assincrona()
+    with tempfile.TemporaryDirectory() as diretorio:
+        test_spool_lento_nao_trava_o_event_loop(Path(diretorio))
+
+    print("Todos os testes passaram!")